@@ -15,8 +15,8 @@ from app.schemas.auth import Token, UserSignup
 from app.models.user_session import (
     create_user_session,
     revoke_user_session,
-    session_is_active,
 )
+from app.utils.principal_cache import session_user
 from app.utils.session_cookie import (
     SESSION_COOKIE_NAME,
     create_session_cookie_value,
@@ -87,10 +87,7 @@ async def get_current_user_from_jwt(token: str, db: Session) -> User:
         email, session_id = _decode_jwt_claims(token)
     except JWTError:
         raise credentials_exception
-    if not session_is_active(db, session_id):
-        raise credentials_exception
-
-    user = db.query(User).filter(User.email == email).first()
+    user = session_user(db, email, session_id)
     if user is None:
         raise credentials_exception
     return user
@@ -126,9 +123,7 @@ async def get_current_user_from_request(
     if claims is None:
         return None
     email, session_id = claims
-    if not session_is_active(db, session_id):
-        return None
-    return db.query(User).filter(User.email == email).first()
+    return session_user(db, email, session_id)
 
 
 def get_current_user_from_websocket(
@@ -141,11 +136,9 @@ def get_current_user_from_websocket(
             email, session_id = _decode_jwt_claims(token)
         except JWTError:
             return None, "Invalid token"
-        if not session_is_active(db, session_id):
-            return None, "Session revoked"
-        user = db.query(User).filter(User.email == email).first()
+        user = session_user(db, email, session_id)
         if user is None:
-            return None, "User not found"
+            return None, "Session revoked or user not found"
         return user, None
 
     cookie_value = websocket.cookies.get(SESSION_COOKIE_NAME)
@@ -153,12 +146,9 @@ def get_current_user_from_websocket(
     if claims is None:
         return None, "Missing token"
     email, session_id = claims
-    if not session_is_active(db, session_id):
-        return None, "Session revoked"
-
-    user = db.query(User).filter(User.email == email).first()
+    user = session_user(db, email, session_id)
     if user is None:
-        return None, "User not found"
+        return None, "Session revoked or user not found"
     return user, None
 
 
@@ -186,10 +176,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    if not session_is_active(db, session_id):
-        raise credentials_exception
-
-    user = db.query(User).filter(User.email == email).first()
+    user = session_user(db, email, session_id)
     if user is None:
         raise credentials_exception
     return user
@@ -13,7 +13,11 @@ token (same scheme as ``/api/log``). Device endpoints:
 - ``GET /api/frames/{id}/embedded/ota/manifest`` — sha256/size of the latest
   OTA app image so the device can decide whether to update.
 - ``GET /api/frames/{id}/embedded/ota/download`` — the OTA app image
-  (``frameos_esp32.bin``, not the merged flash image).
+  (``frameos_esp32.bin``, not the merged flash image); resumable with
+  ``Range``/``If-Range`` against an ETag of ``otaSha256``.
+- ``GET /api/frames/{id}/embedded/ota/delta`` — a binary patch from the
+  image the device runs to the current one, when the manifest offers it
+  (see ``app/tasks/embedded_ota.py``).
 - ``GET /api/frames/{id}/embedded/scenes`` — the frame's scenes as a JSON
   array (interpreted scenes: QuickJS + AOT app library on-device). The
   ETag is the payload's sha256; devices poll with ``If-None-Match`` and get
@@ -33,7 +37,7 @@ import struct
 from datetime import datetime, timezone
 from http import HTTPStatus
 
-from fastapi import Depends, Header, HTTPException
+from fastapi import Depends, Header, HTTPException, Query
 from fastapi.responses import FileResponse, Response
 from sqlalchemy.orm import Session
 
@@ -42,6 +46,15 @@ from app.drivers.devices import device_dimensions
 from app.models.frame import Frame, get_frame_json
 from app.redis import get_redis
 from app.utils.embedded_render import render_scene_rgba
+from app.utils.principal_cache import frame_principal
+from app.tasks.embedded_ota import (
+    OTA_DELTA_FORMAT,
+    SHA256_PATTERN,
+    ota_archive_path,
+    ota_delta_path,
+    ota_images,
+    running_ota_image,
+)
 from app.tasks.embedded_firmware import (
     FOS_PIXEL_1BPP,
     FOS_PIXEL_2BPP_BWYR,
@@ -93,11 +106,14 @@ def _embedded_frame_from_bearer(db: Session, frame_id: int, authorization: str |
     parts = authorization.split(" ")
     if len(parts) != 2 or parts[0].lower() != "bearer":
         raise HTTPException(status_code=HTTPStatus.UNAUTHORIZED, detail="Invalid Authorization header")
-    frame = db.query(Frame).filter_by(server_api_key=parts[1]).first()
-    if not frame or int(frame.id) != frame_id:
+    principal = frame_principal(db, parts[1])
+    if principal is None or principal.frame_id != frame_id:
         raise HTTPException(status_code=HTTPStatus.UNAUTHORIZED, detail="Unauthorized")
-    if (frame.mode or "rpios") != "embedded":
+    if principal.mode != "embedded":
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Not an embedded frame")
+    frame = db.get(Frame, frame_id)
+    if frame is None:
+        raise HTTPException(status_code=HTTPStatus.UNAUTHORIZED, detail="Unauthorized")
     return frame
 
 
@@ -425,42 +441,126 @@ async def api_embedded_device_settings(
 # for in-browser previews only, never for frames.
 
 
+def _ready_ota_firmware(frame: Frame) -> dict:
+    firmware = latest_embedded_firmware(frame) or {}
+    ota_path = firmware.get("otaPath")
+    if (firmware.get("status") != "ready" or not isinstance(ota_path, str)
+            or not os.path.isfile(ota_path)):
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="No OTA image available")
+    return firmware
+
+
+def _ota_image_path(firmware: dict) -> str:
+    """The archived copy of the current image when there is one (a rebuild
+    rewrites ``otaPath`` in place), else ``otaPath`` itself."""
+    sha256 = firmware.get("otaSha256")
+    if isinstance(sha256, str) and SHA256_PATTERN.match(sha256):
+        archived = ota_archive_path(sha256)
+        if archived.is_file():
+            return str(archived)
+    return firmware["otaPath"]
+
+
+def _ota_delta_for_device(frame: Frame, firmware: dict) -> dict | None:
+    to_sha256 = firmware.get("otaSha256")
+    running = running_ota_image(frame.embedded)
+    if running is None or not isinstance(to_sha256, str) or running["sha256"] == to_sha256:
+        return None
+    # Built with the firmware (build_ota_deltas); never diffed on a request.
+    delta_path = ota_delta_path(running["sha256"], to_sha256)
+    if not delta_path.is_file():
+        return None
+    return {
+        "format": OTA_DELTA_FORMAT,
+        "fromSha256": running["sha256"],
+        "size": delta_path.stat().st_size,
+        "url": f"/api/frames/{frame.id}/embedded/ota/delta?from={running['sha256']}&to={to_sha256}",
+    }
+
+
 @api_public.get("/frames/{id:int}/embedded/ota/manifest")
 async def api_embedded_device_ota_manifest(
     id: int,
+    delta: str | None = None,
     db: Session = Depends(get_db),
     authorization: str = Header(None),
 ):
+    """``delta`` is the patch format the device can apply (``OTA_DELTA_FORMAT``).
+
+    When it matches and a patch from the image the device last booted is
+    available, ``mode`` is ``"delta"`` and ``delta`` describes the patch;
+    otherwise the device downloads the full image from ``url``.
+    """
     frame = _embedded_frame_from_bearer(db, id, authorization)
-    firmware = latest_embedded_firmware(frame) or {}
-    ota_path = firmware.get("otaPath")
-    if (firmware.get("status") != "ready" or not isinstance(ota_path, str)
-            or not os.path.isfile(ota_path)):
-        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="No OTA image available")
-    return {
-        "sha256": firmware.get("otaSha256"),
+    firmware = _ready_ota_firmware(frame)
+    sha256 = firmware.get("otaSha256")
+    manifest = {
+        "sha256": sha256,
         "elfSha256": firmware.get("otaElfSha256"),
         "size": firmware.get("otaSize"),
         "firmwareVersion": firmware.get("firmwareVersion"),
+        "mode": "full",
+        "url": f"/api/frames/{frame.id}/embedded/ota/download"
+               + (f"?sha256={sha256}" if isinstance(sha256, str) else ""),
     }
+    if delta == OTA_DELTA_FORMAT:
+        patch = _ota_delta_for_device(frame, firmware)
+        if patch is not None:
+            manifest["mode"] = "delta"
+            manifest["delta"] = patch
+    return manifest
 
 
 @api_public.head("/frames/{id:int}/embedded/ota/download")
 @api_public.get("/frames/{id:int}/embedded/ota/download")
 async def api_embedded_device_ota_download(
     id: int,
+    sha256: str | None = None,
     db: Session = Depends(get_db),
     authorization: str = Header(None),
 ):
+    """The full OTA image, resumable with ``Range``/``If-Range``.
+
+    The ETag is ``otaSha256``; with ``?sha256=`` (the manifest's ``url``) a
+    request for anything but the current image is a 404 instead of bytes
+    from a different build.
+    """
     frame = _embedded_frame_from_bearer(db, id, authorization)
-    firmware = latest_embedded_firmware(frame) or {}
-    ota_path = firmware.get("otaPath")
-    if (firmware.get("status") != "ready" or not isinstance(ota_path, str)
-            or not os.path.isfile(ota_path)):
-        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="No OTA image available")
+    firmware = _ready_ota_firmware(frame)
+    ota_sha256 = firmware.get("otaSha256")
+    if sha256 is not None and sha256.lower() != ota_sha256:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="OTA image no longer available")
+    headers = {"Cache-Control": "no-store"}
+    if isinstance(ota_sha256, str):
+        headers["ETag"] = f'"{ota_sha256}"'
+    return FileResponse(
+        _ota_image_path(firmware),
+        media_type="application/octet-stream",
+        filename=os.path.basename(firmware["otaPath"]),
+        headers=headers,
+    )
+
+
+@api_public.head("/frames/{id:int}/embedded/ota/delta")
+@api_public.get("/frames/{id:int}/embedded/ota/delta")
+async def api_embedded_device_ota_delta(
+    id: int,
+    from_sha256: str = Query(alias="from"),
+    to_sha256: str = Query(alias="to"),
+    db: Session = Depends(get_db),
+    authorization: str = Header(None),
+):
+    frame = _embedded_frame_from_bearer(db, id, authorization)
+    firmware = _ready_ota_firmware(frame)
+    known = {image["sha256"] for image in ota_images(frame.embedded)}
+    if to_sha256 != firmware.get("otaSha256") or from_sha256 not in known:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="No OTA delta available")
+    delta_path = ota_delta_path(from_sha256, to_sha256)
+    if not delta_path.is_file():
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="No OTA delta available")
     return FileResponse(
-        ota_path,
+        delta_path,
         media_type="application/octet-stream",
-        filename=os.path.basename(ota_path),
-        headers={"Cache-Control": "no-store"},
+        filename=delta_path.name,
+        headers={"Cache-Control": "no-store", "ETag": f'"{from_sha256[:32]}-{to_sha256[:32]}"'},
     )
@@ -0,0 +1,105 @@
+"""Background image prefetch for frames somebody is looking at.
+
+Dashboards tell the backend which frame images they show by sending
+``{"event": "watch_frames", "data": {"frameIds": [...]}}`` over ``/ws``.
+Every instance mirrors the frames its sockets watch into one Redis sorted
+set (member: frame id, score: expiry), so whichever instance receives a
+frame's ``render:done`` log knows whether anybody cares.
+
+When somebody does, the new image is pulled from the device right away and
+marked fresh for ``PREFETCH_FRESH_SECONDS``; the browser's request — sent
+on the same ``render:done`` — is then answered from the cache. Frames nobody
+watches are never prefetched: their viewer entry simply expires.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from typing import Iterable
+
+from arq import ArqRedis as Redis
+
+from app.utils.env import get_env_float
+
+FRAME_IMAGE_VIEWERS_KEY = "frame_image_viewers"
+# Sockets re-announce what they watch every VIEWER_REFRESH_SECONDS; an entry
+# outlives a couple of missed refreshes before the frame counts as unwatched.
+VIEWER_TTL_SECONDS = get_env_float("FRAME_IMAGE_VIEWER_TTL", 90.0)
+VIEWER_REFRESH_SECONDS = VIEWER_TTL_SECONDS / 3
+PREFETCH_FRESH_SECONDS = get_env_float("FRAME_IMAGE_PREFETCH_FRESH", 30.0)
+PREFETCH_WAIT_SECONDS = get_env_float("FRAME_IMAGE_PREFETCH_WAIT", 10.0)
+MAX_WATCHED_FRAMES = 500
+
+_prefetches: dict[int, asyncio.Task[bool]] = {}
+
+
+def frame_image_prefetched_key(frame_id: int) -> str:
+    return f"frame:{frame_id}:image_prefetched"
+
+
+async def mark_frames_watched(redis: Redis, frame_ids: Iterable[int], *, now: float | None = None) -> None:
+    now = now or time.time()
+    expires = now + VIEWER_TTL_SECONDS
+    mapping = {str(frame_id): expires for frame_id in frame_ids}
+    if not mapping:
+        return
+    await redis.zadd(FRAME_IMAGE_VIEWERS_KEY, mapping)
+    await redis.zremrangebyscore(FRAME_IMAGE_VIEWERS_KEY, "-inf", now)
+
+
+async def frame_has_viewers(redis: Redis, frame_id: int, *, now: float | None = None) -> bool:
+    try:
+        expires = await redis.zscore(FRAME_IMAGE_VIEWERS_KEY, str(frame_id))
+    except Exception:
+        return False
+    return expires is not None and float(expires) >= (now or time.time())
+
+
+async def maybe_prefetch_frame_image(redis: Redis, frame_id: int) -> asyncio.Task[bool] | None:
+    """Start a prefetch for *frame_id* if a dashboard is watching it."""
+    if not await frame_has_viewers(redis, frame_id):
+        return None
+    return schedule_frame_image_prefetch(frame_id)
+
+
+def schedule_frame_image_prefetch(frame_id: int) -> asyncio.Task[bool]:
+    task = _prefetches.get(frame_id)
+    if task is not None and not task.done():
+        return task
+    task = asyncio.create_task(_prefetch(frame_id))
+    _prefetches[frame_id] = task
+
+    def _cleanup(completed: asyncio.Task[bool]) -> None:
+        if _prefetches.get(frame_id) is completed:
+            del _prefetches[frame_id]
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            completed.result()
+
+    task.add_done_callback(_cleanup)
+    return task
+
+
+async def wait_for_frame_image_prefetch(frame_id: int, timeout: float = PREFETCH_WAIT_SECONDS) -> None:
+    """Let a request that arrives mid-prefetch wait for it instead of refetching."""
+    task = _prefetches.get(frame_id)
+    if task is None or task.done():
+        return
+    with contextlib.suppress(asyncio.TimeoutError, Exception):
+        await asyncio.wait_for(asyncio.shield(task), timeout)
+
+
+async def _prefetch(frame_id: int) -> bool:
+    from app.api.frames import prefetch_frame_image
+    from app.database import SessionLocal
+    from app.models.frame import Frame
+    from app.redis import get_shared_redis
+
+    db = SessionLocal()
+    try:
+        frame = db.get(Frame, frame_id)
+        if frame is None:
+            return False
+        return await prefetch_frame_image(db, get_shared_redis(), frame)
+    finally:
+        db.close()
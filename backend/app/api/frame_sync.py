@@ -137,7 +137,6 @@ FRAME_SYNC_FRAME_KEYS = tuple(
         "ssh_pass",
         "ssh_port",
         "ssh_user",
-        "terminal_history",
         "timezone_updater",
     }
 )
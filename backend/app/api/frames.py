@@ -8,7 +8,6 @@ from http import HTTPStatus
 import contextlib
 import aiofiles
 import asyncssh
-import gzip
 import hashlib
 import io
 import ipaddress
@@ -23,8 +22,9 @@ import sys
 import tempfile
 import time
 import zipfile
+from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import Any, Awaitable, Optional, Tuple, cast
+from typing import Any, Awaitable, Iterator, List, Literal, Optional, Tuple, Union, cast
 from types import SimpleNamespace
 from urllib.parse import quote
 
@@ -45,7 +45,7 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 # local ---------------------------------------------------------------------
-from app.database import SessionLocal, get_db
+from app.database import SessionLocal, get_db, run_and_commit, run_db
 from arq import ArqRedis as Redis
 from app.models.frame import (
     Frame,
@@ -58,8 +58,25 @@ from app.models.frame import (
     refresh_tls_certificate_validity_dates,
     update_frame,
 )
-from app.models.log import FRAME_ACTIVITY_LOG_TYPES, Log, new_log as log
+from app.models.log import (
+    FRAME_ACTIVITY_LOG_TYPES,
+    LOG_PAGE_LIMIT,
+    LOG_PAGE_MAX_LIMIT,
+    LOG_SEARCH_LIMIT,
+    LOG_SEARCH_MAX_LIMIT,
+    Log,
+    archived_log,
+    new_log as log,
+    query_logs,
+    search_logs,
+)
+from app.models.log_segment import LogSegment, read_log_segment
 from app.models.metrics import Metrics
+from app.models.terminal_history import (
+    TERMINAL_HISTORY_PAGE_LIMIT,
+    append_terminal_command,
+    terminal_history_page,
+)
 from app.codegen.scene_nim import write_scene_nim
 from app.utils.ssh_utils import (
     get_ssh_connection,
@@ -71,7 +88,11 @@ from app.schemas.frames import (
     FramesListResponse,
     FrameResponse,
     FrameLogsResponse,
+    FrameLogsColumnarResponse,
+    FrameLogSearchResponse,
     FrameMetricsResponse,
+    FrameTerminalCommandRequest,
+    FrameTerminalHistoryResponse,
     FrameStateResponse,
     FrameUploadedScenesResponse,
     FrameAssetsResponse,
@@ -101,6 +122,20 @@ from app.utils.frame_http import (
     _is_embedded_frame,
 )
 from app.utils import embedded_assets, virtual_assets
+from app.utils.compression import (
+    COMPRESSION_FORMATS,
+    compressed_cache_is_fresh,
+    compressed_path_for,
+    normalize_compression_format,
+    stream_compressed_to_cache,
+)
+from app.utils.virtual_image import VirtualImageResponse, load_virtual_image
+from app.utils.frame_reachability import get_frame_reachability, is_known_down
+from app.api.frame_image_prefetch import (
+    PREFETCH_FRESH_SECONDS,
+    frame_image_prefetched_key,
+    wait_for_frame_image_prefetch,
+)
 from app.api.frame_sync import (
     apply_frame_sync,
     get_frame_sync_status,
@@ -550,6 +585,61 @@ async def _wait_for_cached_frame_image(redis: Redis, cache_key: str) -> bytes |
     return await _get_cached_frame_image(redis, cache_key)
 
 
+async def _wait_for_frame_image_refresh(redis: Redis, refresh_lock_key: str, cache_key: str) -> bytes | None:
+    deadline = time.monotonic() + FRAME_IMAGE_REFRESH_WAIT_SECONDS
+    while time.monotonic() < deadline and await redis.exists(refresh_lock_key):
+        await asyncio.sleep(0.1)
+    return await _wait_for_cached_frame_image(redis, cache_key)
+
+
+async def _refresh_frame_image_from_device(
+    db: Session, redis: Redis, frame: Frame
+) -> tuple[int, bytes, dict[str, str]]:
+    """Fetch /image from the device and cache it; returns (status, body, response headers)."""
+    status, body, headers = await _fetch_frame_http_bytes(frame, redis, path="/image")
+    if status != 200:
+        return status, body, headers
+    body = await asyncio.get_running_loop().run_in_executor(
+        None, _coerce_frame_image_to_png, body, headers
+    )
+    scene_id = headers.get("x-scene-id")
+    if not scene_id:
+        encoded_scene_id = await redis.get(f"frame:{frame.id}:active_scene")
+        if encoded_scene_id:
+            scene_id = encoded_scene_id.decode("utf-8")
+    await _store_frame_image(db, redis, frame, body, scene_id=scene_id, publish_rendered=False)
+    return status, body, await store_frame_sync_hint_headers(redis, frame.id, headers)
+
+
+async def prefetch_frame_image(db: Session, redis: Redis, frame: Frame) -> bool:
+    """Refresh the cached image in the background for a watched frame.
+
+    Skips frames that render server-side or are known to be offline, and
+    backs off when another request or instance is already refreshing.
+    """
+    if is_virtual_frame(frame) or is_known_down(await get_frame_reachability(redis, frame.id)):
+        return False
+    frame_image_lock = _get_frame_image_lock(frame.id)
+    if frame_image_lock.locked():
+        return False
+    async with frame_image_lock:
+        # The cached image is about to be replaced; stop vouching for it.
+        await redis.delete(frame_image_prefetched_key(frame.id))
+        refresh_lock_key = _frame_image_refresh_lock_key(frame.id)
+        refresh_lock_token = f"{config.INSTANCE_ID}:{time.time()}:{frame.id}:prefetch"
+        if not await redis.set(refresh_lock_key, refresh_lock_token, ex=FRAME_IMAGE_REFRESH_LOCK_SECONDS, nx=True):
+            return False
+        try:
+            status, _body, _headers = await _refresh_frame_image_from_device(db, redis, frame)
+        finally:
+            with contextlib.suppress(Exception):
+                await _release_frame_image_refresh_lock(redis, refresh_lock_key, refresh_lock_token)
+    if status != 200:
+        return False
+    await redis.set(frame_image_prefetched_key(frame.id), "1", ex=int(PREFETCH_FRESH_SECONDS))
+    return True
+
+
 def _frame_image_dimensions(frame: Frame) -> tuple[int, int]:
     width = int(frame.width or 800)
     height = int(frame.height or 600)
@@ -635,34 +725,36 @@ async def _store_frame_image(
         )
 
         now = datetime.utcnow()
-        img_row = (
-            db.query(SceneImage)
-            .filter_by(project_id=frame.project_id, frame_id=frame.id, scene_id=stored_scene_id)
-            .first()
-        )
-        if img_row:
-            img_row.image = body
-            img_row.timestamp = now
-            img_row.width = width
-            img_row.height = height
-            img_row.thumb_image = thumb
-            img_row.thumb_width = t_width
-            img_row.thumb_height = t_height
-        else:
-            img_row = SceneImage(
-                project_id=frame.project_id,
-                frame_id=frame.id,
-                scene_id=stored_scene_id,
-                image=body,
-                timestamp=now,
-                width=width,
-                height=height,
-                thumb_image=thumb,
-                thumb_width=t_width,
-                thumb_height=t_height,
+
+        def _upsert_scene_image(db: Session) -> None:
+            img_row = (
+                db.query(SceneImage)
+                .filter_by(project_id=frame.project_id, frame_id=frame.id, scene_id=stored_scene_id)
+                .first()
             )
-            db.add(img_row)
-        db.commit()
+            if img_row:
+                img_row.image = body
+                img_row.timestamp = now
+                img_row.width = width
+                img_row.height = height
+                img_row.thumb_image = thumb
+                img_row.thumb_width = t_width
+                img_row.thumb_height = t_height
+            else:
+                db.add(SceneImage(
+                    project_id=frame.project_id,
+                    frame_id=frame.id,
+                    scene_id=stored_scene_id,
+                    image=body,
+                    timestamp=now,
+                    width=width,
+                    height=height,
+                    thumb_image=thumb,
+                    thumb_width=t_width,
+                    thumb_height=t_height,
+                ))
+
+        await run_and_commit(db, _upsert_scene_image)
 
         await publish_message(
             redis,
@@ -1344,7 +1436,7 @@ async def api_frame_ping(
 
     try:
         status, body, _hdrs = await _fetch_frame_http_bytes(
-            frame, redis, path=ping_path, method="GET"
+            frame, redis, path=ping_path, method="GET", live=True
         )
         elapsed_ms = (time.perf_counter() - started) * 1000
         message = _format_body_preview(body) or f"HTTP {status}"
@@ -2066,36 +2158,120 @@ async def api_frame_sync_apply(
     }
 
 
-@api_project.get("/frames/{id:int}/logs", response_model=FrameLogsResponse)
+@api_project.get(
+    "/frames/{id:int}/logs",
+    response_model=Union[FrameLogsResponse, FrameLogsColumnarResponse],
+)
 async def api_frame_get_logs(
     id: int,
     after_id: Optional[int] = Query(None, ge=0),
+    before_id: Optional[int] = Query(None, ge=0),
+    types: List[str] = Query([], alias="type"),
+    events: List[str] = Query([], alias="event"),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    limit: int = Query(LOG_PAGE_LIMIT, ge=1, le=LOG_PAGE_MAX_LIMIT),
+    format: Literal["rows", "columns"] = Query("rows"),
     db: Session = Depends(get_db),
 ):
     frame = _project_frame(db, id)
     if frame is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Frame not found")
-    if after_id is not None:
-        # Incremental fetch: only rows newer than what the client already has.
-        # Used on websocket reconnect so a flaky connection doesn't re-download
-        # the whole buffer every time. Ascending so callers can append directly.
-        rows = (
-            db.query(Log)
-            .filter(Log.project_id == frame.project_id, Log.frame_id == id, Log.id > after_id)
-            .order_by(Log.id.asc())
-            .limit(1000)
-            .all()
-        )
-        return {"logs": [log_entry.to_dict() for log_entry in rows]}
-    latest_logs = (
-        db.query(Log)
-        .filter_by(project_id=frame.project_id, frame_id=id)
-        .order_by(Log.timestamp.desc(), Log.id.desc())
-        .limit(1000)
-        .all()
+    if after_id is not None and before_id is not None:
+        _bad_request("Pass either after_id or before_id, not both")
+    # after_id is the incremental fetch used on websocket reconnect (only
+    # rows newer than what the client has); before_id pages back through the
+    # retained history. Both are ascending so callers can append or prepend.
+    rows, has_more = query_logs(
+        db,
+        frame.project_id,
+        id,
+        after_id=after_id,
+        before_id=before_id,
+        types=types,
+        events=events,
+        since=since,
+        until=until,
+        limit=limit,
+    )
+    if format == "columns":
+        # Column arrays: field names once per page instead of once per row.
+        return {
+            "columns": {
+                "id": [row.id for row in rows],
+                "timestamp": [row.timestamp.replace(tzinfo=timezone.utc).isoformat() for row in rows],
+                "type": [row.type for row in rows],
+                "line": [row.line for row in rows],
+                "ip": [row.ip for row in rows],
+            },
+            "has_more": has_more,
+        }
+    return {"logs": [log_entry.to_dict() for log_entry in rows], "has_more": has_more}
+
+
+def _log_search_results(matches: list[tuple[Log, list[dict[str, Any]]]]) -> dict[str, Any]:
+    return {"results": [{**log_entry.to_dict(), "highlight": segments} for log_entry, segments in matches]}
+
+
+@api_project.get("/frames/logs/search", response_model=FrameLogSearchResponse)
+async def api_frames_search_logs(
+    q: str = Query(..., min_length=1, max_length=256),
+    limit: int = Query(LOG_SEARCH_LIMIT, ge=1, le=LOG_SEARCH_MAX_LIMIT),
+    archived: bool = Query(False),
+    db: Session = Depends(get_db),
+):
+    """Ranked log matches across every frame in the project; with
+    ``archived``, the newest archived segments are scanned as well."""
+    return _log_search_results(
+        await run_db(search_logs, db, current_project_id(), q, limit=limit, archived=archived)
+    )
+
+
+@api_project.get("/frames/{id:int}/logs/search", response_model=FrameLogSearchResponse)
+async def api_frame_search_logs(
+    id: int,
+    q: str = Query(..., min_length=1, max_length=256),
+    limit: int = Query(LOG_SEARCH_LIMIT, ge=1, le=LOG_SEARCH_MAX_LIMIT),
+    archived: bool = Query(False),
+    db: Session = Depends(get_db),
+):
+    frame = _project_frame(db, id)
+    if frame is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Frame not found")
+    return _log_search_results(
+        await run_db(search_logs, db, frame.project_id, q, frame_id=id, limit=limit, archived=archived)
     )
-    logs = [log_entry.to_dict() for log_entry in reversed(latest_logs)]
-    return {"logs": logs}
+
+
+@api_project.get("/frames/{id:int}/terminal_history", response_model=FrameTerminalHistoryResponse)
+async def api_frame_get_terminal_history(
+    id: int,
+    after_id: Optional[int] = Query(None, ge=0),
+    before_id: Optional[int] = Query(None, ge=0),
+    limit: int = Query(TERMINAL_HISTORY_PAGE_LIMIT, ge=1, le=TERMINAL_HISTORY_PAGE_LIMIT),
+    db: Session = Depends(get_db),
+):
+    frame = _project_frame(db, id)
+    if frame is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Frame not found")
+    if after_id is not None and before_id is not None:
+        _bad_request("Pass either after_id or before_id, not both")
+    commands = terminal_history_page(db, frame, after_id=after_id, before_id=before_id, limit=limit)
+    return {"commands": [command.to_dict() for command in commands]}
+
+
+@api_project.post("/frames/{id:int}/terminal_history", response_model=FrameTerminalHistoryResponse)
+async def api_frame_append_terminal_history(
+    id: int,
+    data: FrameTerminalCommandRequest,
+    db: Session = Depends(get_db),
+):
+    frame = _project_frame(db, id)
+    if frame is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Frame not found")
+    # No update_frame broadcast: history is only read by the terminal panel.
+    command = append_terminal_command(db, frame, data.command)
+    return {"commands": [command.to_dict()] if command else []}
 
 
 def _format_frame_log_line(log_entry: Log) -> str:
@@ -2109,19 +2285,32 @@ async def api_frame_download_full_logs(id: int, db: Session = Depends(get_db)):
     if frame is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Frame not found")
 
+    # Archived segments stay compressed until they are streamed.
+    segments = (
+        db.query(LogSegment.project_id, LogSegment.frame_id, LogSegment.codec, LogSegment.data)
+        .filter(LogSegment.project_id == frame.project_id, LogSegment.frame_id == id)
+        .order_by(LogSegment.first_log_id.asc())
+        .all()
+    )
     logs = (
         db.query(Log)
         .filter_by(project_id=frame.project_id, frame_id=id)
         .order_by(Log.timestamp.asc(), Log.id.asc())
         .all()
     )
-    content = "\n".join(_format_frame_log_line(log_entry) for log_entry in logs)
-    if content:
-        content += "\n"
+
+    def content() -> Iterator[str]:
+        for segment in segments:
+            yield "".join(
+                _format_frame_log_line(archived_log(segment, row)) + "\n" for row in read_log_segment(segment)
+            )
+        if logs:
+            yield "".join(_format_frame_log_line(log_entry) + "\n" for log_entry in logs)
+
     timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H-%M-%SZ")
     filename = f"frame-{id}-full-logs-{timestamp}.log"
-    return Response(
-        content,
+    return StreamingResponse(
+        content(),
         media_type="text/plain; charset=utf-8",
         headers={
             "Content-Disposition": (
@@ -2150,7 +2339,6 @@ async def api_frame_get_image(
     )
 
     cache_key = _frame_image_cache_key(frame.id)
-    path = "/image"
 
     # Virtual frames have no device to fetch from: render server-side (the
     # same wasm path their public URLs use) instead of proxying to a
@@ -2193,6 +2381,30 @@ async def api_frame_get_image(
         else:
             return await _frame_image_placeholder_response(frame)
 
+    # The reachability monitor saw this frame go down: answer from the cache
+    # now instead of holding the request until the connect timeout.
+    if is_known_down(await get_frame_reachability(redis, frame.id)):
+        last_image = await _get_cached_frame_image(redis, cache_key)
+        if last_image:
+            return Response(
+                content=last_image,
+                media_type="image/png",
+                headers=await read_frame_sync_hint_headers(redis, frame.id),
+            )
+        return await _frame_image_placeholder_response(frame)
+
+    # A dashboard watching this frame had the image prefetched right after
+    # render:done; wait for an in-flight prefetch and serve its result.
+    await wait_for_frame_image_prefetch(frame.id)
+    if await redis.get(frame_image_prefetched_key(frame.id)):
+        last_image = await _get_cached_frame_image(redis, cache_key)
+        if last_image:
+            return Response(
+                content=last_image,
+                media_type="image/png",
+                headers=await read_frame_sync_hint_headers(redis, frame.id),
+            )
+
     frame_image_lock = _get_frame_image_lock(id)
     waited_for_lock = frame_image_lock.locked()
     if waited_for_lock:
@@ -2216,7 +2428,8 @@ async def api_frame_get_image(
             nx=True,
         )
         if not refresh_lock_acquired:
-            cached = await _wait_for_cached_frame_image(redis, cache_key)
+            # Another instance is fetching right now; its result beats ours.
+            cached = await _wait_for_frame_image_refresh(redis, refresh_lock_key, cache_key)
             if cached:
                 return Response(
                     content=cached,
@@ -2229,22 +2442,9 @@ async def api_frame_get_image(
         status = 0
         body = b""
         try:
-            status, body, headers = await _fetch_frame_http_bytes(
-                frame, redis, path=path
-            )
+            status, body, response_headers = await _refresh_frame_image_from_device(db, redis, frame)
 
             if status == 200:
-                body = await asyncio.get_running_loop().run_in_executor(
-                    None, _coerce_frame_image_to_png, body, headers
-                )
-                scene_id = headers.get("x-scene-id")
-                if not scene_id:
-                    encoded_scene_id = await redis.get(f"frame:{id}:active_scene")
-                    if encoded_scene_id:
-                        scene_id = encoded_scene_id.decode("utf-8")
-                await _store_frame_image(db, redis, frame, body, scene_id=scene_id, publish_rendered=False)
-                response_headers = await store_frame_sync_hint_headers(redis, frame.id, headers)
-
                 return Response(content=body, media_type="image/png", headers=response_headers)
             else:
                 if cached:
@@ -2545,9 +2745,13 @@ async def api_frame_assets_sync(
     try:
         from app.models.assets import sync_assets
 
-        await sync_assets(db, redis, frame)
+        plan = await sync_assets(db, redis, frame)
         await _invalidate_frame_assets_cache(redis, frame, frame.assets_path or "/srv/assets")
-        return {"message": "Assets synced successfully"}
+        return {
+            "message": "Assets synced successfully",
+            "uploaded": len(plan.upload) if plan else 0,
+            "deleted": len(plan.delete) if plan else 0,
+        }
     except Exception as e:
         raise HTTPException(status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -3163,7 +3367,11 @@ async def api_frame_buildroot_sd_image(
 
 
 @api_project.get("/frames/{id:int}/buildroot/sd_image/download")
-async def api_frame_buildroot_sd_image_download(id: int, db: Session = Depends(get_db)):
+async def api_frame_buildroot_sd_image_download(
+    id: int,
+    compression: str = Query("gzip"),
+    db: Session = Depends(get_db),
+):
     frame = _project_frame(db, id)
     if not frame:
         _not_found()
@@ -3179,17 +3387,66 @@ async def api_frame_buildroot_sd_image_download(id: int, db: Session = Depends(g
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Generated SD card image file not found")
 
     filename = str(sd_image.get("filename") or f"frameos-{id}.img")
-    download_path = path
-    download_filename = filename
-    if not path.endswith(".gz"):
-        download_path = f"{path}.gz"
-        download_filename = filename if filename.endswith(".gz") else f"{filename}.gz"
-        if not os.path.isfile(download_path) or os.path.getmtime(download_path) < os.path.getmtime(path):
-            with open(path, "rb") as source, open(download_path, "wb") as compressed:
-                with gzip.GzipFile(filename="", mode="wb", fileobj=compressed, mtime=0) as destination:
-                    shutil.copyfileobj(source, destination)
+    if sd_image.get("virtual"):
+        return _virtual_image_download_response(Path(path), filename, compression)
+    return _compressed_download_response(path, filename, compression)
+
+
+def _virtual_image_download_response(manifest_path: Path, filename: str, compression: str) -> Response:
+    """Serve an SD image stored as extents over the shared release image.
+
+    gzip is spliced from the block-compressed release image and the frame's
+    overlay with full Range support; other formats are compressed on the fly
+    and not cached, as a cache would be the per-frame copy this avoids.
+    """
+    try:
+        fmt = normalize_compression_format(compression)
+    except ValueError as exc:
+        _bad_request(str(exc))
+    suffix, media_type = COMPRESSION_FORMATS[fmt]
+    base_filename = filename[:-3] if filename.endswith(".gz") else filename
+    download_filename = f"{base_filename}{suffix}"
+    image = load_virtual_image(manifest_path, "gzip" if fmt == "gzip" else "raw")
+    if image is None or not image.is_intact():
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Generated SD card image file not found")
+    headers = {"Content-Disposition": f'attachment; filename="{_ascii_safe(download_filename)}"'}
+    if fmt == "gzip":
+        return VirtualImageResponse(
+            image,
+            media_type=media_type,
+            headers=headers,
+            last_modified=manifest_path.stat().st_mtime,
+        )
+    return StreamingResponse(stream_compressed_to_cache(image, None, fmt), media_type=media_type, headers=headers)
 
-    return FileResponse(download_path, media_type="application/gzip", filename=download_filename)
+
+def _compressed_download_response(path: str, filename: str, compression: str) -> Response:
+    """Serve *path* compressed as requested.
+
+    A cached compressed copy (or an already gzipped source) is a plain file
+    response, so browsers can resume it with Range. Otherwise the bytes are
+    compressed block-parallel off the event loop and streamed to the client
+    while the cache is written.
+    """
+    try:
+        fmt = normalize_compression_format(compression)
+    except ValueError as exc:
+        _bad_request(str(exc))
+    source = Path(path)
+    suffix, media_type = COMPRESSION_FORMATS[fmt]
+    base_filename = filename[:-3] if filename.endswith(".gz") else filename
+    download_filename = f"{base_filename}{suffix}"
+
+    if fmt == "gzip" and source.suffix == ".gz":
+        return FileResponse(source, media_type=media_type, filename=download_filename)
+    cache = compressed_path_for(source, fmt)
+    if compressed_cache_is_fresh(source, cache):
+        return FileResponse(cache, media_type=media_type, filename=download_filename)
+    return StreamingResponse(
+        stream_compressed_to_cache(source, cache, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{_ascii_safe(download_filename)}"'},
+    )
 
 
 @api_project.get("/frames/{id:int}/embedded/firmware")
@@ -3267,7 +3524,11 @@ async def api_frame_embedded_firmware(
 
 
 @api_project.get("/frames/{id:int}/embedded/firmware/download")
-async def api_frame_embedded_firmware_download(id: int, db: Session = Depends(get_db)):
+async def api_frame_embedded_firmware_download(
+    id: int,
+    compression: str | None = Query(None),
+    db: Session = Depends(get_db),
+):
     frame = _project_frame(db, id)
     if not frame:
         _not_found()
@@ -3283,6 +3544,8 @@ async def api_frame_embedded_firmware_download(id: int, db: Session = Depends(ge
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Generated firmware file not found")
 
     filename = str(firmware.get("filename") or f"frameos-esp32-{id}.bin")
+    if compression:
+        return _compressed_download_response(path, filename, compression)
     return FileResponse(
         path,
         media_type="application/octet-stream",
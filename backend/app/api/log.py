@@ -3,9 +3,9 @@ from sqlalchemy.orm import Session
 from arq import ArqRedis as Redis
 
 from app.database import get_db
-from app.models.frame import Frame
 from app.models.log import process_log
 from app.schemas.log import LogRequest, LogResponse
+from app.utils.principal_cache import frame_principal
 from app.utils.request_ip import extract_client_ip
 from app.redis import get_redis
 from . import api_public
@@ -25,11 +25,12 @@ async def post_api_log(
     if len(parts) != 2:
         raise HTTPException(status_code=401, detail="Invalid Authorization header")
 
-    server_api_key = parts[1]
-    frame = db.query(Frame).filter_by(server_api_key=server_api_key).first()
-
-    if not frame:
+    principal = frame_principal(db, parts[1])
+    if principal is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
+    # The id is enough for plain log lines; process_log loads the row for
+    # the events that update it.
+    frame = principal.frame_id
 
     client_ip = extract_client_ip(
         request.headers,
@@ -12,7 +12,7 @@ from PIL import Image, ImageDraw, ImageFont
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.config import config
-from app.database import get_db
+from app.database import get_db, run_and_commit
 from app.models.repository import Repository
 from app.models.scene_image import SceneImage            # created earlier
 from app.models.frame import Frame
@@ -180,7 +180,9 @@ async def get_scene_image(
 
 
 def _store_scene_image(db: Session, project_id: int, frame_id: int, scene_id: str, body: bytes) -> SceneImage:
-    """Normalize `body` to PNG + thumbnail and upsert the scene's snapshot."""
+    """Normalize `body` to PNG + thumbnail and upsert the scene's snapshot.
+
+    A unit of work for ``run_and_commit``: the caller commits."""
     try:
         with Image.open(io.BytesIO(body)) as img:
             if img.mode != "RGB":
@@ -218,8 +220,6 @@ def _store_scene_image(db: Session, project_id: int, frame_id: int, scene_id: st
             thumb_height=t_height,
         )
         db.add(img_row)
-    db.commit()
-    db.refresh(img_row)
     return img_row
 
 
@@ -244,7 +244,8 @@ async def upsert_scene_image(
     if not body:
         raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="Missing image payload")
 
-    return _store_scene_image(db, project_id, frame_id, scene_id, body).to_dict()
+    img_row = await run_and_commit(db, _store_scene_image, project_id, frame_id, scene_id, body)
+    return img_row.to_dict()
 
 
 class SceneImageCopyRequest(BaseModel):
@@ -394,4 +395,5 @@ async def copy_scene_image(
             detail="Provide source_scene_id, template_id or url",
         )
 
-    return _store_scene_image(db, project_id, frame_id, scene_id, image_bytes).to_dict()
+    img_row = await run_and_commit(db, _store_scene_image, project_id, frame_id, scene_id, image_bytes)
+    return img_row.to_dict()
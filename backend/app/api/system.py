@@ -1,5 +1,6 @@
 from app.api import api_user
-from app.schemas.system import CacheInfo, DatabaseInfo, DiskInfo, DockerInfo, LoadInfo, MemoryInfo, SystemInfoResponse, SystemMetricsResponse
+from app.schemas.system import CacheInfo, DatabaseInfo, DiskInfo, DockerInfo, LoadInfo, MemoryInfo, SshPoolInfo, SystemInfoResponse, SystemMetricsResponse
+from app.utils.ssh_utils import ssh_pool_metrics
 from app.utils.system_info import get_system_info, get_system_metrics
 
 
@@ -16,7 +17,20 @@ def _load_to_schema(load) -> LoadInfo:
 
 
 def _cache_to_schema(caches) -> list[CacheInfo]:
-    return [CacheInfo(name=cache.name, path=str(cache.path), sizeBytes=cache.size_bytes, exists=cache.exists) for cache in caches]
+    return [
+        CacheInfo(
+            name=cache.name,
+            path=str(cache.path),
+            sizeBytes=cache.size_bytes,
+            exists=cache.exists,
+            entries=cache.entries,
+            pinnedEntries=cache.pinned_entries,
+            hits=cache.hits,
+            misses=cache.misses,
+            hitRate=cache.hit_rate,
+        )
+        for cache in caches
+    ]
 
 
 def _database_to_schema(database) -> DatabaseInfo:
@@ -35,6 +49,24 @@ def _docker_to_schema(docker) -> DockerInfo:
     )
 
 
+def _ssh_pool_to_schema(metrics) -> SshPoolInfo:
+    return SshPoolInfo(
+        frames=metrics["frames"],
+        connections=metrics["connections"],
+        activeLeases=metrics["active_leases"],
+        idleConnections=metrics["idle_connections"],
+        connecting=metrics["connecting"],
+        handshakes=metrics["handshakes"],
+        handshakeFailures=metrics["handshake_failures"],
+        avgHandshakeSeconds=metrics["avg_handshake_seconds"],
+        leases=metrics["leases"],
+        reused=metrics["reused"],
+        sharedHandshakes=metrics["shared_handshakes"],
+        idleCloses=metrics["idle_closes"],
+        prewarms=metrics["prewarms"],
+    )
+
+
 @api_user.get("/system/info", response_model=SystemInfoResponse)
 def system_info():
     disk, caches, database, memory, load, docker = get_system_info()
@@ -45,6 +77,7 @@ def system_info():
         memory=_memory_to_schema(memory),
         load=_load_to_schema(load),
         docker=_docker_to_schema(docker),
+        sshPool=_ssh_pool_to_schema(ssh_pool_metrics()),
     )
 
 
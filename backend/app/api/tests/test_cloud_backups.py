@@ -55,7 +55,6 @@ def make_frame(db, project_id):
         network={"wifiSSID": "HomeWifi", "wifiPassword": "wifi-secret"},
         agent={"agentEnabled": True, "agentSharedSecret": "agent-secret"},
         https_proxy={"enable": True, "certs": {"server_key": "TLS KEY"}},
-        terminal_history=["ssh something"],
     )
     db.add(frame)
     db.commit()
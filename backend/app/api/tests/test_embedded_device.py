@@ -443,6 +443,125 @@ async def test_ota_manifest_serves_ready_artifact(async_client, no_auth_client,
     assert response.content == b''
 
 
+@pytest.mark.asyncio
+async def test_ota_download_resumes_with_range_keyed_on_ota_sha(async_client, no_auth_client, db, tmp_path):
+    frame = await device_frame(async_client, db)
+    ota_file = tmp_path / 'frameos-ota.bin'
+    ota_file.write_bytes(b'\xe9' + bytes(range(256)) * 8)
+    embedded = dict(frame.embedded or {})
+    embedded['firmware'] = {
+        'status': 'ready',
+        'firmwareVersion': EMBEDDED_FIRMWARE_VERSION,
+        'path': str(ota_file),
+        'otaPath': str(ota_file),
+        'otaSha256': 'ab' * 32,
+        'otaSize': ota_file.stat().st_size,
+        'panel': embedded_panel_for_frame(frame),
+        'configHash': embedded_firmware_config_hash(frame),
+    }
+    frame.embedded = embedded
+    db.add(frame)
+    db.commit()
+
+    manifest = (await no_auth_client.get(
+        f'/api/frames/{frame.id}/embedded/ota/manifest', headers=auth(frame))).json()
+    assert manifest['mode'] == 'full'
+    assert manifest['url'] == f'/api/frames/{frame.id}/embedded/ota/download?sha256={"ab" * 32}'
+
+    response = await no_auth_client.get(manifest['url'], headers={
+        **auth(frame), 'Range': 'bytes=1000-', 'If-Range': f'"{"ab" * 32}"'})
+    assert response.status_code == 206
+    assert response.content == ota_file.read_bytes()[1000:]
+    assert response.headers['etag'] == f'"{"ab" * 32}"'
+
+    # A different build: If-Range fails and the whole image comes back.
+    response = await no_auth_client.get(f'/api/frames/{frame.id}/embedded/ota/download', headers={
+        **auth(frame), 'Range': 'bytes=1000-', 'If-Range': f'"{"cd" * 32}"'})
+    assert response.status_code == 200
+    assert response.content == ota_file.read_bytes()
+
+    response = await no_auth_client.get(
+        f'/api/frames/{frame.id}/embedded/ota/download?sha256={"cd" * 32}', headers=auth(frame))
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_ota_manifest_offers_built_delta_from_the_booted_image(
+        async_client, no_auth_client, db, tmp_path, monkeypatch):
+    from app.tasks import embedded_ota
+    from app.tasks.embedded_ota import OTA_DELTA_FORMAT, archive_ota_image, build_ota_deltas, record_ota_image
+
+    monkeypatch.setenv('FRAMEOS_EMBEDDED_ARTIFACT_DIR', str(tmp_path / 'artifacts'))
+    patches = []
+
+    class FakeDetools:
+        @staticmethod
+        def create_patch(ffrom, fto, fpatch, **kwargs):
+            patches.append(kwargs)
+            fpatch.write(b'PATCH' + ffrom.read()[:4] + fto.read()[:4])
+
+    monkeypatch.setattr(embedded_ota, '_detools', lambda: FakeDetools)
+    frame = await device_frame(async_client, db)
+    old_image = tmp_path / 'old.bin'
+    old_image.write_bytes(b'\xe9old' * 1000)
+    new_image = tmp_path / 'frameos-ota.bin'
+    new_image.write_bytes(b'\xe9new' * 1000)
+    old_sha, new_sha = '11' * 32, '22' * 32
+    archive_ota_image(old_image, old_sha)
+    archive_ota_image(new_image, new_sha)
+
+    embedded = dict(frame.embedded or {})
+    embedded = record_ota_image(embedded, {'sha256': old_sha, 'elfSha256': 'aa' * 32})
+    embedded = record_ota_image(embedded, {'sha256': new_sha, 'elfSha256': 'bb' * 32})
+    embedded['lastBoot'] = {'at': '2026-01-01T00:00:00+00:00', 'elfSha256': 'aa' * 16}
+    embedded['firmware'] = {
+        'status': 'ready',
+        'firmwareVersion': EMBEDDED_FIRMWARE_VERSION,
+        'path': str(new_image),
+        'otaPath': str(new_image),
+        'otaSha256': new_sha,
+        'otaElfSha256': 'bb' * 32,
+        'otaSize': new_image.stat().st_size,
+        'panel': embedded_panel_for_frame(frame),
+        'configHash': embedded_firmware_config_hash(frame),
+    }
+    frame.embedded = embedded
+    db.add(frame)
+    db.commit()
+
+    # Devices that do not ask for a delta keep getting the full image.
+    manifest = (await no_auth_client.get(
+        f'/api/frames/{frame.id}/embedded/ota/manifest', headers=auth(frame))).json()
+    assert manifest['mode'] == 'full'
+    assert 'delta' not in manifest
+
+    # The manifest never diffs: until the build has made the patch, it's the full image.
+    manifest = (await no_auth_client.get(
+        f'/api/frames/{frame.id}/embedded/ota/manifest',
+        params={'delta': OTA_DELTA_FORMAT}, headers=auth(frame))).json()
+    assert manifest['mode'] == 'full'
+    assert patches == []
+
+    build_ota_deltas(embedded, new_sha)
+    manifest = (await no_auth_client.get(
+        f'/api/frames/{frame.id}/embedded/ota/manifest',
+        params={'delta': OTA_DELTA_FORMAT}, headers=auth(frame))).json()
+    assert manifest['mode'] == 'delta'
+    assert len(patches) == 1
+    assert patches[0] == {'compression': 'heatshrink', 'patch_type': 'sequential'}
+    assert manifest['delta']['fromSha256'] == old_sha
+    assert manifest['delta']['format'] == OTA_DELTA_FORMAT
+
+    response = await no_auth_client.get(manifest['delta']['url'], headers=auth(frame))
+    assert response.status_code == 200
+    assert response.content == b'PATCH\xe9old\xe9new'
+    assert manifest['delta']['size'] == len(response.content)
+
+    response = await no_auth_client.get(
+        f'/api/frames/{frame.id}/embedded/ota/delta?from={"33" * 32}&to={new_sha}', headers=auth(frame))
+    assert response.status_code == 404
+
+
 @pytest.mark.asyncio
 async def test_ota_manifest_404_for_ready_4mb_no_ota_build(async_client, no_auth_client, db, tmp_path):
     frame = await device_frame(async_client, db)
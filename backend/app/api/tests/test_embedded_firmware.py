@@ -1,3 +1,5 @@
+import hashlib
+
 import pytest
 from unittest.mock import AsyncMock, patch
 
@@ -1423,3 +1425,115 @@ async def test_embedded_build_lock_is_globally_exclusive(redis, monkeypatch):
 
     await embedded_firmware_module._release_embedded_build_lock(redis, token)
     assert await redis.get(embedded_firmware_module.EMBEDDED_BUILD_LOCK_KEY) is None
+
+
+@pytest.mark.asyncio
+async def test_embedded_build_locks_are_per_build_directory(redis, monkeypatch):
+    monkeypatch.setattr(embedded_firmware_module, 'EMBEDDED_BUILD_LOCK_WAIT_SECONDS', 0.05)
+    monkeypatch.setattr(embedded_firmware_module, 'EMBEDDED_BUILD_LOCK_POLL_SECONDS', 0.01)
+    project = embedded_firmware_module.EMBEDDED_PROJECT_DIR
+    s3_key = embedded_firmware_module.embedded_build_lock_key(project / 'build-esp32-s3-16mb')
+    c3_key = embedded_firmware_module.embedded_build_lock_key(project / 'build-esp32-c3-4mb')
+    assert s3_key != c3_key
+
+    s3_token = await embedded_firmware_module._acquire_embedded_build_lock(redis, s3_key)
+    # Another directory builds alongside; the same directory waits.
+    c3_token = await embedded_firmware_module._acquire_embedded_build_lock(redis, c3_key)
+    with pytest.raises(ValueError, match='Another embedded firmware build'):
+        await embedded_firmware_module._acquire_embedded_build_lock(redis, s3_key)
+
+    await embedded_firmware_module._release_embedded_build_lock(redis, s3_token, s3_key)
+    await embedded_firmware_module._release_embedded_build_lock(redis, c3_token, c3_key)
+    assert await redis.get(s3_key) is None
+    assert await redis.get(c3_key) is None
+
+
+@pytest.mark.asyncio
+async def test_embedded_build_slots_cap_concurrent_builds(redis, monkeypatch):
+    monkeypatch.setattr(embedded_firmware_module, 'EMBEDDED_BUILD_CONCURRENCY', 2)
+    monkeypatch.setattr(embedded_firmware_module, 'EMBEDDED_BUILD_LOCK_WAIT_SECONDS', 0.05)
+    monkeypatch.setattr(embedded_firmware_module, 'EMBEDDED_BUILD_LOCK_POLL_SECONDS', 0.01)
+
+    first = await embedded_firmware_module._acquire_embedded_build_slot(redis)
+    second = await embedded_firmware_module._acquire_embedded_build_slot(redis)
+    assert first[0] != second[0]
+    with pytest.raises(ValueError, match='2 embedded firmware builds are already running'):
+        await embedded_firmware_module._acquire_embedded_build_slot(redis)
+
+    await embedded_firmware_module._release_embedded_build_lock(redis, first[1], first[0])
+    third = await embedded_firmware_module._acquire_embedded_build_slot(redis)
+    assert third[0] == first[0]
+
+
+@pytest.mark.asyncio
+async def test_embedded_build_is_cached_before_the_build_dir_is_released(tmp_path, monkeypatch, redis):
+    monkeypatch.setenv('FRAMEOS_EMBEDDED_ARTIFACT_DIR', str(tmp_path / 'artifacts'))
+    monkeypatch.setattr(embedded_firmware_module, 'EMBEDDED_PROJECT_DIR', tmp_path)
+    monkeypatch.setattr(embedded_firmware_module, 'log', AsyncMock())
+    build_dir = tmp_path / 'build-esp32-s3-16mb'
+    store = embedded_firmware_module.store_embedded_firmware_build
+    locked_while_storing = []
+
+    def checked_store(build_key, directory):
+        locked_while_storing.append(embedded_firmware_module._build_locks[directory.name].locked())
+        return store(build_key, directory)
+
+    monkeypatch.setattr(embedded_firmware_module, 'store_embedded_firmware_build', checked_store)
+    command = (
+        'mkdir -p bootloader partition_table && echo CONFIG_X=y > sdkconfig && '
+        'for name in merged-binary.bin frameos_esp32.bin frameos_esp32.elf '
+        'bootloader/bootloader.bin partition_table/partition-table.bin; do printf built > $name; done'
+    )
+
+    outputs = await embedded_firmware_module._run_embedded_idf_build(
+        None, redis, Frame(id=1),
+        build_key='ab' * 32,
+        build_dir=build_dir,
+        command=f'cd {build_dir} && {command}',
+        env={'PATH': '/usr/bin:/bin'},
+        generated_header=build_dir / 'generated_config.h',
+        generated_config='#define A 1\n',
+        required_sdkconfig={'CONFIG_X': 'y'},
+    )
+
+    assert locked_while_storing == [True]
+    assert outputs['merged'].read_bytes() == b'built'
+    assert await redis.get(embedded_firmware_module.embedded_build_lock_key(build_dir)) is None
+
+
+def test_embedded_build_cache_reuses_identical_builds(tmp_path, monkeypatch):
+    monkeypatch.setenv('FRAMEOS_EMBEDDED_ARTIFACT_DIR', str(tmp_path / 'artifacts'))
+    monkeypatch.setattr(embedded_firmware_module, 'embedded_firmware_source_fingerprint', lambda: 'sha256:src')
+    monkeypatch.setattr(embedded_firmware_module, 'EMBEDDED_BUILD_CACHE_ENTRIES', 1)
+    build_dir = tmp_path / 'build-esp32-s3-16mb'
+    (build_dir / 'bootloader').mkdir(parents=True)
+    (build_dir / 'partition_table').mkdir()
+    (build_dir / 'merged-binary.bin').write_bytes(b'merged')
+    (build_dir / 'frameos_esp32.bin').write_bytes(b'app image')
+    (build_dir / 'frameos_esp32.elf').write_bytes(b'elf')
+    (build_dir / 'bootloader' / 'bootloader.bin').write_bytes(b'boot')
+    (build_dir / 'partition_table' / 'partition-table.bin').write_bytes(b'pt')
+
+    key = embedded_firmware_module.embedded_firmware_build_key({'generatedConfig': '#define A 1\n'})
+    assert key == embedded_firmware_module.embedded_firmware_build_key({'generatedConfig': '#define A 1\n'})
+    assert key != embedded_firmware_module.embedded_firmware_build_key({'generatedConfig': '#define A 2\n'})
+    assert embedded_firmware_module.cached_embedded_firmware_build(key) is None
+
+    stored = embedded_firmware_module.store_embedded_firmware_build(key, build_dir)
+    # Later builds in the same directory must not change the cached image.
+    (build_dir / 'merged-binary.bin').write_bytes(b'other frame')
+
+    cached = embedded_firmware_module.cached_embedded_firmware_build(key)
+    assert cached is not None
+    assert cached['merged'].read_bytes() == b'merged'
+    assert cached['ota'].read_bytes() == b'app image'
+    assert cached['appSize'] == len(b'app image')
+    assert cached['bootloaderSize'] == 4
+    assert cached['partitionTableSize'] == 2
+    assert cached['elfSha256'] == stored['elfSha256'] == hashlib.sha256(b'elf').hexdigest()
+
+    # Over the entry budget, the older build is evicted.
+    other = embedded_firmware_module.embedded_firmware_build_key({'generatedConfig': 'other'})
+    embedded_firmware_module.store_embedded_firmware_build(other, build_dir)
+    assert embedded_firmware_module.cached_embedded_firmware_build(key) is None
+    assert embedded_firmware_module.cached_embedded_firmware_build(other) is not None
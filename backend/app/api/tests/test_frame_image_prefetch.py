@@ -0,0 +1,104 @@
+import asyncio
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from app.api import frame_image_prefetch as prefetch
+from app.api import frames as frames_api
+from app.models import new_frame
+from app.models.log import process_log
+from app.websockets import _handle_client_message, manager
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 1), 'white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_viewer_entries_expire(redis):
+    await redis.delete(prefetch.FRAME_IMAGE_VIEWERS_KEY)
+    await prefetch.mark_frames_watched(redis, [1, 2], now=1000.0)
+
+    assert await prefetch.frame_has_viewers(redis, 1, now=1000.0 + prefetch.VIEWER_TTL_SECONDS)
+    assert not await prefetch.frame_has_viewers(redis, 1, now=1001.0 + prefetch.VIEWER_TTL_SECONDS)
+    assert not await prefetch.frame_has_viewers(redis, 3, now=1000.0)
+
+
+@pytest.mark.asyncio
+async def test_render_done_prefetches_only_watched_frames(db, redis):
+    frame = await new_frame(db, redis, 'PrefetchFrame', 'localhost', 'localhost')
+    await redis.delete(prefetch.FRAME_IMAGE_VIEWERS_KEY)
+    scheduled = []
+
+    with patch.object(prefetch, 'schedule_frame_image_prefetch', side_effect=scheduled.append):
+        await process_log(db, redis, frame, {'event': 'render:done'})
+        assert scheduled == []
+
+        await prefetch.mark_frames_watched(redis, [frame.id])
+        await process_log(db, redis, frame, {'event': 'render:done'})
+        await process_log(db, redis, frame, {'event': 'render'})
+
+    assert scheduled == [frame.id]
+
+
+@pytest.mark.asyncio
+async def test_prefetched_image_is_served_from_cache(async_client, db, redis):
+    frame = await new_frame(db, redis, 'PrefetchedImageFrame', 'localhost', 'localhost')
+    body = _png()
+    fetches = []
+
+    async def mock_fetch(frame_obj, redis_obj, *, path, method="GET"):
+        fetches.append(path)
+        await asyncio.sleep(0.05)
+        return 200, body, {'content-type': 'image/png'}
+
+    with patch('app.api.frames._fetch_frame_http_bytes', side_effect=mock_fetch):
+        async def run_prefetch(frame_id):
+            return await frames_api.prefetch_frame_image(db, redis, frame)
+
+        with patch.object(prefetch, '_prefetch', side_effect=run_prefetch):
+            prefetch.schedule_frame_image_prefetch(frame.id)
+            # The browser asks while the prefetch is still talking to the device.
+            response = await async_client.get(f'/api/frames/{frame.id}/image?t=123')
+            second = await async_client.get(f'/api/frames/{frame.id}/image?t=124')
+
+    assert response.status_code == 200
+    assert response.content == body
+    assert second.content == body
+    assert fetches == ['/image']
+    assert await redis.get(prefetch.frame_image_prefetched_key(frame.id)) == b'1'
+
+
+@pytest.mark.asyncio
+async def test_prefetch_skips_when_refresh_already_running(db, redis):
+    frame = await new_frame(db, redis, 'BusyPrefetchFrame', 'localhost', 'localhost')
+    await redis.set(frames_api._frame_image_refresh_lock_key(frame.id), 'other-instance', ex=30)
+
+    with patch('app.api.frames._fetch_frame_http_bytes') as fetch:
+        assert await frames_api.prefetch_frame_image(db, redis, frame) is False
+
+    fetch.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_watch_frames_message_only_keeps_visible_frames(db, redis):
+    frame = await new_frame(db, redis, 'WatchedFrame', 'localhost', 'localhost')
+    websocket = object()
+    manager.active_connections.append(websocket)
+    message = json.dumps({'event': 'watch_frames', 'data': {'frameIds': [frame.id, 'junk', 99999]}})
+    try:
+        assert await _handle_client_message(websocket, message, {frame.project_id}) is True
+        assert manager.watched_frame_ids() == {frame.id}
+        assert await prefetch.frame_has_viewers(redis, frame.id)
+
+        assert await _handle_client_message(websocket, message, set()) is True
+        assert manager.watched_frame_ids() == set()
+        assert await _handle_client_message(websocket, 'ping', None) is False
+    finally:
+        manager.active_connections.remove(websocket)
+        manager.connection_watched_frames.pop(websocket, None)
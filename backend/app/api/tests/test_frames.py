@@ -2,6 +2,7 @@ import asyncio
 import gzip
 import io
 import json
+import lzma
 import pytest
 import subprocess
 import time
@@ -16,6 +17,7 @@ from app.api import frame_sync, frames as frames_api
 from app.models import new_frame
 from app.models.frame import Frame
 from app.models.log import Log
+from app.models.log_segment import archive_log_rows
 from app.models.metrics import Metrics
 from app.models.scene_image import SceneImage
 from app.models.settings import Settings
@@ -25,7 +27,10 @@ from app.tasks.buildroot_image import (
     BUILDROOT_SD_IMAGE_CUSTOMIZATION_VERSION,
     buildroot_sd_image_config_fingerprint,
     ensure_buildroot_frame_defaults,
+    latest_buildroot_sd_image,
 )
+from app.utils.compression import compress_file
+from app.utils.virtual_image import Extent, VirtualImage, write_virtual_image_manifest
 from app.codegen.drivers_nim import frame_compilation_mode
 from app.drivers.devices import (
     WAVESHARE_RPI_ZERO_PHOTOPAINTER_7IN3E_DEVICE,
@@ -55,6 +60,7 @@ async def test_api_frames(async_client, db, redis):
     assert len(data['frames']) == 1
     assert data['frames'][0]['name'] == 'TestFrame'
 
+
 @pytest.mark.asyncio
 async def test_api_frame_get_found(async_client, db, redis):
     frame = await new_frame(db, redis, 'FoundFrame', 'localhost', 'localhost')
@@ -626,6 +632,144 @@ async def test_api_frame_logs_full_download_includes_all_persisted_logs(async_cl
     assert full_lines[0].endswith('(stdout) line 0')
     assert full_lines[-1].endswith('(stdout) line 1001')
 
+@pytest.mark.asyncio
+async def test_api_frame_get_logs_pages_and_filters(async_client, db, redis):
+    frame = await new_frame(db, redis, 'PagedLogsFrame', 'localhost', 'localhost')
+    base_timestamp = datetime(2026, 5, 8, 8, 0, 0)
+    for index in range(30):
+        event = ('render', 'render:done', 'bootup')[index % 3]
+        db.add(Log(
+            project_id=frame.project_id,
+            frame_id=frame.id,
+            type='webhook' if index % 2 == 0 else 'stdout',
+            line=json.dumps({'event': event, 'n': index}) if index % 2 == 0 else f'line {index}',
+            event=event if index % 2 == 0 else None,
+            timestamp=base_timestamp + timedelta(minutes=index),
+        ))
+    db.commit()
+    url = f'/api/frames/{frame.id}/logs'
+
+    # Page backwards from the newest rows until the start of the history.
+    seen = []
+    page = (await async_client.get(url, params={'limit': 12})).json()
+    while True:
+        seen = page['logs'] + seen
+        if not page['has_more']:
+            break
+        page = (await async_client.get(url, params={'limit': 12, 'before_id': page['logs'][0]['id']})).json()
+    # 30 lines plus new_frame's welcome line.
+    assert len(seen) == 31
+    assert [log['id'] for log in seen] == sorted(log['id'] for log in seen)
+    newer = (await async_client.get(url, params={'after_id': seen[25]['id'], 'limit': 2})).json()
+    assert [log['id'] for log in newer['logs']] == [seen[26]['id'], seen[27]['id']]
+    assert newer['has_more'] is True
+
+    stdout = (await async_client.get(url, params={'type': 'stdout'})).json()['logs']
+    assert len(stdout) == 15 and {log['type'] for log in stdout} == {'stdout'}
+    done = (await async_client.get(url, params=[('event', 'render:done'), ('event', 'bootup')])).json()['logs']
+    assert [json.loads(log['line'])['n'] for log in done] == [2, 4, 8, 10, 14, 16, 20, 22, 26, 28]
+    window = (await async_client.get(url, params={
+        'since': '2026-05-08T08:10:00Z',
+        'until': '2026-05-08T10:15:00+02:00',
+    })).json()['logs']
+    assert [log['timestamp'][11:16] for log in window] == [f'08:{minute}' for minute in range(10, 15)]
+
+    columns = (await async_client.get(url, params={'format': 'columns', 'type': 'stdout', 'limit': 3})).json()
+    assert columns['has_more'] is True
+    assert columns['columns']['line'] == ['line 25', 'line 27', 'line 29']
+    assert set(columns['columns']) == {'id', 'timestamp', 'type', 'line', 'ip'}
+    assert (await async_client.get(url, params={'after_id': 1, 'before_id': 2})).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_api_frame_search_logs(async_client, db, redis):
+    kitchen = await new_frame(db, redis, 'Kitchen', 'localhost', 'localhost')
+    hallway = await new_frame(db, redis, 'Hallway', 'localhost', 'localhost')
+    for frame, line in (
+        (kitchen, 'HTTP error: connection refused by weather.example'),
+        (kitchen, 'render done in 812ms'),
+        (hallway, 'error error error: connection refused'),
+    ):
+        db.add(Log(project_id=frame.project_id, frame_id=frame.id, type='stdout', line=line))
+    db.commit()
+
+    project_wide = (await async_client.get('/api/frames/logs/search', params={'q': 'connection refused'})).json()
+    assert {result['frame_id'] for result in project_wide['results']} == {kitchen.id, hallway.id}
+
+    response = await async_client.get(f'/api/frames/{kitchen.id}/logs/search', params={'q': 'refused error'})
+    assert response.status_code == 200
+    [result] = response.json()['results']
+    assert result['line'] == 'HTTP error: connection refused by weather.example'
+    assert [segment['text'] for segment in result['highlight'] if segment['match']] == ['error', 'refused']
+    assert ''.join(segment['text'] for segment in result['highlight']) == result['line']
+
+    assert (await async_client.get('/api/frames/logs/search', params={'q': ''})).status_code == 422
+    assert (await async_client.get('/api/frames/999999/logs/search', params={'q': 'error'})).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_api_frame_logs_read_archived_segments(async_client, db, redis):
+    frame = await new_frame(db, redis, 'ArchivedFrame', 'localhost', 'localhost')
+    db.query(Log).delete()
+    archived = [
+        Log(id=index + 1, timestamp=datetime(2026, 4, 1, 12, 0, index), type='stdout',
+            line=f'old line {index}' + (' disk full' if index == 3 else ''), ip=None, event=None)
+        for index in range(5)
+    ]
+    archive_log_rows(db, frame.project_id, frame.id, archived)
+    db.add(Log(project_id=frame.project_id, frame_id=frame.id, type='stdout', line='new line: disk full again',
+               timestamp=datetime(2026, 5, 1, 12, 0, 0)))
+    db.commit()
+
+    full_lines = (await async_client.get(f'/api/frames/{frame.id}/logs/full')).text.splitlines()
+    assert full_lines == [
+        '[2026-04-01T12:00:00+00:00] (stdout) old line 0',
+        '[2026-04-01T12:00:01+00:00] (stdout) old line 1',
+        '[2026-04-01T12:00:02+00:00] (stdout) old line 2',
+        '[2026-04-01T12:00:03+00:00] (stdout) old line 3 disk full',
+        '[2026-04-01T12:00:04+00:00] (stdout) old line 4',
+        '[2026-05-01T12:00:00+00:00] (stdout) new line: disk full again',
+    ]
+
+    search_url = f'/api/frames/{frame.id}/logs/search'
+    results = (await async_client.get(search_url, params={'q': 'disk full'})).json()['results']
+    assert [result['line'] for result in results] == ['new line: disk full again']
+    results = (await async_client.get(search_url, params={'q': 'disk full', 'archived': 'true'})).json()['results']
+    assert [result['line'] for result in results] == ['new line: disk full again', 'old line 3 disk full']
+    assert results[1]['id'] == 4 and results[1]['frame_id'] == frame.id
+    assert [segment['text'] for segment in results[1]['highlight'] if segment['match']] == ['disk', 'full']
+
+@pytest.mark.asyncio
+async def test_api_frame_terminal_history(async_client, db, redis, monkeypatch):
+    import app.models.terminal_history as terminal_history_module
+
+    monkeypatch.setattr(terminal_history_module, 'TERMINAL_HISTORY_PER_FRAME', 5)
+    frame = await new_frame(db, redis, 'TerminalFrame', 'localhost', 'localhost')
+    url = f'/api/frames/{frame.id}/terminal_history'
+
+    pubsub = redis.pubsub()
+    await pubsub.subscribe('broadcast_channel')
+    for index in range(7):
+        response = await async_client.post(url, json={'command': f'echo {index}'})
+        assert response.status_code == 200
+        assert response.json()['commands'][0]['command'] == f'echo {index}'
+    # Repeats of the latest command and blank lines are not stored.
+    assert (await async_client.post(url, json={'command': ' echo 6 '})).json()['commands'] == []
+    assert (await async_client.post(url, json={'command': '  '})).json()['commands'] == []
+    # Appending does not rewrite or broadcast the frame.
+    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.2)
+    assert message is None
+    await pubsub.unsubscribe('broadcast_channel')
+
+    commands = (await async_client.get(url)).json()['commands']
+    assert [c['command'] for c in commands] == [f'echo {i}' for i in range(2, 7)]
+
+    older = (await async_client.get(url, params={'before_id': commands[2]['id'], 'limit': 1})).json()['commands']
+    assert [c['command'] for c in older] == ['echo 3']
+    newer = (await async_client.get(url, params={'after_id': commands[2]['id']})).json()['commands']
+    assert [c['command'] for c in newer] == ['echo 5', 'echo 6']
+    assert (await async_client.get(url, params={'after_id': 1, 'before_id': 2})).status_code == 400
+
 @pytest.mark.asyncio
 async def test_api_frame_get_image_cached(async_client, db, redis):
     # Create the frame
@@ -2752,11 +2896,13 @@ async def test_api_frame_update_keeps_buildroot_sd_image_for_unrelated_metadata(
     db.add(frame)
     db.commit()
 
-    response = await async_client.post(f'/api/frames/{frame.id}', json={'terminal_history': ['ls']})
+    # Unlike name or debug, archiving is not part of the image's setup JSON.
+    response = await async_client.post(f'/api/frames/{frame.id}', json={'archived': True})
 
     assert response.status_code == 200
     db.expire_all()
     frame = db.get(Frame, frame.id)
+    assert frame.archived is True
     assert frame.buildroot['sdImage']['status'] == 'ready'
 
 
@@ -3011,6 +3157,83 @@ async def test_api_frame_buildroot_sd_image_download(async_client, db, redis, tm
     assert response.headers['content-type'].startswith('application/gzip')
     assert 'frameos-test.img.gz' in response.headers['content-disposition']
 
+    # The cached copy is now a plain file response that can be resumed.
+    cached = await async_client.get(
+        f'/api/frames/{frame.id}/buildroot/sd_image/download', headers={'Range': 'bytes=0-1'}
+    )
+    assert cached.status_code == 206
+    assert cached.content == b'\x1f\x8b'
+
+    xz_response = await async_client.get(f'/api/frames/{frame.id}/buildroot/sd_image/download?compression=xz')
+    assert xz_response.status_code == 200
+    assert lzma.decompress(xz_response.content) == b'frameos image'
+    assert 'frameos-test.img.xz' in xz_response.headers['content-disposition']
+
+    unknown = await async_client.get(f'/api/frames/{frame.id}/buildroot/sd_image/download?compression=rar')
+    assert unknown.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_api_frame_buildroot_virtual_sd_image_download(async_client, db, redis, tmp_path):
+    base = tmp_path / 'release.img'
+    base.write_bytes(b'A' * 1000 + b'B' * 1000)
+    compressed_base = tmp_path / 'release.img.blocks.gz'
+    members = compress_file(base, compressed_base, 'gzip', split_at=(1000,))
+    overlay = tmp_path / 'frame.overlay'
+    patch_gz = gzip.compress(b'C' * 1000, mtime=0)
+    overlay.write_bytes(b'C' * 10 + patch_gz)
+    manifest = tmp_path / 'frame.img.vimg.json'
+    write_virtual_image_manifest(manifest, {
+        'raw': VirtualImage.from_extents([
+            Extent(1000, str(base), 0),
+            Extent(10, str(overlay), 0),
+            Extent(990, fill=ord('C')),
+        ]),
+        'gzip': VirtualImage.from_extents([
+            Extent(members[1][1], str(compressed_base), 0),
+            Extent(len(patch_gz), str(overlay), 10),
+        ]),
+    })
+    frame = await new_frame(db, redis, 'VirtualBuildrootFrame', 'frame.local', 'backend.local')
+    frame.mode = 'buildroot'
+    frame.buildroot = {
+        'platform': 'raspberry-pi-zero-2-w',
+        'sdImage': {
+            'status': 'ready',
+            'filename': 'frameos-test.img.gz',
+            'path': str(manifest),
+            'virtual': True,
+            'customizationVersion': BUILDROOT_SD_IMAGE_CUSTOMIZATION_VERSION,
+        },
+    }
+    set_buildroot_sd_image_config_fingerprint(frame)
+    db.add(frame)
+    db.commit()
+    url = f'/api/frames/{frame.id}/buildroot/sd_image/download'
+    expected = b'A' * 1000 + b'C' * 1000
+
+    response = await async_client.get(url)
+    assert response.status_code == 200
+    assert gzip.decompress(response.content) == expected
+    assert 'frameos-test.img.gz' in response.headers['content-disposition']
+    assert not list(tmp_path.glob('*.img.gz'))
+
+    tail = await async_client.get(url, headers={'Range': f'bytes={len(response.content) - 8}-'})
+    assert tail.status_code == 206
+    assert tail.content == response.content[-8:]
+    stale = await async_client.get(url, headers={'Range': 'bytes=0-1', 'If-Range': '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == response.content
+    beyond = await async_client.get(url, headers={'Range': f'bytes={len(response.content)}-'})
+    assert beyond.status_code == 416
+
+    xz_response = await async_client.get(f'{url}?compression=xz')
+    assert lzma.decompress(xz_response.content) == expected
+
+    base.write_bytes(b'changed')
+    assert latest_buildroot_sd_image(frame)['status'] == 'missing'
+    assert (await async_client.get(url)).status_code == 404
+
 
 @pytest.mark.asyncio
 async def test_api_frame_new_missing_fields(async_client):
@@ -1,4 +1,7 @@
+import gzip
+import json
 import pytest
+from app import middleware
 from app.models import new_frame, update_frame, Log
 
 @pytest.mark.asyncio
@@ -13,7 +16,7 @@ async def test_api_log_single_entry(async_client, db, redis):
     response = await async_client.post('/api/log', json=data, headers=headers)
     assert response.status_code == 200
     # Check the DB
-    logs = db.query(Log).filter_by(frame_id=frame.id).all()
+    logs = db.query(Log).filter_by(frame_id=frame.id).order_by(Log.id).all()
     # We have the welcome log plus the new one
     assert len(logs) == 2
     assert "banana" in logs[1].line
@@ -96,3 +99,81 @@ async def test_api_log_no_key(async_client, db, redis):
     response = await async_client.post('/api/log', json=data)
     assert response.status_code == 401
     assert response.json()['detail'] == "Unauthorized"
+
+
+async def _log_frame(db, redis):
+    frame = await new_frame(db, redis, 'CompressedLogFrame', 'localhost', 'localhost')
+    frame.server_api_key = 'testkey'
+    await update_frame(db, redis, frame)
+    return frame
+
+
+@pytest.mark.asyncio
+async def test_api_log_gzip_body_is_decoded_as_it_streams(async_client, db, redis):
+    frame = await _log_frame(db, redis)
+    body = gzip.compress(json.dumps({'logs': [{'event': 'log', 'message': f'line {i}'} for i in range(500)]}).encode())
+
+    async def chunks():
+        for offset in range(0, len(body), 100):
+            yield body[offset:offset + 100]
+
+    response = await async_client.post(
+        '/api/log',
+        content=chunks(),
+        headers={'Authorization': 'Bearer testkey', 'Content-Encoding': 'gzip', 'Content-Type': 'application/json'},
+    )
+    assert response.status_code == 200
+    assert db.query(Log).filter_by(frame_id=frame.id).count() == 501
+
+
+@pytest.mark.asyncio
+async def test_api_log_zstd_body(async_client, db, redis):
+    zstandard = pytest.importorskip("zstandard")
+    frame = await _log_frame(db, redis)
+    body = zstandard.ZstdCompressor().compress(json.dumps({'log': {'event': 'log', 'message': 'zstd banana'}}).encode())
+
+    response = await async_client.post(
+        '/api/log',
+        content=body,
+        headers={'Authorization': 'Bearer testkey', 'Content-Encoding': 'zstd', 'Content-Type': 'application/json'},
+    )
+    assert response.status_code == 200
+    assert db.query(Log).filter_by(frame_id=frame.id).order_by(Log.id.desc()).first().line.count('zstd banana') == 1
+
+
+@pytest.mark.asyncio
+async def test_api_log_rejects_bad_compressed_bodies(async_client, db, redis, monkeypatch):
+    await _log_frame(db, redis)
+    headers = {'Authorization': 'Bearer testkey', 'Content-Type': 'application/json'}
+    monkeypatch.setattr(middleware, 'MAX_DECOMPRESSED_BODY', 1024)
+
+    bomb = gzip.compress(b'{"logs": [' + b' ' * (10 * 1024 * 1024) + b']}')
+    response = await async_client.post('/api/log', content=bomb, headers={**headers, 'Content-Encoding': 'gzip'})
+    assert response.status_code == 413
+
+    corrupt = gzip.compress(b'{"logs": []}')[:-8] + b'garbage!'
+    response = await async_client.post('/api/log', content=corrupt, headers={**headers, 'Content-Encoding': 'gzip'})
+    assert response.status_code == 400
+
+    response = await async_client.post('/api/log', content=b'{}', headers={**headers, 'Content-Encoding': 'compress'})
+    assert response.status_code == 415
+    assert 'gzip' in response.headers['accept-encoding']
+
+
+@pytest.mark.asyncio
+async def test_api_log_brotli_body_and_bomb(async_client, db, redis, monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    frame = await _log_frame(db, redis)
+    headers = {'Authorization': 'Bearer testkey', 'Content-Type': 'application/json', 'Content-Encoding': 'br'}
+
+    body = brotli.compress(json.dumps({'log': {'event': 'log', 'message': 'brotli banana'}}).encode())
+    response = await async_client.post('/api/log', content=body, headers=headers)
+    assert response.status_code == 200
+    assert db.query(Log).filter_by(frame_id=frame.id).order_by(Log.id.desc()).first().line.count('brotli banana') == 1
+
+    # A few hundred bytes that expand to 64 MB.
+    monkeypatch.setattr(middleware, 'MAX_DECOMPRESSED_BODY', 1024)
+    bomb = brotli.compress(b'{"logs": [' + b' ' * (64 * 1024 * 1024) + b']}', quality=11)
+    assert len(bomb) < 1024
+    response = await async_client.post('/api/log', content=bomb, headers=headers)
+    assert response.status_code == 413
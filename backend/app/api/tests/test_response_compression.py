@@ -0,0 +1,171 @@
+import gzip
+import json
+import os
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app.middleware import PrecompressedStaticFiles, ResponseCompressionMiddleware, negotiate_content_encoding
+
+
+async def _raw_get(app, path: str, accept_encoding: str):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        async with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+            return response, b"".join([chunk async for chunk in response.aiter_raw()])
+
+
+def _decode(response, raw: bytes) -> bytes:
+    encoding = response.headers.get("content-encoding")
+    if encoding == "zstd":
+        return pytest.importorskip("zstandard").ZstdDecompressor().decompressobj().decompress(raw)
+    if encoding == "br":
+        return pytest.importorskip("brotli").decompress(raw)
+    return gzip.decompress(raw) if encoding == "gzip" else raw
+
+
+def _compressing_app():
+    frames = [{"id": index, "name": f"Frame {index}", "scenes": ["a", "b", "c"]} for index in range(200)]
+
+    async def frames_json(_request):
+        return JSONResponse({"frames": frames})
+
+    async def tiny_json(_request):
+        return JSONResponse({"ok": True})
+
+    async def image(_request):
+        return Response(b"\x89PNG" + b"\x00" * 4096, media_type="image/png")
+
+    async def ndjson(_request):
+        async def lines():
+            for frame in frames:
+                yield json.dumps(frame) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    app = Starlette(routes=[
+        Route("/frames", frames_json),
+        Route("/tiny", tiny_json),
+        Route("/image.png", image),
+        Route("/export", ndjson),
+    ])
+    app.add_middleware(ResponseCompressionMiddleware)
+    return app, frames
+
+
+def test_negotiate_content_encoding():
+    available = ["zstd", "br", "gzip"]
+    assert negotiate_content_encoding("gzip, deflate, br, zstd", available) == "zstd"
+    assert negotiate_content_encoding("gzip;q=0.5, br", available) == "br"
+    assert negotiate_content_encoding("*", available) == "zstd"
+    assert negotiate_content_encoding("*, zstd;q=0, br;q=0", available) == "gzip"
+    assert negotiate_content_encoding("gzip;q=0", available) is None
+    assert negotiate_content_encoding("", available) is None
+
+
+@pytest.mark.asyncio
+async def test_response_compression_only_compresses_text_like_bodies():
+    app, frames = _compressing_app()
+
+    response, raw = await _raw_get(app, "/frames", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(raw)
+    assert json.loads(gzip.decompress(raw)) == {"frames": frames}
+
+    response, raw = await _raw_get(app, "/image.png", "gzip")
+    assert "content-encoding" not in response.headers
+    assert raw.startswith(b"\x89PNG")
+
+    response, raw = await _raw_get(app, "/tiny", "gzip")
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw) == {"ok": True}
+
+    response, raw = await _raw_get(app, "/frames", "identity")
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw) == {"frames": frames}
+
+
+@pytest.mark.asyncio
+async def test_response_compression_streams():
+    app, frames = _compressing_app()
+
+    response, raw = await _raw_get(app, "/export", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert [json.loads(line) for line in gzip.decompress(raw).splitlines()] == frames
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding, module", [("zstd", "zstandard"), ("br", "brotli"), ("gzip", "zlib")])
+async def test_response_compression_round_trips(encoding, module):
+    pytest.importorskip(module)
+    app, frames = _compressing_app()
+
+    response, raw = await _raw_get(app, "/frames", f"{encoding}, identity;q=0.5")
+    assert response.headers["content-encoding"] == encoding
+    assert int(response.headers["content-length"]) == len(raw)
+    assert json.loads(_decode(response, raw)) == {"frames": frames}
+
+    response, raw = await _raw_get(app, "/export", encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert [json.loads(line) for line in _decode(response, raw).splitlines()] == frames
+
+
+@pytest.mark.asyncio
+async def test_response_compression_weakens_file_etags(tmp_path):
+    source = b'{"frame": "kitchen"}\n' * 200
+    (tmp_path / "frames.json").write_bytes(source)
+
+    async def download(_request):
+        return FileResponse(tmp_path / "frames.json", media_type="application/json")
+
+    app = Starlette(routes=[Route("/frames.json", download)])
+    app.add_middleware(ResponseCompressionMiddleware)
+
+    plain, raw = await _raw_get(app, "/frames.json", "identity")
+    assert plain.headers["accept-ranges"] == "bytes"
+    assert not plain.headers["etag"].startswith("W/")
+    assert raw == source
+
+    response, raw = await _raw_get(app, "/frames.json", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == f"W/{plain.headers['etag']}"
+    assert "accept-ranges" not in response.headers
+    assert gzip.decompress(raw) == source
+
+
+@pytest.mark.asyncio
+async def test_static_files_serve_precompressed_variants(tmp_path):
+    source = b"console.log('frameos');\n" * 100
+    (tmp_path / "main.js").write_bytes(source)
+    (tmp_path / "main.js.gz").write_bytes(gzip.compress(source))
+    (tmp_path / "main.js.br").write_bytes(b"brotli bytes")
+    app = Starlette(routes=[Mount("/static", PrecompressedStaticFiles(directory=tmp_path))])
+    app.add_middleware(ResponseCompressionMiddleware)
+
+    response, raw = await _raw_get(app, "/static/main.js", "gzip, br")
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert raw == b"brotli bytes"
+
+    response, raw = await _raw_get(app, "/static/main.js", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw) == source
+
+    response, raw = await _raw_get(app, "/static/main.js", "identity")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert raw == source
+
+    # Siblings older than the file they compress are stale.
+    stat = os.stat(tmp_path / "main.js")
+    os.utime(tmp_path / "main.js.br", (stat.st_atime, stat.st_mtime - 60))
+    response, raw = await _raw_get(app, "/static/main.js", "br")
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert _decode(response, raw) == source
@@ -29,6 +29,9 @@ async def test_get_system_info(async_client, tmp_path, monkeypatch):
 
         cache_sizes = {cache["path"]: cache for cache in data["caches"]}
         assert cache_sizes[str(cross_cache)]["sizeBytes"] == 1024
+        # One row for the cross cache, with the toolchain cache statistics.
+        assert [cache["path"] for cache in data["caches"]].count(str(cross_cache)) == 1
+        assert cache_sizes[str(cross_cache)]["entries"] == 1
         assert cache_sizes[str(docker_root)]["sizeBytes"] == 2048
 
         assert data["database"]["path"] == str(db_file)
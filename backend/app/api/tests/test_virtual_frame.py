@@ -282,6 +282,15 @@ async def test_virtual_assets_quota(async_client, db, redis, virtual_assets_dir)
         files={'file': ('small.bin', b'y' * 700)})
     assert response.status_code == 200, response.text
 
+    # Deleting it frees its bytes for the next upload.
+    response = await async_client.post(
+        f'/api/frames/{frame.id}/assets/delete', data={'path': 'small.bin'})
+    assert response.status_code == 200, response.text
+    response = await async_client.post(
+        f'/api/frames/{frame.id}/assets/upload',
+        files={'file': ('small2.bin', b'x' * 900)})
+    assert response.status_code == 200, response.text
+
 
 def test_virtual_assets_quota_parsing():
     from app.utils.virtual_assets import DEFAULT_QUOTA_MB, quota_bytes
@@ -442,3 +451,8 @@ async def test_virtual_render_passes_save_assets_and_budget(
     assert response.status_code == 200
     paths = [a['path'] for a in response.json()['assets']]
     assert '/srv/assets/wikicommons/img.abc123.jpg' in paths
+
+    # The next render's budget counts the asset the harness wrote.
+    response = await async_client.post(f'/api/frames/{frame.id}/event/render')
+    assert response.status_code == 200, response.text
+    assert captured['assets_write_budget'] == 1024 * 1024 - len(b'jpeg-bytes')
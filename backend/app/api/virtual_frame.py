@@ -285,9 +285,11 @@ async def _virtual_frame_png(
     )
     if saved_assets is not None and saved_assets.get("files"):
         # Scene apps saved new assets (OpenAI images, downloaded photos):
-        # drop the cached listing so the workspace sees them.
+        # drop the cached listing so the workspace sees them, and recount
+        # usage since the harness wrote them behind our back.
         from .frames import _invalidate_frame_assets_cache
 
+        virtual_assets.invalidate_usage(frame)
         await _invalidate_frame_assets_cache(
             redis, frame, frame.assets_path or "/srv/assets"
         )
@@ -15,6 +15,7 @@ from app.database import SessionLocal, engine, Base  # noqa: E402
 from app.models.organization import Project  # noqa: E402
 from app.models.user import User  # noqa: E402
 from app.tenancy import ensure_default_project_for_user  # noqa: E402
+from app.utils.principal_cache import clear_principal_cache  # noqa: E402
 
 
 PROJECT_SCOPED_TEST_PATHS = (
@@ -54,6 +55,18 @@ class ProjectAsyncClient(AsyncClient):
         return await super().request(method, self._project_url(url), *args, **kwargs)
 
 
+@pytest.fixture(autouse=True)
+def isolated_artifact_cache_index(tmp_path_factory, monkeypatch):
+    # Cache bookkeeping from download/build code paths stays out of the repo.
+    monkeypatch.setenv("FRAMEOS_CACHE_INDEX", str(tmp_path_factory.mktemp("cache-index") / "cache-index.json"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_principal_cache():
+    # Each test recreates its database; ids repeat, cached principals must not.
+    clear_principal_cache()
+
+
 @pytest.fixture(autouse=True)
 def setup_and_teardown_db():
     if not config.TEST:
@@ -68,6 +81,11 @@ def setup_and_teardown_db():
     yield
     # Drop all tables after each test
     Base.metadata.drop_all(bind=engine)
+    # Pooled connections cache statements prepared against the dropped
+    # schema. SQLite re-prepares them on next use, and for an insert that
+    # fires the log search triggers (FTS5) that re-prepare leaves a read open:
+    # the write then fails with "database is locked" instead of waiting.
+    engine.dispose()
 
 @pytest_asyncio.fixture
 async def db():
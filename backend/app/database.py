@@ -1,8 +1,17 @@
+import asyncio
+import contextvars
+import functools
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
 
 from sqlalchemy import create_engine, event
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 from app.config import config
+from app.utils.env import get_env_int
+
+T = TypeVar("T")
 
 is_sqlite = config.DATABASE_URL.startswith("sqlite")
 
@@ -65,3 +74,84 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Sessions are synchronous. Run on the event loop, a query that waits on the
+# SQLite write lock (busy_timeout, up to 30s) stalls every websocket and
+# request in the process. Async code hands ORM work to these threads instead:
+# a waiting writer then only holds up the request that issued it. A session
+# may move between threads as long as it is used by one at a time, which
+# awaiting each call guarantees.
+DB_THREADS = get_env_int("FRAMEOS_DB_THREADS", 8)
+_db_executor: ThreadPoolExecutor | None = None
+_db_thread_state = threading.local()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=max(1, DB_THREADS), thread_name_prefix="frameos-db")
+    return _db_executor
+
+
+def _call_with_loop(loop: asyncio.AbstractEventLoop, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    _db_thread_state.loop = loop
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _db_thread_state.loop = None
+
+
+def calling_loop() -> asyncio.AbstractEventLoop | None:
+    """The running loop, or the one that handed this thread its ORM work.
+
+    Mapper events fire inside flushes; those that schedule async follow-ups
+    (principal cache invalidation) use this to reach the loop from a DB thread.
+    """
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return getattr(_db_thread_state, "loop", None)
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run ``fn(*args, **kwargs)`` on a database thread."""
+    loop = asyncio.get_running_loop()
+    # Like asyncio.to_thread, carry context variables (the request's project
+    # scope) over to the thread.
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(
+        _executor(), functools.partial(context.run, _call_with_loop, loop, fn, *args, **kwargs)
+    )
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # The thread can't be stopped and may still be using the caller's
+        # session: let it finish before the caller's cleanup closes it.
+        while not future.done():
+            try:
+                await asyncio.wait((future,))
+            except asyncio.CancelledError:
+                pass
+        if not future.cancelled():
+            future.exception()
+        raise
+
+
+async def run_and_commit(db: Session, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run the unit of work ``fn(db, *args, **kwargs)`` and commit it, off the loop.
+
+    Rolls back if *fn* or the commit raises, so *db* stays usable. Commit
+    before awaiting anything else: a write transaction left open across an
+    await holds the SQLite write lock while this task is suspended.
+    """
+    def unit_of_work() -> T:
+        try:
+            result = fn(db, *args, **kwargs)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return result
+
+    return await run_db(unit_of_work)
@@ -3,7 +3,6 @@ import json
 import os
 from contextlib import asynccontextmanager
 from httpx import AsyncClient, Limits
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.exception_handlers import request_validation_exception_handler
@@ -12,12 +11,12 @@ from fastapi import FastAPI, Request, Depends
 from app.api.auth import get_current_user
 from app.api import api_open, api_project, api_user, api_public
 from app.api.project_auth import get_current_project
-from fastapi.middleware.gzip import GZipMiddleware
-from app.middleware import GzipRequestMiddleware
+from app.middleware import PrecompressedStaticFiles, RequestDecompressionMiddleware, ResponseCompressionMiddleware
 from app.ws.remote_ws import router as remote_ws_router
 from app.ws.terminal_ws import router as terminal_ws_router
-from app.websockets import register_ws_routes, redis_listener
+from app.websockets import frame_viewers_refresher, register_ws_routes, redis_listener
 from app.config import config, normalize_ingress_path
+from app.utils.dir_size import directory_size_reconciler
 from app.utils.posthog import initialize_posthog, capture_exception as posthog_capture_exception
 
 @asynccontextmanager
@@ -26,19 +25,22 @@ async def lifespan(app: FastAPI):
     app.state.http_client = AsyncClient(limits=Limits(max_connections=20, max_keepalive_connections=10))
     app.state.http_semaphore = asyncio.Semaphore(10)
     task = asyncio.create_task(redis_listener())
+    viewers_task = asyncio.create_task(frame_viewers_refresher())
+    dir_size_task = asyncio.create_task(directory_size_reconciler())
     yield
     await app.state.http_client.aclose()
     from app.redis import close_shared_redis
     await close_shared_redis()
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
+    for background_task in (task, viewers_task, dir_size_task):
+        background_task.cancel()
+        try:
+            await background_task
+        except asyncio.CancelledError:
+            pass
 
 app = FastAPI(lifespan=lifespan)
-app.add_middleware(GZipMiddleware)
-app.add_middleware(GzipRequestMiddleware)
+app.add_middleware(ResponseCompressionMiddleware)
+app.add_middleware(RequestDecompressionMiddleware)
 
 register_ws_routes(app)
 app.include_router(remote_ws_router)
@@ -65,13 +67,13 @@ serve_html = config.HASSIO_RUN_MODE != "public"
 if serve_html:
     # only if frontend/dist exists, might not if we're using vite
     if os.path.exists("../frontend/dist"):
-        app.mount("/assets", StaticFiles(directory="../frontend/dist/assets"), name="assets")
-        app.mount("/img", StaticFiles(directory="../frontend/dist/img"), name="img")
-        app.mount("/static", StaticFiles(directory="../frontend/dist/static"), name="static")
+        app.mount("/assets", PrecompressedStaticFiles(directory="../frontend/dist/assets"), name="assets")
+        app.mount("/img", PrecompressedStaticFiles(directory="../frontend/dist/img"), name="img")
+        app.mount("/static", PrecompressedStaticFiles(directory="../frontend/dist/static"), name="static")
         # wasm live-preview bundle (built by frameos/tools/build_wasm.sh into
         # frontend/public/frameos-wasm, copied into dist by the frontend build)
         if os.path.exists("../frontend/dist/frameos-wasm"):
-            app.mount("/frameos-wasm", StaticFiles(directory="../frontend/dist/frameos-wasm"), name="frameos-wasm")
+            app.mount("/frameos-wasm", PrecompressedStaticFiles(directory="../frontend/dist/frameos-wasm"), name="frameos-wasm")
 
         try:
             index_html_template = open("../frontend/dist/index.html").read()
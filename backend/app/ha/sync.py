@@ -371,22 +371,28 @@ class HomeAssistantSync:
             db.close()
 
     def _load_project_frames(self, project_id: int) -> list[dict]:
-        from app.models.frame import Frame
+        from app.models.frame import Frame, frame_summary_options
 
         db = SessionLocal()
         try:
-            frames = db.query(Frame).filter(Frame.project_id == project_id).all()
-            return [frame.to_dict() for frame in frames]
+            # Discovery needs scene names, nothing else heavy.
+            frames = (
+                db.query(Frame)
+                .options(*frame_summary_options("scenes"))
+                .filter(Frame.project_id == project_id)
+                .all()
+            )
+            return [{**frame.to_summary_dict(), "scenes": frame.scenes} for frame in frames]
         finally:
             db.close()
 
     def _load_frame_dict(self, frame_id: int) -> Optional[dict]:
-        from app.models.frame import Frame
+        from app.models.frame import Frame, frame_summary_options
 
         db = SessionLocal()
         try:
-            frame = db.get(Frame, frame_id)
-            return frame.to_dict() if frame else None
+            frame = db.get(Frame, frame_id, options=frame_summary_options("scenes"))
+            return {**frame.to_summary_dict(), "scenes": frame.scenes} if frame else None
         finally:
             db.close()
 
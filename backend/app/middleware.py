@@ -1,64 +1,388 @@
-
+import asyncio
+import mimetypes
 import os
 import zlib
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from typing import Any, Callable, Iterator, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-# Cap the decompressed size of an incoming gzip body. A few KB of gzip can
+from app.utils.compression import _brotli, _zstandard
+
+# Cap the decompressed size of an incoming request body. A few KB of gzip can
 # expand to gigabytes ("zip bomb"); this path is reachable on log ingestion, so
 # decompress incrementally and abort once the limit is exceeded.
 MAX_DECOMPRESSED_BODY = int(os.environ.get("MAX_DECOMPRESSED_BODY", str(32 * 1024 * 1024)))
+# zlib output is produced in slices of this size.
+_GZIP_OUTPUT_SLICE = 64 * 1024
+# zstandard and brotli can't bound their output per call, so they are fed
+# input slices small enough that one slice can't expand past a few MB: a
+# 4-byte zstd block yields at most 128 KB, a brotli meta-block at most 16 MB.
+_ZSTD_INPUT_SLICE = 256
+_BROTLI_INPUT_SLICE = 16
+
+# Responses smaller than this go out as they are.
+RESPONSE_COMPRESSION_MINIMUM_SIZE = 500
+# (level for bodies up to RESPONSE_COMPRESSION_LARGE_BODY, level for larger
+# or streamed ones). Starlette's GZipMiddleware used gzip 9 for everything,
+# the costliest choice on a Raspberry Pi for little gain over 6.
+RESPONSE_COMPRESSION_LEVELS = {"zstd": (6, 3), "br": (5, 4), "gzip": (6, 4)}
+RESPONSE_COMPRESSION_LARGE_BODY = 256 * 1024
+# Bodies at least this large are compressed off the event loop.
+RESPONSE_COMPRESSION_THREAD_SIZE = 128 * 1024
+# Text-like media types; everything else (images, SD images, archives,
+# octet-stream downloads) is already compressed or not worth the CPU.
+COMPRESSIBLE_MEDIA_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/wasm",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+}
+# Written next to the frontend bundle by its build, in order of preference.
+PRECOMPRESSED_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+
+
+class _GzipDecoder:
+    def __init__(self) -> None:
+        # 16 + MAX_WBITS lets zlib auto-detect the gzip header.
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decode(self, data: bytes) -> Iterator[bytes]:
+        while data:
+            yield self._decompressor.decompress(data, _GZIP_OUTPUT_SLICE)
+            data = self._decompressor.unconsumed_tail
+
+    def finish(self) -> bytes:
+        tail = self._decompressor.flush()
+        if not self._decompressor.eof:
+            raise ValueError("truncated gzip body")
+        return tail
+
+
+class _SlicedDecoder:
+    def __init__(self, decompress: Callable[[bytes], bytes], finished: Callable[[], bool], input_slice: int) -> None:
+        self._decompress = decompress
+        self._finished = finished
+        self._input_slice = input_slice
+
+    def decode(self, data: bytes) -> Iterator[bytes]:
+        view = memoryview(data)
+        for offset in range(0, len(view), self._input_slice):
+            yield self._decompress(bytes(view[offset:offset + self._input_slice]))
+
+    def finish(self) -> bytes:
+        if not self._finished():
+            raise ValueError("truncated body")
+        return b""
+
+
+def _zstd_decoder() -> _SlicedDecoder:
+    decompressor = _zstandard().ZstdDecompressor().decompressobj()
+    return _SlicedDecoder(decompressor.decompress, lambda: decompressor.eof, _ZSTD_INPUT_SLICE)
 
 
-def _bounded_gunzip(raw_body: bytes, limit: int) -> bytes | None:
-    # 16 + MAX_WBITS lets zlib auto-detect the gzip header. Decompress in bounded
-    # output slices so a bomb is caught before it materializes in memory.
-    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
-    chunks: list[bytes] = []
-    total = 0
-    data = raw_body
-    while data:
-        out = decompressor.decompress(data, 65536)
-        total += len(out)
-        if total > limit:
-            return None
-        chunks.append(out)
-        data = decompressor.unconsumed_tail
-    tail = decompressor.flush()
-    total += len(tail)
-    if total > limit:
-        return None
-    chunks.append(tail)
-    return b"".join(chunks)
-
-
-class GzipRequestMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.headers.get("content-encoding") == "gzip":
-            # Read the raw gzipped body
-            raw_body = await request.body()
-
-            # Decompress with a hard size cap
-            from starlette.responses import Response
+def _brotli_decoder() -> _SlicedDecoder:
+    decompressor = _brotli().Decompressor()
+    return _SlicedDecoder(decompressor.process, decompressor.is_finished, _BROTLI_INPUT_SLICE)
+
+
+def request_decoders() -> dict[str, Callable[[], Any]]:
+    """Content-Encoding -> decoder factory, for the codecs installed here."""
+    decoders: dict[str, Callable[[], Any]] = {"gzip": _GzipDecoder, "x-gzip": _GzipDecoder}
+    if _zstandard() is not None:
+        decoders["zstd"] = _zstd_decoder
+    if _brotli() is not None:
+        decoders["br"] = _brotli_decoder
+    return decoders
+
+
+class RequestDecompressionMiddleware:
+    """
+    Decode gzip, zstd or brotli request bodies as their ``http.request``
+    messages arrive, so the app sees a plain body without it ever being
+    buffered here. Bodies that decode past MAX_DECOMPRESSED_BODY fail with
+    413, corrupt ones with 400. Requests without a Content-Encoding go
+    straight through.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"content-encoding":
+                encoding = value.decode("latin-1").strip().lower()
+                break
+        if not encoding or encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        decoders = request_decoders()
+        if encoding not in decoders:
+            response = PlainTextResponse(
+                f"Unsupported content encoding: {encoding}",
+                status_code=415,
+                headers={"Accept-Encoding": ", ".join(decoders)},
+            )
+            await response(scope, receive, send)
+            return
+
+        # The decoded length isn't known up front; the app reads to the last message.
+        scope = dict(scope)
+        scope["headers"] = [
+            (name, value) for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ]
+        await self.app(scope, self._decoding_receive(receive, decoders[encoding](), encoding), send)
+
+    def _decoding_receive(self, receive: Receive, decoder: Any, encoding: str) -> Receive:
+        received = 0
+        decoded = 0
+        done = False
+
+        def count(piece: bytes) -> bytes:
+            nonlocal decoded
+            decoded += len(piece)
+            if decoded > MAX_DECOMPRESSED_BODY:
+                raise HTTPException(status_code=413, detail="Decompressed body too large")
+            return piece
+
+        async def decoding_receive() -> Message:
+            nonlocal received, done
+            message = await receive()
+            if done or message["type"] != "http.request":
+                return message
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            received += len(body)
+            # Raised into the app's body read, so its exception handlers
+            # turn these into 400/413 responses.
             try:
-                decompressed_body = _bounded_gunzip(raw_body, MAX_DECOMPRESSED_BODY)
-            except (OSError, zlib.error):
-                return Response("Invalid gzipped data", status_code=400)
-            if decompressed_body is None:
-                return Response("Decompressed body too large", status_code=413)
-
-            # Remove content-encoding header and update content-length
-            new_headers = [
-                (name, value) for (name, value) in request.scope['headers']
-                if name.lower() != b'content-encoding'
-            ]
-            new_headers = [
-                (b'content-length', str(len(decompressed_body)).encode('utf-8'))
-            ] + new_headers
-            request.scope['headers'] = new_headers
-
-            # Monkey-patch request._body so that request.json() and request.body() return the decompressed data
-            request._body = decompressed_body
-
-        response = await call_next(request)
+                pieces = [count(piece) for piece in decoder.decode(body)]
+                if not more_body:
+                    done = True
+                    if received:
+                        pieces.append(count(decoder.finish()))
+            except HTTPException:
+                raise
+            except Exception as exc:
+                raise HTTPException(status_code=400, detail=f"Invalid {encoding} data") from exc
+            return {"type": "http.request", "body": b"".join(pieces), "more_body": more_body}
+
+        return decoding_receive
+
+
+def negotiate_content_encoding(accept_encoding: str, available: Sequence[str]) -> str | None:
+    """The encoding of *available* (most preferred first) that the client
+    ranks highest in its Accept-Encoding header, or None for identity."""
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def response_encodings() -> list[str]:
+    """Response encodings this server can produce, most preferred first."""
+    encodings = []
+    if _zstandard() is not None:
+        encodings.append("zstd")
+    if _brotli() is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def is_compressible_media_type(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type == "text/event-stream":
+        # Every event must reach the client as it is sent.
+        return False
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_MEDIA_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+def _response_compressor(encoding: str, level: int) -> tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """``(compress, finish)`` for one response body."""
+    if encoding == "zstd":
+        zstd_compressor = _zstandard().ZstdCompressor(level=level).compressobj()
+        return zstd_compressor.compress, zstd_compressor.flush
+    if encoding == "br":
+        brotli_compressor = _brotli().Compressor(quality=level)
+        return brotli_compressor.process, brotli_compressor.finish
+    gzip_compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return gzip_compressor.compress, gzip_compressor.flush
+
+
+class ResponseCompressionMiddleware:
+    """
+    Compress text-like responses (JSON, HTML, JS, CSS...) with the best of
+    zstd, br and gzip the client accepts. Responses that already carry a
+    Content-Encoding, partial content, tiny bodies and media types that are
+    compressed already (PNG, JPEG, gzipped SD images) go out untouched.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_content_encoding(Headers(scope=scope).get("accept-encoding", ""), response_encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressingResponder(self.app, encoding)(scope, receive, send)
+
+
+class _CompressingResponder:
+    def __init__(self, app: ASGIApp, encoding: str) -> None:
+        self.app = app
+        self.encoding = encoding
+        self.send: Send | None = None
+        self.start_message: Message | None = None
+        self.compressor: tuple[Callable[[bytes], bytes], Callable[[], bytes]] | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body shows whether to compress.
+            self.start_message = message
+            return
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            await self.start(start, message)
+            return
+        if self.compressor is not None and message["type"] == "http.response.body":
+            message["body"] = await self.compress(message.get("body", b""), message.get("more_body", False))
+        await self.send(message)
+
+    async def start(self, start: Message, message: Message) -> None:
+        headers = MutableHeaders(scope=start)
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if (
+            message["type"] != "http.response.body"
+            or "content-encoding" in headers
+            or "content-range" in headers
+            or not is_compressible_media_type(headers.get("content-type", ""))
+            or (not more_body and len(body) < RESPONSE_COMPRESSION_MINIMUM_SIZE)
+        ):
+            await self.send(start)
+            await self.send(message)
+            return
+
+        small, large = RESPONSE_COMPRESSION_LEVELS[self.encoding]
+        level = large if more_body or len(body) > RESPONSE_COMPRESSION_LARGE_BODY else small
+        self.compressor = _response_compressor(self.encoding, level)
+        message["body"] = await self.compress(body, more_body)
+        headers["Content-Encoding"] = self.encoding
+        if "accept-encoding" not in [value.strip().lower() for value in headers.get("vary", "").split(",")]:
+            headers.add_vary_header("Accept-Encoding")
+        # The bytes differ from the file a FileResponse describes: its strong
+        # ETag would claim byte-identity with the plain variant, and ranges
+        # would index into the uncompressed file.
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if "accept-ranges" in headers:
+            del headers["Accept-Ranges"]
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(message["body"]))
+        await self.send(start)
+        await self.send(message)
+
+    async def compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= RESPONSE_COMPRESSION_THREAD_SIZE:
+            return await asyncio.to_thread(self._compress, body, more_body)
+        return self._compress(body, more_body)
+
+    def _compress(self, body: bytes, more_body: bool) -> bytes:
+        compress, finish = self.compressor
+        if more_body:
+            return compress(body)
+        return compress(body) + finish()
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that answers with a file's ``.br`` or ``.gz`` sibling, as
+    written by the frontend build, when the client accepts that encoding:
+    the bundle is compressed once at build time at the highest level instead
+    of on every request.
+    """
+
+    def file_response(
+        self,
+        full_path: Any,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        variants: dict[str, tuple[str, os.stat_result]] = {}
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+            try:
+                variant_stat = os.stat(f"{full_path}{suffix}")
+            except OSError:
+                continue
+            # A dev build rewrites files in place; skip siblings left over
+            # from an older build.
+            if variant_stat.st_mtime >= stat_result.st_mtime:
+                variants[encoding] = (f"{full_path}{suffix}", variant_stat)
+        if not variants:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_content_encoding(request_headers.get("accept-encoding", ""), list(variants))
+        if encoding is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers.add_vary_header("Accept-Encoding")
+            return response
+
+        variant_path, variant_stat = variants[encoding]
+        response = FileResponse(
+            variant_path,
+            status_code=status_code,
+            stat_result=variant_stat,
+            media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain",
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
         return response
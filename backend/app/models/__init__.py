@@ -4,11 +4,13 @@ from .chat import *  # noqa: F403
 from .cloud import *  # noqa: F403
 from .frame import *  # noqa: F403
 from .log import *  # noqa: F403
+from .log_segment import *  # noqa: F403
 from .metrics import *  # noqa: F403
 from .organization import *  # noqa: F403
 from .repository import *  # noqa: F403
 from .settings import *  # noqa: F403
 from .scene_image import *    # noqa: F403
 from .template import *  # noqa: F403
+from .terminal_history import *  # noqa: F403
 from .user import *  # noqa: F403
 from .user_session import *  # noqa: F403
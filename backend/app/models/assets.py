@@ -7,7 +7,18 @@ from sqlalchemy.orm import Session, mapped_column
 from app.models.frame import Frame
 from app.database import Base
 from arq import ArqRedis as Redis
-from app.utils.remote_exec import _use_remote, run_command, upload_file
+from app.utils.asset_sync import (
+    AssetSyncPlan,
+    SyncFile,
+    apply_command,
+    build_sync_archive,
+    bytes_sync_file,
+    local_sync_file,
+    parse_probe_output,
+    plan_asset_sync,
+    probe_command,
+)
+from app.utils.remote_exec import print_size, run_command, upload_file
 from app.models.log import new_log as log
 
 default_assets_path = "/srv/assets"
@@ -28,15 +39,15 @@ class Assets(Base):
             'size': len(self.data) if self.data else 0,
         }
 
-async def sync_assets(db: Session, redis: Redis, frame: Frame):
+async def sync_assets(db: Session, redis: Redis, frame: Frame) -> AssetSyncPlan | None:
     assets_path = frame.assets_path or default_assets_path
     writable = await make_asset_folders(db, redis, frame, assets_path)
     if frame.upload_fonts != "none":
         if writable:
-            await upload_font_assets(db, redis, frame, assets_path)
-        else:
-            await log(db, redis, frame.id, "stderr",
-                      f"Warning: {assets_path} is not writable, skipping font sync")
+            return await upload_font_assets(db, redis, frame, assets_path)
+        await log(db, redis, frame.id, "stderr",
+                  f"Warning: {assets_path} is not writable, skipping font sync")
+    return None
 
 ASSETS_WRITABLE_MARKER = "FRAMEOS_ASSETS_WRITABLE"
 
@@ -74,66 +85,80 @@ async def make_asset_folders(db: Session, redis: Redis, frame: Frame, assets_pat
     _, stdout, _ = await run_command(db, redis, frame, cmd)
     return ASSETS_WRITABLE_MARKER in stdout
 
-async def upload_font_assets(db: Session, redis: Redis, frame: Frame, assets_path: str):
-    if await _use_remote(frame, redis):
-        from app.ws.remote_ws import assets_list_on_frame
-        assets = await assets_list_on_frame(frame.id, assets_path + "/fonts", redis=redis)
-        remote_fonts = {a["path"]: int(a.get("size", 0)) for a in assets}
-    else:
-        command = f"find {assets_path}/fonts -type f -exec stat --format='%s %Y %n' {{}} +"
-        status, stdout, _ = await run_command(db, redis, frame, command, log_output=False)
-        stdout_lines = stdout.splitlines()
-        remote_fonts = {}
-        for line in stdout_lines:
-            if not line:
+FONT_EXTENSIONS = (".ttf", ".txt", ".md")
+
+
+def _desired_font_files(db: Session, frame: Frame) -> list[SyncFile]:
+    files: dict[str, SyncFile] = {}
+    for root, _, names in os.walk(local_fonts_path):
+        for name in names:
+            if not name.endswith(FONT_EXTENSIONS):
                 continue
-            size, mtime, path = line.split(' ', 2)
-            remote_fonts[path] = int(size)
-
-    local_fonts = {}
-    for root, _, files in os.walk(local_fonts_path):
-        for file in files:
-            local_path = os.path.join(root, file)
-            local_fonts[local_path] = os.stat(local_path).st_size
-
-    fonts_to_upload: list[tuple[str, str]] = []
-    for local_path, local_size in local_fonts.items():
-        if not local_path.endswith('.ttf') and not local_path.endswith('.txt') and not local_path.endswith('.md'):
-            continue
-        remote_path = local_path.replace(local_fonts_path, assets_path + '/fonts')
-        remote_size = remote_fonts.get(remote_path)
-        if remote_size is None or remote_size != local_size:
-            fonts_to_upload.append((local_path, remote_path))
+            local_path = os.path.join(root, name)
+            relative = "fonts/" + os.path.relpath(local_path, local_fonts_path)
+            files[relative] = local_sync_file(local_path, relative)
 
     custom_fonts = db.query(Assets).filter(
         Assets.project_id == frame.project_id,
         Assets.path.like("fonts/%.ttf"),
     ).all()
-    custom_fonts_to_upload = []
     for font in custom_fonts:
-        remote_path = font.path.replace("fonts/", assets_path + '/fonts/')
-        remote_size = remote_fonts.get(remote_path)
-        if remote_size is None or remote_size != len(font.data):
-            custom_fonts_to_upload.append((font, remote_path))
+        try:
+            file = bytes_sync_file(font.path, font.data or b"")
+        except ValueError:
+            continue
+        # Custom fonts shadow bundled ones of the same name, as before.
+        files[file.path] = file
+    return list(files.values())
 
-    if not fonts_to_upload and not custom_fonts_to_upload:
-        await log(db, redis, frame.id, "stdout", "No fonts to upload")
-        return
 
-    await log(
+async def upload_font_assets(db: Session, redis: Redis, frame: Frame, assets_path: str) -> AssetSyncPlan:
+    """Bring ``{assets_path}/fonts`` in line with the bundled and custom fonts.
+
+    One probe (manifest + size listing), one tar upload, one apply command —
+    regardless of how many fonts changed. See app.utils.asset_sync.
+    """
+    _, stdout, _ = await run_command(
         db,
         redis,
-        frame.id,
-        "stdout",
-        f"Uploading {len(fonts_to_upload) + len(custom_fonts_to_upload)} fonts",
+        frame,
+        probe_command(assets_path, f"{assets_path}/fonts"),
+        log_output=False,
+        log_command=False,
     )
+    remote_manifest, remote_sizes = parse_probe_output(stdout, assets_path)
+    plan = plan_asset_sync(_desired_font_files(db, frame), remote_manifest, remote_sizes, scope="fonts/")
 
-    for local_path, remote_path in fonts_to_upload:
-        with open(local_path, "rb") as fh:
-            data = fh.read()
-        await upload_file(db, redis, frame, remote_path, data)
-    for font, remote_path in custom_fonts_to_upload:
-        await upload_file(db, redis, frame, remote_path, font.data)
+    if plan.empty:
+        await log(db, redis, frame.id, "stdout", "No fonts to upload")
+        return plan
+
+    # The archive always carries the updated manifest, so even a delete-only
+    # sync ships one small tar.
+    archive = build_sync_archive(plan.upload, plan.manifest)
+    archive_path = f"/tmp/frameos-assets-{uuid.uuid4().hex}.tar.gz"
+    if plan.upload:
+        await log(
+            db,
+            redis,
+            frame.id,
+            "stdout",
+            f"Uploading {len(plan.upload)} fonts ({print_size(len(archive))} archive)",
+        )
+    if plan.delete:
+        await log(db, redis, frame.id, "stdout", f"Removing {len(plan.delete)} stale fonts")
+    await upload_file(db, redis, frame, archive_path, archive)
+
+    status, _, stderr = await run_command(
+        db,
+        redis,
+        frame,
+        apply_command(assets_path, archive_path, plan.delete),
+        log_output=False,
+    )
+    if status != 0:
+        raise RuntimeError(f"Failed to apply asset sync in {assets_path}: {stderr.strip() or f'exit {status}'}")
+    return plan
 
 async def copy_custom_fonts_to_local_source_folder(db: Session, local_source_folder: str, project_id: int):
     custom_fonts = db.query(Assets).filter(
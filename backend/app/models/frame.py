@@ -5,9 +5,9 @@ from datetime import datetime, timezone
 from arq import ArqRedis as Redis
 from typing import Any, Optional
 from sqlalchemy.dialects.sqlite import JSON
-from sqlalchemy import ForeignKey, Integer, String, Double, DateTime, Boolean
-from sqlalchemy.orm import Session, mapped_column
-from app.database import Base
+from sqlalchemy import ForeignKey, Integer, String, Double, DateTime, Boolean, event, inspect
+from sqlalchemy.orm import Session, defer, mapped_column
+from app.database import Base, run_and_commit, run_db
 
 from app.drivers.devices import (
     apply_device_config_defaults,
@@ -18,6 +18,7 @@ from app.drivers.devices import (
 )
 from app.models.apps import get_app_configs
 from app.models.settings import get_settings_dict
+from app.utils.principal_cache import invalidate_principals
 from app.utils.timezone import frame_timezone, stored_timezone
 from app.utils.token import secure_token
 from app.utils.tls import generate_frame_tls_material, parse_certificate_not_valid_after
@@ -352,7 +353,6 @@ class Frame(Base):
     buildroot = mapped_column(JSON, nullable=True)
     embedded = mapped_column(JSON, nullable=True)
     rpios = mapped_column(JSON, nullable=True)
-    terminal_history = mapped_column(JSON, nullable=True, default=list)
 
     # not used
     apps = mapped_column(JSON, nullable=True)
@@ -360,6 +360,14 @@ class Frame(Base):
     background_color = mapped_column(String(64), nullable=True) # still used as fallback in frontend
 
     def to_dict(self):
+        return {
+            **self.to_summary_dict(),
+            'scenes': self.scenes,
+            'last_successful_deploy': self.last_successful_deploy,
+        }
+
+    def to_summary_dict(self):
+        """``to_dict`` without the heavy columns (``FRAME_HEAVY_COLUMNS``)."""
         return {
             'id': self.id,
             'project_id': self.project_id,
@@ -398,7 +406,6 @@ class Frame(Base):
             'flip': self.flip,
             'background_color': self.background_color,
             'debug': self.debug,
-            'scenes': self.scenes,
             'last_log_at': self.last_log_at.replace(tzinfo=timezone.utc).isoformat() if self.last_log_at else None,
             'log_to_file': self.log_to_file,
             'assets_path': self.assets_path,
@@ -416,11 +423,29 @@ class Frame(Base):
             'buildroot': self.buildroot,
             'embedded': self.embedded,
             'rpios': self.rpios,
-            'terminal_history': self.terminal_history,
-            'last_successful_deploy': self.last_successful_deploy,
             'last_successful_deploy_at': self.last_successful_deploy_at.replace(tzinfo=timezone.utc).isoformat() if self.last_successful_deploy_at else None,
         }
 
+
+# Columns that dominate a frame row: the scene graphs, a full snapshot of
+# the frame (scenes included) as last deployed, and the unused legacy apps
+# blob. Lists, summaries and auth checks skip them.
+FRAME_HEAVY_COLUMNS = ("scenes", "last_successful_deploy", "apps")
+
+
+def frame_summary_options(*keep: str):
+    """Loader options deferring ``FRAME_HEAVY_COLUMNS`` except *keep*.
+
+    Accessing a deferred column raises instead of lazy-loading it, so a
+    summary query never turns into one extra query per frame.
+    """
+    return [
+        defer(getattr(Frame, column), raiseload=True)
+        for column in FRAME_HEAVY_COLUMNS
+        if column not in keep
+    ]
+
+
 async def new_frame(
     db: Session,
     redis: Redis,
@@ -546,10 +571,25 @@ def refresh_tls_certificate_validity_dates(frame: Frame):
     frame.https_proxy = https_proxy
 
 
+# What device auth caches about a frame (app.utils.principal_cache).
+_PRINCIPAL_ATTRIBUTES = ("server_api_key", "mode", "project_id")
+
+
+@event.listens_for(Frame, "after_update")
+def _invalidate_frame_principal(_mapper, _connection, target: Frame):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _PRINCIPAL_ATTRIBUTES):
+        invalidate_principals(frame_id=target.id)
+
+
+@event.listens_for(Frame, "after_delete")
+def _invalidate_deleted_frame_principal(_mapper, _connection, target: Frame):
+    invalidate_principals(frame_id=target.id)
+
+
 async def update_frame(db: Session, redis: Redis, frame: Frame):
-    db.add(frame)
-    db.commit()
-    db.refresh(frame)
+    await run_and_commit(db, Session.add, frame)
+    await run_db(db.refresh, frame)
     await publish_message(redis, "update_frame", frame.to_dict())
 
 
@@ -558,10 +598,14 @@ async def delete_frame(db: Session, redis: Redis, frame_id: int, project_id: int
         # delete corresonding log and metric entries first
         from .log import Log
         db.query(Log).filter_by(project_id=project_id, frame_id=frame_id).delete()
+        from .log_segment import LogSegment
+        db.query(LogSegment).filter_by(project_id=project_id, frame_id=frame_id).delete()
         from .metrics import Metrics
         db.query(Metrics).filter_by(project_id=project_id, frame_id=frame_id).delete()
         from .scene_image import SceneImage
         db.query(SceneImage).filter_by(project_id=project_id, frame_id=frame_id).delete()
+        from .terminal_history import TerminalCommand
+        db.query(TerminalCommand).filter_by(project_id=project_id, frame_id=frame_id).delete()
 
         cache_key = f'frame:{frame_id}:image'
         await redis.delete(cache_key)
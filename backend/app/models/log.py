@@ -3,23 +3,42 @@ import re
 from datetime import timezone, datetime
 from copy import deepcopy
 from ipaddress import ip_address
-from typing import Any, Optional
+from typing import Any, Optional, Sequence
 from arq import ArqRedis as Redis
 
 from .frame import Frame, update_frame
+from .log_segment import LogSegment, archive_log_rows, enforce_log_archive_budget, read_log_segment
 from .metrics import new_metrics
-from app.database import Base
+from app.database import Base, is_sqlite, run_and_commit, run_db
+from app.utils.env import get_env_int
 from app.utils.timezone import stored_timezone
-from sqlalchemy import Index, Integer, String, DateTime, ForeignKey, Text, delete, event, func, select
+from sqlalchemy import (
+    DDL, Index, Integer, String, DateTime, ForeignKey, Text, column, delete, event, func, literal_column, select, table,
+)
 from sqlalchemy.orm import relationship, backref, Session, mapped_column
 from app.websockets import publish_message
 
 LOG_LIMIT_PER_FRAME = 10000
+# ... and at most this much line text: a frame logging whole JSON payloads
+# would otherwise keep hundreds of MB hot.
+LOG_BYTES_PER_FRAME = get_env_int("FRAMEOS_LOG_BYTES_PER_FRAME", 4 * 1024 * 1024)
 # Run the count+prune query only every N inserts per frame (per process).
 # Frames stream logs continuously; counting on every insert dominated
 # ingestion cost before the (frame_id, timestamp) index existed.
 PRUNE_CHECK_EVERY = 100
 FRAME_ACTIVITY_LOG_TYPES = ("webhook",)
+LOG_EVENT_MAX_LENGTH = 64
+LOG_PAGE_LIMIT = 1000
+LOG_PAGE_MAX_LIMIT = 5000
+LOG_SEARCH_LIMIT = 100
+LOG_SEARCH_MAX_LIMIT = 1000
+# Archived segments a search opens at most, newest first.
+LOG_SEARCH_MAX_SEGMENTS = 32
+LOG_FTS_TABLE = "log_fts"
+# Wrapped around matched terms by FTS5's highlight(); control characters
+# never appear in the JSON or text lines devices send.
+_MATCH_START = "\x02"
+_MATCH_END = "\x03"
 
 _inserts_since_prune_check: dict[int, int] = {}
 
@@ -103,7 +122,7 @@ def _embedded_boot_metadata(log: dict, boot_timestamp: datetime, ip: str | None
         metadata["frameosVersion"] = frameos_version
     if boot_ip:
         metadata["ip"] = boot_ip
-    for key in ("width", "height", "pixelFormat", "mode", "renderMode", "panel", "wifi"):
+    for key in ("width", "height", "pixelFormat", "mode", "renderMode", "panel", "wifi", "elfSha256"):
         value = log.get(key)
         if value is not None:
             metadata[key] = value
@@ -127,6 +146,10 @@ class Log(Base):
     __tablename__ = 'log'
     __table_args__ = (
         Index('ix_log_frame_id_timestamp', 'frame_id', 'timestamp'),
+        # Keyset pages walk a frame's rows by id, optionally of one type or event.
+        Index('ix_log_frame_id_id', 'frame_id', 'id'),
+        Index('ix_log_frame_id_type_id', 'frame_id', 'type', 'id'),
+        Index('ix_log_frame_id_event_id', 'frame_id', 'event', 'id'),
     )
     id = mapped_column(Integer, primary_key=True)
     project_id = mapped_column(Integer, ForeignKey("project.id"), nullable=False, index=True)
@@ -135,6 +158,8 @@ class Log(Base):
     line = mapped_column(Text, nullable=False)
     ip = mapped_column(String(64), nullable=True)
     frame_id = mapped_column(Integer, ForeignKey('frame.id'), nullable=False)
+    # The "event" of a webhook line, copied out of its JSON for filtering.
+    event = mapped_column(String(LOG_EVENT_MAX_LENGTH), nullable=True)
 
     frame = relationship('Frame', backref=backref('logs', lazy=True))
 
@@ -150,6 +175,31 @@ class Log(Base):
         }
 
 
+# SQLite: an FTS5 index over log lines, kept in step with the table by
+# triggers. Every insert path (device posts, the websocket stream, raw SQL) and every
+# delete (maybe_prune_logs, frame deletion) updates it in the same
+# transaction. External content: the index stores no second copy of the text.
+_LOG_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {LOG_FTS_TABLE} USING fts5(line, content='log', content_rowid='id')",
+    f"""CREATE TRIGGER IF NOT EXISTS log_fts_insert AFTER INSERT ON log BEGIN
+        INSERT INTO {LOG_FTS_TABLE}(rowid, line) VALUES (new.id, new.line);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS log_fts_delete AFTER DELETE ON log BEGIN
+        INSERT INTO {LOG_FTS_TABLE}({LOG_FTS_TABLE}, rowid, line) VALUES ('delete', old.id, old.line);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS log_fts_update AFTER UPDATE OF line ON log BEGIN
+        INSERT INTO {LOG_FTS_TABLE}({LOG_FTS_TABLE}, rowid, line) VALUES ('delete', old.id, old.line);
+        INSERT INTO {LOG_FTS_TABLE}(rowid, line) VALUES (new.id, new.line);
+    END""",
+)
+for _statement in _LOG_FTS_DDL:
+    event.listen(Log.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+# The triggers go with the table.
+event.listen(
+    Log.__table__, "after_drop", DDL(f"DROP TABLE IF EXISTS {LOG_FTS_TABLE}").execute_if(dialect="sqlite")
+)
+
+
 @event.listens_for(Log, "before_insert")
 def _set_log_project_id(_mapper, connection, target: Log):
     if target.project_id is not None or target.frame_id is None:
@@ -160,43 +210,234 @@ def _set_log_project_id(_mapper, connection, target: Log):
     target.project_id = project_id
 
 
-def maybe_prune_logs(db: Session, project_id: int, frame_id: int, inserts: int = 1) -> None:
-    """Trim a frame's logs back to LOG_LIMIT_PER_FRAME, checking the count only
-    every PRUNE_CHECK_EVERY inserts (and on the first insert this process sees
-    for the frame). Leaves the deletes pending; the caller commits."""
+def hot_log_totals(db: Session, project_id: int, frame_id: int, inserts: int = 1) -> Optional[tuple[int, int]]:
+    """The frame's (rows, characters of line text) in ``log`` when a prune
+    check is due: every PRUNE_CHECK_EVERY inserts, and on the first insert
+    this process sees for the frame. Otherwise None.
+
+    Call it before the insert's first write: pysqlite opens the write
+    transaction at the first INSERT, so summing up to LOG_BYTES_PER_FRAME
+    of lines here doesn't hold the SQLite write lock."""
     since_check = _inserts_since_prune_check.get(frame_id)
     if since_check is not None and since_check + inserts < PRUNE_CHECK_EVERY:
         _inserts_since_prune_check[frame_id] = since_check + inserts
-        return
+        return None
     _inserts_since_prune_check[frame_id] = 0
+    count, text_bytes = (
+        db.query(func.count(Log.id), func.coalesce(func.sum(func.length(Log.line)), 0))
+        .filter(Log.project_id == project_id, Log.frame_id == frame_id)
+        .one()
+    )
+    return count, text_bytes
 
-    frame_logs_count = db.query(Log).filter_by(project_id=project_id, frame_id=frame_id).count()
-    if frame_logs_count > LOG_LIMIT_PER_FRAME + 100:
-        # One bulk DELETE: loading the excess rows as ORM objects and deleting
-        # them one by one held the write transaction open for the whole sweep,
-        # locking out every other writer.
-        oldest_ids = (
-            select(Log.id)
-            .where(Log.project_id == project_id, Log.frame_id == frame_id)
-            .order_by(Log.timestamp)
-            .limit(frame_logs_count - LOG_LIMIT_PER_FRAME)
-        )
-        db.execute(delete(Log).where(Log.id.in_(oldest_ids)))
 
+def maybe_prune_logs(db: Session, project_id: int, frame_id: int, totals: Optional[tuple[int, int]]) -> None:
+    """Roll a frame's oldest logs into its compressed segments, keeping at
+    most LOG_LIMIT_PER_FRAME rows and LOG_BYTES_PER_FRAME of text in ``log``,
+    and trim its segments to their byte budget. *totals* is what
+    hot_log_totals returned plus the rows just inserted; None skips the
+    check. Leaves the writes pending; the caller commits."""
+    if totals is None:
+        return
+    count, text_bytes = totals
+    rows_over = count - LOG_LIMIT_PER_FRAME if count > LOG_LIMIT_PER_FRAME + 100 else 0
+    bytes_over = text_bytes - LOG_BYTES_PER_FRAME
+    if rows_over <= 0 and bytes_over <= 0:
+        return
+    # Plain rows, one segment write and one bulk DELETE: loading the excess
+    # rows as ORM objects and deleting them one by one held the write
+    # transaction open for the whole sweep, locking out every other writer.
+    # Only the rows that go are read, oldest first, until both budgets hold.
+    oldest = (
+        select(Log.id, Log.timestamp, Log.type, Log.line, Log.ip, Log.event)
+        .where(Log.project_id == project_id, Log.frame_id == frame_id)
+        .order_by(Log.timestamp, Log.id)
+    )
+    rows = []
+    freed = 0
+    result = db.execute(oldest)
+    for row in result:
+        if len(rows) >= rows_over and freed >= bytes_over:
+            break
+        rows.append(row)
+        freed += len(row.line or "")
+    result.close()
+    if not rows:
+        return
+    archive_log_rows(db, project_id, frame_id, rows)
+    db.execute(delete(Log).where(Log.id.in_(oldest.limit(len(rows)).with_only_columns(Log.id))))
+    db.flush()
+    enforce_log_archive_budget(db, project_id, frame_id)
 
-async def new_log(
+
+def query_logs(
+    db: Session,
+    project_id: int,
+    frame_id: int,
+    *,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    types: Sequence[str] = (),
+    events: Sequence[str] = (),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = LOG_PAGE_LIMIT,
+) -> tuple[list[Log], bool]:
+    """One page of a frame's logs in ascending id order, and whether more
+    rows lie beyond it.
+
+    Keyset paging by id: with *after_id* the page is the oldest matching rows
+    newer than it (and "more" means newer ones); otherwise the newest rows,
+    older than *before_id* if given (and "more" means older ones). *since*
+    and *until* bound ``timestamp`` (inclusive, exclusive)."""
+    query = db.query(Log).filter(Log.project_id == project_id, Log.frame_id == frame_id)
+    if types:
+        query = query.filter(Log.type.in_(types))
+    if events:
+        query = query.filter(Log.event.in_(events))
+    # Stored timestamps are naive UTC.
+    if since is not None:
+        query = query.filter(Log.timestamp >= _aware_utc(since).replace(tzinfo=None))
+    if until is not None:
+        query = query.filter(Log.timestamp < _aware_utc(until).replace(tzinfo=None))
+    if after_id is not None:
+        rows = query.filter(Log.id > after_id).order_by(Log.id.asc()).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+    if before_id is not None:
+        query = query.filter(Log.id < before_id)
+    rows = query.order_by(Log.id.desc()).limit(limit + 1).all()
+    return list(reversed(rows[:limit])), len(rows) > limit
+
+
+def _log_search_terms(query: str) -> list[str]:
+    return [term for term in query.split() if term.strip('"*')]
+
+
+def _fts_match_expression(terms: Sequence[str]) -> str:
+    # Every term quoted, so user input can't form FTS5 syntax (NEAR, column
+    # filters, a stray quote); a trailing * still asks for a prefix match.
+    parts = []
+    for term in terms:
+        phrase = term.rstrip("*").replace('"', '""')
+        parts.append(f'"{phrase}"*' if term.endswith("*") else f'"{phrase}"')
+    return " ".join(parts)
+
+
+def _marked_segments(marked: str) -> list[dict[str, Any]]:
+    segments: list[dict[str, Any]] = []
+    head, *matches = marked.split(_MATCH_START)
+    if head:
+        segments.append({"text": head, "match": False})
+    for chunk in matches:
+        match, _, rest = chunk.partition(_MATCH_END)
+        if match:
+            segments.append({"text": match, "match": True})
+        if rest:
+            segments.append({"text": rest, "match": False})
+    return segments
+
+
+def _term_segments(line: str, terms: Sequence[str]) -> list[dict[str, Any]]:
+    pattern = re.compile("|".join(re.escape(term.strip('"*')) for term in terms), re.IGNORECASE)
+    return _marked_segments(pattern.sub(lambda m: f"{_MATCH_START}{m.group(0)}{_MATCH_END}", line))
+
+
+def archived_log(segment: Any, row: dict[str, Any]) -> Log:
+    """A transient Log for *row* of *segment* (see ``read_log_segment``)."""
+    return Log(project_id=segment.project_id, frame_id=segment.frame_id, **row)
+
+
+def _search_archived_logs(
+    db: Session,
+    project_id: int,
+    terms: Sequence[str],
+    *,
+    frame_id: Optional[int],
+    limit: int,
+) -> list[tuple[Log, list[dict[str, Any]]]]:
+    # Segments aren't indexed: open them newest first and scan until the
+    # page is full or LOG_SEARCH_MAX_SEGMENTS were read. One blob in memory
+    # at a time, none kept in the session.
+    needles = [term.strip('"*').lower() for term in terms]
+    segment_ids = select(LogSegment.id).where(LogSegment.project_id == project_id)
+    if frame_id is not None:
+        segment_ids = segment_ids.where(LogSegment.frame_id == frame_id)
+    segment_ids = segment_ids.order_by(LogSegment.last_log_id.desc()).limit(LOG_SEARCH_MAX_SEGMENTS)
+    matches: list[tuple[Log, list[dict[str, Any]]]] = []
+    for segment_id in db.execute(segment_ids).scalars().all():
+        segment = db.execute(
+            select(LogSegment.project_id, LogSegment.frame_id, LogSegment.codec, LogSegment.data)
+            .where(LogSegment.id == segment_id)
+        ).first()
+        if segment is None:
+            continue
+        for row in reversed(list(read_log_segment(segment))):
+            line = row["line"].lower()
+            if all(needle in line for needle in needles):
+                matches.append((archived_log(segment, row), _term_segments(row["line"], terms)))
+                if len(matches) >= limit:
+                    return matches
+    return matches
+
+
+def search_logs(
+    db: Session,
+    project_id: int,
+    query: str,
+    *,
+    frame_id: Optional[int] = None,
+    limit: int = LOG_SEARCH_LIMIT,
+    archived: bool = False,
+) -> list[tuple[Log, list[dict[str, Any]]]]:
+    """Log lines matching every term of *query*, best first, each with its
+    line split into ``{"text", "match"}`` segments.
+
+    Searches one frame or, without *frame_id*, the whole project. On SQLite
+    the recent rows are an FTS5 query ranked by bm25 (a term ending in ``*``
+    matches as a prefix); elsewhere a substring scan, newest first. With
+    *archived*, the newest LOG_SEARCH_MAX_SEGMENTS archived segments fill up
+    what's left of the page, newest first, by substring. Blocking: call it
+    through ``run_db`` from async code."""
+    terms = _log_search_terms(query)
+    if not terms:
+        return []
+    if is_sqlite:
+        fts = table(LOG_FTS_TABLE, column("rowid", Integer))
+        fts_table = literal_column(LOG_FTS_TABLE)
+        search = (
+            db.query(Log, func.highlight(fts_table, 0, _MATCH_START, _MATCH_END))
+            .join(fts, fts.c.rowid == Log.id)
+            .filter(fts_table.op("MATCH")(_fts_match_expression(terms)), Log.project_id == project_id)
+        )
+        if frame_id is not None:
+            search = search.filter(Log.frame_id == frame_id)
+        rows = search.order_by(literal_column(f"{LOG_FTS_TABLE}.rank"), Log.id.desc()).limit(limit).all()
+        matches = [(log, _marked_segments(marked or "")) for log, marked in rows]
+    else:
+        search = db.query(Log).filter(Log.project_id == project_id)
+        if frame_id is not None:
+            search = search.filter(Log.frame_id == frame_id)
+        for term in terms:
+            search = search.filter(Log.line.icontains(term.strip('"*'), autoescape=True))
+        matches = [(log, _term_segments(log.line, terms)) for log in search.order_by(Log.id.desc()).limit(limit).all()]
+    if archived and len(matches) < limit:
+        matches += _search_archived_logs(db, project_id, terms, frame_id=frame_id, limit=limit - len(matches))
+    return matches
+
+
+def _insert_log(
     db: Session,
-    redis: Redis,
     frame_id: int,
     type: str,
     line: str,
-    timestamp: Optional[datetime] = None,
-    ip: Optional[str] = None,
+    timestamp: datetime,
+    ip: Optional[str],
+    event: Optional[str] = None,
 ) -> Log:
-    timestamp = timestamp or datetime.utcnow()
     frame = db.get(Frame, frame_id)
     if frame is None:
         raise ValueError(f"Frame {frame_id} not found")
+    totals = hot_log_totals(db, frame.project_id, frame_id)
 
     log = Log(
         project_id=frame.project_id,
@@ -205,39 +446,129 @@ async def new_log(
         line=line,
         timestamp=timestamp,
         ip=ip,
+        event=event[:LOG_EVENT_MAX_LENGTH] if event else None,
     )
     db.add(log)
     if is_frame_activity_log(type, line) and (frame.last_log_at is None or timestamp > frame.last_log_at):
         frame.last_log_at = timestamp
-    # Make the pending row visible to the prune count and assign its id.
+    # Assign the id; the prune below deletes by id.
     db.flush()
-    payload = {**log.to_dict(), "timestamp": log.timestamp.replace(tzinfo=timezone.utc).isoformat()}
-    maybe_prune_logs(db, frame.project_id, frame_id)
-    # Commit before any await. Sessions here run sync SQLAlchemy on the event
-    # loop: awaiting while the flush's write transaction is open suspends this
-    # task with the SQLite write lock held, and any other request that then
-    # blocks on that lock freezes the loop, so the holder never resumes to
-    # commit ("database is locked" storms).
-    db.commit()
+    if totals is not None:
+        totals = (totals[0] + 1, totals[1] + len(line))
+    maybe_prune_logs(db, frame.project_id, frame_id, totals)
+    return log
+
 
+async def new_log(
+    db: Session,
+    redis: Redis,
+    frame_id: int,
+    type: str,
+    line: str,
+    timestamp: Optional[datetime] = None,
+    ip: Optional[str] = None,
+    event: Optional[str] = None,
+) -> Log:
+    timestamp = timestamp or datetime.utcnow()
+    # Off the loop and committed before the publish: a write that waits on
+    # the SQLite lock, or a transaction held open across an await, used to
+    # freeze every other request ("database is locked" storms).
+    log = await run_and_commit(db, _insert_log, frame_id, type, line, timestamp, ip, event)
+    payload = {**log.to_dict(), "timestamp": log.timestamp.replace(tzinfo=timezone.utc).isoformat()}
     await publish_message(redis, "new_log", payload)
     return log
 
 
+def _insert_logs(
+    db: Session,
+    frame_id: int,
+    entries: Sequence[tuple[datetime, str, str]],
+    ip: Optional[str],
+) -> list[Log]:
+    frame = db.get(Frame, frame_id)
+    if frame is None:
+        raise ValueError(f"Frame {frame_id} not found")
+    totals = hot_log_totals(db, frame.project_id, frame_id, inserts=len(entries))
+
+    logs = [
+        Log(project_id=frame.project_id, frame_id=frame_id, type=type, line=line, timestamp=timestamp, ip=ip)
+        for timestamp, type, line in entries
+    ]
+    db.add_all(logs)
+    last_activity = max(
+        (timestamp for timestamp, type, line in entries if is_frame_activity_log(type, line)), default=None
+    )
+    if last_activity is not None and (frame.last_log_at is None or last_activity > frame.last_log_at):
+        frame.last_log_at = last_activity
+    # One multi-row INSERT for the whole batch.
+    db.flush()
+    if totals is not None:
+        totals = (totals[0] + len(logs), totals[1] + sum(len(log.line) for log in logs))
+    maybe_prune_logs(db, frame.project_id, frame_id, totals)
+    return logs
+
+
+async def new_logs(
+    db: Session,
+    redis: Redis,
+    frame_id: int,
+    entries: Sequence[tuple[datetime, str, str]],
+    ip: Optional[str] = None,
+) -> list[Log]:
+    """Store ``(timestamp, type, line)`` entries of one frame in a single
+    commit and announce them with a single ``new_logs`` message."""
+    if not entries:
+        return []
+    logs = await run_and_commit(db, _insert_logs, frame_id, entries, ip)
+    await publish_message(
+        redis,
+        "new_logs",
+        {"project_id": logs[0].project_id, "frame_id": frame_id, "logs": [log.to_dict() for log in logs]},
+    )
+    return logs
+
+
+# Log events that update the frame row; the rest only need its id.
+FRAME_UPDATING_LOG_EVENTS = ("render", "render:device", "render:done", "bootup")
+
+
 async def process_log(
     db: Session,
     redis: Redis,
-    frame: Frame,
+    frame: Frame | int,
     log: dict | list,
     ip: Optional[str] = None,
 ):
+    """Store one device log line and apply what it says about the frame.
+
+    *frame* may be just the frame id (device auth resolves a cached id): the
+    row is then loaded only for the events that update it.
+    """
+    frame_id = frame if isinstance(frame, int) else int(frame.id)
     if isinstance(log, list):
         timestamp = datetime.utcfromtimestamp(log[0])
         log = log[1]
     else:
         timestamp = datetime.utcnow()
 
-    await new_log(db, redis, int(frame.id), "webhook", json.dumps(log), timestamp, ip=ip)
+    if isinstance(log, dict) and log.get("event") == "render:done":
+        # Dashboards refetch the image as soon as this line reaches them, so
+        # start pulling it from the device before publishing the log.
+        from app.api.frame_image_prefetch import maybe_prefetch_frame_image
+
+        await maybe_prefetch_frame_image(redis, frame_id)
+
+    event_name = log.get("event") if isinstance(log, dict) else None
+    await new_log(
+        db,
+        redis,
+        frame_id,
+        "webhook",
+        json.dumps(log),
+        timestamp,
+        ip=ip,
+        event=event_name if isinstance(event_name, str) else None,
+    )
 
     assert isinstance(log, dict), f"Log must be a dict, got {type(log)}"
 
@@ -246,7 +577,12 @@ async def process_log(
     if event in ("render:scene", "render:sceneChange", "event:setCurrentScene"):
         scene_id = log.get("sceneId") or log.get("scene") or log.get("id")
         if scene_id:
-            await redis.set(f"frame:{frame.id}:active_scene", scene_id, ex=300)
+            await redis.set(f"frame:{frame_id}:active_scene", scene_id, ex=300)
+
+    if isinstance(frame, int) and event in FRAME_UPDATING_LOG_EVENTS:
+        frame = await run_db(db.get, Frame, frame_id)
+        if frame is None:
+            return
 
     changes: dict[str, Any] = {}
     if event == 'render':
@@ -313,4 +649,4 @@ async def process_log(
             del metrics_dict['event']
         if 'timestamp' in metrics_dict:
             del metrics_dict['timestamp']
-        await new_metrics(db, redis, int(frame.id), metrics_dict)
+        await new_metrics(db, redis, frame_id, metrics_dict)
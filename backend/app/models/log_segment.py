@@ -0,0 +1,138 @@
+import json
+from datetime import datetime
+from typing import Any, Iterator, Sequence
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, LargeBinary, String, delete
+from sqlalchemy.orm import Session, defer, mapped_column
+from app.database import Base
+from app.utils.compression import available_compression_formats, block_compressor, decompress_block
+from app.utils.env import get_env_int
+
+# Compressed bytes of archived logs kept per frame; the oldest segments go
+# first. Device JSON lines compress about 5:1, so this holds ~80 MB of rows.
+LOG_ARCHIVE_BYTES_PER_FRAME = get_env_int("FRAMEOS_LOG_ARCHIVE_BYTES_PER_FRAME", 16 * 1024 * 1024)
+# A trim moves only ~100 rows, too few to compress well: each is appended to
+# the frame's newest segment until that one holds this many compressed bytes.
+LOG_SEGMENT_BYTES = get_env_int("FRAMEOS_LOG_SEGMENT_BYTES", 256 * 1024)
+LOG_SEGMENT_FIELDS = ("id", "timestamp", "type", "line", "ip", "event")
+
+
+class LogSegment(Base):
+    """A block of a frame's oldest log rows, rolled out of ``log`` and
+    compressed: one JSON object per row and line, oldest first.
+
+    ``log`` keeps the recent rows (at most LOG_LIMIT_PER_FRAME of them and
+    LOG_BYTES_PER_FRAME of text, indexed and searchable); segments hold the
+    rest under a byte budget per frame. The id and time bounds let readers
+    pick segments without opening them.
+    """
+    __tablename__ = 'log_segment'
+    __table_args__ = (
+        Index('ix_log_segment_frame_id_first_log_id', 'frame_id', 'first_log_id'),
+    )
+    id = mapped_column(Integer, primary_key=True)
+    project_id = mapped_column(Integer, ForeignKey("project.id"), nullable=False, index=True)
+    frame_id = mapped_column(Integer, ForeignKey('frame.id'), nullable=False)
+    first_log_id = mapped_column(Integer, nullable=False)
+    last_log_id = mapped_column(Integer, nullable=False)
+    started_at = mapped_column(DateTime, nullable=False)
+    ended_at = mapped_column(DateTime, nullable=False)
+    line_count = mapped_column(Integer, nullable=False)
+    # Compressed size, what the budget counts.
+    size = mapped_column(Integer, nullable=False)
+    codec = mapped_column(String(8), nullable=False)
+    data = mapped_column(LargeBinary, nullable=False)
+
+
+def _segment_codec() -> str:
+    return "zstd" if "zstd" in available_compression_formats() else "gzip"
+
+
+def _encode_rows(rows: Sequence[Any]) -> bytes:
+    return "".join(
+        json.dumps(
+            {
+                field: value.isoformat() if isinstance(value, datetime) else value
+                for field in LOG_SEGMENT_FIELDS
+                if (value := getattr(row, field)) is not None
+            },
+            separators=(",", ":"),
+        ) + "\n"
+        for row in rows
+    ).encode("utf-8")
+
+
+def archive_log_rows(db: Session, project_id: int, frame_id: int, rows: Sequence[Any]) -> LogSegment:
+    """Archive *rows* (anything with LOG_SEGMENT_FIELDS as attributes, oldest
+    first): appended to the frame's newest segment while that is under
+    LOG_SEGMENT_BYTES, else in a new one. The caller deletes the rows and
+    commits."""
+    codec = _segment_codec()
+    payload = _encode_rows(rows)
+    first_log_id = min(row.id for row in rows)
+    segment = (
+        # The blob is only loaded if the rows are appended to it.
+        db.query(LogSegment)
+        .options(defer(LogSegment.data))
+        .filter(LogSegment.project_id == project_id, LogSegment.frame_id == frame_id)
+        .order_by(LogSegment.first_log_id.desc())
+        .first()
+    )
+    if (
+        segment is not None
+        and segment.size < LOG_SEGMENT_BYTES
+        and segment.last_log_id < first_log_id
+        and segment.codec in available_compression_formats()
+    ):
+        # Recompressed as one block: appending a second compressed member
+        # would keep the poor ratio of small blocks.
+        data = block_compressor(codec)(decompress_block(segment.data, segment.codec) + payload)
+        segment.last_log_id = max(row.id for row in rows)
+        segment.ended_at = max(segment.ended_at, *(row.timestamp for row in rows))
+        segment.line_count += len(rows)
+    else:
+        data = block_compressor(codec)(payload)
+        segment = LogSegment(
+            project_id=project_id,
+            frame_id=frame_id,
+            first_log_id=first_log_id,
+            last_log_id=max(row.id for row in rows),
+            started_at=min(row.timestamp for row in rows),
+            ended_at=max(row.timestamp for row in rows),
+            line_count=len(rows),
+        )
+        db.add(segment)
+    segment.size = len(data)
+    segment.codec = codec
+    segment.data = data
+    return segment
+
+
+def enforce_log_archive_budget(db: Session, project_id: int, frame_id: int) -> None:
+    """Drop a frame's oldest segments beyond LOG_ARCHIVE_BYTES_PER_FRAME.
+    Leaves the deletes pending; the caller commits."""
+    # Sizes only: never load the blobs to count them.
+    sizes = (
+        db.query(LogSegment.id, LogSegment.size)
+        .filter(LogSegment.project_id == project_id, LogSegment.frame_id == frame_id)
+        .order_by(LogSegment.first_log_id.desc())
+        .all()
+    )
+    total = 0
+    expired = []
+    for segment_id, size in sizes:
+        total += size
+        if total > LOG_ARCHIVE_BYTES_PER_FRAME:
+            expired.append(segment_id)
+    if expired:
+        db.execute(delete(LogSegment).where(LogSegment.id.in_(expired)))
+
+
+def read_log_segment(segment: Any) -> Iterator[dict[str, Any]]:
+    """The rows of *segment* (a LogSegment, or a row with its codec and
+    data), oldest first, as dicts of LOG_SEGMENT_FIELDS."""
+    for line in decompress_block(segment.data, segment.codec).decode("utf-8").split("\n"):
+        if not line:
+            continue
+        row = json.loads(line)
+        row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+        yield row
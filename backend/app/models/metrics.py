@@ -3,7 +3,7 @@ from datetime import timezone
 from sqlalchemy.dialects.sqlite import JSON
 from sqlalchemy import Index, Integer, String, ForeignKey, DateTime, delete, event, func, select
 from arq import ArqRedis as Redis
-from app.database import Base
+from app.database import Base, run_and_commit
 from app.models.frame import Frame
 from sqlalchemy.orm import relationship, backref, Session, mapped_column
 from app.websockets import publish_message
@@ -48,18 +48,17 @@ def _set_metrics_project_id(_mapper, connection, target: Metrics):
     target.project_id = project_id
 
 
-async def new_metrics(db: Session, redis: Redis, frame_id: int, metrics: dict) -> Metrics:
+def _insert_metrics(db: Session, frame_id: int, metrics: dict) -> Metrics:
     frame = db.get(Frame, frame_id)
     if frame is None:
         raise ValueError(f"Frame {frame_id} not found")
 
     metric = Metrics(project_id=frame.project_id, frame_id=frame_id, metrics=metrics)
     db.add(metric)
-    # Flush so the count below sees the pending row; commit once at the end
-    # instead of once before and once after the prune.
+    # Flush so the count below sees the pending row; the caller commits once
+    # at the end instead of once before and once after the prune.
     db.flush()
     metrics_count = db.query(Metrics).filter_by(project_id=frame.project_id, frame_id=frame_id).count()
-    payload = metric.to_dict()
     if metrics_count > METRICS_RETAINED_PER_FRAME:
         trim_count = metrics_count - METRICS_RETAINED_PER_FRAME
         # One bulk DELETE instead of loading the excess rows as ORM objects;
@@ -71,7 +70,10 @@ async def new_metrics(db: Session, redis: Redis, frame_id: int, metrics: dict) -
             .limit(trim_count)
         )
         db.execute(delete(Metrics).where(Metrics.id.in_(oldest_ids)))
-    db.commit()
+    return metric
 
-    await publish_message(redis, "new_metrics", payload)
+
+async def new_metrics(db: Session, redis: Redis, frame_id: int, metrics: dict) -> Metrics:
+    metric = await run_and_commit(db, _insert_metrics, frame_id, metrics)
+    await publish_message(redis, "new_metrics", metric.to_dict())
     return metric
@@ -1,9 +1,10 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, UniqueConstraint, func
+from sqlalchemy import DateTime, ForeignKey, Integer, String, UniqueConstraint, event, func
 from sqlalchemy.orm import mapped_column, relationship
 
 from app.database import Base
+from app.utils.principal_cache import invalidate_principals
 
 
 class Organization(Base):
@@ -55,3 +56,18 @@ class Project(Base):
             "name": self.name,
             "created_at": self.created_at.isoformat() if isinstance(self.created_at, datetime) else None,
         }
+
+
+# Websocket scoping caches each user's project ids (app.utils.principal_cache).
+@event.listens_for(OrganizationMember, "after_insert")
+@event.listens_for(OrganizationMember, "after_update")
+@event.listens_for(OrganizationMember, "after_delete")
+def _invalidate_member_projects(_mapper, _connection, target: OrganizationMember):
+    invalidate_principals(user_id=target.user_id)
+
+
+@event.listens_for(Project, "after_insert")
+@event.listens_for(Project, "after_update")
+@event.listens_for(Project, "after_delete")
+def _invalidate_project_members(_mapper, _connection, target: Project):
+    invalidate_principals(all_projects=True)
@@ -0,0 +1,110 @@
+from datetime import timezone
+from typing import Optional
+from sqlalchemy import Index, Integer, ForeignKey, DateTime, Text, delete, event, func, select
+from sqlalchemy.orm import Session, mapped_column
+from app.database import Base
+from app.models.frame import Frame
+
+# Matches the terminal's own history size (MAX_HISTORY_SIZE in terminalLogic.ts).
+TERMINAL_HISTORY_PER_FRAME = 200
+TERMINAL_HISTORY_PAGE_LIMIT = 200
+
+
+class TerminalCommand(Base):
+    """One command typed into a frame's terminal, oldest first by id.
+
+    Append-only: a frame's history used to live in a JSON column on the frame
+    row, so every command rewrote the whole row and was broadcast with it.
+    """
+    __tablename__ = 'terminal_command'
+    __table_args__ = (
+        Index('ix_terminal_command_frame_id_id', 'frame_id', 'id'),
+    )
+    id = mapped_column(Integer, primary_key=True)
+    project_id = mapped_column(Integer, ForeignKey("project.id"), nullable=False, index=True)
+    frame_id = mapped_column(Integer, ForeignKey('frame.id'), nullable=False)
+    timestamp = mapped_column(DateTime, nullable=False, default=func.current_timestamp())
+    command = mapped_column(Text, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'timestamp': self.timestamp.replace(tzinfo=timezone.utc).isoformat(),
+            'command': self.command,
+        }
+
+
+@event.listens_for(TerminalCommand, "before_insert")
+def _set_terminal_command_project_id(_mapper, connection, target: TerminalCommand):
+    if target.project_id is not None or target.frame_id is None:
+        return
+    project_id = connection.execute(
+        Frame.__table__.select().with_only_columns(Frame.__table__.c.project_id).where(Frame.__table__.c.id == target.frame_id)
+    ).scalar()
+    target.project_id = project_id
+
+
+def append_terminal_command(db: Session, frame: Frame, command: str) -> Optional[TerminalCommand]:
+    """Record *command*, trimming the frame's history to TERMINAL_HISTORY_PER_FRAME.
+
+    Blank commands and repeats of the latest one are skipped (returns None),
+    like the terminal's in-memory history does.
+    """
+    command = command.strip()
+    if not command:
+        return None
+    latest = (
+        db.query(TerminalCommand.command)
+        .filter(TerminalCommand.project_id == frame.project_id, TerminalCommand.frame_id == frame.id)
+        .order_by(TerminalCommand.id.desc())
+        .limit(1)
+        .scalar()
+    )
+    if latest == command:
+        return None
+    entry = TerminalCommand(project_id=frame.project_id, frame_id=frame.id, command=command)
+    db.add(entry)
+    db.flush()
+    # Everything at or below the id that is TERMINAL_HISTORY_PER_FRAME back
+    # from the newest goes: one indexed lookup and one bulk DELETE.
+    cutoff_id = (
+        select(TerminalCommand.id)
+        .where(TerminalCommand.project_id == frame.project_id, TerminalCommand.frame_id == frame.id)
+        .order_by(TerminalCommand.id.desc())
+        .offset(TERMINAL_HISTORY_PER_FRAME)
+        .limit(1)
+        .scalar_subquery()
+    )
+    db.execute(
+        delete(TerminalCommand).where(
+            TerminalCommand.project_id == frame.project_id,
+            TerminalCommand.frame_id == frame.id,
+            TerminalCommand.id <= cutoff_id,
+        )
+    )
+    db.commit()
+    return entry
+
+
+def terminal_history_page(
+    db: Session,
+    frame: Frame,
+    *,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = TERMINAL_HISTORY_PAGE_LIMIT,
+) -> list[TerminalCommand]:
+    """Up to *limit* commands in ascending id order.
+
+    With *after_id*, the oldest ones newer than it (incremental fetch);
+    otherwise the newest ones, older than *before_id* if given (paging back).
+    """
+    query = db.query(TerminalCommand).filter(
+        TerminalCommand.project_id == frame.project_id,
+        TerminalCommand.frame_id == frame.id,
+    )
+    if after_id is not None:
+        return query.filter(TerminalCommand.id > after_id).order_by(TerminalCommand.id.asc()).limit(limit).all()
+    if before_id is not None:
+        query = query.filter(TerminalCommand.id < before_id)
+    return list(reversed(query.order_by(TerminalCommand.id.desc()).limit(limit).all()))
@@ -1,9 +1,12 @@
+import io
+import tarfile
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, patch
 
 import pytest
 
-from app.models.assets import ASSETS_WRITABLE_MARKER, make_asset_folders, sync_assets
+from app.models.assets import ASSETS_WRITABLE_MARKER, make_asset_folders, sync_assets, upload_font_assets
+from app.utils.asset_sync import MANIFEST_FILENAME, PROBE_SEPARATOR, bytes_sync_file, render_manifest
 
 
 def make_frame(**overrides):
@@ -101,3 +104,56 @@ async def test_sync_assets_skips_fonts_when_disabled(mock_folders, mock_fonts, d
     mock_folders.return_value = True
     await sync_assets(db, redis, make_frame(upload_fonts="none"))
     mock_fonts.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch("app.models.assets.log", new_callable=AsyncMock)
+@patch("app.models.assets.upload_file", new_callable=AsyncMock)
+@patch("app.models.assets.run_command", new_callable=AsyncMock)
+async def test_upload_font_assets_ships_one_archive(mock_run, mock_upload, _mock_log, db, redis, tmp_path, monkeypatch):
+    fonts = tmp_path / "fonts"
+    fonts.mkdir()
+    (fonts / "Same.ttf").write_bytes(b"same")
+    (fonts / "New.ttf").write_bytes(b"new")
+    (fonts / "skip.otf").write_bytes(b"skip")
+    monkeypatch.setattr("app.models.assets.local_fonts_path", str(fonts))
+    same = bytes_sync_file("fonts/Same.ttf", b"same")
+    manifest = render_manifest({
+        same.path: {"sha256": same.sha256, "size": same.size},
+        "fonts/Stale.ttf": {"sha256": "0" * 64, "size": 5},
+    }).decode()
+    listing = "4 /srv/assets/fonts/Same.ttf\n5 /srv/assets/fonts/Stale.ttf\n"
+    mock_run.side_effect = [(0, f"{manifest}\n{PROBE_SEPARATOR}\n{listing}", ""), (0, "", "")]
+
+    plan = await upload_font_assets(db, redis, make_frame(), "/srv/assets")
+
+    assert [file.path for file in plan.upload] == ["fonts/New.ttf"]
+    assert plan.delete == ["fonts/Stale.ttf"]
+    mock_upload.assert_awaited_once()
+    archive_path, archive = mock_upload.call_args.args[3], mock_upload.call_args.args[4]
+    with tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz") as tar:
+        assert tar.getnames() == ["fonts/New.ttf", MANIFEST_FILENAME]
+    apply_cmd = mock_run.call_args_list[1].args[3]
+    assert f"tar -xzf {archive_path} -C /srv/assets" in apply_cmd
+    assert "rm -f -- /srv/assets/fonts/Stale.ttf" in apply_cmd
+
+
+@pytest.mark.asyncio
+@patch("app.models.assets.log", new_callable=AsyncMock)
+@patch("app.models.assets.upload_file", new_callable=AsyncMock)
+@patch("app.models.assets.run_command", new_callable=AsyncMock)
+async def test_upload_font_assets_skips_upload_when_in_sync(mock_run, mock_upload, mock_log, db, redis, tmp_path, monkeypatch):
+    fonts = tmp_path / "fonts"
+    fonts.mkdir()
+    (fonts / "Same.ttf").write_bytes(b"same")
+    monkeypatch.setattr("app.models.assets.local_fonts_path", str(fonts))
+    same = bytes_sync_file("fonts/Same.ttf", b"same")
+    manifest = render_manifest({same.path: {"sha256": same.sha256, "size": same.size}}).decode()
+    mock_run.return_value = (0, f"{manifest}\n{PROBE_SEPARATOR}\n4 /srv/assets/fonts/Same.ttf\n", "")
+
+    plan = await upload_font_assets(db, redis, make_frame(), "/srv/assets")
+
+    assert plan.empty
+    mock_upload.assert_not_awaited()
+    assert mock_run.await_count == 1
+    assert mock_log.call_args.args[4] == "No fonts to upload"
@@ -1,9 +1,15 @@
+import importlib
+import asyncio
+import sqlite3
+from types import SimpleNamespace
 import pytest
 from unittest.mock import patch, AsyncMock
 from datetime import datetime, timedelta, timezone
 from app.models.frame import new_frame, Frame
-from app.models.log import LOG_LIMIT_PER_FRAME, new_log, process_log, Log
+from app.models.log import LOG_LIMIT_PER_FRAME, new_log, new_logs, process_log, search_logs, Log
+from app.models.log_segment import LogSegment, archive_log_rows, enforce_log_archive_budget, read_log_segment
 from app.codegen.drivers_nim import frame_compilation_mode
+from app.database import engine, is_sqlite
 from app.tasks.buildroot_image import (
     BUILDROOT_SD_IMAGE_CUSTOMIZATION_VERSION,
     SUPPORTED_BUILDROOT_PLATFORM,
@@ -23,6 +29,58 @@ async def test_new_log(mock_pub, db, redis):
     assert mock_pub.await_count == 2
 
 
+@pytest.mark.asyncio
+@patch("app.models.log.publish_message", new_callable=AsyncMock)
+async def test_new_logs_writes_a_batch_with_one_publish(mock_pub, db, redis):
+    frame = await new_frame(db, redis, "LogFrame", "localhost", "server_host")
+    mock_pub.reset_mock()
+    timestamp = datetime(2026, 1, 1, 12, 0, 0)
+
+    logs = await new_logs(db, redis, frame.id, [
+        (timestamp, "stdout", "Reading package lists..."),
+        (timestamp, "stdout", "Building dependency tree..."),
+        (timestamp + timedelta(seconds=1), "stderr", "W: no Release file"),
+    ], ip="10.0.0.5")
+
+    assert [(log.type, log.line) for log in logs] == [
+        ("stdout", "Reading package lists..."),
+        ("stdout", "Building dependency tree..."),
+        ("stderr", "W: no Release file"),
+    ]
+    assert logs[0].id < logs[1].id < logs[2].id
+    assert db.query(Log).filter(Log.ip == "10.0.0.5").count() == 3
+    mock_pub.assert_awaited_once()
+    _redis, event, payload = mock_pub.await_args.args
+    assert event == "new_logs"
+    assert payload["project_id"] == frame.project_id
+    assert payload["frame_id"] == frame.id
+    assert [log["line"] for log in payload["logs"]] == [log.line for log in logs]
+    # Agent output isn't device activity.
+    assert db.get(Frame, frame.id).last_log_at is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not is_sqlite, reason="SQLite write lock")
+@patch("app.models.log.publish_message", new_callable=AsyncMock)
+async def test_new_log_waits_for_write_lock_off_the_loop(mock_pub, db, redis):
+    frame = await new_frame(db, redis, "LogFrame", "localhost", "server_host")
+    # Another writer (the worker process, say) holds the SQLite write lock.
+    holder = sqlite3.connect(engine.url.database, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        pending = asyncio.create_task(new_log(db, redis, frame.id, "info", "Blocked log"))
+        started = asyncio.get_running_loop().time()
+        await asyncio.sleep(0.2)
+        # The loop kept running while the insert waited for the lock.
+        assert asyncio.get_running_loop().time() - started < 1.0
+        assert not pending.done()
+    finally:
+        holder.execute("COMMIT")
+        holder.close()
+    log_entry = await pending
+    assert db.get(Log, log_entry.id).line == "Blocked log"
+
+
 @pytest.mark.asyncio
 @patch("app.models.log.publish_message", new_callable=AsyncMock)
 async def test_new_log_updates_frame_last_log_at(mock_pub, db, redis):
@@ -85,6 +143,7 @@ async def test_process_log_render(mock_pub, db, redis):
     assert mock_pub.await_count == 2
     updated = db.get(Frame, frame.id)
     assert updated.status == "preparing"
+    assert db.query(Log).filter_by(frame_id=frame.id, type="webhook").one().event == "render"
 
 @pytest.mark.asyncio
 @patch("app.models.log.publish_message", new_callable=AsyncMock)
@@ -335,6 +394,161 @@ async def test_new_log_trimming(mock_pub, db, redis):
     # Pruning trims back down to exactly the limit; the new log survives.
     assert count == LOG_LIMIT_PER_FRAME
     assert db.query(Log).filter_by(frame_id=frame.id).order_by(Log.id.desc()).first().line == "Trigger trim"
+    # The trimmed rows were rolled into a compressed segment, oldest first.
+    [segment] = db.query(LogSegment).filter_by(frame_id=frame.id).all()
+    archived = list(read_log_segment(segment))
+    assert segment.line_count == len(archived) == 101
+    assert [row["line"] for row in archived[:2]] == ["Log 0", "Log 1"]
+    assert segment.size == len(segment.data) < sum(len(row["line"]) for row in archived) * 2
+
+
+@pytest.mark.asyncio
+@patch("app.models.log.publish_message", new_callable=AsyncMock)
+async def test_log_segments_keep_to_byte_budget(mock_pub, db, redis, monkeypatch):
+    import app.models.log_segment as log_segment_module
+
+    frame = await new_frame(db, redis, "BudgetFrame", "localhost", "server_host")
+    # Every segment is "full": each archive call starts a new one.
+    monkeypatch.setattr(log_segment_module, "LOG_SEGMENT_BYTES", 1)
+    rows = [
+        SimpleNamespace(id=i, timestamp=datetime(2026, 1, 1) + timedelta(seconds=i), type="stdout",
+                        line=f"render {i} took {i * 7 % 900}ms", ip=None, event=None)
+        for i in range(400)
+    ]
+    for start in range(0, 400, 100):
+        archive_log_rows(db, frame.project_id, frame.id, rows[start:start + 100])
+    db.flush()
+    sizes = [segment.size for segment in db.query(LogSegment).order_by(LogSegment.first_log_id)]
+
+    # Room for the newest two segments: the older two go.
+    monkeypatch.setattr(log_segment_module, "LOG_ARCHIVE_BYTES_PER_FRAME", sizes[-1] + sizes[-2])
+    enforce_log_archive_budget(db, frame.project_id, frame.id)
+    db.commit()
+    remaining = db.query(LogSegment).filter_by(frame_id=frame.id).order_by(LogSegment.first_log_id).all()
+    assert [(segment.first_log_id, segment.last_log_id) for segment in remaining] == [(200, 299), (300, 399)]
+    assert remaining[0].started_at == datetime(2026, 1, 1, 0, 3, 20)
+    assert next(read_log_segment(remaining[0]))["line"] == "render 200 took 500ms"
+
+
+@pytest.mark.asyncio
+@patch("app.models.log.publish_message", new_callable=AsyncMock)
+async def test_log_segments_fill_up_before_a_new_one_starts(mock_pub, db, redis, monkeypatch):
+    import app.models.log_segment as log_segment_module
+
+    frame = await new_frame(db, redis, "CoalesceFrame", "localhost", "server_host")
+    rows = [
+        SimpleNamespace(id=i, timestamp=datetime(2026, 1, 1) + timedelta(seconds=i), type="stdout",
+                        line=f"render {i} took {i * 7 % 900}ms", ip=None, event=None)
+        for i in range(300)
+    ]
+    archive_log_rows(db, frame.project_id, frame.id, rows[:100])
+    db.flush()
+    [segment] = db.query(LogSegment).filter_by(frame_id=frame.id).all()
+    monkeypatch.setattr(log_segment_module, "LOG_SEGMENT_BYTES", segment.size + 1)
+
+    # The open segment has room: the next trim is appended to it ...
+    archive_log_rows(db, frame.project_id, frame.id, rows[100:200])
+    db.flush()
+    [segment] = db.query(LogSegment).filter_by(frame_id=frame.id).all()
+    assert (segment.first_log_id, segment.last_log_id, segment.line_count) == (0, 199, 200)
+    assert segment.ended_at == datetime(2026, 1, 1, 0, 3, 19)
+    assert [row["line"] for row in read_log_segment(segment)] == [row.line for row in rows[:200]]
+
+    # ... and once it's full, the one after starts a new segment.
+    archive_log_rows(db, frame.project_id, frame.id, rows[200:])
+    db.commit()
+    segments = db.query(LogSegment).filter_by(frame_id=frame.id).order_by(LogSegment.first_log_id).all()
+    assert [(segment.first_log_id, segment.last_log_id) for segment in segments] == [(0, 199), (200, 299)]
+
+
+@pytest.mark.asyncio
+@patch("app.models.log.publish_message", new_callable=AsyncMock)
+async def test_new_log_trimming_keeps_to_byte_budget(mock_pub, db, redis, monkeypatch):
+    log_module = importlib.import_module("app.models.log")
+
+    frame = await new_frame(db, redis, "ByteTrimFrame", "localhost", "server_host")
+    db.query(Log).delete()
+    db.add_all(
+        [Log(project_id=frame.project_id, frame_id=frame.id, type="info", line=f"{i:04d}" + "x" * 96) for i in range(50)]
+    )
+    db.commit()
+    # Far below the row limit, but only room for the newest 20 lines.
+    monkeypatch.setattr(log_module, "LOG_BYTES_PER_FRAME", 2000)
+    log_module._inserts_since_prune_check.clear()
+    await new_log(db, redis, frame.id, "info", "y" * 100)
+
+    kept = [log.line[:4] for log in db.query(Log).filter_by(frame_id=frame.id).order_by(Log.id)]
+    assert kept == [f"{i:04d}" for i in range(31, 50)] + ["yyyy"]
+    [segment] = db.query(LogSegment).filter_by(frame_id=frame.id).all()
+    assert segment.line_count == 31
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not is_sqlite, reason="SQLite write lock")
+@patch("app.models.log.publish_message", new_callable=AsyncMock)
+async def test_prune_totals_are_read_before_the_write_transaction(mock_pub, db, redis, monkeypatch):
+    log_module = importlib.import_module("app.models.log")
+    frame = await new_frame(db, redis, "TotalsFrame", "localhost", "server_host")
+    seen = []
+    hot_log_totals = log_module.hot_log_totals
+
+    def spy(session, *args, **kwargs):
+        totals = hot_log_totals(session, *args, **kwargs)
+        seen.append((totals, session.connection().connection.dbapi_connection.in_transaction))
+        return totals
+
+    monkeypatch.setattr(log_module, "hot_log_totals", spy)
+    log_module._inserts_since_prune_check.clear()
+    await new_log(db, redis, frame.id, "info", "counted")
+    await new_log(db, redis, frame.id, "info", "not counted")
+
+    count = db.query(Log).filter_by(frame_id=frame.id).count()
+    # Checked on the first insert only, and without holding the write lock.
+    [((rows, _text), first_in_transaction), second] = seen
+    assert (rows, first_in_transaction) == (count - 2, False)
+    assert second == (None, False)
+
+
+@pytest.mark.asyncio
+@patch("app.models.log.publish_message", new_callable=AsyncMock)
+async def test_search_logs_follows_inserts_and_prunes(mock_pub, db, redis):
+    frame = await new_frame(db, redis, "SearchFrame", "localhost", "server_host")
+    db.query(Log).delete()
+    db.add_all(
+        [
+            Log(project_id=frame.project_id, frame_id=frame.id, type="info", line=f"tick {i} sensor timeout")
+            for i in range(LOG_LIMIT_PER_FRAME + 100)
+        ]
+    )
+    db.commit()
+    from app.models.log import _inserts_since_prune_check
+    _inserts_since_prune_check.clear()
+    await new_log(db, redis, frame.id, "stderr", "Sensor timeout: retrying in 5s")
+
+    matches = search_logs(db, frame.project_id, "TIMEOUT retry*", frame_id=frame.id)
+    assert [(log.line, segments) for log, segments in matches] == [(
+        "Sensor timeout: retrying in 5s",
+        [
+            {"text": "Sensor ", "match": False},
+            {"text": "timeout", "match": True},
+            {"text": ": ", "match": False},
+            {"text": "retrying", "match": True},
+            {"text": " in 5s", "match": False},
+        ],
+    )]
+    assert search_logs(db, frame.project_id, '" NEAR(') == []
+
+    # The insert above rolled the oldest rows into a segment. The index
+    # dropped them; search still finds them there, after the indexed rows.
+    kept = {log.id for log in db.query(Log).filter_by(frame_id=frame.id, type="info")}
+    assert len(kept) == LOG_LIMIT_PER_FRAME - 1
+    assert len(search_logs(db, frame.project_id, "tick", limit=LOG_LIMIT_PER_FRAME * 2)) == len(kept)
+    matches = search_logs(db, frame.project_id, "tick", limit=LOG_LIMIT_PER_FRAME * 2, archived=True)
+    assert {log.id for log, _ in matches[:len(kept)]} == kept
+    archived = matches[len(kept):]
+    assert len(archived) == 101 and not {log.id for log, _ in archived} & kept
+    assert archived[0][0].line.startswith("tick 100 ")
+    assert [segment for segment in archived[0][1] if segment["match"]] == [{"text": "tick", "match": True}]
 
 
 @pytest.mark.asyncio
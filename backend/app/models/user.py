@@ -1,7 +1,8 @@
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Integer, String
+from sqlalchemy import Integer, String, event
 from sqlalchemy.orm import mapped_column, relationship
 from app.database import Base
+from app.utils.principal_cache import invalidate_principals
 
 class User(Base):
     __tablename__ = 'user'
@@ -21,3 +22,10 @@ class User(Base):
         if not self.password:
             return False
         return check_password_hash(self.password, password)
+
+
+# Session auth caches the user row (app.utils.principal_cache).
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_principal(_mapper, _connection, target: User):
+    invalidate_principals(user_id=target.id)
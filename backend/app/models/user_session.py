@@ -18,10 +18,11 @@ import datetime
 import hashlib
 import secrets
 
-from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, delete, update
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, delete, event, update
 from sqlalchemy.orm import Mapped, Session, mapped_column
 
 from app.database import Base
+from app.utils.principal_cache import invalidate_principals
 
 
 def new_session_id() -> str:
@@ -54,6 +55,14 @@ class UserSession(Base):
         super().__init__(**kwargs)
 
 
+# Session auth caches active sessions (app.utils.principal_cache); the bulk
+# revocations below invalidate explicitly, ORM edits land here.
+@event.listens_for(UserSession, "after_update")
+@event.listens_for(UserSession, "after_delete")
+def _invalidate_session_principal(_mapper, _connection, target: UserSession):
+    invalidate_principals(session_hash=target.session_id_hash)
+
+
 def create_user_session(db: Session, *, user_id: int, expires_at: datetime.datetime) -> str:
     """Records a new session and returns the `jti` to embed in the credential."""
     session_id = new_session_id()
@@ -93,6 +102,7 @@ def revoke_user_session(db: Session, session_id: str | None) -> None:
         .values(revoked_at=datetime.datetime.utcnow())
     )
     db.commit()
+    invalidate_principals(session_hash=hash_session_id(session_id))
 
 
 def revoke_sessions_for_user(db: Session, user_id: int, *, keep_session_id: str | None = None) -> None:
@@ -108,11 +118,14 @@ def revoke_sessions_for_user(db: Session, user_id: int, *, keep_session_id: str
         conditions.append(UserSession.session_id_hash != hash_session_id(keep_session_id))
     db.execute(update(UserSession).where(*conditions).values(revoked_at=datetime.datetime.utcnow()))
     db.commit()
+    # Drops the kept session's cache entry too; it is simply re-read.
+    invalidate_principals(user_id=user_id)
 
 
 def revoke_all_sessions(db: Session) -> None:
     db.execute(update(UserSession).where(UserSession.revoked_at.is_(None)).values(revoked_at=datetime.datetime.utcnow()))
     db.commit()
+    invalidate_principals(all_sessions=True)
 
 
 def purge_expired_sessions(db: Session, *, older_than_days: int = 7) -> None:
@@ -116,7 +116,6 @@ class FrameBase(BaseModel):
     buildroot: Optional[Dict[str, Any]] = None
     embedded: Optional[Dict[str, Any]] = None
     rpios: Optional[Dict[str, Any]] = None
-    terminal_history: Optional[List[str]] = None
     last_successful_deploy: Optional[Dict[str, Any]]
     last_successful_deploy_at: Optional[datetime]
     active_connections: Optional[int] = None
@@ -196,7 +195,6 @@ class FrameUpdateRequest(BaseModel):
     buildroot: Optional[Dict[str, Any]] = None
     embedded: Optional[Dict[str, Any]] = None
     rpios: Optional[Dict[str, Any]] = None
-    terminal_history: Optional[List[str]] = None
     next_action: Optional[str] = None
 
     @field_validator('max_http_response_bytes')
@@ -227,6 +225,20 @@ class FrameSSHKeysUpdateRequest(BaseModel):
 
 class FrameLogsResponse(BaseModel):
     logs: List[Dict[str, Any]]
+    has_more: bool = False
+
+class FrameLogsColumnarResponse(BaseModel):
+    columns: Dict[str, List[Any]]
+    has_more: bool = False
+
+class FrameLogSearchResponse(BaseModel):
+    results: List[Dict[str, Any]]
+
+class FrameTerminalCommandRequest(BaseModel):
+    command: str = Field(max_length=4096)
+
+class FrameTerminalHistoryResponse(BaseModel):
+    commands: List[Dict[str, Any]]
 
 class FrameMetricsResponse(BaseModel):
     metrics: List[Dict[str, Any]]
@@ -23,6 +23,11 @@ class CacheInfo(BaseModel):
     path: str
     sizeBytes: int
     exists: bool
+    entries: int | None = None
+    pinnedEntries: int | None = None
+    hits: int | None = None
+    misses: int | None = None
+    hitRate: float | None = None
 
 
 class DatabaseInfo(BaseModel):
@@ -37,6 +42,22 @@ class DockerInfo(BaseModel):
     error: str | None = None
 
 
+class SshPoolInfo(BaseModel):
+    frames: int
+    connections: int
+    activeLeases: int
+    idleConnections: int
+    connecting: int
+    handshakes: int
+    handshakeFailures: int
+    avgHandshakeSeconds: float | None
+    leases: int
+    reused: int
+    sharedHandshakes: int
+    idleCloses: int
+    prewarms: int
+
+
 class SystemInfoResponse(BaseModel):
     disk: DiskInfo
     caches: list[CacheInfo]
@@ -44,6 +65,7 @@ class SystemInfoResponse(BaseModel):
     memory: MemoryInfo
     load: LoadInfo
     docker: DockerInfo
+    sshPool: SshPoolInfo | None = None
 
 
 class SystemMetricsResponse(BaseModel):
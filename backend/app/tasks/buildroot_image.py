@@ -11,6 +11,7 @@ import re
 import shlex
 import shutil
 import tempfile
+import threading
 from contextlib import suppress
 from dataclasses import dataclass
 from datetime import datetime, timezone
@@ -43,8 +44,11 @@ from app.tasks.precompiled_remote import download_precompiled_remote_release
 from app.tasks.precompiled_frameos import frame_compiled_scene_count, release_version
 from app.tasks.sd_image_blob_patch import (
     build_setup_blob_payload,
+    compose_virtual_setup_blob_image,
+    find_setup_blob_region,
     patch_setup_blob_into_image,
 )
+from app.utils.downloads import DownloadError, download_file, download_single_flight
 from app.tasks.setup_json_reset import (
     BOOT_AUTHORIZED_KEYS_FILE,
     BOOT_CLOUD_CONFIG_FILE,
@@ -53,6 +57,7 @@ from app.tasks.setup_json_reset import (
     BOOT_SETUP_BLOB_FILE,
     BOOT_WIFI_CONNECTION_FILE,
     SETUP_BLOB_MEMBERS,
+    SETUP_BLOB_PLACEHOLDER_SIZE,
     SETUP_JSON_RESET_SCRIPT_PATH,
     SETUP_JSON_RESET_SERVICE_NAME,
     render_setup_blob_region,
@@ -75,6 +80,8 @@ from app.tasks.postboot_log import (
 )
 from app.tasks.utils import get_fresh_frame
 from app.tasks.prebuilt_deps import resolve_prebuilt_target
+from app.utils.artifact_cache import record_artifact_cache_access_async
+from app.utils.asset_sync import write_local_manifest
 from app.utils.build_environment import BuildEnvironmentProvider, selected_build_environment_provider
 from app.utils.build_host import BuildHostConfig, get_build_executor_config
 from app.utils.build_executor import (
@@ -85,8 +92,11 @@ from app.utils.build_executor import (
     create_build_executor,
     ensure_build_executor_configured,
 )
+from app.utils.compression import compress_file
 from app.utils.cross_compile import CrossCompiler
 from app.utils.modal_sandbox import ModalSandboxConfig
+from app.utils.sparse_image import clone_image, sparse_decompress, write_region
+from app.utils.virtual_image import load_virtual_image, virtual_image_is_intact
 from app.utils.ssh_key_utils import select_ssh_keys_for_frame
 from app.utils.token import secure_token
 from app.utils.versions import current_frameos_version
@@ -119,6 +129,9 @@ BUILDROOT_BASE_MANIFEST_FILE = os.environ.get(
     str(REPO_ROOT / "tools" / "buildroot-images" / "manifest.json"),
 )
 BUILDROOT_BASE_USE_REMOTE = os.environ.get("FRAMEOS_BUILDROOT_BASE_USE_REMOTE", "").lower() in {"1", "true", "yes"}
+# Placeholder-personalized images are stored as an extent map over the cached
+# release image instead of a full per-frame copy.
+BUILDROOT_VIRTUAL_SD_IMAGES = os.environ.get("FRAMEOS_VIRTUAL_SD_IMAGES", "1").lower() in {"1", "true", "yes"}
 BUILDROOT_BASE_TIMEOUT = float(os.environ.get("FRAMEOS_BUILDROOT_BASE_TIMEOUT", "60"))
 BUILDROOT_DOCKER_NOFILE_LIMIT = int(os.environ.get("FRAMEOS_BUILDROOT_DOCKER_NOFILE_LIMIT", "65535"))
 BUILDROOT_PROGRESS_LOG_INTERVAL_SECONDS = float(os.environ.get("FRAMEOS_BUILDROOT_PROGRESS_LOG_INTERVAL_SECONDS", "30"))
@@ -459,48 +472,32 @@ async def download_precompiled_buildroot_sd_image(
     cache_path = precompiled_buildroot_sd_image_cache_path(url)
     if cache_path.is_file() and cache_path.stat().st_size > 0:
         await logger("stdout", f"Using cached full precompiled Buildroot SD image release for {platform}")
+        await record_artifact_cache_access_async(cache_path, hit=True)
         return PrecompiledBuildrootSdImageResult(release_url=url, archive_path=cache_path, cache_hit=True)
 
     cache_path.parent.mkdir(parents=True, exist_ok=True)
     await logger("stdout", f"Checking for full precompiled Buildroot SD image release for {platform}")
-    temp_path: Path | None = None
     try:
-        with tempfile.NamedTemporaryFile(
-            prefix=f".{cache_path.name}.",
-            suffix=".part",
-            dir=cache_path.parent,
-            delete=False,
-        ) as temp_file:
-            temp_path = Path(temp_file.name)
-
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-            async with client.stream("GET", url) as response:
-                if response.status_code == 404:
-                    await logger("stdout", f"No full precompiled Buildroot SD image release found for {platform}")
-                    return None
-                response.raise_for_status()
-                with temp_path.open("wb") as output:
-                    async for chunk in response.aiter_bytes():
-                        output.write(chunk)
-
-        if not temp_path.is_file() or temp_path.stat().st_size == 0:
-            await logger("stderr", "Downloaded full precompiled Buildroot SD image release was empty")
-            return None
-        os.replace(temp_path, cache_path)
-        temp_path = None
-        return PrecompiledBuildrootSdImageResult(release_url=url, archive_path=cache_path)
+        await download_file(url, cache_path, timeout=timeout)
     except httpx.HTTPStatusError as exc:
+        if exc.response.status_code == 404:
+            await logger("stdout", f"No full precompiled Buildroot SD image release found for {platform}")
+            return None
         await logger(
             "stderr",
             f"Could not use full precompiled Buildroot SD image release for {platform}: HTTP {exc.response.status_code}",
         )
         return None
-    except httpx.RequestError as exc:
+    except (httpx.RequestError, DownloadError) as exc:
         await logger("stderr", f"Could not use full precompiled Buildroot SD image release for {platform}: {exc}")
         return None
-    finally:
-        if temp_path is not None:
-            temp_path.unlink(missing_ok=True)
+
+    if cache_path.stat().st_size == 0:
+        cache_path.unlink(missing_ok=True)
+        await logger("stderr", "Downloaded full precompiled Buildroot SD image release was empty")
+        return None
+    await record_artifact_cache_access_async(cache_path, hit=False)
+    return PrecompiledBuildrootSdImageResult(release_url=url, archive_path=cache_path)
 
 
 async def resolve_buildroot_base_entry(platform: str, frameos_version: str | None = None) -> dict[str, Any]:
@@ -543,23 +540,27 @@ async def ensure_buildroot_base_image(entry: dict[str, Any], destination_dir: Pa
     image_name = f"{entry.get('platform', 'buildroot')}-{sha256[:16]}.img"
     image_path = destination_dir / image_name
     if image_path.is_file() and _sha256(image_path) == sha256:
+        await record_artifact_cache_access_async(image_path, hit=True)
         return image_path
 
     archive_path = destination_dir / f"{image_name}.gz"
     archive_url = urljoin(_normalize_url_base(BUILDROOT_ARCHIVE_BASE_URL), object_key)
-    async with httpx.AsyncClient(timeout=None) as client:
-        response = await client.get(archive_url)
-        response.raise_for_status()
-        archive_path.write_bytes(response.content)
-
-    with gzip.open(archive_path, "rb") as source, image_path.open("wb") as output:
-        shutil.copyfileobj(source, output)
-    archive_path.unlink(missing_ok=True)
-
-    actual = _sha256(image_path)
-    if actual != sha256:
-        image_path.unlink(missing_ok=True)
-        raise RuntimeError(f"Downloaded Buildroot base image checksum mismatch: expected {sha256}, got {actual}")
+    async with download_single_flight(image_path) as waited:
+        if waited and image_path.is_file() and _sha256(image_path) == sha256:
+            await record_artifact_cache_access_async(image_path, hit=True)
+            return image_path
+        # The manifest's sha256 covers the decompressed image, so it is
+        # checked after unpacking rather than while downloading.
+        await download_file(archive_url, archive_path, timeout=None, single_flight=False)
+
+        sparse_decompress(archive_path, image_path)
+        archive_path.unlink(missing_ok=True)
+
+        actual = _sha256(image_path)
+        if actual != sha256:
+            image_path.unlink(missing_ok=True)
+            raise RuntimeError(f"Downloaded Buildroot base image checksum mismatch: expected {sha256}, got {actual}")
+    await record_artifact_cache_access_async(image_path, hit=False)
     return image_path
 
 
@@ -729,7 +730,6 @@ def _buildroot_sd_image_config_payload(frame: Frame | Any) -> dict[str, Any]:
         "last_log_at",
         "last_successful_deploy",
         "last_successful_deploy_at",
-        "terminal_history",
     ):
         payload.pop(key, None)
 
@@ -903,6 +903,8 @@ def latest_buildroot_sd_image(frame: Frame, current_base_entry: dict[str, Any] |
         }
     if sd_image.get("status") == "ready" and isinstance(path, str) and not Path(path).is_file():
         return {**sd_image, "status": "missing", "error": "The generated image file is missing"}
+    if sd_image.get("status") == "ready" and sd_image.get("virtual") and not virtual_image_is_intact(Path(str(path))):
+        return {**sd_image, "status": "missing", "error": "The cached release image this SD image is based on is missing"}
     return sd_image
 
 
@@ -1154,6 +1156,7 @@ class BuildrootImageBuilder:
             filename = f"{raw_filename}.gz"
             raw_output_path = artifact_dir / raw_filename
             output_path = artifact_dir / filename
+            virtual_manifest_path = artifact_dir / f"{raw_filename}.vimg.json"
 
             started_at = _utc_now()
             await _set_sd_image_status(
@@ -1192,9 +1195,12 @@ class BuildrootImageBuilder:
                     output_path=raw_output_path,
                     bootstrap_frame=bootstrap_frame,
                     setup_payload=setup_payload,
+                    virtual_manifest_path=virtual_manifest_path if BUILDROOT_VIRTUAL_SD_IMAGES else None,
                 )
                 if precompiled_sd_image is not None:
                     personalization_mode = "placeholder"
+                    if virtual_manifest_path.is_file():
+                        personalization_mode = "virtual"
                 else:
                     compose_image = await self._precompiled_sd_image_patch_image()
                     precompiled_sd_image = await self._try_compose_precompiled_sd_image(
@@ -1249,23 +1255,41 @@ class BuildrootImageBuilder:
                     image=compose_image,
                 )
 
-            if not raw_output_path.is_file():
-                raise RuntimeError(f"SD image composer completed without producing {raw_output_path.name}")
+            if personalization_mode == "virtual":
+                raw_image = load_virtual_image(virtual_manifest_path, "raw")
+                compressed_image = load_virtual_image(virtual_manifest_path, "gzip")
+                if raw_image is None or compressed_image is None:
+                    raise RuntimeError(f"Could not read virtual SD image manifest {virtual_manifest_path.name}")
+                output_path = virtual_manifest_path
+                raw_size = raw_image.size
+                compressed_size = compressed_image.size
+                raw_sha256 = await self._with_progress_updates(
+                    "Still checksumming raw Buildroot SD image",
+                    asyncio.to_thread(raw_image.sha256),
+                )
+                compressed_sha256 = await self._with_progress_updates(
+                    "Still checksumming compressed Buildroot SD image",
+                    asyncio.to_thread(compressed_image.sha256),
+                )
+            else:
+                if not raw_output_path.is_file():
+                    raise RuntimeError(f"SD image composer completed without producing {raw_output_path.name}")
 
-            raw_size = raw_output_path.stat().st_size
-            raw_sha256 = await self._with_progress_updates(
-                "Still checksumming raw Buildroot SD image",
-                asyncio.to_thread(_sha256, raw_output_path),
-            )
-            await self._with_progress_updates(
-                "Still compressing Buildroot SD image",
-                asyncio.to_thread(_gzip_file, raw_output_path, output_path),
-            )
-            raw_output_path.unlink(missing_ok=True)
-            compressed_sha256 = await self._with_progress_updates(
-                "Still checksumming compressed Buildroot SD image",
-                asyncio.to_thread(_sha256, output_path),
-            )
+                raw_size = raw_output_path.stat().st_size
+                raw_sha256 = await self._with_progress_updates(
+                    "Still checksumming raw Buildroot SD image",
+                    asyncio.to_thread(_sha256, raw_output_path),
+                )
+                await self._with_progress_updates(
+                    "Still compressing Buildroot SD image",
+                    asyncio.to_thread(_gzip_file, raw_output_path, output_path),
+                )
+                raw_output_path.unlink(missing_ok=True)
+                compressed_size = output_path.stat().st_size
+                compressed_sha256 = await self._with_progress_updates(
+                    "Still checksumming compressed Buildroot SD image",
+                    asyncio.to_thread(_sha256, output_path),
+                )
 
             metadata = {
                 **_preserved_queue_metadata(latest_buildroot_sd_image(self.frame) or {}),
@@ -1301,12 +1325,13 @@ class BuildrootImageBuilder:
                 "rawFilename": raw_filename,
                 "path": str(output_path),
                 "compressed": True,
+                **({"virtual": True} if personalization_mode == "virtual" else {}),
                 "customizationVersion": BUILDROOT_SD_IMAGE_CUSTOMIZATION_VERSION,
                 "compilationMode": frame_compilation_mode(self.frame),
                 "configFingerprint": buildroot_sd_image_config_fingerprint(self.frame),
                 "rawSize": raw_size,
                 "rawSha256": raw_sha256,
-                "size": output_path.stat().st_size,
+                "size": compressed_size,
                 "sha256": compressed_sha256,
                 "downloadUrl": f"/api/projects/{self.frame.project_id}/frames/{self.frame.id}/buildroot/sd_image/download",
                 "createdAt": _utc_now(),
@@ -1398,6 +1423,7 @@ class BuildrootImageBuilder:
         output_path: Path,
         bootstrap_frame: Frame | Any,
         setup_payload: dict[str, Any],
+        virtual_manifest_path: Path | None = None,
     ) -> PrecompiledBuildrootSdImageResult | None:
         """Personalize a release image by patching its setup-blob placeholder.
 
@@ -1408,6 +1434,10 @@ class BuildrootImageBuilder:
         partition merge is needed). Returns None whenever anything makes
         this path inapplicable — no release image, no placeholder in it
         (older release), payload too big — and the caller falls back.
+
+        With *virtual_manifest_path* nothing is copied: the image is written
+        as a manifest over the cached release image (see
+        sd_image_blob_patch.compose_virtual_setup_blob_image).
         """
         if not self._can_use_precompiled_sd_image():
             return None
@@ -1454,19 +1484,32 @@ class BuildrootImageBuilder:
             "via its setup-blob placeholder",
         )
         try:
-            await self._with_progress_updates(
-                "Still unpacking precompiled Buildroot SD image",
-                asyncio.to_thread(
-                    self._prepare_precompiled_release_image,
-                    precompiled_sd_image.archive_path,
-                    output_path,
-                ),
-            )
-            patched = await asyncio.to_thread(
-                patch_setup_blob_into_image, output_path, payload
-            )
+            if virtual_manifest_path is not None:
+                patched = await self._with_progress_updates(
+                    "Still preparing shared precompiled Buildroot SD image",
+                    asyncio.to_thread(
+                        _compose_virtual_precompiled_image,
+                        precompiled_sd_image.archive_path,
+                        payload,
+                        virtual_manifest_path,
+                    ),
+                )
+            else:
+                await self._with_progress_updates(
+                    "Still unpacking precompiled Buildroot SD image",
+                    asyncio.to_thread(
+                        self._prepare_precompiled_release_image,
+                        precompiled_sd_image.archive_path,
+                        output_path,
+                    ),
+                )
+                patched = await asyncio.to_thread(
+                    patch_setup_blob_into_image, output_path, payload
+                )
         except Exception as exc:
             output_path.unlink(missing_ok=True)
+            if virtual_manifest_path is not None:
+                virtual_manifest_path.unlink(missing_ok=True)
             await self._log(
                 "stderr",
                 f"Could not patch the precompiled SD image in place: {exc}. "
@@ -1748,20 +1791,23 @@ class BuildrootImageBuilder:
                 target_path.parent.mkdir(parents=True, exist_ok=True)
                 shutil.copy2(source_path, target_path)
 
-        if self.db is None or not hasattr(self.db, "query") or not hasattr(self.frame, "project_id"):
-            return
+        if self.db is not None and hasattr(self.db, "query") and hasattr(self.frame, "project_id"):
+            custom_fonts = self.db.query(Assets).filter(
+                Assets.project_id == self.frame.project_id,
+                Assets.path.like("fonts/%.ttf"),
+            ).all()
+            for font in custom_fonts:
+                relative_path = Path(str(font.path).removeprefix("fonts/"))
+                if relative_path.is_absolute() or any(part in ("", ".", "..") for part in relative_path.parts):
+                    continue
+                target_path = fonts_dir / relative_path
+                target_path.parent.mkdir(parents=True, exist_ok=True)
+                target_path.write_bytes(font.data or b"")
 
-        custom_fonts = self.db.query(Assets).filter(
-            Assets.project_id == self.frame.project_id,
-            Assets.path.like("fonts/%.ttf"),
-        ).all()
-        for font in custom_fonts:
-            relative_path = Path(str(font.path).removeprefix("fonts/"))
-            if relative_path.is_absolute() or any(part in ("", ".", "..") for part in relative_path.parts):
-                continue
-            target_path = fonts_dir / relative_path
-            target_path.parent.mkdir(parents=True, exist_ok=True)
-            target_path.write_bytes(font.data or b"")
+        # Baked-in fonts are listed in the sync manifest, so the first deploy
+        # after flashing finds them in place instead of re-sending them.
+        if fonts_dir.is_dir():
+            write_local_manifest(assets_dir, "fonts")
 
     @staticmethod
     def _copy_libraries(paths: list[str], destination: Path) -> None:
@@ -2468,7 +2514,8 @@ genimage --rootpath "$work_dir/empty-root" --tmppath "$work_dir/tmp" --inputpath
         frameos_image: Path,
         assets_image: Path,
     ) -> list[dict[str, int]]:
-        shutil.copy2(base_image_path, output_path)
+        # Reflinked (or sparse) so untouched partitions share the cached base.
+        clone_image(base_image_path, output_path)
         partitions = _mbr_partitions(output_path)
         partitions = _shrink_data_partitions(
             output_path,
@@ -2512,9 +2559,8 @@ genimage --rootpath "$work_dir/empty-root" --tmppath "$work_dir/tmp" --inputpath
     @staticmethod
     def _prepare_precompiled_release_image(release_image_path: Path, output_path: Path) -> list[dict[str, int]]:
         if release_image_path.name.endswith(".gz"):
-            _gunzip_file(release_image_path, output_path)
-        else:
-            shutil.copy2(release_image_path, output_path)
+            release_image_path = _decompressed_release_image(release_image_path)
+        clone_image(release_image_path, output_path)
 
         partitions = _mbr_partitions(output_path)
         # Full release images already include their FRAMEOS and ASSETS payloads.
@@ -4021,16 +4067,69 @@ def _sha256(path: Path) -> str:
 
 
 def _gzip_file(source_path: Path, destination_path: Path) -> None:
-    destination_path.parent.mkdir(parents=True, exist_ok=True)
-    with source_path.open("rb") as source, destination_path.open("wb") as compressed:
-        with gzip.GzipFile(filename="", mode="wb", fileobj=compressed, mtime=0) as destination:
-            shutil.copyfileobj(source, destination)
+    # Block-parallel: one gzip member per block across a thread pool.
+    compress_file(source_path, destination_path, "gzip")
+
+
+def _decompressed_release_image(archive_path: Path) -> Path:
+    """Unpack a cached ``release.img.gz`` once, next to it, for every frame to clone."""
+    image_path = archive_path.with_suffix("")
+    with suppress(OSError):
+        if image_path.stat().st_mtime >= archive_path.stat().st_mtime:
+            return image_path
+    partial_path = image_path.with_name(f"{image_path.name}.{os.getpid()}.partial")
+    try:
+        sparse_decompress(archive_path, partial_path)
+        os.replace(partial_path, image_path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+    return image_path
+
+
+_shared_release_image_lock = threading.Lock()
 
 
-def _gunzip_file(source_path: Path, destination_path: Path) -> None:
-    destination_path.parent.mkdir(parents=True, exist_ok=True)
-    with gzip.open(source_path, "rb") as source, destination_path.open("wb") as destination:
-        shutil.copyfileobj(source, destination)
+def _block_compressed_release_image(image_path: Path, split_at: tuple[int, ...]) -> tuple[Path, list[tuple[int, int]]]:
+    """Gzip members of *image_path* with boundaries at *split_at*, cached next to it."""
+    compressed_path = image_path.with_name(f"{image_path.name}.blocks.gz")
+    index_path = image_path.with_name(f"{image_path.name}.blocks.json")
+    stat = image_path.stat()
+    with suppress(OSError, ValueError, KeyError):
+        index = json.loads(index_path.read_text(encoding="utf-8"))
+        members = [(int(raw), int(compressed)) for raw, compressed in index["members"]]
+        raw_offsets = {raw for raw, _compressed in members} | {stat.st_size}
+        if (
+            index["sourceSize"] == stat.st_size
+            and index["sourceMtimeNs"] == stat.st_mtime_ns
+            and compressed_path.stat().st_size == index["size"]
+            and all(offset in raw_offsets for offset in split_at)
+        ):
+            return compressed_path, members
+    members = compress_file(image_path, compressed_path, "gzip", split_at=split_at)
+    index_path.write_text(
+        json.dumps({
+            "sourceSize": stat.st_size,
+            "sourceMtimeNs": stat.st_mtime_ns,
+            "size": compressed_path.stat().st_size,
+            "members": members,
+        }),
+        encoding="utf-8",
+    )
+    return compressed_path, members
+
+
+def _compose_virtual_precompiled_image(archive_path: Path, payload: bytes, manifest_path: Path) -> bool:
+    """Write a virtual personalized image over the shared release image; False without a placeholder."""
+    with _shared_release_image_lock:
+        image_path = _decompressed_release_image(archive_path)
+        offset = find_setup_blob_region(image_path)
+        if offset is None:
+            return False
+        compressed_path, members = _block_compressed_release_image(
+            image_path, (offset, offset + SETUP_BLOB_PLACEHOLDER_SIZE)
+        )
+    compose_virtual_setup_blob_image(image_path, compressed_path, members, offset, payload, manifest_path)
+    return True
 
 
 def _mbr_partitions(image_path: Path) -> list[dict[str, int]]:
@@ -4133,9 +4232,9 @@ def _replace_partition(image_path: Path, partitions: list[dict[str, int]], parti
         raise RuntimeError(
             f"{source_path.name} is larger than partition {partition_number}: {source_size} > {partition['size']}"
         )
-    with image_path.open("r+b") as image, source_path.open("rb") as source:
-        image.seek(partition["start"])
-        shutil.copyfileobj(source, image)
+    # Only blocks that differ are written, so a reflinked base keeps sharing
+    # the rest of the partition.
+    write_region(image_path, partition["start"], source_path)
 
 
 def _hostname_for_frame(frame: Frame) -> str:
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import tempfile
 from typing import Any
 
@@ -11,7 +12,14 @@ from sqlalchemy.orm import Session
 from app.models.frame import Frame, update_frame
 from app.models.log import new_log as log
 from app.tasks._frame_deployer import FrameDeployer
-from app.tasks.frame_deploy_workflow import FrameDeployWorkflow, active_deploy_job_key, deploy_lock_key
+from app.tasks.frame_deploy_workflow import (
+    FrameDeployWorkflow,
+    _deploy_uses_remote,
+    active_deploy_job_key,
+    deploy_lock_key,
+)
+from app.utils.remote_exec import ssh_is_configured
+from app.utils.ssh_utils import start_ssh_prewarm
 
 from .utils import get_fresh_frame
 
@@ -119,6 +127,9 @@ async def deploy_frame_task(ctx: dict[str, Any], id: int, task_id: str | None =
         return
 
     await register_active_deploy_job(redis, id, job_id)
+    # Dial the frame while the deploy plans and builds locally; the first
+    # remote command then finds the connection ready.
+    prewarm = start_ssh_prewarm(redis, frame) if ssh_is_configured(frame) and not _deploy_uses_remote(frame) else None
     try:
         with tempfile.TemporaryDirectory() as temp_dir:
             deployer = FrameDeployer(
@@ -150,4 +161,8 @@ async def deploy_frame_task(ctx: dict[str, Any], id: int, task_id: str | None =
         # stuck state but lets job-status consumers see the failure.
         raise
     finally:
+        if prewarm is not None and not prewarm.done():
+            prewarm.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await prewarm
         await clear_active_deploy_job(redis, id, job_id)
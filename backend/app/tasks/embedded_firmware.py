@@ -43,7 +43,11 @@ from app.models.frame import (
     update_frame,
 )
 from app.models.log import new_log as log
+from app.tasks.embedded_ota import archive_ota_image, build_ota_deltas, ota_images_in_use, record_ota_image
 from app.tasks.utils import get_fresh_frame
+from app.utils.artifact_cache import record_artifact_cache_access_async
+from app.utils.env import get_env_int
+from app.utils.file_hash_index import FileHashIndex
 from app.utils.frame_http import _fetch_frame_http_bytes
 from app.utils.token import secure_token
 
@@ -552,15 +556,19 @@ EMBEDDED_REQUIRED_SDKCONFIG = {
     "CONFIG_ESP_ERR_TO_NAME_LOOKUP": "y",
 }
 
-# idf.py builds are not safe to run concurrently in the same build directory
-_build_lock = asyncio.Lock()
-
-# The build writes per-frame state (main/generated_config.h, sdkconfig) into
-# the shared in-tree ESP-IDF project before running idf.py, so two frames
-# building at once — even from different worker processes — would corrupt each
-# other's images. The asyncio lock above only covers one process; this redis
-# key is the cross-process guard.
+# idf.py builds are not safe to run concurrently in the same build directory.
+# Each platform + flash profile has its own (``embedded_build_dir``), holding
+# its sdkconfig, the per-frame generated_config.h and the Nim cache, so builds
+# for different directories run side by side. Two frames sharing a directory
+# would still corrupt each other's images — even from different worker
+# processes — hence one redis lock per directory (this key plus the directory
+# name) on top of the in-process asyncio locks.
+_build_locks: dict[str, asyncio.Lock] = {}
 EMBEDDED_BUILD_LOCK_KEY = "embedded_firmware:build_lock"
+# Builds are CPU- and memory-heavy: at most this many run at once across all
+# workers, whatever their directories.
+EMBEDDED_BUILD_CONCURRENCY = get_env_int("FRAMEOS_EMBEDDED_BUILD_CONCURRENCY", 2)
+EMBEDDED_BUILD_SLOT_KEY = "embedded_firmware:build_slot"
 EMBEDDED_BUILD_LOCK_TTL_SECONDS = int(
     os.environ.get("FRAMEOS_EMBEDDED_BUILD_LOCK_TTL_SECONDS", str(2 * 3600))
 )
@@ -572,12 +580,16 @@ EMBEDDED_BUILD_LOCK_POLL_SECONDS = float(
 )
 
 
-async def _acquire_embedded_build_lock(redis: Redis) -> str:
-    """Blockingly acquire the global firmware build lock; returns the token."""
+def embedded_build_lock_key(build_dir: Path) -> str:
+    return f"{EMBEDDED_BUILD_LOCK_KEY}:{build_dir.name}"
+
+
+async def _acquire_embedded_build_lock(redis: Redis, lock_key: str = EMBEDDED_BUILD_LOCK_KEY) -> str:
+    """Blockingly acquire a firmware build directory lock; returns the token."""
     token = secure_token(16)
     deadline = time.monotonic() + EMBEDDED_BUILD_LOCK_WAIT_SECONDS
     while not await redis.set(
-        EMBEDDED_BUILD_LOCK_KEY, token, nx=True, ex=EMBEDDED_BUILD_LOCK_TTL_SECONDS
+        lock_key, token, nx=True, ex=EMBEDDED_BUILD_LOCK_TTL_SECONDS
     ):
         if time.monotonic() >= deadline:
             raise ValueError(
@@ -588,12 +600,32 @@ async def _acquire_embedded_build_lock(redis: Redis) -> str:
     return token
 
 
-async def _release_embedded_build_lock(redis: Redis, token: str) -> None:
+async def _release_embedded_build_lock(redis: Redis, token: str, lock_key: str = EMBEDDED_BUILD_LOCK_KEY) -> None:
     # Delete only our own token: the TTL may have expired and another build
     # may legitimately hold the lock now.
-    current = await redis.get(EMBEDDED_BUILD_LOCK_KEY)
+    current = await redis.get(lock_key)
     if current is not None and current.decode(errors="replace") == token:
-        await redis.delete(EMBEDDED_BUILD_LOCK_KEY)
+        await redis.delete(lock_key)
+
+
+async def _acquire_embedded_build_slot(redis: Redis) -> tuple[str, str]:
+    """Wait for one of the EMBEDDED_BUILD_CONCURRENCY global build slots.
+
+    Returns ``(slot key, token)`` for ``_release_embedded_build_lock``.
+    """
+    token = secure_token(16)
+    deadline = time.monotonic() + EMBEDDED_BUILD_LOCK_WAIT_SECONDS
+    while True:
+        for index in range(max(EMBEDDED_BUILD_CONCURRENCY, 1)):
+            slot_key = f"{EMBEDDED_BUILD_SLOT_KEY}:{index}"
+            if await redis.set(slot_key, token, nx=True, ex=EMBEDDED_BUILD_LOCK_TTL_SECONDS):
+                return slot_key, token
+        if time.monotonic() >= deadline:
+            raise ValueError(
+                f"{EMBEDDED_BUILD_CONCURRENCY} embedded firmware builds are already running; "
+                "try again once one finishes."
+            )
+        await asyncio.sleep(EMBEDDED_BUILD_LOCK_POLL_SECONDS)
 
 
 def normalize_embedded_platform(platform: str | None) -> str:
@@ -881,6 +913,11 @@ def _firmware_source_files() -> tuple[list[tuple[str, Path | None]], tuple[tuple
     return entries, tuple(signature)
 
 
+def embedded_source_index_path() -> Path:
+    # .cache is ignored by git and by the fingerprint itself.
+    return EMBEDDED_PROJECT_DIR / ".cache" / "source-index.json"
+
+
 def embedded_firmware_source_fingerprint() -> str:
     """Fingerprint of the source trees a firmware image is built from, so
     cached builds go stale when the code changes — not only when the frame's
@@ -899,15 +936,17 @@ def embedded_firmware_source_fingerprint() -> str:
         _source_fingerprint_cache = (now, signature, fingerprint)
         return fingerprint
 
+    # Per-file hashes persist across restarts and worker processes; only
+    # files whose size or mtime changed are read again.
+    index = FileHashIndex(embedded_source_index_path())
     digest = hashlib.sha256()
     for label, path in entries:
         digest.update(label.encode("utf-8"))
         digest.update(b"\0")
         if path is not None:
-            with path.open("rb") as source:
-                for chunk in iter(lambda: source.read(1024 * 1024), b""):
-                    digest.update(chunk)
+            digest.update(index.sha256(path).encode("ascii"))
         digest.update(b"\0")
+    index.save()
     fingerprint = f"sha256:{digest.hexdigest()}"
     _source_fingerprint_cache = (now, signature, fingerprint)
     return fingerprint
@@ -1871,6 +1910,174 @@ async def request_pending_embedded_firmware_ota(db: Session, redis: Redis, frame
     return True
 
 
+EMBEDDED_BUILD_CACHE_ENTRIES = get_env_int("FRAMEOS_EMBEDDED_BUILD_CACHE_ENTRIES", 16)
+_EMBEDDED_BUILD_OUTPUTS = {
+    "merged": "merged-binary.bin",
+    "ota": "frameos_esp32.bin",
+}
+
+
+def embedded_build_cache_dir() -> Path:
+    return embedded_artifact_dir() / "builds"
+
+
+def embedded_firmware_build_key(inputs: dict[str, Any]) -> str:
+    """Everything an image depends on: the build *inputs* (generated config,
+    sdkconfig, toolchain paths, flags) plus the firmware version and the
+    source fingerprint.
+
+    The generated config bakes in the frame's ID, API key, hostname and
+    Wi-Fi, so keys are per frame: the cache saves rebuilding the same frame
+    (a re-requested build, an OTA retry, a settings change that compiles to
+    the same image), not building a second identical frame."""
+    payload = {
+        **inputs,
+        "firmwareVersion": EMBEDDED_FIRMWARE_VERSION,
+        "sourceFingerprint": embedded_firmware_source_fingerprint(),
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def cached_embedded_firmware_build(build_key: str) -> dict[str, Any] | None:
+    """The outputs of an earlier build with the same key, if still on disk."""
+    entry = embedded_build_cache_dir() / build_key[:32]
+    try:
+        meta = json.loads((entry / "meta.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(meta, dict) or meta.get("buildKey") != build_key:
+        return None
+    outputs: dict[str, Any] = {**meta}
+    for name, filename in _EMBEDDED_BUILD_OUTPUTS.items():
+        path = entry / filename
+        if not path.is_file():
+            return None
+        outputs[name] = path
+    # Recently used entries survive eviction longest.
+    os.utime(entry)
+    return outputs
+
+
+def store_embedded_firmware_build(build_key: str, build_dir: Path) -> dict[str, Any]:
+    """Copy a finished build's outputs into the cache; returns them as
+    ``cached_embedded_firmware_build`` would."""
+    cache_dir = embedded_build_cache_dir()
+    entry = cache_dir / build_key[:32]
+    partial = cache_dir / f".{build_key[:32]}.{os.getpid()}.partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    partial.mkdir(parents=True)
+    try:
+        for filename in _EMBEDDED_BUILD_OUTPUTS.values():
+            shutil.copyfile(build_dir / filename, partial / filename)
+        meta = {
+            "buildKey": build_key,
+            "appSize": (build_dir / "frameos_esp32.bin").stat().st_size,
+            "bootloaderSize": (build_dir / "bootloader" / "bootloader.bin").stat().st_size,
+            "partitionTableSize": (build_dir / "partition_table" / "partition-table.bin").stat().st_size,
+            "elfSha256": _sha256(build_dir / "frameos_esp32.elf"),
+        }
+        (partial / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(partial, entry)
+    finally:
+        shutil.rmtree(partial, ignore_errors=True)
+    _evict_embedded_build_cache(cache_dir, entry)
+    return {**meta, **{name: entry / filename for name, filename in _EMBEDDED_BUILD_OUTPUTS.items()}}
+
+
+def _evict_embedded_build_cache(cache_dir: Path, keep: Path) -> None:
+    entries = [
+        path for path in cache_dir.iterdir()
+        if path.is_dir() and not path.name.startswith(".") and path != keep
+    ]
+    entries.sort(key=lambda path: path.stat().st_mtime_ns, reverse=True)
+    for stale in entries[max(EMBEDDED_BUILD_CACHE_ENTRIES, 1) - 1:]:
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+async def _run_embedded_idf_build(
+    db: Session,
+    redis: Redis,
+    frame: Frame,
+    *,
+    build_key: str,
+    build_dir: Path,
+    command: str,
+    env: dict[str, str],
+    generated_header: Path,
+    generated_config: str,
+    required_sdkconfig: dict[str, str],
+) -> dict[str, Any]:
+    """Run idf.py in *build_dir* under its directory lock and a global slot,
+    then store the outputs in the build cache before the lock is released:
+    once it is, another frame's build may overwrite *build_dir*."""
+    lock_key = embedded_build_lock_key(build_dir)
+    build_lock_token = await _acquire_embedded_build_lock(redis, lock_key)
+    try:
+        slot_key, slot_token = await _acquire_embedded_build_slot(redis)
+        try:
+            async with _build_locks.setdefault(build_dir.name, asyncio.Lock()):
+                reset_sdkconfig = _reset_stale_embedded_sdkconfig(build_dir, required_sdkconfig)
+                if reset_sdkconfig:
+                    reset_keys = ", ".join(f"{key}={value}" for key, value in sorted(reset_sdkconfig.items()))
+                    await log(db, redis, int(frame.id), "stdout",
+                              f"Regenerating ESP32 sdkconfig for required defaults: {reset_keys}")
+                # After the reset, which may have removed the whole directory.
+                build_dir.mkdir(parents=True, exist_ok=True)
+                generated_header.write_text(generated_config)
+
+                process = await asyncio.create_subprocess_exec(
+                    "bash", "-c", command,
+                    cwd=str(EMBEDDED_PROJECT_DIR),
+                    env=env,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                )
+                output_tail: list[str] = []
+                assert process.stdout is not None
+                last_heartbeat = datetime.now(timezone.utc)
+                while True:
+                    line = await process.stdout.readline()
+                    if not line:
+                        break
+                    text = line.decode("utf-8", errors="replace").rstrip()
+                    if text:
+                        output_tail.append(text)
+                        del output_tail[:-50]
+                    now = datetime.now(timezone.utc)
+                    if (now - last_heartbeat).total_seconds() >= 15:
+                        last_heartbeat = now
+                        frame = get_fresh_frame(db, int(frame.id)) or frame
+                        current = latest_embedded_firmware(frame) or {}
+                        if current.get("status") == "building":
+                            await _set_firmware_status(db, redis, frame, {**current, "lastHeartbeatAt": _utc_now()})
+                returncode = await process.wait()
+                if returncode != 0:
+                    tail = "\n".join(output_tail[-20:])
+                    raise ValueError(f"idf.py build failed with exit code {returncode}:\n{tail}")
+                _check_embedded_build_outputs(build_dir, required_sdkconfig)
+                return store_embedded_firmware_build(build_key, build_dir)
+        finally:
+            await _release_embedded_build_lock(redis, slot_token, slot_key)
+    finally:
+        await _release_embedded_build_lock(redis, build_lock_token, lock_key)
+
+
+def _check_embedded_build_outputs(build_dir: Path, required_sdkconfig: dict[str, str]) -> None:
+    missing_sdkconfig = _missing_required_sdkconfig(build_dir / "sdkconfig", required_sdkconfig)
+    if missing_sdkconfig:
+        missing = ", ".join(f"{key}={value}" for key, value in sorted(missing_sdkconfig.items()))
+        raise ValueError(f"ESP32 sdkconfig is missing required defaults after build: {missing}")
+
+    # The app artifact is the bare app image. OTA-capable profiles flash it
+    # into the inactive ota_0/ota_1 slot; 4MB builds keep it only for size/hash
+    # metadata because that partition table has a single factory app.
+    for filename in ("merged-binary.bin", "frameos_esp32.bin", "frameos_esp32.elf"):
+        if not (build_dir / filename).is_file():
+            raise ValueError(f"Build succeeded but {build_dir / filename} was not produced")
+
+
 async def embedded_firmware_task(ctx: dict[str, Any], id: int, request_id: str | None = None):
     db: Session = ctx["db"]
     redis: Redis = ctx["redis"]
@@ -1963,13 +2170,15 @@ async def _build_firmware(db: Session, redis: Redis, frame: Frame, request_id: s
         await log(db, redis, int(frame.id), "stdout", f"Using explicit Pixie override at {pixie_path}")
 
     # Per-frame compile-time defaults (backend URL, API key, panel, pins, Wi-Fi).
-    # Written to disk only under the build lock below: the header lives in the
-    # shared in-tree project, so writing it while another frame builds would
-    # bake this frame's credentials into the other frame's image.
+    # Written into this build's own directory, under its lock below, and
+    # handed to CMake by path: builds in other directories never see it. The
+    # Nim runtime is compiled into the build directory for the same reason.
     wifi_ssid, wifi_password = embedded_wifi_credentials(frame)
-    generated_header = EMBEDDED_PROJECT_DIR / "main" / "generated_config.h"
+    generated_header = build_dir / "generated_config.h"
     generated_config = _generated_config_header(frame, wifi_ssid=wifi_ssid, wifi_password=wifi_password)
     generated_config_hash = hashlib.sha256(generated_config.encode("utf-8")).hexdigest()
+    env["FRAMEOS_GENERATED_CONFIG_HEADER"] = str(generated_header)
+    env["FRAMEOS_NIMCACHE_DIR"] = str(build_dir / "nimcache")
 
     # Fallback demo-scene parameters: interpreted scenes are loaded at runtime,
     # but this define gives the built-in demo a frame-specific label. Keep the
@@ -2007,77 +2216,45 @@ async def _build_firmware(db: Session, redis: Redis, frame: Frame, request_id: s
                f'{idf_base} -D SDKCONFIG_DEFAULTS={shlex.quote(sdkconfig_defaults)} '
                f'reconfigure >/dev/null && {idf_base} build merge-bin')
 
-    build_lock_token = await _acquire_embedded_build_lock(redis)
-    try:
-        async with _build_lock:
-            generated_header.write_text(generated_config)
-            reset_sdkconfig = _reset_stale_embedded_sdkconfig(build_dir, required_sdkconfig)
-            if reset_sdkconfig:
-                reset_keys = ", ".join(f"{key}={value}" for key, value in sorted(reset_sdkconfig.items()))
-                await log(db, redis, int(frame.id), "stdout",
-                          f"Regenerating ESP32 sdkconfig for required defaults: {reset_keys}")
-
-            process = await asyncio.create_subprocess_exec(
-                "bash", "-c", command,
-                cwd=str(EMBEDDED_PROJECT_DIR),
-                env=env,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT,
-            )
-            output_tail: list[str] = []
-            assert process.stdout is not None
-            last_heartbeat = datetime.now(timezone.utc)
-            while True:
-                line = await process.stdout.readline()
-                if not line:
-                    break
-                text = line.decode("utf-8", errors="replace").rstrip()
-                if text:
-                    output_tail.append(text)
-                    del output_tail[:-50]
-                now = datetime.now(timezone.utc)
-                if (now - last_heartbeat).total_seconds() >= 15:
-                    last_heartbeat = now
-                    frame = get_fresh_frame(db, int(frame.id)) or frame
-                    current = latest_embedded_firmware(frame) or {}
-                    if current.get("status") == "building":
-                        await _set_firmware_status(db, redis, frame, {**current, "lastHeartbeatAt": _utc_now()})
-            returncode = await process.wait()
-    finally:
-        await _release_embedded_build_lock(redis, build_lock_token)
-
-    if returncode != 0:
-        tail = "\n".join(output_tail[-20:])
-        raise ValueError(f"idf.py build failed with exit code {returncode}:\n{tail}")
-
-    missing_sdkconfig = _missing_required_sdkconfig(build_dir / "sdkconfig", required_sdkconfig)
-    if missing_sdkconfig:
-        missing = ", ".join(f"{key}={value}" for key, value in sorted(missing_sdkconfig.items()))
-        raise ValueError(f"ESP32 sdkconfig is missing required defaults after build: {missing}")
-
-    merged_bin = build_dir / "merged-binary.bin"
-    if not merged_bin.is_file():
-        raise ValueError(f"Build succeeded but {merged_bin} was not produced")
-
-    # The app artifact is the bare app image. OTA-capable profiles flash it
-    # into the inactive ota_0/ota_1 slot; 4MB builds keep it only for size/hash
-    # metadata because that partition table has a single factory app.
-    ota_bin = build_dir / "frameos_esp32.bin"
-    if not ota_bin.is_file():
-        raise ValueError(f"Build succeeded but {ota_bin} was not produced")
-    ota_elf = build_dir / "frameos_esp32.elf"
-    if not ota_elf.is_file():
-        raise ValueError(f"Build succeeded but {ota_elf} was not produced")
+    build_key = embedded_firmware_build_key({
+        "generatedConfig": generated_config,
+        "platform": platform,
+        "flashProfile": flash_profile,
+        "sdkconfigDefaults": sdkconfig_defaults,
+        "requiredSdkconfig": required_sdkconfig,
+        "panel": selected_panel,
+        "nimStep": nim_step,
+        "nimFlags": env.get("FRAMEOS_EXTRA_NIM_FLAGS", ""),
+        "pixie": str(pixie_path or ""),
+        "idfPath": str(idf_path),
+    })
+    outputs = cached_embedded_firmware_build(build_key)
+    if outputs is not None:
+        await log(db, redis, int(frame.id), "stdout",
+                  f"Reusing cached firmware build {build_key[:12]} (same config and sources)")
+        await record_artifact_cache_access_async(outputs["merged"], hit=True)
+    else:
+        outputs = await _run_embedded_idf_build(
+            db, redis, frame,
+            build_key=build_key,
+            build_dir=build_dir,
+            command=command,
+            env=env,
+            generated_header=generated_header,
+            generated_config=generated_config,
+            required_sdkconfig=required_sdkconfig,
+        )
+        await record_artifact_cache_access_async(outputs["merged"], hit=False)
 
     artifact_dir = embedded_artifact_dir()
     artifact_dir.mkdir(parents=True, exist_ok=True)
     filename = f"frameos-{platform}-frame{frame.id}.bin"
     artifact_path = artifact_dir / filename
-    shutil.copyfile(merged_bin, artifact_path)
+    shutil.copyfile(outputs["merged"], artifact_path)
     ota_filename = f"frameos-{platform}-frame{frame.id}-ota.bin"
     ota_artifact_path = artifact_dir / ota_filename
     if flash_profile["otaSupported"]:
-        shutil.copyfile(ota_bin, ota_artifact_path)
+        shutil.copyfile(outputs["ota"], ota_artifact_path)
 
     frame = get_fresh_frame(db, int(frame.id)) or frame
     current = latest_embedded_firmware(frame) or {}
@@ -2100,21 +2277,35 @@ async def _build_firmware(db: Session, redis: Redis, frame: Frame, request_id: s
         "panel": selected_panel,
         "configHash": generated_config_hash,
         "sourceFingerprint": embedded_firmware_source_fingerprint(),
-        "appSize": ota_bin.stat().st_size,
-        "bootloaderSize": (build_dir / "bootloader" / "bootloader.bin").stat().st_size,
-        "partitionTableSize": (build_dir / "partition_table" / "partition-table.bin").stat().st_size,
-        "otaElfSha256": _sha256(ota_elf),
+        "appSize": outputs["appSize"],
+        "bootloaderSize": outputs["bootloaderSize"],
+        "partitionTableSize": outputs["partitionTableSize"],
+        "otaElfSha256": outputs["elfSha256"],
+        "buildKey": build_key,
         "startedAt": current.get("startedAt") or started_at,
         "completedAt": _utc_now(),
         "downloadUrl": embedded_firmware_download_url(int(frame.id), merged_sha256),
     }
     if flash_profile["otaSupported"]:
+        ota_sha256 = _sha256(ota_artifact_path)
         ready_status = {
             **ready_status,
             "otaPath": str(ota_artifact_path),
             "otaSize": ota_artifact_path.stat().st_size,
-            "otaSha256": _sha256(ota_artifact_path),
+            "otaSha256": ota_sha256,
         }
+        # Devices download (and diff against) the archived copy, which a
+        # later rebuild cannot overwrite.
+        archive_ota_image(ota_artifact_path, ota_sha256)
+        frame.embedded = record_ota_image(dict(frame.embedded or {}), {
+            "sha256": ota_sha256,
+            "elfSha256": ready_status["otaElfSha256"],
+            "size": ready_status["otaSize"],
+            "builtAt": ready_status["completedAt"],
+        }, in_use=ota_images_in_use(db, exclude_frame_id=int(frame.id)))
+        # Diffed here, once per build, so the manifest a device polls only
+        # has to look for the patch.
+        await asyncio.to_thread(build_ota_deltas, frame.embedded, ota_sha256)
     await _set_firmware_status(db, redis, frame, ready_status)
     await log(db, redis, int(frame.id), "stdout",
               f"{platform_spec['label']} firmware ready: {filename} ({artifact_path.stat().st_size} bytes)")
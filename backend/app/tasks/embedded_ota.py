@@ -0,0 +1,199 @@
+"""OTA image archive and binary deltas for embedded (ESP32) frames.
+
+Every OTA-capable firmware build is archived by content (``ota/<sha256>.bin``
+next to the firmware artifacts) and remembered in the frame's
+``embedded.otaImages`` list, newest last. Identical builds for several frames
+share one archived file, which is deleted once no frame's history lists it.
+That gives the device endpoints:
+
+- a stable file per ``otaSha256``, so a resumed ``Range`` download never
+  splices two builds together even when a rebuild overwrites the frame's
+  ``otaPath`` mid-download;
+- the bytes of the build a device is running (matched by the ``elfSha256``
+  it reports in its bootup log) to diff the new build against.
+
+Deltas use the detools sequential patch format with heatshrink compression,
+the format ESP-IDF's ``esp_delta_ota`` component applies on-device. The
+firmware build diffs every archived image in the history against the new one
+and caches the patches under ``ota/delta/``; the manifest only offers a patch
+that already exists. ``detools`` is an optional dependency and without it
+every device gets the full image.
+"""
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable
+
+from sqlalchemy.orm import Session
+
+from app.models.frame import Frame
+from app.utils.env import get_env_float
+
+OTA_DELTA_FORMAT = "detools-sequential-heatshrink"
+# A delta must be at most this fraction of the full image to be offered.
+OTA_DELTA_MAX_RATIO = get_env_float("FRAMEOS_OTA_DELTA_MAX_RATIO", 0.7)
+EMBEDDED_OTA_HISTORY = 4
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _detools():
+    try:
+        import detools
+    except ImportError:
+        return None
+    return detools
+
+
+def ota_delta_available() -> bool:
+    return _detools() is not None
+
+
+def embedded_ota_dir() -> Path:
+    from app.tasks.embedded_firmware import embedded_artifact_dir
+
+    return embedded_artifact_dir() / "ota"
+
+
+def ota_archive_path(sha256: str) -> Path:
+    if not SHA256_PATTERN.match(sha256):
+        raise ValueError(f"Invalid OTA image sha256: {sha256!r}")
+    return embedded_ota_dir() / f"{sha256}.bin"
+
+
+def ota_delta_path(from_sha256: str, to_sha256: str) -> Path:
+    if not SHA256_PATTERN.match(from_sha256) or not SHA256_PATTERN.match(to_sha256):
+        raise ValueError("Invalid OTA image sha256")
+    return embedded_ota_dir() / "delta" / f"{from_sha256[:32]}-{to_sha256[:32]}.patch"
+
+
+def archive_ota_image(path: Path, sha256: str) -> Path:
+    """Keep a content-addressed copy of the OTA image at *path*."""
+    archived = ota_archive_path(sha256)
+    if archived.is_file():
+        return archived
+    partial = _partial_path(archived)
+    try:
+        # A copy, not a hard link: builds rewrite ``otaPath`` in place.
+        shutil.copyfile(path, partial)
+        os.replace(partial, archived)
+    finally:
+        partial.unlink(missing_ok=True)
+    return archived
+
+
+def _partial_path(path: Path) -> Path:
+    """A fresh temp file next to *path*: two jobs writing the same output in
+    one process must not share it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, partial = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".partial", dir=path.parent)
+    os.close(fd)
+    return Path(partial)
+
+
+def ota_images(embedded: Any) -> list[dict[str, Any]]:
+    images = embedded.get("otaImages") if isinstance(embedded, dict) else None
+    if not isinstance(images, list):
+        return []
+    return [
+        image for image in images
+        if isinstance(image, dict) and isinstance(image.get("sha256"), str)
+        and SHA256_PATTERN.match(image["sha256"])
+    ]
+
+
+def ota_images_in_use(db: Session, exclude_frame_id: int | None = None) -> set[str]:
+    """Hashes of the archived images listed by any frame but *exclude_frame_id*."""
+    query = db.query(Frame.embedded).filter(Frame.embedded.isnot(None))
+    if exclude_frame_id is not None:
+        query = query.filter(Frame.id != exclude_frame_id)
+    return {image["sha256"] for (embedded,) in query for image in ota_images(embedded)}
+
+
+def record_ota_image(embedded: dict[str, Any], image: dict[str, Any], *, in_use: Iterable[str] = ()) -> dict[str, Any]:
+    """Return *embedded* with *image* appended to ``otaImages``.
+
+    Archived images (and their deltas) that fall out of the history are
+    deleted, unless another frame still lists them in *in_use*.
+    """
+    history = [entry for entry in ota_images(embedded) if entry["sha256"] != image["sha256"]]
+    history.append(image)
+    dropped, history = history[:-EMBEDDED_OTA_HISTORY], history[-EMBEDDED_OTA_HISTORY:]
+    in_use = set(in_use)
+    for entry in dropped:
+        if entry["sha256"] not in in_use:
+            _forget_ota_image(entry["sha256"])
+    return {**embedded, "otaImages": history}
+
+
+def _forget_ota_image(sha256: str) -> None:
+    ota_archive_path(sha256).unlink(missing_ok=True)
+    delta_dir = embedded_ota_dir() / "delta"
+    if not delta_dir.is_dir():
+        return
+    for patch in delta_dir.iterdir():
+        if sha256[:32] in patch.stem.split("-"):
+            patch.unlink(missing_ok=True)
+
+
+def running_ota_image(embedded: Any) -> dict[str, Any] | None:
+    """The archived image whose ELF hash matches the device's last bootup."""
+    last_boot = embedded.get("lastBoot") if isinstance(embedded, dict) else None
+    elf_sha256 = last_boot.get("elfSha256") if isinstance(last_boot, dict) else None
+    if not isinstance(elf_sha256, str) or len(elf_sha256) < 8:
+        return None
+    for image in reversed(ota_images(embedded)):
+        manifest_elf = image.get("elfSha256")
+        # The device may report a truncated hash (esp_app_get_elf_sha256).
+        if isinstance(manifest_elf, str) and manifest_elf.startswith(elf_sha256.lower()):
+            return image
+    return None
+
+
+def build_ota_delta(from_path: Path, to_path: Path, delta_path: Path) -> Path | None:
+    """Create (or reuse) the patch turning *from_path* into *to_path*.
+
+    Returns None when detools is unavailable or the patch would not be
+    meaningfully smaller than the full image. Blocking, and slow on large
+    images: run it from the build, never from a device request.
+    """
+    if delta_path.is_file():
+        return delta_path
+    # Remembers a pair whose patch came out too big, so it is not diffed again.
+    too_big = delta_path.with_suffix(".full")
+    if too_big.exists():
+        return None
+    detools = _detools()
+    if detools is None:
+        return None
+    partial = _partial_path(delta_path)
+    try:
+        with from_path.open("rb") as ffrom, to_path.open("rb") as fto, partial.open("wb") as fpatch:
+            detools.create_patch(ffrom, fto, fpatch, compression="heatshrink", patch_type="sequential")
+        if partial.stat().st_size > to_path.stat().st_size * OTA_DELTA_MAX_RATIO:
+            too_big.touch()
+            return None
+        os.replace(partial, delta_path)
+    finally:
+        partial.unlink(missing_ok=True)
+    return delta_path
+
+
+def build_ota_deltas(embedded: Any, to_sha256: str) -> list[Path]:
+    """Patches to the archived image *to_sha256* from every other image in
+    the history, whichever of them a device may still be running."""
+    to_path = ota_archive_path(to_sha256)
+    if not ota_delta_available() or not to_path.is_file():
+        return []
+    deltas = []
+    for image in ota_images(embedded):
+        from_path = ota_archive_path(image["sha256"])
+        if image["sha256"] == to_sha256 or not from_path.is_file():
+            continue
+        delta = build_ota_delta(from_path, to_path, ota_delta_path(image["sha256"], to_sha256))
+        if delta is not None:
+            deltas.append(delta)
+    return deltas
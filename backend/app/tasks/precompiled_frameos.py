@@ -11,13 +11,13 @@ from dataclasses import dataclass
 from pathlib import Path
 from urllib.parse import urljoin
 
-import httpx
-
 from app.codegen.drivers_nim import COMPILATION_MODE_SHARED
 from app.codegen.release_drivers_nim import release_driver_specs
 from app.drivers.devices import drivers_for_frame
 from app.models.frame import Frame
 from app.tasks._frame_deployer import FrameDeployer
+from app.utils.artifact_cache import record_artifact_cache_access_async
+from app.utils.downloads import download_file
 from app.utils.versions import get_versions
 
 RELEASE_BASE_URL = os.environ.get(
@@ -170,30 +170,23 @@ async def _cached_release_archive(
     cache_path = precompiled_frameos_cache_path(url)
     if _has_cached_archive(cache_path):
         await logger("stdout", f"Using cached precompiled {label} release for {target}")
+        await record_artifact_cache_access_async(cache_path, hit=True)
         return cache_path, True
 
     await logger("stdout", f"Downloading precompiled {label} release for {target}")
     cache_path.parent.mkdir(parents=True, exist_ok=True)
     if _has_cached_archive(cache_path):
         await logger("stdout", f"Using cached precompiled {label} release for {target}")
+        await record_artifact_cache_access_async(cache_path, hit=True)
         return cache_path, True
 
-    temp_path: Path | None = None
-    try:
-        with tempfile.NamedTemporaryFile(
-            prefix=f".{cache_path.name}.",
-            suffix=".part",
-            dir=cache_path.parent,
-            delete=False,
-        ) as temp_file:
-            temp_path = Path(temp_file.name)
-        await _download(url, temp_path, timeout)
-        if not _has_cached_archive(temp_path):
-            raise RuntimeError("Downloaded precompiled FrameOS release was empty")
-        os.replace(temp_path, cache_path)
-    finally:
-        if temp_path is not None:
-            temp_path.unlink(missing_ok=True)
+    # Straight into the cache path: an interrupted download leaves a
+    # ``.part`` file the next attempt resumes.
+    await _download(url, cache_path, timeout)
+    if not _has_cached_archive(cache_path):
+        cache_path.unlink(missing_ok=True)
+        raise RuntimeError("Downloaded precompiled FrameOS release was empty")
+    await record_artifact_cache_access_async(cache_path, hit=False)
     return cache_path, False
 
 
@@ -205,12 +198,7 @@ def _has_cached_archive(path: Path) -> bool:
 
 
 async def _download(url: str, destination: Path, timeout: float) -> None:
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-        async with client.stream("GET", url) as response:
-            response.raise_for_status()
-            with destination.open("wb") as fh:
-                async for chunk in response.aiter_bytes():
-                    fh.write(chunk)
+    await download_file(url, destination, timeout=timeout)
 
 
 def _safe_extract(tar: tarfile.TarFile, path: Path) -> None:
@@ -10,15 +10,23 @@ never changes because the file keeps its exact size.
 
 The payload is a gzipped POSIX tar of the /boot/frameos-* personalization
 files; busybox `gunzip | tar -x` unpacks it in the first-boot script.
+
+Since the personalized image is the release image plus that one region,
+`compose_virtual_setup_blob_image` can also skip the copy altogether and
+describe it as an extent map over the shared release image (and a
+block-compressed copy of it), storing only the region's non-padding bytes.
 """
 from __future__ import annotations
 
 import gzip
 import io
 import mmap
+import re
 import tarfile
 from pathlib import Path
 
+from app.utils.compression import block_compressor
+from app.utils.virtual_image import Extent, VirtualImage, write_virtual_image_manifest
 from app.tasks.setup_json_reset import (
     SETUP_BLOB_MAGIC,
     SETUP_BLOB_MEMBERS,
@@ -61,52 +69,95 @@ def build_setup_blob_payload(boot_files: dict[str, bytes]) -> bytes:
     return buffer.getvalue()
 
 
-def _region_is_pristine(region: memoryview) -> bool:
+# What breaks the placeholder's shape: a byte outside tab..'~', or a line
+# that does not start with '#' (empty lines are fine). Each is looked for
+# with a C-speed pass over the whole region — memchr for the control bytes,
+# bytes.isascii, one literal-prefixed regex — never a per-byte Python loop.
+_CONTROL_BYTES = tuple(bytes([value]) for value in (*range(0x09), 0x7F))
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+_BAD_LINE_START = re.compile(rb"\n[^#\n]")
+
+
+def _region_violation(region: bytes) -> int | None:
+    """Offset of some byte that makes *region* non-pristine, or None.
+
+    Not necessarily the first one: callers only need a witness.
+    """
+    positions = [region.find(byte) for byte in _CONTROL_BYTES]
+    bad_line = _BAD_LINE_START.search(region)
+    if bad_line is not None:
+        positions.append(bad_line.start())
+    violation = max(positions)
+    if violation < 0 and not region.isascii():
+        match = _NON_ASCII.search(region)
+        violation = match.start() if match is not None else -1
+    return violation if violation >= 0 else None
+
+
+def _find_violation(mapped: mmap.mmap, start: int, end: int) -> int | None:
+    """Image offset of a violation in ``mapped[start:end]``, or None.
+
+    Checked in growing windows so a decoy with junk right after its magic
+    costs kilobytes, not a full 8 MiB copy.
+    """
+    window = 64 * 1024
+    position = start
+    while position < end:
+        window_end = min(position + window, end)
+        # One byte of overlap: a newline closing the previous window is
+        # checked against the byte that follows it.
+        window_start = position - 1 if position > start else start
+        violation = _region_violation(mapped[window_start:window_end])
+        if violation is not None:
+            return window_start + violation
+        position = window_end
+        window = min(window * 4, 4 * 1024 * 1024)
+    return None
+
+
+def _region_is_pristine(region) -> bool:
     """True when the bytes after the magic look like the untouched placeholder.
 
     Mirrors the browser patcher's check: ASCII only, every line starting with
     '#'. Anything else is a decoy occurrence of the magic (or an already
     personalized image) and must not be overwritten.
     """
-    at_line_start = False  # the magic line's own newline starts the first line
-    for byte in region:
-        if byte == 0x0A:
-            at_line_start = True
-            continue
-        if at_line_start and byte != 0x23:  # '#'
-            return False
-        at_line_start = False
-        if byte < 0x09 or byte > 0x7E:
-            return False
-    return True
+    return _region_violation(bytes(region)) is None
 
 
 def find_setup_blob_region(
-    image_path: Path, *, search_limit: int = DEFAULT_SEARCH_LIMIT
+    image_path: Path, *, search_limit: int | None = DEFAULT_SEARCH_LIMIT
 ) -> int | None:
-    """Byte offset of the pristine placeholder region in the raw image, or None."""
+    """Byte offset of the pristine placeholder region in the raw image, or None.
+
+    ``search_limit=None`` searches the whole image.
+    """
     file_size = image_path.stat().st_size
     if file_size < len(_MAGIC_BYTES):
         return None
     with image_path.open("rb") as handle:
         with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
-            limit = min(file_size, search_limit)
+            limit = file_size if search_limit is None else min(file_size, search_limit)
             position = 0
+            # A violation found in an earlier candidate's region. Later
+            # candidates whose region starts at or before it contain it too
+            # and need no second scan.
+            violation_at = -1
             while True:
                 offset = mapped.find(_MAGIC_BYTES, position, limit)
                 if offset < 0:
                     return None
-                if offset + SETUP_BLOB_PLACEHOLDER_SIZE > file_size:
+                region_start = offset + len(_MAGIC_BYTES)
+                region_end = offset + SETUP_BLOB_PLACEHOLDER_SIZE
+                if region_end > file_size:
                     return None
-                # A plain bytes copy (8 MiB) rather than a memoryview: a live
-                # view into the mmap would block its close with BufferError.
-                region = mapped[
-                    offset + len(_MAGIC_BYTES) : offset + SETUP_BLOB_PLACEHOLDER_SIZE
-                ]
-                if _region_is_pristine(memoryview(region)):
-                    return offset
-                # A decoy (e.g. the magic quoted inside some other file):
-                # keep scanning one byte later, like the browser patcher.
+                if region_start > violation_at:
+                    violation = _find_violation(mapped, region_start, region_end)
+                    if violation is None:
+                        return offset
+                    violation_at = violation
+                # A decoy (e.g. the magic quoted inside some other file). Like
+                # the browser patcher, keep scanning one byte later.
                 position = offset + 1
 
 
@@ -114,7 +165,7 @@ def patch_setup_blob_into_image(
     image_path: Path,
     payload: bytes,
     *,
-    search_limit: int = DEFAULT_SEARCH_LIMIT,
+    search_limit: int | None = DEFAULT_SEARCH_LIMIT,
 ) -> bool:
     """Overwrite the placeholder region in the raw .img with the payload.
 
@@ -130,3 +181,48 @@ def patch_setup_blob_into_image(
         handle.seek(offset)
         handle.write(region)
     return True
+
+
+def compose_virtual_setup_blob_image(
+    base_image_path: Path,
+    compressed_base_path: Path,
+    compressed_members: list[tuple[int, int]],
+    offset: int,
+    payload: bytes,
+    manifest_path: Path,
+) -> None:
+    """Describe the personalized image as extents over the shared base files.
+
+    *offset* is the placeholder region found in *base_image_path*;
+    *compressed_base_path* is that image compressed into independent gzip
+    members, two of which start exactly at the region's first byte and right
+    after its last (``compressed_members`` maps raw to compressed offsets).
+    Writes the manifest plus a small ``.overlay`` file holding the region's
+    header and payload and the region as one gzip member.
+    """
+    region = render_setup_blob_region(payload)
+    end = offset + SETUP_BLOB_PLACEHOLDER_SIZE
+    compressed_size = compressed_base_path.stat().st_size
+    member_offsets = dict(compressed_members)
+    member_offsets.setdefault(base_image_path.stat().st_size, compressed_size)
+    if offset not in member_offsets or end not in member_offsets:
+        raise ValueError("Compressed base image is not split around the setup blob region")
+    # Everything after header + payload is '#' padding; keep it implicit.
+    head = region.rstrip(b"#")
+    region_gz = block_compressor("gzip")(region)
+    overlay_path = manifest_path.with_name(f"{manifest_path.name}.overlay")
+    overlay_path.write_bytes(head + region_gz)
+
+    base, compressed, overlay = str(base_image_path), str(compressed_base_path), str(overlay_path)
+    raw_image = VirtualImage.from_extents([
+        Extent(offset, base, 0),
+        Extent(len(head), overlay, 0),
+        Extent(len(region) - len(head), fill=ord("#")),
+        Extent(base_image_path.stat().st_size - end, base, end),
+    ])
+    gzip_image = VirtualImage.from_extents([
+        Extent(member_offsets[offset], compressed, 0),
+        Extent(len(region_gz), overlay, len(head)),
+        Extent(compressed_size - member_offsets[end], compressed, member_offsets[end]),
+    ])
+    write_virtual_image_manifest(manifest_path, {"raw": raw_image, "gzip": gzip_image})
@@ -51,10 +51,12 @@ from app.tasks.binary_builder import FrameBinaryBuildResult
 from app.tasks.prebuilt_deps import resolve_prebuilt_target
 from app.tasks.setup_json_reset import (
     DEFAULT_SETUP_JSON_RESET_FILE_PATH,
+    render_setup_blob_placeholder,
     render_setup_json_reset_service,
     render_setup_json_reset_script,
     setup_json_reset_file_path,
 )
+from app.utils.asset_sync import MANIFEST_FILENAME, parse_manifest
 from app.utils.build_executor import BuildHostExecutor
 from app.utils.build_host import BuildHostConfig
 from app.utils.cross_compile import CrossCompiler
@@ -774,6 +776,8 @@ def test_buildroot_sd_image_stages_local_fonts_into_assets_partition(tmp_path, m
     assert (assets_dir / "fonts" / "FrameOSFont.ttf").read_bytes() == b"font"
     assert (assets_dir / "fonts" / "README.md").read_text(encoding="utf-8") == "fonts\n"
     assert not (assets_dir / "fonts" / "ignore.otf").exists()
+    manifest = parse_manifest((assets_dir / MANIFEST_FILENAME).read_bytes())
+    assert sorted(manifest) == ["fonts/FrameOSFont.ttf", "fonts/README.md"]
 
 
 def test_buildroot_sd_image_stages_custom_font_assets(tmp_path, monkeypatch):
@@ -2265,7 +2269,6 @@ def test_buildroot_bootstrap_frame_uses_web_only_and_clears_scenes():
                 "sdImage": {"status": "ready"},
             },
             "rpios": {"compilationMode": "precompiled"},
-            "terminal_history": [],
             "apps": [],
             "image_url": None,
             "background_color": None,
@@ -2448,3 +2451,29 @@ def test_frameos_service_names_network_manager_only_where_it_exists():
     without_nm = render_buildroot_frameos_service(False)
     assert "NetworkManager" not in without_nm
     assert "After=network.target" in without_nm
+
+
+def test_virtual_precompiled_image_reuses_shared_release_files(tmp_path):
+    from app.tasks.sd_image_blob_patch import build_setup_blob_payload
+    from app.utils.virtual_image import load_virtual_image
+
+    image = b"\xa5" * 1_000_000 + render_setup_blob_placeholder() + b"\x5a" * 1_000_000
+    archive = tmp_path / "release.img.gz"
+    archive.write_bytes(gzip.compress(image, mtime=0))
+    payload = build_setup_blob_payload({"frameos-setup.json": b'{"name": "Virtual"}'})
+    first, second = tmp_path / "one.vimg.json", tmp_path / "two.vimg.json"
+
+    assert buildroot_image_module._compose_virtual_precompiled_image(archive, payload, first) is True
+    compressed_base = tmp_path / "release.img.blocks.gz"
+    built_at = compressed_base.stat().st_mtime_ns
+    assert buildroot_image_module._compose_virtual_precompiled_image(archive, payload, second) is True
+
+    assert compressed_base.stat().st_mtime_ns == built_at
+    raw = load_virtual_image(second, "raw")
+    compressed = load_virtual_image(second, "gzip")
+    assert raw is not None and compressed is not None
+    patched = b"".join(raw.iter_bytes())
+    assert len(patched) == len(image)
+    assert patched[:1_000_000] == image[:1_000_000]
+    assert patched[-1_000_000:] == image[-1_000_000:]
+    assert gzip.decompress(b"".join(compressed.iter_bytes())) == patched
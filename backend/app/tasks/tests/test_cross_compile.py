@@ -6,6 +6,7 @@ from types import SimpleNamespace
 import pytest
 
 from app.tasks.prebuilt_deps import PrebuiltEntry, resolve_prebuilt_target
+from app.utils.artifact_cache import artifact_cache_stats
 from app.utils.build_executor import create_build_executor
 from app.utils.cross_compile import CrossCompiler, TargetMetadata
 from app.utils.modal_sandbox import ModalSandboxConfig
@@ -167,6 +168,10 @@ async def test_ensure_prebuilt_component_refreshes_incomplete_cached_artifacts(
     assert download_count == 1
     assert compiler._prebuilt_component_is_valid(component, dest_dir) is True
 
+    assert await compiler._ensure_prebuilt_component(component) == dest_dir
+    prebuilt_stats = next(stats for stats in artifact_cache_stats() if stats.key == "cross-prebuilt")
+    assert (prebuilt_stats.hits, prebuilt_stats.misses) == (1, 1)
+
 
 @pytest.mark.asyncio
 async def test_ensure_prebuilt_component_rejects_invalid_download(tmp_path, monkeypatch: pytest.MonkeyPatch):
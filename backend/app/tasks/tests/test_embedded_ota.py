@@ -0,0 +1,124 @@
+import pytest
+
+from app.models.frame import new_frame
+from app.tasks import embedded_ota
+from app.tasks.embedded_ota import (
+    EMBEDDED_OTA_HISTORY,
+    archive_ota_image,
+    build_ota_delta,
+    build_ota_deltas,
+    ota_archive_path,
+    ota_delta_path,
+    ota_images_in_use,
+    record_ota_image,
+    running_ota_image,
+)
+
+
+def test_history_is_capped_and_drops_archived_images(tmp_path, monkeypatch):
+    monkeypatch.setenv("FRAMEOS_EMBEDDED_ARTIFACT_DIR", str(tmp_path))
+    source = tmp_path / "frameos-ota.bin"
+    embedded: dict = {}
+    shas = [f"{index:02x}" * 32 for index in range(EMBEDDED_OTA_HISTORY + 1)]
+    for sha in shas:
+        source.write_bytes(sha.encode())
+        archive_ota_image(source, sha)
+        embedded = record_ota_image(embedded, {"sha256": sha, "elfSha256": sha[::-1]})
+    delta = ota_delta_path(shas[1], shas[-1])
+    delta.parent.mkdir(parents=True)
+    delta.write_bytes(b"patch")
+
+    embedded = record_ota_image(embedded, {"sha256": "ff" * 32})
+
+    assert [image["sha256"] for image in embedded["otaImages"]] == shas[2:] + ["ff" * 32]
+    assert not ota_archive_path(shas[0]).exists()
+    assert not ota_archive_path(shas[1]).exists()
+    assert not delta.exists()
+    # The archive is a copy: rewriting the build output leaves it intact.
+    source.write_bytes(b"rebuilt")
+    assert ota_archive_path(shas[-1]).read_bytes() == shas[-1].encode()
+
+
+@pytest.mark.asyncio
+async def test_images_shared_with_other_frames_are_kept(db, redis, tmp_path, monkeypatch):
+    monkeypatch.setenv("FRAMEOS_EMBEDDED_ARTIFACT_DIR", str(tmp_path))
+    source = tmp_path / "frameos-ota.bin"
+    shared = "aa" * 32
+    source.write_bytes(b"identical build")
+    archive_ota_image(source, shared)
+    first = await new_frame(db, redis, "First", "localhost", "localhost")
+    second = await new_frame(db, redis, "Second", "localhost", "localhost")
+    second.embedded = {"otaImages": [{"sha256": shared}]}
+    db.commit()
+
+    in_use = ota_images_in_use(db, exclude_frame_id=first.id)
+    assert in_use == {shared}
+    embedded: dict = {"otaImages": [{"sha256": shared}]}
+    for index in range(EMBEDDED_OTA_HISTORY):
+        embedded = record_ota_image(embedded, {"sha256": f"{index:02x}" * 32}, in_use=in_use)
+
+    assert shared not in [image["sha256"] for image in embedded["otaImages"]]
+    # The second frame may still be resuming a download of it.
+    assert ota_archive_path(shared).is_file()
+
+
+def test_running_image_matches_truncated_elf_hash():
+    embedded = {
+        "otaImages": [{"sha256": "11" * 32, "elfSha256": "ab" * 32}, {"sha256": "22" * 32, "elfSha256": "cd" * 32}],
+        "lastBoot": {"elfSha256": "ABABABABABABABAB"},
+    }
+    assert running_ota_image(embedded)["sha256"] == "11" * 32
+    assert running_ota_image({**embedded, "lastBoot": {"version": "1.0"}}) is None
+
+
+def test_oversized_delta_is_remembered_and_not_offered(tmp_path, monkeypatch):
+    calls = []
+
+    class FakeDetools:
+        @staticmethod
+        def create_patch(ffrom, fto, fpatch, **kwargs):
+            calls.append(kwargs)
+            fpatch.write(fto.read())
+
+    monkeypatch.setattr(embedded_ota, "_detools", lambda: FakeDetools)
+    old, new = tmp_path / "old.bin", tmp_path / "new.bin"
+    old.write_bytes(b"a" * 100)
+    new.write_bytes(b"b" * 100)
+    delta = tmp_path / "delta" / "x.patch"
+
+    assert build_ota_delta(old, new, delta) is None
+    assert build_ota_delta(old, new, delta) is None
+    assert len(calls) == 1
+    assert not delta.exists()
+
+
+def test_no_delta_without_detools(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedded_ota, "_detools", lambda: None)
+    (tmp_path / "a").write_bytes(b"a")
+    assert build_ota_delta(tmp_path / "a", tmp_path / "a", tmp_path / "d.patch") is None
+
+
+def test_build_diffs_every_earlier_image_once(tmp_path, monkeypatch):
+    monkeypatch.setenv("FRAMEOS_EMBEDDED_ARTIFACT_DIR", str(tmp_path))
+    diffed = []
+
+    class FakeDetools:
+        @staticmethod
+        def create_patch(ffrom, fto, fpatch, **kwargs):
+            diffed.append(ffrom.read())
+            fpatch.write(b"patch")
+
+    monkeypatch.setattr(embedded_ota, "_detools", lambda: FakeDetools)
+    source = tmp_path / "frameos-ota.bin"
+    embedded: dict = {}
+    shas = [f"{index:02x}" * 32 for index in range(3)]
+    for sha in shas:
+        source.write_bytes(sha.encode() * 10)
+        archive_ota_image(source, sha)
+        embedded = record_ota_image(embedded, {"sha256": sha})
+
+    assert build_ota_deltas(embedded, shas[-1]) == [ota_delta_path(sha, shas[-1]) for sha in shas[:-1]]
+    assert build_ota_deltas(embedded, shas[-1]) == [ota_delta_path(sha, shas[-1]) for sha in shas[:-1]]
+    assert diffed == [sha.encode() * 10 for sha in shas[:-1]]
+    # Temp files are unique per call and never left behind.
+    assert not [path for path in tmp_path.rglob("*.partial")]
@@ -1,6 +1,8 @@
 import importlib.util
+import os
 import shutil
 import sys
+import time
 from pathlib import Path
 
 
@@ -276,3 +278,24 @@ def test_prepare_assets_uses_packaged_frontend_when_shared_sources_are_missing(t
     assert manifest is not None
     assert manifest.frontend_hash == frontend_hash
     assert manifest.modules_hash == modules_hash
+
+
+def test_hash_inputs_reuses_a_persistent_file_hash_index(tmp_path, monkeypatch):
+    frameos_root = create_project_layout(tmp_path)
+    stamp = time.time() - 60
+    for path in tmp_path.rglob("*"):
+        if path.is_file():
+            os.utime(path, (stamp, stamp))
+
+    before = prepare_assets.hash_module_inputs(frameos_root)
+    assert (frameos_root / prepare_assets.HASH_INDEX_PATH).is_file()
+
+    # A later run (e.g. the next `nimble assets`) only stats the inputs.
+    index = prepare_assets.load_hash_index(frameos_root)
+    monkeypatch.setattr(prepare_assets, "load_hash_index", lambda _root: index)
+    assert prepare_assets.hash_module_inputs(frameos_root) == before
+    assert index.hashed == 0
+
+    write(frameos_root / "src" / "apps" / "data" / "sample" / "config.json", "{\"name\":\"Renamed\"}\n")
+    assert prepare_assets.hash_module_inputs(frameos_root) != before
+    assert index.hashed == 1
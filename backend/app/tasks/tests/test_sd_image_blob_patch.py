@@ -4,16 +4,25 @@ from __future__ import annotations
 
 import gzip
 import io
+import mmap
+import os
+import random
 import tarfile
+import time
 from pathlib import Path
 
 import pytest
 
+from app.tasks import sd_image_blob_patch
 from app.tasks.sd_image_blob_patch import (
+    _region_is_pristine,
     build_setup_blob_payload,
+    compose_virtual_setup_blob_image,
     find_setup_blob_region,
     patch_setup_blob_into_image,
 )
+from app.utils.compression import compress_file
+from app.utils.virtual_image import load_virtual_image
 from app.tasks.setup_json_reset import (
     SETUP_BLOB_MAGIC,
     SETUP_BLOB_PLACEHOLDER_SIZE,
@@ -21,6 +30,8 @@ from app.tasks.setup_json_reset import (
     render_setup_blob_region,
 )
 
+DEFAULT_SEARCH_LIMIT = sd_image_blob_patch.DEFAULT_SEARCH_LIMIT
+
 FILES = {
     "frameos-setup.json": b'{"name": "Patched frame"}',
     "frameos-hostname": b"patched-frame\n",
@@ -127,3 +138,176 @@ def test_region_render_is_exactly_placeholder_sized():
     region = render_setup_blob_region(build_setup_blob_payload(FILES))
     assert len(region) == SETUP_BLOB_PLACEHOLDER_SIZE
     assert region.startswith((SETUP_BLOB_MAGIC + "\n").encode("ascii"))
+
+
+def test_virtual_image_matches_in_place_patch(tmp_path):
+    base = _fake_image(tmp_path, decoy=True)
+    patched = tmp_path / "patched.img"
+    patched.write_bytes(base.read_bytes())
+    payload = build_setup_blob_payload(FILES)
+    assert patch_setup_blob_into_image(patched, payload) is True
+    offset = find_setup_blob_region(base)
+    assert offset is not None
+    compressed_base = tmp_path / "fake.img.blocks.gz"
+    members = compress_file(
+        base, compressed_base, "gzip", block_size=512 * 1024, split_at=(offset, offset + SETUP_BLOB_PLACEHOLDER_SIZE)
+    )
+    manifest = tmp_path / "frame.img.vimg.json"
+
+    compose_virtual_setup_blob_image(base, compressed_base, members, offset, payload, manifest)
+
+    expected = patched.read_bytes()
+    raw = load_virtual_image(manifest, "raw")
+    compressed = load_virtual_image(manifest, "gzip")
+    assert raw is not None and compressed is not None
+    assert raw.size == len(expected)
+    assert b"".join(raw.iter_bytes()) == expected
+    assert raw.open().read() == expected
+    assert gzip.decompress(b"".join(compressed.iter_bytes())) == expected
+    # Only the header, payload and a gzip member of the region are stored per image.
+    assert (tmp_path / "frame.img.vimg.json.overlay").stat().st_size < 64 * 1024
+
+
+def test_virtual_image_needs_a_split_compressed_base(tmp_path):
+    base = _fake_image(tmp_path)
+    offset = find_setup_blob_region(base)
+    assert offset is not None
+    compressed_base = tmp_path / "fake.img.blocks.gz"
+    members = compress_file(base, compressed_base, "gzip", block_size=3 * 1024 * 1024)
+    with pytest.raises(ValueError):
+        compose_virtual_setup_blob_image(
+            base, compressed_base, members, offset, build_setup_blob_payload(FILES), tmp_path / "frame.vimg.json"
+        )
+
+
+def _reference_region_is_pristine(region: bytes) -> bool:
+    # The original byte-at-a-time check, kept as the parity oracle.
+    at_line_start = False
+    for byte in region:
+        if byte == 0x0A:
+            at_line_start = True
+            continue
+        if at_line_start and byte != 0x23:
+            return False
+        at_line_start = False
+        if byte < 0x09 or byte > 0x7E:
+            return False
+    return True
+
+
+def _reference_find_setup_blob_region(image_path: Path, search_limit: int) -> int | None:
+    magic = (SETUP_BLOB_MAGIC + "\n").encode("ascii")
+    data = image_path.read_bytes()
+    position = 0
+    while True:
+        offset = data.find(magic, position, min(len(data), search_limit))
+        if offset < 0 or offset + SETUP_BLOB_PLACEHOLDER_SIZE > len(data):
+            return None
+        if _reference_region_is_pristine(data[offset + len(magic) : offset + SETUP_BLOB_PLACEHOLDER_SIZE]):
+            return offset
+        position = offset + 1
+
+
+@pytest.mark.parametrize(
+    "region",
+    [
+        b"",
+        b"# ok\n#\n\n\n# fine\t~\n",
+        b"first byte after the magic is not checked\n# ok",
+        b"# ok\n\n",
+        b"# ok\nx",
+        b"# ok\n\n \n",
+        b"# ok\n#\x7f",
+        b"# tab\t# fine\n#\x08",
+        b"#\r\n#",
+        b"# ok\n\t#",
+        "# \u00e9\n".encode("utf-8"),
+    ],
+)
+def test_region_check_matches_reference(region):
+    assert _region_is_pristine(region) is _reference_region_is_pristine(region)
+
+
+def test_region_check_matches_reference_on_random_regions():
+    rng = random.Random(1234)
+    alphabet = b"#\n\t a~\x7f\x00\r"
+    for _ in range(2000):
+        region = bytes(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        assert _region_is_pristine(region) is _reference_region_is_pristine(region), region
+
+
+def _decoy_image(tmp_path: Path, decoys: list[bytes], *, with_placeholder: bool = True) -> Path:
+    magic = (SETUP_BLOB_MAGIC + "\n").encode("ascii")
+    placeholder = render_setup_blob_placeholder()
+    parts = [b"\xa5" * 4096]
+    for decoy in decoys:
+        parts.append(magic + decoy)
+    if with_placeholder:
+        parts.append(placeholder)
+    parts.append(b"\x5a" * 4096)
+    image = tmp_path / "decoys.img"
+    image.write_bytes(b"".join(parts))
+    return image
+
+
+@pytest.mark.parametrize(
+    "decoys, with_placeholder",
+    [
+        ([b"not a comment\n"], True),
+        # Magic lines back to back: each one's region contains the next one's.
+        ([b"", b"", b"#\n" * 3, b"\x00"], True),
+        # The newline ends the first scan window, the bad line starts the next.
+        ([b"#" * (64 * 1024 - 1) + b"\nx"], True),
+        # A mostly valid region whose only violation sits deep inside it.
+        ([b"#" * (SETUP_BLOB_PLACEHOLDER_SIZE // 2) + b"\n!"], True),
+        ([b"# looks fine\n" * 10 + b"\x01"], False),
+        # An already personalized image: the payload is binary.
+        ([b"size=12\n\x1f\x8b\x08binary"], False),
+    ],
+)
+def test_find_setup_blob_region_matches_reference(tmp_path, decoys, with_placeholder):
+    image = _decoy_image(tmp_path, decoys, with_placeholder=with_placeholder)
+    expected = _reference_find_setup_blob_region(image, DEFAULT_SEARCH_LIMIT)
+    assert find_setup_blob_region(image) == expected
+    assert (expected is None) is not with_placeholder
+
+
+def test_search_limit_none_scans_the_whole_image(tmp_path):
+    image = tmp_path / "late.img"
+    with image.open("wb") as handle:
+        handle.truncate(2 * 1024 * 1024)
+        handle.seek(0, os.SEEK_END)
+        handle.write(render_setup_blob_placeholder())
+    assert find_setup_blob_region(image, search_limit=1024 * 1024) is None
+    assert find_setup_blob_region(image, search_limit=None) == 2 * 1024 * 1024
+
+
+@pytest.mark.skipif(
+    os.environ.get("FRAMEOS_BENCHMARK", "").lower() not in {"1", "true", "yes", "on"},
+    reason="set FRAMEOS_BENCHMARK=1 to run the setup blob scan benchmark",
+)
+def test_benchmark_setup_blob_scan(tmp_path):
+    # 200 decoys, each followed by an almost-pristine region, in front of the
+    # real placeholder: the old scan re-copied and re-walked 8 MiB per decoy.
+    decoys = [b"#\n" * 1000 + b"\x00" for _ in range(200)]
+    image = _decoy_image(tmp_path, decoys)
+    region = render_setup_blob_placeholder()
+
+    started = time.perf_counter()
+    offset = find_setup_blob_region(image, search_limit=None)
+    scan_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    assert _region_is_pristine(region)
+    check_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    assert _reference_region_is_pristine(region)
+    reference_seconds = time.perf_counter() - started
+
+    with image.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        assert mapped[offset : offset + len(region)] == region
+    print(
+        f"\nfind_setup_blob_region with 200 decoys: {scan_seconds * 1000:.1f} ms; "
+        f"8 MiB region check: {check_seconds * 1000:.2f} ms "
+        f"(byte loop: {reference_seconds * 1000:.0f} ms)"
+    )
+    assert check_seconds * 10 < reference_seconds
@@ -60,13 +60,17 @@ async def startup(ctx: Dict[str, Any]):
         # inventory heartbeat, automatic frame backups after deploys).
         from app.cloud.sync import cloud_sync_service
         ctx['cloud_sync_task'] = asyncio.create_task(cloud_sync_service.run())
+        # One prober for the whole fleet, so request handlers can skip frames
+        # that are known to be offline.
+        from app.utils.frame_reachability import frame_reachability_monitor
+        ctx['reachability_task'] = asyncio.create_task(frame_reachability_monitor.run())
     print("Worker startup: created shared HTTPX client and Redis")
 
 # Optional: on_shutdown logic
 async def shutdown(ctx: Dict[str, Any]):
     if 'client' in ctx:
         await ctx['client'].aclose()
-    for task_key in ('ha_sync_task', 'cloud_sync_task'):
+    for task_key in ('ha_sync_task', 'cloud_sync_task', 'reachability_task'):
         if task := ctx.pop(task_key, None):
             task.cancel()
             try:
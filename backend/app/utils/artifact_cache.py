@@ -0,0 +1,418 @@
+"""One disk budget for the backend's artifact caches.
+
+Release archives, SD images, Buildroot output, cross toolchains and embedded
+firmware builds are each cached in their own directory. Every top-level file
+or directory in those areas is one cache entry. A shared JSON index records
+each entry's size and last access, plus per-area hit and miss counters.
+``enforce_artifact_cache_budget`` evicts the least recently used entries
+until the areas fit ``FRAMEOS_CACHE_BUDGET_BYTES`` and the disk keeps
+``FRAMEOS_CACHE_MIN_FREE_BYTES`` free.
+
+Entries are never evicted while pinned:
+
+- ``pinned_artifact_cache_entry`` pins an entry for the duration of a job;
+- every ``record_artifact_cache_access`` leases the entry for a while, so
+  the job that just fetched it can use it;
+- files a ready virtual SD image is composed from are always pinned.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import fcntl
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+from app.utils.dir_size import adjust_directory_size, walk_directory_size
+from app.utils.env import get_env_int
+from app.utils.token import secure_token
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+ARTIFACT_CACHE_INDEX_VERSION = 1
+ARTIFACT_CACHE_BUDGET_BYTES = get_env_int("FRAMEOS_CACHE_BUDGET_BYTES", 50 * 1024**3)
+ARTIFACT_CACHE_MIN_FREE_BYTES = get_env_int("FRAMEOS_CACHE_MIN_FREE_BYTES", 5 * 1024**3)
+# How long an entry stays pinned after it was looked up or stored.
+ARTIFACT_CACHE_LEASE_SECONDS = get_env_int("FRAMEOS_CACHE_LEASE_SECONDS", 3600)
+# Upper bound for a job-scoped pin, in case its worker dies mid-job.
+ARTIFACT_CACHE_PIN_TTL_SECONDS = get_env_int("FRAMEOS_CACHE_PIN_TTL_SECONDS", 6 * 3600)
+# Names that belong to in-progress writes, not to finished entries.
+_IN_PROGRESS_SUFFIXES = (".part", ".part.json", ".partial", ".lock", ".tmp")
+
+
+@dataclass(frozen=True)
+class CacheArea:
+    key: str
+    name: str
+    path: Path
+    # Top-level names that are not entries (e.g. another area nested inside).
+    exclude: frozenset[str] = field(default_factory=frozenset)
+
+
+@dataclass(frozen=True)
+class ArtifactCacheStats:
+    key: str
+    name: str
+    path: Path
+    size_bytes: int
+    entries: int
+    pinned_entries: int
+    hits: int
+    misses: int
+    evictions: int
+
+    @property
+    def hit_rate(self) -> float | None:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
+def artifact_cache_areas() -> list[CacheArea]:
+    # Imported lazily: these modules are heavy and import app.utils themselves.
+    from app.tasks.buildroot_image import (
+        buildroot_base_cache_dir,
+        buildroot_output_cache_dir,
+        buildroot_precompiled_sd_image_cache_dir,
+    )
+    from app.tasks.embedded_firmware import embedded_build_cache_dir
+    from app.tasks.precompiled_frameos import precompiled_frameos_cache_dir
+    from app.utils.cross_compile import cross_cache_root
+
+    cross_root = cross_cache_root()
+    return [
+        CacheArea("precompiled-frameos", "Precompiled FrameOS releases", precompiled_frameos_cache_dir()),
+        CacheArea("precompiled-sd-images", "Precompiled SD images", buildroot_precompiled_sd_image_cache_dir()),
+        CacheArea("buildroot-base-images", "Buildroot base images", buildroot_base_cache_dir()),
+        CacheArea("buildroot-output", "Buildroot output", buildroot_output_cache_dir()),
+        CacheArea("cross-toolchains", "Cross-compilation toolchains", cross_root, frozenset({"prebuilt"})),
+        CacheArea("cross-prebuilt", "Prebuilt dependencies", cross_root / "prebuilt"),
+        CacheArea("embedded-builds", "Embedded firmware builds", embedded_build_cache_dir()),
+    ]
+
+
+def artifact_cache_index_path() -> Path:
+    return Path(
+        os.environ.get("FRAMEOS_CACHE_INDEX")
+        or (REPO_ROOT / "db" / "artifacts" / "cache-index.json")
+    )
+
+
+def path_size(path: Path) -> int:
+    """Bytes on disk under *path* (a file or a directory tree)."""
+    try:
+        stat = path.lstat()
+    except OSError:
+        return 0
+    if not path.is_dir() or path.is_symlink():
+        return stat.st_blocks * 512 if stat.st_blocks else stat.st_size
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                child = os.lstat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            total += child.st_blocks * 512 if child.st_blocks else child.st_size
+    return total
+
+
+@contextlib.contextmanager
+def _locked_index() -> Iterator[dict[str, Any]]:
+    """The index, loaded and written back under an exclusive file lock."""
+    path = artifact_cache_index_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f"{path.name}.lock"), "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            index = _load_index(path)
+            yield index
+            partial = path.with_name(f"{path.name}.{os.getpid()}.partial")
+            partial.write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+            os.replace(partial, path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _load_index(path: Path) -> dict[str, Any]:
+    try:
+        index = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        index = None
+    if not isinstance(index, dict) or index.get("version") != ARTIFACT_CACHE_INDEX_VERSION:
+        index = {"version": ARTIFACT_CACHE_INDEX_VERSION}
+    if not isinstance(index.get("entries"), dict):
+        index["entries"] = {}
+    if not isinstance(index.get("areas"), dict):
+        index["areas"] = {}
+    return index
+
+
+def _area_counters(index: dict[str, Any], area: CacheArea) -> dict[str, int]:
+    counters = index["areas"].setdefault(area.key, {})
+    for name in ("hits", "misses", "evictions", "evictedBytes"):
+        counters.setdefault(name, 0)
+    return counters
+
+
+def _entry_for_path(path: Path, areas: list[CacheArea]) -> tuple[CacheArea, Path] | None:
+    """The area and top-level entry *path* lives in, if any."""
+    path = path.absolute()
+    best: tuple[CacheArea, Path] | None = None
+    for area in areas:
+        root = area.path.absolute()
+        try:
+            relative = path.relative_to(root)
+        except ValueError:
+            continue
+        if not relative.parts or relative.parts[0] in area.exclude:
+            continue
+        # Nested areas (cross-prebuilt inside cross-toolchains): deepest wins.
+        if best is None or len(root.parts) > len(best[0].path.absolute().parts):
+            best = (area, root / relative.parts[0])
+    return best
+
+
+def _is_entry_name(name: str, area: CacheArea) -> bool:
+    return not name.startswith(".") and name not in area.exclude and not name.endswith(_IN_PROGRESS_SUFFIXES)
+
+
+def _entry_record(index: dict[str, Any], area: CacheArea, entry: Path) -> dict[str, Any]:
+    record = index["entries"].get(str(entry))
+    try:
+        mtime_ns = entry.lstat().st_mtime_ns
+    except OSError:
+        mtime_ns = 0
+    if not isinstance(record, dict) or record.get("mtimeNs") != mtime_ns:
+        previous = record if isinstance(record, dict) else {}
+        record = {
+            **previous,
+            "area": area.key,
+            "size": path_size(entry),
+            "mtimeNs": mtime_ns,
+            "lastAccess": previous.get("lastAccess") or mtime_ns / 1e9,
+            "pins": previous.get("pins") or {},
+        }
+        index["entries"][str(entry)] = record
+    return record
+
+
+def record_artifact_cache_access(path: Path, *, hit: bool, enforce: bool = True) -> None:
+    """Note a lookup of the cache entry holding *path*.
+
+    A miss means the entry was just (re)created; the budget is then enforced,
+    sparing this entry.
+    """
+    areas = artifact_cache_areas()
+    located = _entry_for_path(path, areas)
+    if located is None:
+        return
+    area, entry = located
+    with _locked_index() as index:
+        counters = _area_counters(index, area)
+        counters["hits" if hit else "misses"] += 1
+        if entry.exists():
+            record = _entry_record(index, area, entry)
+            if not hit:
+                record["size"] = path_size(entry)
+            record["lastAccess"] = time.time()
+            record["leasedUntil"] = time.time() + ARTIFACT_CACHE_LEASE_SECONDS
+    if enforce and not hit:
+        enforce_artifact_cache_budget()
+
+
+def _pin_entry(path: Path) -> tuple[Path, str] | None:
+    located = _entry_for_path(path, artifact_cache_areas())
+    if located is None:
+        return None
+    area, entry = located
+    token = secure_token(8)
+    with _locked_index() as index:
+        record = index["entries"].get(str(entry))
+        if not isinstance(record, dict):
+            # No size yet: the next scan measures it, outside of this job's path.
+            record = index["entries"][str(entry)] = {"area": area.key, "pins": {}}
+        record.setdefault("pins", {})[token] = time.time() + ARTIFACT_CACHE_PIN_TTL_SECONDS
+        record["lastAccess"] = time.time()
+    return entry, token
+
+
+def _unpin_entry(entry: Path, token: str) -> None:
+    with _locked_index() as index:
+        record = index["entries"].get(str(entry))
+        if isinstance(record, dict):
+            record.get("pins", {}).pop(token, None)
+
+
+@contextlib.asynccontextmanager
+async def pinned_artifact_cache_entry(path: Path) -> AsyncIterator[None]:
+    """Keep the cache entry holding *path* from eviction while in the block.
+
+    The index lock is taken on a worker thread: another process may hold it
+    for a while.
+    """
+    pin = await asyncio.to_thread(_pin_entry, path)
+    try:
+        yield
+    finally:
+        if pin is not None:
+            await asyncio.to_thread(_unpin_entry, *pin)
+
+
+def _ready_image_sources() -> set[str]:
+    """Files that ready virtual SD images are composed from."""
+    from app.tasks.buildroot_image import buildroot_artifact_dir
+
+    sources: set[str] = set()
+    artifact_dir = buildroot_artifact_dir()
+    if not artifact_dir.is_dir():
+        return sources
+    for manifest in artifact_dir.glob("*.vimg.json"):
+        try:
+            payload = json.loads(manifest.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        for image in (payload.get("images") or {}).values():
+            if isinstance(image, dict):
+                sources.update(str(source) for source in (image.get("sources") or {}))
+    return sources
+
+
+def _is_pinned(record: dict[str, Any], now: float) -> bool:
+    if float(record.get("leasedUntil") or 0) > now:
+        return True
+    pins = record.get("pins") or {}
+    return any(float(expiry) > now for expiry in pins.values())
+
+
+def _scan(index: dict[str, Any], areas: list[CacheArea]) -> dict[str, CacheArea]:
+    """Reconcile the index with the areas on disk; returns entry -> area."""
+    found: dict[str, CacheArea] = {}
+    for area in areas:
+        if not area.path.is_dir():
+            continue
+        for child in area.path.iterdir():
+            if _is_entry_name(child.name, area):
+                _entry_record(index, area, child)
+                found[str(child)] = area
+    for key in list(index["entries"]):
+        if key not in found:
+            del index["entries"][key]
+    return found
+
+
+def _remove_entry(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        freed = walk_directory_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            freed = path.lstat().st_size
+        except OSError:
+            freed = 0
+        path.unlink(missing_ok=True)
+    # Keeps the running totals /system/info shows for enclosing cache dirs.
+    adjust_directory_size(path, -freed)
+
+
+def enforce_artifact_cache_budget(
+    budget_bytes: int | None = None,
+    min_free_bytes: int | None = None,
+) -> list[Path]:
+    """Evict least recently used, unpinned entries until within budget.
+
+    Victims are chosen and renamed out of the way under the index lock, then
+    deleted after it is released, so other jobs can pin and record entries
+    while gigabytes are removed.
+    """
+    budget_bytes = ARTIFACT_CACHE_BUDGET_BYTES if budget_bytes is None else budget_bytes
+    min_free_bytes = ARTIFACT_CACHE_MIN_FREE_BYTES if min_free_bytes is None else min_free_bytes
+    areas = artifact_cache_areas()
+    pinned_sources = _ready_image_sources()
+    pinned_entries = {
+        str(located[1]) for source in pinned_sources
+        if (located := _entry_for_path(Path(source), areas)) is not None
+    }
+    evicted: list[Path] = []
+    doomed: list[Path] = []
+    with _locked_index() as index:
+        found = _scan(index, areas)
+        entries = index["entries"]
+        total = sum(int(record.get("size") or 0) for record in entries.values())
+        freed = 0
+        now = time.time()
+        candidates = sorted(
+            (key for key in found if key not in pinned_entries and not _is_pinned(entries[key], now)),
+            key=lambda key: float(entries[key].get("lastAccess") or 0),
+        )
+        for key in candidates:
+            if total <= budget_bytes and _free_bytes(found[key].path) + freed >= min_free_bytes:
+                break
+            path = Path(key)
+            doomed_path = path.with_name(f".{path.name}.{secure_token(4)}.evicting")
+            try:
+                os.replace(path, doomed_path)
+            except OSError:
+                continue
+            size = int(entries[key].get("size") or 0)
+            counters = _area_counters(index, found[key])
+            counters["evictions"] += 1
+            counters["evictedBytes"] += size
+            del entries[key]
+            total -= size
+            freed += size
+            evicted.append(path)
+            doomed.append(doomed_path)
+    for doomed_path in doomed:
+        _remove_entry(doomed_path)
+    return evicted
+
+
+def _free_bytes(path: Path) -> int:
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        # Unknown: let the byte budget alone decide.
+        return 1 << 62
+
+
+async def record_artifact_cache_access_async(path: Path, *, hit: bool) -> None:
+    """``record_artifact_cache_access`` off the event loop (eviction may
+    delete gigabytes)."""
+    await asyncio.to_thread(record_artifact_cache_access, path, hit=hit)
+
+
+def artifact_cache_stats() -> list[ArtifactCacheStats]:
+    areas = [area for area in artifact_cache_areas() if area.path.is_dir()]
+    if not areas:
+        return []
+    pinned_sources = _ready_image_sources()
+    pinned_entries = {
+        str(located[1]) for source in pinned_sources
+        if (located := _entry_for_path(Path(source), areas)) is not None
+    }
+    with _locked_index() as index:
+        found = _scan(index, areas)
+        now = time.time()
+        stats: list[ArtifactCacheStats] = []
+        for area in areas:
+            keys = [key for key, entry_area in found.items() if entry_area is area]
+            counters = _area_counters(index, area)
+            stats.append(ArtifactCacheStats(
+                key=area.key,
+                name=area.name,
+                path=area.path,
+                size_bytes=sum(int(index["entries"][key].get("size") or 0) for key in keys),
+                entries=len(keys),
+                pinned_entries=sum(
+                    1 for key in keys if key in pinned_entries or _is_pinned(index["entries"][key], now)
+                ),
+                hits=counters["hits"],
+                misses=counters["misses"],
+                evictions=counters["evictions"],
+            ))
+    return stats
@@ -0,0 +1,258 @@
+"""Content-hash manifest sync for frame asset folders.
+
+Every synced assets folder carries a small JSON manifest
+(``MANIFEST_FILENAME``) listing the sha256 and size of each file the backend
+put there. A sync reads that manifest together with a size listing of the
+folder, diffs both against the files the frame should have, and ships every
+missing or changed file in ONE gzipped tar that also carries the updated
+manifest. Files that were synced before but are no longer wanted are removed
+with one batched ``rm``. Files the backend never wrote (uploads, scene
+output) are not in the manifest and are never touched.
+
+Trusting the manifest alone is not enough — an SD card can be swapped or a
+file deleted by hand — so a file only counts as present when the manifest
+hash matches AND the folder listing reports the expected size.
+
+Paths in the manifest are relative to the assets folder (``fonts/Foo.ttf``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import shlex
+import tarfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+MANIFEST_FILENAME = ".frameos-assets.json"
+MANIFEST_VERSION = 1
+
+# Printed between the manifest and the folder listing in the probe command so
+# both arrive in a single round trip.
+PROBE_SEPARATOR = "FRAMEOS_ASSET_SYNC_LISTING"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# (path, size, mtime_ns) -> sha256. Fonts on the backend rarely change, so
+# repeated deploys skip rehashing ~30 MB of TTFs.
+_local_hash_cache: dict[tuple[str, int, int], str] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class SyncFile:
+    """One file the frame should have: either on local disk or in memory."""
+
+    path: str
+    size: int
+    sha256: str
+    local_path: str | None = None
+    data: bytes | None = None
+
+    def read(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        if self.local_path is None:
+            return b""
+        with open(self.local_path, "rb") as fh:
+            return fh.read()
+
+
+@dataclass(slots=True)
+class AssetSyncPlan:
+    upload: list[SyncFile] = field(default_factory=list)
+    delete: list[str] = field(default_factory=list)
+    manifest: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    @property
+    def empty(self) -> bool:
+        return not self.upload and not self.delete
+
+
+def file_sha256(path: str) -> str:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    cached = _local_hash_cache.get(key)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    _local_hash_cache[key] = value
+    return value
+
+
+def local_sync_file(local_path: str, relative_path: str) -> SyncFile:
+    return SyncFile(
+        path=normalize_relative_path(relative_path),
+        size=os.path.getsize(local_path),
+        sha256=file_sha256(local_path),
+        local_path=local_path,
+    )
+
+
+def bytes_sync_file(relative_path: str, data: bytes) -> SyncFile:
+    return SyncFile(
+        path=normalize_relative_path(relative_path),
+        size=len(data),
+        sha256=hashlib.sha256(data).hexdigest(),
+        data=data,
+    )
+
+
+def normalize_relative_path(path: str) -> str:
+    normalized = Path(str(path).replace("\\", "/").lstrip("/"))
+    if normalized.is_absolute() or any(part in ("", ".", "..") for part in normalized.parts):
+        raise ValueError(f"Invalid asset path: {path!r}")
+    return normalized.as_posix()
+
+
+def parse_manifest(text: str | bytes | None) -> dict[str, dict[str, Any]]:
+    """Files section of a manifest; anything unreadable counts as empty."""
+    if not text:
+        return {}
+    try:
+        payload = json.loads(text)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(payload, dict) or payload.get("version") != MANIFEST_VERSION:
+        return {}
+    files = payload.get("files")
+    if not isinstance(files, dict):
+        return {}
+    return {
+        str(path): entry
+        for path, entry in files.items()
+        if isinstance(entry, dict) and isinstance(entry.get("sha256"), str)
+    }
+
+
+def render_manifest(files: dict[str, dict[str, Any]]) -> bytes:
+    return json.dumps(
+        {"version": MANIFEST_VERSION, "files": dict(sorted(files.items()))},
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def plan_asset_sync(
+    desired: list[SyncFile],
+    remote_manifest: dict[str, dict[str, Any]],
+    remote_sizes: dict[str, int],
+    *,
+    scope: str = "",
+) -> AssetSyncPlan:
+    """Diff the wanted files against what the frame reports.
+
+    Only manifest entries under *scope* (e.g. ``"fonts/"``) are candidates
+    for deletion; entries outside it are carried over untouched so separate
+    syncs can share one manifest.
+    """
+    plan = AssetSyncPlan()
+    wanted = {file.path: file for file in desired}
+
+    for path, entry in remote_manifest.items():
+        if not path.startswith(scope) or path in wanted:
+            plan.manifest[path] = entry
+        elif path in remote_sizes:
+            plan.delete.append(path)
+
+    for path, file in sorted(wanted.items()):
+        entry = {"sha256": file.sha256, "size": file.size}
+        plan.manifest[path] = entry
+        known = remote_manifest.get(path)
+        if (
+            known is None
+            or known.get("sha256") != file.sha256
+            or remote_sizes.get(path) != file.size
+        ):
+            plan.upload.append(file)
+
+    plan.delete.sort()
+    return plan
+
+
+def build_sync_archive(files: list[SyncFile], manifest: dict[str, dict[str, Any]]) -> bytes:
+    """Gzipped tar of *files* plus the updated manifest, rooted at the assets folder."""
+    buffer = io.BytesIO()
+    mtime = int(time.time())
+    with tarfile.open(fileobj=buffer, mode="w:gz", format=tarfile.USTAR_FORMAT, compresslevel=6) as tar:
+        for file in files:
+            data = file.read()
+            info = tarfile.TarInfo(name=file.path)
+            info.size = len(data)
+            info.mode = 0o644
+            info.mtime = mtime
+            tar.addfile(info, io.BytesIO(data))
+        manifest_data = render_manifest(manifest)
+        info = tarfile.TarInfo(name=MANIFEST_FILENAME)
+        info.size = len(manifest_data)
+        info.mode = 0o644
+        info.mtime = mtime
+        tar.addfile(info, io.BytesIO(manifest_data))
+    return buffer.getvalue()
+
+
+def probe_command(assets_path: str, scope_dir: str) -> str:
+    """Print the manifest, a separator and ``<size> <path>`` for every file under *scope_dir*."""
+    manifest = shlex.quote(f"{assets_path}/{MANIFEST_FILENAME}")
+    target = shlex.quote(scope_dir)
+    return (
+        f"cat {manifest} 2>/dev/null; echo; echo {PROBE_SEPARATOR}; "
+        f"[ -d {target} ] && find {target} -type f -exec stat -c '%s %n' {{}} + 2>/dev/null; true"
+    )
+
+
+def parse_probe_output(stdout: str, assets_path: str) -> tuple[dict[str, dict[str, Any]], dict[str, int]]:
+    manifest_text, _, listing = stdout.partition(PROBE_SEPARATOR)
+    return parse_manifest(manifest_text.strip()), parse_size_listing(listing, assets_path)
+
+
+def parse_size_listing(listing: str, assets_path: str) -> dict[str, int]:
+    prefix = assets_path.rstrip("/") + "/"
+    sizes: dict[str, int] = {}
+    for line in listing.splitlines():
+        size, _, path = line.strip().partition(" ")
+        if not path or not size.isdigit() or not path.startswith(prefix):
+            continue
+        sizes[path[len(prefix):]] = int(size)
+    return sizes
+
+
+def apply_command(assets_path: str, archive_path: str | None, deletes: list[str]) -> str:
+    """Shell command that unpacks the sync archive and drops stale files in one go."""
+    root = shlex.quote(assets_path)
+    parts = ["set -e"]
+    if archive_path:
+        archive = shlex.quote(archive_path)
+        # Removed on any exit, so a failed extract doesn't leave it in /tmp.
+        parts.append(f"trap {shlex.quote(f'rm -f {archive}')} EXIT")
+    if deletes:
+        targets = " ".join(shlex.quote(f"{assets_path}/{path}") for path in deletes)
+        parts.append(f"rm -f -- {targets}")
+    if archive_path:
+        parts.append(f"mkdir -p {root}")
+        parts.append(f"tar -xzf {archive} -C {root}")
+    return "; ".join(parts)
+
+
+def write_local_manifest(assets_dir: Path, scope: str = "") -> None:
+    """Write a manifest describing files already staged under *assets_dir*.
+
+    Used when assets are baked into an image, so the first sync after boot
+    finds everything in place instead of re-sending it.
+    """
+    files: dict[str, dict[str, Any]] = {}
+    root = assets_dir / scope if scope else assets_dir
+    if root.is_dir():
+        for path in sorted(root.rglob("*")):
+            if not path.is_file():
+                continue
+            relative = path.relative_to(assets_dir).as_posix()
+            files[relative] = {"sha256": file_sha256(str(path)), "size": path.stat().st_size}
+    (assets_dir / MANIFEST_FILENAME).write_bytes(render_manifest(files))
@@ -0,0 +1,252 @@
+"""Block-parallel compression for SD images and firmware downloads.
+
+Large images are cut into fixed-size blocks that are compressed
+independently on a thread pool (zlib, lzma and zstd all release the GIL) and
+written back in order. Each block becomes a complete gzip member, xz stream
+or zstd frame; concatenations of those are valid files that ``gunzip``,
+``xz -d``, ``zstd -d``, Raspberry Pi Imager and balenaEtcher all read, the
+same trick pigz uses.
+
+``stream_compressed_to_cache`` hands the compressed bytes to the client as
+they are produced while writing them to a cache file, so the first download
+of a fresh image starts immediately and later ones are plain (rangeable)
+file responses.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import gzip
+import lzma
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterable, Iterator
+
+from app.utils.env import get_env_int
+
+COMPRESSION_BLOCK_SIZE = get_env_int("FRAMEOS_COMPRESSION_BLOCK_SIZE", 8 * 1024 * 1024)
+COMPRESSION_THREADS = get_env_int("FRAMEOS_COMPRESSION_THREADS", min(os.cpu_count() or 2, 8))
+
+# format -> (file suffix, media type)
+COMPRESSION_FORMATS: dict[str, tuple[str, str]] = {
+    "gzip": (".gz", "application/gzip"),
+    "xz": (".xz", "application/x-xz"),
+    "zstd": (".zst", "application/zstd"),
+}
+DEFAULT_LEVELS = {"gzip": 6, "xz": 6, "zstd": 3}
+
+_inflight_caches: set[str] = set()
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def available_compression_formats() -> list[str]:
+    return [fmt for fmt in COMPRESSION_FORMATS if fmt != "zstd" or _zstandard() is not None]
+
+
+def normalize_compression_format(value: str | None) -> str:
+    fmt = (value or "gzip").strip().lower()
+    fmt = {"gz": "gzip", "zst": "zstd"}.get(fmt, fmt)
+    if fmt not in COMPRESSION_FORMATS:
+        raise ValueError(f"Unsupported compression format: {value}")
+    if fmt not in available_compression_formats():
+        raise ValueError(f"Compression format '{fmt}' is not available on this server (install zstandard)")
+    return fmt
+
+
+def compressed_path_for(source: Path, fmt: str) -> Path:
+    """``foo.img`` / ``foo.img.gz`` -> ``foo.img<suffix>`` next to the source."""
+    base = source.with_suffix("") if source.suffix == ".gz" else source
+    return base.with_name(base.name + COMPRESSION_FORMATS[fmt][0])
+
+
+def block_compressor(fmt: str, level: int | None = None) -> Callable[[bytes], bytes]:
+    level = DEFAULT_LEVELS[fmt] if level is None else level
+    if fmt == "gzip":
+        return lambda block: gzip.compress(block, compresslevel=level, mtime=0)
+    if fmt == "xz":
+        return lambda block: lzma.compress(block, format=lzma.FORMAT_XZ, preset=level)
+    if fmt == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise ValueError("zstandard is not installed")
+        # ZstdCompressor instances must not be shared between threads.
+        return lambda block: zstandard.ZstdCompressor(level=level, write_content_size=False).compress(block)
+    raise ValueError(f"Unsupported compression format: {fmt}")
+
+
+def decompress_block(block: bytes, fmt: str) -> bytes:
+    """Inverse of ``block_compressor``."""
+    if fmt == "gzip":
+        return gzip.decompress(block)
+    if fmt == "xz":
+        return lzma.decompress(block, format=lzma.FORMAT_XZ)
+    if fmt == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise ValueError("zstandard is not installed")
+        # Blocks don't record their content size; stream-decode instead.
+        return zstandard.ZstdDecompressor().decompressobj().decompress(block)
+    raise ValueError(f"Unsupported compression format: {fmt}")
+
+
+def _open_source(source):
+    if not isinstance(source, Path):
+        # Anything else with an ``open()`` (e.g. a VirtualImage).
+        return source.open()
+    return gzip.open(source, "rb") if source.suffix == ".gz" else source.open("rb")
+
+
+def _read_blocks(fh, block_size: int, split_at: Iterable[int]) -> Iterator[bytes]:
+    """Fixed-size blocks, additionally cut at every raw offset in *split_at*."""
+    boundaries = sorted(set(split_at))
+    position = 0
+    index = 0
+    while True:
+        while index < len(boundaries) and boundaries[index] <= position:
+            index += 1
+        size = block_size if index == len(boundaries) else min(block_size, boundaries[index] - position)
+        block = fh.read(size)
+        if not block:
+            return
+        position += len(block)
+        yield block
+
+
+def iter_compressed_members(
+    source,
+    fmt: str = "gzip",
+    *,
+    level: int | None = None,
+    block_size: int | None = None,
+    threads: int | None = None,
+    split_at: Iterable[int] = (),
+) -> Iterator[tuple[int, bytes]]:
+    """Yield ``(raw length, compressed block)`` for *source* compressed as *fmt*.
+
+    A ``.gz`` source is decompressed on the fly, so an already gzipped image
+    can be served as xz or zstd. Blocks also end at every offset in
+    *split_at*, so a byte range can later be swapped for another member.
+    """
+    compress = block_compressor(fmt, level)
+    block_size = block_size or COMPRESSION_BLOCK_SIZE
+    threads = max(threads or COMPRESSION_THREADS, 1)
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="frameos-compress")
+    pending: deque[tuple[int, Future[bytes]]] = deque()
+    try:
+        with _open_source(source) as fh:
+            blocks = _read_blocks(fh, block_size, split_at)
+            eof = False
+            produced = False
+            while True:
+                # Keep every worker busy plus one block queued each, without
+                # reading the whole image into memory.
+                while not eof and len(pending) < threads * 2:
+                    block = next(blocks, None)
+                    if block is None:
+                        eof = True
+                        break
+                    pending.append((len(block), executor.submit(compress, block)))
+                if not pending:
+                    break
+                produced = True
+                raw_length, future = pending.popleft()
+                yield raw_length, future.result()
+            if not produced:
+                yield 0, compress(b"")
+    finally:
+        for _raw_length, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_compressed_blocks(source, fmt: str = "gzip", **kwargs) -> Iterator[bytes]:
+    """Yield *source* compressed as *fmt*, one independently compressed block at a time."""
+    for _raw_length, block in iter_compressed_members(source, fmt, **kwargs):
+        yield block
+
+
+def compress_file(source: Path, destination: Path, fmt: str = "gzip", **kwargs) -> list[tuple[int, int]]:
+    """Compress *source* into *destination*; returns each member's (raw offset, compressed offset)."""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(destination.name + ".partial")
+    members: list[tuple[int, int]] = []
+    raw_offset = compressed_offset = 0
+    try:
+        with partial.open("wb") as out:
+            for raw_length, chunk in iter_compressed_members(source, fmt, **kwargs):
+                members.append((raw_offset, compressed_offset))
+                out.write(chunk)
+                raw_offset += raw_length
+                compressed_offset += len(chunk)
+        os.replace(partial, destination)
+    finally:
+        partial.unlink(missing_ok=True)
+    return members
+
+
+def compressed_cache_is_fresh(source: Path, cache: Path) -> bool:
+    try:
+        return cache.stat().st_mtime >= source.stat().st_mtime
+    except OSError:
+        return False
+
+
+async def stream_compressed_to_cache(source, cache: Path | None, fmt: str = "gzip") -> AsyncIterator[bytes]:
+    """Stream *source* compressed as *fmt* while writing the same bytes to *cache*.
+
+    The cache only appears once the stream completes; an aborted download
+    leaves nothing behind. When another request is already filling the same
+    cache (or *cache* is None) the bytes are streamed without writing a copy.
+    """
+    key = str(cache)
+    write_cache = cache is not None and key not in _inflight_caches
+    blocks = iter_compressed_blocks(source, fmt)
+    out = None
+    if write_cache:
+        _inflight_caches.add(key)
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        partial = cache.with_name(f"{cache.name}.{os.getpid()}.partial")
+        out = partial.open("wb")
+    completed = False
+    pulling: asyncio.Future[bytes | None] | None = None
+    try:
+        while True:
+            pulling = asyncio.ensure_future(asyncio.to_thread(next, blocks, None))
+            chunk = await asyncio.shield(pulling)
+            if chunk is None:
+                break
+            if out is not None:
+                await asyncio.to_thread(out.write, chunk)
+            yield chunk
+        completed = True
+    finally:
+        # A disconnect can cancel us mid-block; the generator may only be
+        # closed once that thread has handed it back.
+        if pulling is not None and not pulling.done():
+            with contextlib.suppress(BaseException):
+                await asyncio.wait([pulling])
+        await asyncio.to_thread(blocks.close)
+        if out is not None:
+            out.close()
+            if completed:
+                os.replace(partial, cache)
+            with contextlib.suppress(OSError):
+                partial.unlink()
+            _inflight_caches.discard(key)
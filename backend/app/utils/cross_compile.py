@@ -1,21 +1,17 @@
 from __future__ import annotations
 
 import json
-import hashlib
 import os
 import re
 import shlex
 import shutil
 import tarfile
-import tempfile
 from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
 from textwrap import dedent, indent
 from typing import Awaitable, Callable, Iterable
 
-import httpx
-
 from arq import ArqRedis as Redis
 from sqlalchemy.orm import Session
 
@@ -27,7 +23,9 @@ from app.tasks.prebuilt_deps import (
     fetch_prebuilt_manifest,
     resolve_prebuilt_target,
 )
+from app.utils.artifact_cache import pinned_artifact_cache_entry, record_artifact_cache_access_async
 from app.utils.build_host import BuildHostConfig
+from app.utils.downloads import download_file
 from app.utils.build_executor import (
     BuildExecutor,
     DockerMount,
@@ -207,6 +205,8 @@ class CrossCompiler:
         cache_root.mkdir(parents=True, exist_ok=True)
         key = cross_cache_key(target)
         self.toolchain_dir = cache_root / key
+        # Reported to the artifact cache as a hit or miss once the build runs.
+        self.toolchain_cached = self.toolchain_dir.is_dir()
         self.toolchain_dir.mkdir(parents=True, exist_ok=True)
         self.sysroot_dir = self.toolchain_dir / "sysroot"
         self.sysroot_dir.mkdir(parents=True, exist_ok=True)
@@ -256,7 +256,12 @@ class CrossCompiler:
                     f"Connected to {build_executor_display_name(self.build_host)} for cross compilation",
                 )
             try:
-                return await self._build_with_context(source_dir)
+                await record_artifact_cache_access_async(self.toolchain_dir, hit=self.toolchain_cached)
+                # Keep the toolchain and prebuilt deps from cache eviction
+                # while this build uses them.
+                async with pinned_artifact_cache_entry(self.toolchain_dir), \
+                        pinned_artifact_cache_entry(self.prebuilt_dir):
+                    return await self._build_with_context(source_dir)
             finally:
                 self.executor = None
 
@@ -604,6 +609,7 @@ class CrossCompiler:
         expected_marker = f"{component}|{version}|{url}|{self.prebuilt_entry.md5_for(component) or ''}"
         if marker.exists() and marker.read_text() == expected_marker:
             if self._prebuilt_component_is_valid(component, dest_dir):
+                await record_artifact_cache_access_async(dest_dir, hit=True)
                 return dest_dir
             await self._log(
                 "stderr",
@@ -631,28 +637,23 @@ class CrossCompiler:
             return None
 
         marker.write_text(expected_marker)
+        await record_artifact_cache_access_async(dest_dir, hit=False)
         return dest_dir
 
     async def _download_and_extract(self, url: str, dest_dir: Path, expected_md5: str | None) -> None:
-        tmp_fd, tmp_path = tempfile.mkstemp(suffix=".tar.gz")
-        os.close(tmp_fd)
+        # A stable path next to the component so a dropped download resumes.
+        archive = dest_dir.parent / f".{dest_dir.name}.tar.gz"
+        await download_file(
+            url,
+            archive,
+            timeout=self.prebuilt_timeout,
+            digests={"md5": expected_md5} if expected_md5 else None,
+        )
         try:
-            async with httpx.AsyncClient(timeout=self.prebuilt_timeout) as client:
-                async with client.stream("GET", url) as response:
-                    response.raise_for_status()
-                    with open(tmp_path, "wb") as fh:
-                        async for chunk in response.aiter_bytes():
-                            fh.write(chunk)
-            if expected_md5:
-                actual = self._file_md5sum(Path(tmp_path))
-                if actual != expected_md5:
-                    raise RuntimeError(
-                        f"MD5 mismatch for {url}: expected {expected_md5}, got {actual}"
-                    )
-            with tarfile.open(tmp_path, "r:gz") as tar:
+            with tarfile.open(archive, "r:gz") as tar:
                 self._safe_extract(tar, dest_dir)
         finally:
-            Path(tmp_path).unlink(missing_ok=True)
+            archive.unlink(missing_ok=True)
 
     @staticmethod
     def _safe_extract(tar: tarfile.TarFile, path: Path) -> None:
@@ -676,14 +677,6 @@ class CrossCompiler:
             shutil.move(str(child), dest_dir / child.name)
         shutil.rmtree(inner)
 
-    @staticmethod
-    def _file_md5sum(path: Path) -> str:
-        hasher = hashlib.md5()
-        with path.open("rb") as fh:
-            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
-                hasher.update(chunk)
-        return hasher.hexdigest()
-
     def _prebuilt_component_is_valid(self, component: str, root: Path) -> bool:
         validators = {
             "quickjs": self._quickjs_component_is_valid,
@@ -0,0 +1,126 @@
+"""Running byte totals for directories the backend writes into.
+
+Walking a directory to find its size costs one ``stat`` per file. Virtual
+frames ask for their asset usage on every render, and ``/system/info`` lists
+cache directories that can hold hundreds of thousands of files. This module
+walks each root once and then keeps its total in memory:
+
+- code that writes or deletes through our own APIs (virtual asset uploads,
+  artifact cache evictions) calls ``adjust_directory_size`` with the delta;
+- writes we cannot account for (a scene saving assets during a render, files
+  another process drops in) call ``invalidate_directory_size``, and the next
+  query walks again;
+- ``directory_size_reconciler`` re-walks every known root in the background
+  every ``FRAMEOS_DIR_SIZE_RECONCILE_SECONDS``, so drift never outlives one
+  interval. A total older than twice that interval is re-walked on query.
+
+Totals are per process. Only the API process renders virtual frames and
+serves ``/system/info``; the worker's evictions land in its own tally and the
+API catches up on the next reconcile.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.utils.env import get_env_int
+
+DIR_SIZE_RECONCILE_SECONDS = get_env_int("FRAMEOS_DIR_SIZE_RECONCILE_SECONDS", 600)
+
+
+@dataclass
+class _Tally:
+    size_bytes: int
+    walked_at: float
+
+
+_tallies: dict[str, _Tally] = {}
+_lock = threading.Lock()
+
+
+def _key(root: Path) -> str:
+    return os.path.abspath(root)
+
+
+def _is_within(key: str, root: str) -> bool:
+    return key == root or key.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def walk_directory_size(root: Path) -> int:
+    """Apparent size of all regular files under *root* (0 if it is missing)."""
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def directory_size(root: Path) -> int:
+    """Bytes under *root*, from the running total when there is a fresh one."""
+    key = _key(root)
+    with _lock:
+        tally = _tallies.get(key)
+        if tally is not None and time.monotonic() - tally.walked_at < 2 * DIR_SIZE_RECONCILE_SECONDS:
+            return max(0, tally.size_bytes)
+    return reconcile_directory_size(root)
+
+
+def reconcile_directory_size(root: Path) -> int:
+    """Walk *root* and replace its running total."""
+    key = _key(root)
+    started = time.monotonic()
+    size = walk_directory_size(root)
+    with _lock:
+        tally = _tallies.get(key)
+        # Another walk that started later already stored a newer total.
+        # (An adjustment made during the walk may be counted twice or not at
+        # all; the next reconcile settles it.)
+        if tally is None or tally.walked_at <= started:
+            _tallies[key] = _Tally(size, time.monotonic())
+        else:
+            size = tally.size_bytes
+    return size
+
+
+def adjust_directory_size(path: Path, delta: int) -> None:
+    """Apply a write (+) or delete (-) of *delta* bytes at *path*.
+
+    Every tracked root containing *path* is updated; untracked roots are left
+    alone, their first query walks them anyway.
+    """
+    if not delta:
+        return
+    key = _key(path)
+    with _lock:
+        for root, tally in _tallies.items():
+            if _is_within(key, root):
+                tally.size_bytes += delta
+
+
+def invalidate_directory_size(path: Path) -> None:
+    """Forget the totals of every tracked root containing or under *path*."""
+    key = _key(path)
+    with _lock:
+        for root in list(_tallies):
+            if _is_within(key, root) or _is_within(root, key):
+                del _tallies[root]
+
+
+async def directory_size_reconciler() -> None:
+    """Re-walk every tracked root off the event loop, once per interval."""
+    while True:
+        await asyncio.sleep(DIR_SIZE_RECONCILE_SECONDS)
+        with _lock:
+            roots = list(_tallies)
+        for root in roots:
+            try:
+                await asyncio.to_thread(reconcile_directory_size, Path(root))
+            except Exception as e:
+                print(f"directory_size_reconciler error for {root}: {e}")
@@ -0,0 +1,436 @@
+"""Resumable downloads for release archives and prebuilt dependencies.
+
+Release images and toolchains are hundreds of MB fetched over whatever
+uplink the backend has. ``download_file``:
+
+- keeps progress in ``<destination>.part`` (plus a small ``.part.json``
+  state file) and resumes it with ``Range``/``If-Range`` after a dropped
+  connection or a restarted worker;
+- splits large files into ``DOWNLOAD_SEGMENTS`` ranges fetched in parallel
+  when the server supports ranges;
+- verifies digests (``{"sha256": ...}``, ``{"md5": ...}``) before the file
+  is moved into place — streamed while downloading for single-stream
+  downloads, in one pass over the finished file for segmented ones;
+- holds a Redis lock per destination so concurrent jobs, in this process or
+  another worker, wait for one download instead of racing their own;
+- shares one process-wide bandwidth cap (``FRAMEOS_DOWNLOAD_BANDWIDTH_LIMIT``
+  in bytes per second) across all downloads.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Mapping
+
+import httpx
+
+from app.utils.env import get_env_int
+from app.utils.token import secure_token
+
+DOWNLOAD_SEGMENTS = get_env_int("FRAMEOS_DOWNLOAD_SEGMENTS", 4)
+DOWNLOAD_SEGMENT_MIN_BYTES = get_env_int("FRAMEOS_DOWNLOAD_SEGMENT_MIN_BYTES", 32 * 1024 * 1024)
+DOWNLOAD_ATTEMPTS = get_env_int("FRAMEOS_DOWNLOAD_ATTEMPTS", 6)
+DOWNLOAD_BANDWIDTH_LIMIT = get_env_int("FRAMEOS_DOWNLOAD_BANDWIDTH_LIMIT", 0)
+DOWNLOAD_LOCK_TTL_SECONDS = 60
+DOWNLOAD_LOCK_POLL_SECONDS = 1.0
+DOWNLOAD_RETRY_BACKOFF_SECONDS = 1.0
+# Progress is persisted at most this often per segment.
+_STATE_SAVE_BYTES = 4 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+_RETRYABLE_ERRORS = (httpx.TransportError, httpx.DecodingError)
+# What proxies and CDNs answer on a flaky uplink; the .part file is kept
+# and resumed like after a dropped connection.
+_RETRYABLE_STATUSES = {429}
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status in _RETRYABLE_STATUSES
+    return isinstance(error, _RETRYABLE_ERRORS)
+
+
+class DownloadError(RuntimeError):
+    pass
+
+
+class DownloadDigestMismatch(DownloadError):
+    pass
+
+
+class _SourceChanged(Exception):
+    """A range request was answered with the whole (possibly new) file."""
+
+
+@dataclass(slots=True)
+class _Segment:
+    start: int
+    # Exclusive; None while the size is unknown (read until EOF).
+    end: int | None
+    done: int = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None and self.start + self.done >= self.end
+
+
+class _BandwidthLimiter:
+    """Paces reads so all downloads together stay under *rate* bytes/s."""
+
+    def __init__(self, rate: int) -> None:
+        self.rate = rate
+        self._next_slot = time.monotonic()
+
+    async def throttle(self, size: int) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._next_slot = max(self._next_slot, now) + size / self.rate
+        delay = self._next_slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_limiters: dict[int, _BandwidthLimiter] = {}
+
+
+def _limiter(rate: int) -> _BandwidthLimiter:
+    limiter = _limiters.get(rate)
+    if limiter is None:
+        limiter = _limiters[rate] = _BandwidthLimiter(rate)
+    return limiter
+
+
+def _download_lock_key(destination: Path) -> str:
+    digest = hashlib.sha256(str(destination.resolve()).encode("utf-8")).hexdigest()[:32]
+    return f"download:{digest}"
+
+
+@contextlib.asynccontextmanager
+async def download_single_flight(destination: Path) -> AsyncIterator[bool]:
+    """Hold the download lock for *destination* while the body runs.
+
+    Yields whether another holder had to be waited for, in which case
+    callers should re-check their cache first. Without Redis the body just
+    runs.
+    """
+    from app.redis import get_shared_redis
+
+    key = _download_lock_key(destination)
+    token = secure_token(16)
+    redis = None
+    waited = False
+    try:
+        redis = get_shared_redis()
+        while not await redis.set(key, token, ex=DOWNLOAD_LOCK_TTL_SECONDS, nx=True):
+            waited = True
+            await asyncio.sleep(DOWNLOAD_LOCK_POLL_SECONDS)
+    except Exception as exc:  # Redis down: a duplicate download beats none.
+        logger.warning("Download lock for %s unavailable: %s", destination, exc)
+        redis = None
+
+    refresher: asyncio.Task | None = None
+    if redis is not None:
+        async def refresh() -> None:
+            while True:
+                await asyncio.sleep(DOWNLOAD_LOCK_TTL_SECONDS / 3)
+                await redis.expire(key, DOWNLOAD_LOCK_TTL_SECONDS)
+
+        refresher = asyncio.create_task(refresh())
+    try:
+        yield waited
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await refresher
+        if redis is not None:
+            with contextlib.suppress(Exception):
+                if await redis.get(key) == token.encode():
+                    await redis.delete(key)
+
+
+def _validator(response: httpx.Response) -> str | None:
+    etag = response.headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("last-modified")
+
+
+class _Download:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        destination: Path,
+        *,
+        digests: Mapping[str, str],
+        segments: int,
+        limiter: _BandwidthLimiter,
+    ) -> None:
+        self.client = client
+        self.url = url
+        self.destination = destination
+        self.part = destination.with_name(f"{destination.name}.part")
+        self.state_path = destination.with_name(f"{destination.name}.part.json")
+        self.digests = {name.lower(): value.lower() for name, value in digests.items() if value}
+        self.max_segments = max(segments, 1)
+        self.limiter = limiter
+        self.size: int | None = None
+        self.validator: str | None = None
+        self.segments: list[_Segment] = []
+        self.hashers: dict[str, "hashlib._Hash"] | None = None
+
+    def _load_state(self) -> bool:
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+            if state.get("url") != self.url or not self.part.is_file():
+                return False
+            self.size = state.get("size")
+            self.validator = state.get("validator")
+            self.segments = [_Segment(*segment) for segment in state["segments"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if self.size is None and len(self.segments) == 1:
+            # Single stream of unknown size: the part file is the progress.
+            self.segments[0].done = self.part.stat().st_size
+        return bool(self.segments)
+
+    def _save_state(self) -> None:
+        state = {
+            "url": self.url,
+            "size": self.size,
+            "validator": self.validator,
+            "segments": [[segment.start, segment.end, segment.done] for segment in self.segments],
+        }
+        partial = self.state_path.with_name(f"{self.state_path.name}.tmp")
+        partial.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(partial, self.state_path)
+
+    def _reset(self) -> None:
+        self.part.unlink(missing_ok=True)
+        self.state_path.unlink(missing_ok=True)
+        self.segments = []
+        self.validator = None
+        self.size = None
+
+    async def _probe(self) -> None:
+        """Learn size, validator and range support from a one-byte range request.
+
+        (Not HEAD: signed release-asset URLs are often only valid for GET.)
+        """
+        async with self.client.stream("GET", self.url, headers={"Range": "bytes=0-0"}) as response:
+            response.raise_for_status()
+            self.validator = _validator(response)
+            if response.status_code != 206:
+                length = response.headers.get("content-length")
+                self.size = int(length) if length and length.isdigit() else None
+                return
+            total = response.headers.get("content-range", "").rpartition("/")[2]
+            if not total.isdigit():
+                return
+            self.size = int(total)
+        count = min(self.max_segments, self.size // DOWNLOAD_SEGMENT_MIN_BYTES)
+        if count < 2:
+            return
+        step = -(-self.size // count)
+        self.segments = [
+            _Segment(start, min(start + step, self.size)) for start in range(0, self.size, step)
+        ]
+
+    async def _start(self) -> None:
+        self._reset()
+        await self._probe()
+        if not self.segments:
+            self.segments = [_Segment(0, self.size)]
+        self.part.parent.mkdir(parents=True, exist_ok=True)
+        with self.part.open("wb") as fh:
+            if len(self.segments) > 1 and self.size is not None:
+                fh.truncate(self.size)
+
+    async def run(self) -> None:
+        started = self._load_state()
+        attempts = 0
+        while True:
+            try:
+                if not started:
+                    await self._start()
+                    started = True
+                if self.hashers is None and len(self.segments) == 1 and self.digests:
+                    self._start_streaming_hash()
+                await _run_all([self._fetch_segment(segment) for segment in self.segments if not segment.complete])
+                break
+            except _SourceChanged:
+                # Start over as one plain stream; this counts as a failed attempt.
+                self._restart_single_stream()
+                exc: Exception = DownloadError(f"{self.url} changed during the download")
+            except (*_RETRYABLE_ERRORS, httpx.HTTPStatusError) as error:
+                if not _retryable(error):
+                    raise
+                exc = error
+            finally:
+                if started:
+                    self._save_state()
+            attempts += 1
+            if attempts >= DOWNLOAD_ATTEMPTS:
+                raise DownloadError(f"Download of {self.url} kept failing: {exc}") from exc
+            await asyncio.sleep(DOWNLOAD_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+
+        await self._verify()
+        os.replace(self.part, self.destination)
+        self.state_path.unlink(missing_ok=True)
+
+    def _start_streaming_hash(self) -> None:
+        self.hashers = {name: hashlib.new(name) for name in self.digests}
+        done = self.segments[0].done
+        if not done:
+            return
+        # Resumed: the bytes already on disk are hashed once up front.
+        with self.part.open("rb") as fh:
+            remaining = done
+            while remaining > 0:
+                chunk = fh.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                for hasher in self.hashers.values():
+                    hasher.update(chunk)
+                remaining -= len(chunk)
+
+    async def _fetch_segment(self, segment: _Segment) -> None:
+        position = segment.start + segment.done
+        headers = {}
+        if position > 0 or (segment.end is not None and len(self.segments) > 1):
+            last = "" if segment.end is None else str(segment.end - 1)
+            headers["Range"] = f"bytes={position}-{last}"
+            if self.validator:
+                headers["If-Range"] = self.validator
+        async with self.client.stream("GET", self.url, headers=headers) as response:
+            response.raise_for_status()
+            if "Range" in headers and response.status_code != 206:
+                # If-Range failed (the file changed) or ranges are unsupported.
+                raise _SourceChanged()
+            if self.validator is None:
+                self.validator = _validator(response)
+            with self.part.open("r+b") as fh:
+                fh.seek(position)
+                unsaved = 0
+                async for chunk in response.aiter_raw():
+                    if segment.end is not None:
+                        chunk = chunk[: segment.end - position]
+                    if not chunk:
+                        break
+                    fh.write(chunk)
+                    if self.hashers is not None:
+                        for hasher in self.hashers.values():
+                            hasher.update(chunk)
+                    position += len(chunk)
+                    segment.done = position - segment.start
+                    unsaved += len(chunk)
+                    if unsaved >= _STATE_SAVE_BYTES:
+                        fh.flush()
+                        self._save_state()
+                        unsaved = 0
+                    await self.limiter.throttle(len(chunk))
+        if segment.end is None:
+            segment.end = position
+            self.size = position
+        elif position < segment.end:
+            raise httpx.RemoteProtocolError(f"Response ended at byte {position} of {segment.end}")
+
+    def _restart_single_stream(self) -> None:
+        self.size = None
+        self.validator = None
+        self.segments = [_Segment(0, None)]
+        with self.part.open("wb"):
+            pass
+        if self.digests:
+            self.hashers = {name: hashlib.new(name) for name in self.digests}
+
+    async def _verify(self) -> None:
+        if not self.digests:
+            return
+        if self.hashers is not None:
+            actual = {name: hasher.hexdigest() for name, hasher in self.hashers.items()}
+        else:
+            actual = await asyncio.to_thread(_file_digests, self.part, list(self.digests))
+        for name, expected in self.digests.items():
+            if actual[name] != expected:
+                self._reset()
+                raise DownloadDigestMismatch(
+                    f"{name} mismatch for {self.url}: expected {expected}, got {actual[name]}"
+                )
+
+
+async def _run_all(coroutines: list) -> None:
+    """Await all; on the first failure cancel the rest, then re-raise it."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in tasks:
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            raise task.exception()  # type: ignore[misc]
+
+
+def _file_digests(path: Path, names: list[str]) -> dict[str, str]:
+    hashers = {name: hashlib.new(name) for name in names}
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            for hasher in hashers.values():
+                hasher.update(chunk)
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+async def download_file(
+    url: str,
+    destination: Path,
+    *,
+    timeout: float | None = 60.0,
+    digests: Mapping[str, str] | None = None,
+    segments: int | None = None,
+    bandwidth_limit: int | None = None,
+    single_flight: bool = True,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> None:
+    """Download *url* to *destination*, resuming any earlier partial attempt.
+
+    Raises ``httpx.HTTPStatusError`` for HTTP errors other than 5xx and 429
+    (so callers can treat a 404 specially), ``DownloadDigestMismatch`` when
+    a digest does not match (the partial data is discarded) and
+    ``DownloadError`` when the connection or the server keeps failing (the
+    partial data is kept for next time).
+    """
+    destination = Path(destination)
+    lock = download_single_flight(destination) if single_flight else contextlib.nullcontext(False)
+    async with lock as waited:
+        if waited and destination.is_file():
+            # Somebody else finished it while we waited.
+            return
+        async with httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=True,
+            transport=transport,
+            # Ranges refer to the stored bytes; no transparent compression.
+            headers={"Accept-Encoding": "identity"},
+        ) as client:
+            download = _Download(
+                client,
+                url,
+                destination,
+                digests=digests or {},
+                segments=DOWNLOAD_SEGMENTS if segments is None else segments,
+                limiter=_limiter(DOWNLOAD_BANDWIDTH_LIMIT if bandwidth_limit is None else bandwidth_limit),
+            )
+            await download.run()
@@ -0,0 +1,102 @@
+"""A persistent index of per-file content hashes, keyed by stat signature.
+
+Fingerprinting a source tree means hashing every file in it. The index
+remembers ``(size, mtime_ns, sha256)`` per file in a small JSON file, so a
+later run (another process, or after a restart) only rehashes files whose
+size or mtime changed and just stats the rest.
+
+Self-contained (stdlib only): frameos/tools/prepare_assets.py loads this file
+by path, like makeapploaders.py does with app/codegen.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+FILE_HASH_INDEX_VERSION = 1
+# Files modified this recently may still change within the same mtime tick
+# (coarse filesystem timestamps); they are hashed but not remembered.
+RACY_MTIME_SECONDS = 2.0
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileHashIndex:
+    def __init__(self, path: Path | None) -> None:
+        self.path = path
+        self._entries: dict[str, tuple[int, int, str]] = {}
+        self._seen: set[str] = set()
+        self._dirty = False
+        self.hashed = 0
+        if path is not None:
+            self._load(path)
+
+    def _load(self, path: Path) -> None:
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(payload, dict) or payload.get("version") != FILE_HASH_INDEX_VERSION:
+            return
+        files = payload.get("files")
+        if not isinstance(files, dict):
+            return
+        for key, value in files.items():
+            if isinstance(value, list) and len(value) == 3:
+                size, mtime_ns, sha256 = value
+                if isinstance(size, int) and isinstance(mtime_ns, int) and isinstance(sha256, str):
+                    self._entries[key] = (size, mtime_ns, sha256)
+
+    def sha256(self, path: Path, stat: os.stat_result | None = None) -> str:
+        """Content hash of *path*, reused from the index while its stat matches."""
+        stat = stat or path.stat()
+        key = str(path.absolute())
+        self._seen.add(key)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        sha256 = sha256_file(path)
+        self.hashed += 1
+        if stat.st_mtime_ns < (time.time() - RACY_MTIME_SECONDS) * 1_000_000_000:
+            self._entries[key] = (stat.st_size, stat.st_mtime_ns, sha256)
+            self._dirty = True
+        elif self._entries.pop(key, None) is not None:
+            self._dirty = True
+        return sha256
+
+    def save(self) -> None:
+        """Write the index back, dropping entries for files that are gone.
+
+        Entries for other files are kept even when not looked up this time:
+        several callers may hash different subsets into one index.
+        """
+        if self.path is None:
+            return
+        stale = [key for key in self._entries.keys() - self._seen if not os.path.exists(key)]
+        for key in stale:
+            del self._entries[key]
+        if not self._dirty and not stale:
+            return
+        payload = {
+            "version": FILE_HASH_INDEX_VERSION,
+            "files": {key: list(value) for key, value in sorted(self._entries.items())},
+        }
+        partial = self.path.with_name(f"{self.path.name}.{os.getpid()}.partial")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            partial.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+            os.replace(partial, self.path)
+        except OSError:
+            # Only a cache: a read-only tree still fingerprints, just slower.
+            partial.unlink(missing_ok=True)
+            return
+        self._dirty = False
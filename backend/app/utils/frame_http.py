@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 from http import HTTPStatus
 import ipaddress
 import ssl
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlsplit
 
 import httpx
 from cryptography import x509
@@ -13,6 +15,12 @@ from fastapi import HTTPException
 
 from app.models.frame import Frame, normalize_https_proxy
 from app.utils.env import get_env_float, get_env_int
+from app.utils.frame_reachability import (
+    frame_offline_exception,
+    get_frame_reachability,
+    is_known_down,
+    record_frame_reachability,
+)
 from app.utils.network import is_safe_host
 from app.utils.remote_exec import _use_remote
 from app.ws.remote_ws import http_get_on_frame
@@ -28,6 +36,12 @@ FRAME_HTTP_TIMEOUT = httpx.Timeout(
 )
 _frame_http_semaphore = asyncio.Semaphore(FRAME_HTTP_MAX_CONCURRENCY)
 FRAME_HTTP_RETRIES = get_env_int("FRAME_HTTP_RETRIES", 2)
+# Head start each direct candidate (configured host, last boot IP, ...) gets
+# to connect before the next one is tried in parallel, and how long the
+# winner is remembered so later requests try it first.
+FRAME_HTTP_RACE_STAGGER_SECONDS = get_env_float("FRAME_HTTP_RACE_STAGGER", 0.25)
+FRAME_HTTP_ROUTE_TTL_SECONDS = get_env_int("FRAME_HTTP_ROUTE_TTL", 600)
+_RACEABLE_METHODS = {"GET", "HEAD", "OPTIONS"}
 DEFAULT_FRAME_HTTPS_PROXY_PORT = 8443
 
 
@@ -234,11 +248,13 @@ async def _fetch_frame_http_bytes(
     body: bytes | str | None = None,
     headers: Optional[dict[str, str]] = None,
     timeout: Optional[httpx.Timeout] = None,
+    live: bool = False,
 ) -> tuple[int, bytes, dict[str, str]]:
     """Fetch *path* from the frame returning (status, body-bytes, headers).
 
     `timeout` overrides FRAME_HTTP_TIMEOUT for requests that legitimately
-    take long (e.g. asset uploads crawling over a weak WiFi link)."""
+    take long (e.g. asset uploads crawling over a weak WiFi link). `live`
+    skips the known-down short-circuit, for explicit pings."""
     if await _use_remote(frame, redis):
         remote_body: str | None
         if isinstance(body, bytes):
@@ -266,56 +282,239 @@ async def _fetch_frame_http_bytes(
             return status, body, hdrs
         raise HTTPException(status_code=500, detail="Bad remote response")
 
+    # Polling reads fail fast for frames the reachability monitor saw go
+    # down; actions still get their one real attempt.
+    raceable = method.upper() in _RACEABLE_METHODS
+    reachability = await get_frame_reachability(redis, frame.id)
+    if raceable and not live and is_known_down(reachability):
+        raise frame_offline_exception(reachability)
+
     candidates = _frame_http_direct_candidates(frame, path, method)
+    remembered = await _remembered_route(redis, frame) if len(candidates) > 1 else None
+    candidates = _prefer_route(candidates, remembered)
     hdrs = _auth_headers(frame, headers)
+    request_timeout = timeout if timeout is not None else FRAME_HTTP_TIMEOUT
+
+    async def attempt(
+        url: str, verify: Any, on_connect: Callable[[], Awaitable[None]]
+    ) -> tuple[int, bytes, dict[str, str]]:
+        return await _request_candidate(frame, url, verify, method, hdrs, body, request_timeout, on_connect)
+
+    # Only idempotent requests are raced: when the hostname and the last boot
+    # IP both reach the device, a raced POST would run the action twice.
+    stagger = FRAME_HTTP_RACE_STAGGER_SECONDS if raceable else None
+    async with _frame_http_semaphore:
+        index, result = await _race_candidates(candidates, attempt, stagger=stagger)
+
+    if reachability is not None and not reachability.get("up", True) and frame.id is not None:
+        # The frame answered before the monitor noticed; stop short-circuiting.
+        await record_frame_reachability(redis, int(frame.id), True, http_status=result[0], previous=reachability)
+
+    if len(candidates) > 1:
+        origin = _candidate_origin(candidates[index][0])
+        if origin != remembered:
+            await _remember_route(redis, frame, origin)
+    return result
+
+
+class _CandidateFailed(Exception):
+    """One route to the frame failed; the next one may still work."""
+
+    def __init__(self, error: HTTPException):
+        super().__init__(error.detail)
+        self.error = error
+
+
+async def _request_candidate(
+    frame: Frame,
+    url: str,
+    verify: Any,
+    method: str,
+    hdrs: dict[str, str],
+    body: bytes | str | None,
+    timeout: httpx.Timeout,
+    on_connect: Optional[Callable[[], Awaitable[None]]] = None,
+) -> tuple[int, bytes, dict[str, str]]:
+    """Request one candidate URL with retries. Raises _CandidateFailed when
+    this route is unusable, HTTPException when no route will do better.
+
+    *on_connect* is awaited once the connection is up, just before the
+    request is sent."""
     timeout_errors = (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.WriteTimeout)
     attempts = max(1, FRAME_HTTP_RETRIES)
-    last_error: HTTPException | None = None
-    async with _frame_http_semaphore:
-        for candidate_index, (url, verify) in enumerate(candidates):
-            async with httpx.AsyncClient(verify=verify) as client:
-                for attempt in range(1, attempts + 1):
-                    try:
-                        response = await client.request(
-                            method,
-                            url,
-                            headers=hdrs,
-                            content=body,
-                            timeout=timeout if timeout is not None else FRAME_HTTP_TIMEOUT,
-                        )
-                        return response.status_code, response.content, dict(response.headers)
-                    except timeout_errors:
-                        if attempt < attempts:
-                            await asyncio.sleep(0.15 * attempt)
-                            continue
-                        last_error = HTTPException(
-                            status_code=HTTPStatus.REQUEST_TIMEOUT,
-                            detail=f"Timeout to {url}",
-                        )
-                    except httpx.PoolTimeout:
-                        raise HTTPException(
-                            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
-                            detail="Frame request queue is saturated",
-                        )
-                    except httpx.ConnectError as exc:
-                        if detail := _tls_connect_error_detail(frame, str(exc)):
-                            last_error = HTTPException(
-                                status_code=HTTPStatus.BAD_GATEWAY,
-                                detail=detail,
-                            )
-                            break
-                        last_error = HTTPException(
-                            status_code=HTTPStatus.BAD_GATEWAY,
-                            detail=str(exc),
-                        )
-                    except Exception as exc:
-                        raise HTTPException(
-                            status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(exc)
-                        )
-                    break
-            if candidate_index < len(candidates) - 1:
+
+    async def trace(event: str, _info: dict[str, Any]) -> None:
+        if on_connect is not None and event.endswith("send_request_headers.started"):
+            await on_connect()
+
+    async with httpx.AsyncClient(verify=verify) as client:
+        for attempt in range(1, attempts + 1):
+            try:
+                response = await client.request(
+                    method,
+                    url,
+                    headers=hdrs,
+                    content=body,
+                    timeout=timeout,
+                    extensions={"trace": trace},
+                )
+                return response.status_code, response.content, dict(response.headers)
+            except timeout_errors:
+                if attempt < attempts:
+                    await asyncio.sleep(0.15 * attempt)
+                    continue
+                raise _CandidateFailed(HTTPException(
+                    status_code=HTTPStatus.REQUEST_TIMEOUT,
+                    detail=f"Timeout to {url}",
+                ))
+            except httpx.PoolTimeout:
+                raise HTTPException(
+                    status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                    detail="Frame request queue is saturated",
+                )
+            except httpx.ConnectError as exc:
+                detail = _tls_connect_error_detail(frame, str(exc)) or str(exc)
+                raise _CandidateFailed(HTTPException(
+                    status_code=HTTPStatus.BAD_GATEWAY,
+                    detail=detail,
+                ))
+            except Exception as exc:
+                raise HTTPException(
+                    status_code=HTTPStatus.INTERNAL_SERVER_ERROR, detail=str(exc)
+                )
+    raise _CandidateFailed(HTTPException(status_code=HTTPStatus.BAD_GATEWAY, detail="Frame request failed"))
+
+
+def _is_route_answer(status: int) -> bool:
+    return 200 <= status < 300 or status == HTTPStatus.NOT_MODIFIED
+
+
+async def _race_candidates(
+    candidates: list[tuple[str, Any]],
+    attempt: Callable[[str, Any, Callable[[], Awaitable[None]]], Awaitable[tuple[int, bytes, dict[str, str]]]],
+    *,
+    stagger: float | None,
+) -> tuple[int, tuple[int, bytes, dict[str, str]]]:
+    """Happy-eyeballs over *candidates*, returning (winner index, result).
+
+    The next candidate starts when the running ones fail, or — if *stagger*
+    is set — after *stagger* seconds in which none of them connected. Only
+    the connect phase is raced: a candidate that connects waits (in the
+    ``on_connect`` callback *attempt* gets) until no other one is sending,
+    so a slow response never doubles the request. The first answer wins
+    and cancels the rest; a fallback (any candidate but the first) only
+    wins with a 2xx or 304, since a stale IP may belong to another host by
+    now. With ``stagger=None`` candidates run strictly one after another.
+    """
+    tasks: dict[asyncio.Task, int] = {}
+    errors: list[HTTPException] = []
+    rejected: HTTPException | None = None
+    sending = asyncio.Lock()
+    connected = False
+
+    def wins(index: int, result: tuple[int, bytes, dict[str, str]]) -> bool:
+        return index == 0 or _is_route_answer(result[0])
+
+    async def run(index: int) -> tuple[int, bytes, dict[str, str]]:
+        url, verify = candidates[index]
+        holding = False
+
+        async def on_connect() -> None:
+            nonlocal connected, holding
+            connected = True
+            if not holding:
+                await sending.acquire()
+                holding = True
+
+        try:
+            result = await attempt(url, verify, on_connect)
+        except BaseException:
+            if holding:
+                sending.release()
+            raise
+        # A winner keeps the others from sending until they're cancelled.
+        if holding and not wins(index, result):
+            sending.release()
+        return result
+
+    next_index = 0
+    launch = True
+    try:
+        while True:
+            if launch and next_index < len(candidates):
+                tasks[asyncio.create_task(run(next_index))] = next_index
+                next_index += 1
+            launch = False
+            if not tasks:
+                break
+
+            wait_for = stagger if stagger is not None and not connected and next_index < len(candidates) else None
+            done, _ = await asyncio.wait(tasks, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                launch = not connected
                 continue
 
-    if last_error is not None:
-        raise last_error
+            failed = False
+            for task in sorted(done, key=lambda finished: tasks[finished]):
+                index = tasks.pop(task)
+                try:
+                    result = task.result()
+                except _CandidateFailed as exc:
+                    errors.append(exc.error)
+                    failed = True
+                    continue
+                if wins(index, result):
+                    return index, result
+                rejected = HTTPException(
+                    status_code=HTTPStatus.BAD_GATEWAY,
+                    detail=f"{_candidate_origin(candidates[index][0])} answered {result[0]}",
+                )
+                failed = True
+            launch = failed
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(BaseException):
+                await task
+
+    if errors:
+        raise errors[-1]
+    if rejected is not None:
+        raise rejected
     raise HTTPException(status_code=HTTPStatus.BAD_GATEWAY, detail="Frame request failed")
+
+
+def frame_http_route_key(frame_id: int) -> str:
+    return f"frame:{frame_id}:http_route"
+
+
+def _candidate_origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _prefer_route(candidates: list[tuple[str, Any]], origin: str | None) -> list[tuple[str, Any]]:
+    if not origin:
+        return candidates
+    preferred = [candidate for candidate in candidates if _candidate_origin(candidate[0]) == origin]
+    return preferred + [candidate for candidate in candidates if candidate not in preferred]
+
+
+async def _remembered_route(redis: Redis | None, frame: Frame) -> str | None:
+    if redis is None:
+        return None
+    try:
+        value = await redis.get(frame_http_route_key(int(frame.id)))
+    except Exception:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode(errors="replace")
+    return value or None
+
+
+async def _remember_route(redis: Redis | None, frame: Frame, origin: str) -> None:
+    if redis is None or frame.id is None:
+        return
+    with contextlib.suppress(Exception):
+        await redis.set(frame_http_route_key(int(frame.id)), origin, ex=FRAME_HTTP_ROUTE_TTL_SECONDS)
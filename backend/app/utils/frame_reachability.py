@@ -0,0 +1,340 @@
+"""Fleet reachability monitor.
+
+Runs as a single asyncio task inside the arq worker (same singleton slot as
+the Home Assistant and FrameOS Cloud syncs) and probes every directly
+reachable frame on an adaptive schedule: one batched ICMP sweep for all due
+frames plus an HTTP ``HEAD /`` against each frame's own server. Any HTTP
+response — even a 404 — proves the FrameOS server is up.
+
+The result lands in Redis under ``frame:<id>:reachability``::
+
+    {"up": true, "rttMs": 4.2, "httpStatus": 200, "lastSeen": 1700000000.0,
+     "checkedAt": 1700000000.0, "failures": 0}
+
+Request handlers read it to fail fast: a polling GET against a frame that
+failed its recent probes raises straight away instead of waiting out the
+connect timeout, so the image endpoint serves the cached image immediately.
+
+Schedule: frames that just changed state are rechecked after
+``RECHECK_SECONDS``; down frames every ``DOWN_INTERVAL_SECONDS``; up frames
+start at ``UP_MIN_INTERVAL_SECONDS`` and stretch to ``UP_MAX_INTERVAL_SECONDS``
+while they stay up.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import re
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Any, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from app.utils.env import get_env_float, get_env_int
+
+RECHECK_SECONDS = 10.0
+DOWN_INTERVAL_SECONDS = get_env_float("FRAME_REACHABILITY_DOWN_INTERVAL", 30.0)
+UP_MIN_INTERVAL_SECONDS = get_env_float("FRAME_REACHABILITY_UP_MIN_INTERVAL", 30.0)
+UP_MAX_INTERVAL_SECONDS = get_env_float("FRAME_REACHABILITY_UP_MAX_INTERVAL", 120.0)
+PROBE_TIMEOUT_SECONDS = get_env_float("FRAME_REACHABILITY_PROBE_TIMEOUT", 3.0)
+PROBE_CONCURRENCY = get_env_int("FRAME_REACHABILITY_CONCURRENCY", 32)
+# Consecutive failed probes before a frame counts as down, and how long a
+# "down" verdict is trusted. The window outlives one down interval so a
+# single late sweep doesn't reopen the floodgates.
+DOWN_AFTER_FAILURES = 2
+DOWN_TRUST_SECONDS = DOWN_INTERVAL_SECONDS * 3
+STATE_TTL_SECONDS = 15 * 60
+FRAME_RELOAD_SECONDS = 30.0
+TICK_SECONDS = 2.0
+
+_PING_TIME_RE = re.compile(r"time[=<]\s*([\d.]+)\s*ms")
+
+
+def frame_reachability_key(frame_id: int) -> str:
+    return f"frame:{frame_id}:reachability"
+
+
+async def get_frame_reachability(redis, frame_id: int | None) -> Optional[dict[str, Any]]:
+    if redis is None or frame_id is None:
+        return None
+    try:
+        raw = await redis.get(frame_reachability_key(int(frame_id)))
+    except Exception:
+        return None
+    if not raw:
+        return None
+    try:
+        state = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def is_known_down(state: Optional[dict[str, Any]], *, now: float | None = None) -> bool:
+    if not state or state.get("up", True):
+        return False
+    if int(state.get("failures") or 0) < DOWN_AFTER_FAILURES:
+        return False
+    checked_at = float(state.get("checkedAt") or 0)
+    return ((now or time.time()) - checked_at) <= DOWN_TRUST_SECONDS
+
+
+def frame_offline_exception(state: Optional[dict[str, Any]]) -> HTTPException:
+    last_seen = (state or {}).get("lastSeen")
+    detail = "Frame is offline"
+    if last_seen:
+        ago = max(int(time.time() - float(last_seen)), 0)
+        detail += f" (last seen {ago}s ago)"
+    return HTTPException(status_code=HTTPStatus.SERVICE_UNAVAILABLE, detail=detail)
+
+
+async def record_frame_reachability(
+    redis,
+    frame_id: int,
+    up: bool,
+    *,
+    rtt_ms: float | None = None,
+    http_status: int | None = None,
+    previous: Optional[dict[str, Any]] = None,
+    now: float | None = None,
+) -> dict[str, Any]:
+    """Store one probe result, carrying ``lastSeen`` and the failure streak over."""
+    now = now or time.time()
+    previous = previous or {}
+    state = {
+        "up": up,
+        "rttMs": round(rtt_ms, 1) if rtt_ms is not None else None,
+        "httpStatus": http_status,
+        "lastSeen": now if up else previous.get("lastSeen"),
+        "checkedAt": now,
+        "failures": 0 if up else int(previous.get("failures") or 0) + 1,
+    }
+    with contextlib.suppress(Exception):
+        await redis.set(frame_reachability_key(frame_id), json.dumps(state), ex=STATE_TTL_SECONDS)
+    return state
+
+
+async def ping_hosts(hosts: list[str], *, timeout: float = PROBE_TIMEOUT_SECONDS) -> dict[str, float | None]:
+    """ICMP round-trip time in ms per host, ``None`` when it didn't answer.
+
+    Uses one ``fping`` process for the whole batch when it is installed and
+    falls back to concurrent ``ping -c 1`` processes otherwise.
+    """
+    unique = sorted(set(hosts))
+    if not unique:
+        return {}
+    if shutil.which("fping"):
+        return await _fping_hosts(unique, timeout)
+    if not shutil.which("ping"):
+        return dict.fromkeys(unique)
+    semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+
+    async def one(host: str) -> float | None:
+        async with semaphore:
+            return await _ping_host(host, timeout)
+
+    results = await asyncio.gather(*(one(host) for host in unique))
+    return dict(zip(unique, results))
+
+
+async def _run_probe_process(args: list[str], timeout: float) -> tuple[int | None, str]:
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+    except (FileNotFoundError, PermissionError):
+        return None, ""
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        with contextlib.suppress(Exception):
+            await proc.wait()
+        return None, ""
+    return proc.returncode, (stdout or b"").decode(errors="replace")
+
+
+async def _ping_host(host: str, timeout: float) -> float | None:
+    timeout_arg = str(int(timeout * 1000)) if sys.platform == "darwin" else str(max(int(timeout), 1))
+    returncode, output = await _run_probe_process(["ping", "-c", "1", "-W", timeout_arg, host], timeout + 1.0)
+    if returncode != 0:
+        return None
+    match = _PING_TIME_RE.search(output)
+    return float(match.group(1)) if match else 0.0
+
+
+async def _fping_hosts(hosts: list[str], timeout: float) -> dict[str, float | None]:
+    args = ["fping", "-C", "1", "-q", "-t", str(int(timeout * 1000)), *hosts]
+    _returncode, output = await _run_probe_process(args, timeout + 2.0 + len(hosts) * 0.01)
+    return parse_fping_output(output, hosts)
+
+
+def parse_fping_output(output: str, hosts: list[str]) -> dict[str, float | None]:
+    """Parse ``fping -C 1 -q`` lines: ``host : 1.23`` or ``host : -``."""
+    results: dict[str, float | None] = dict.fromkeys(hosts)
+    for line in output.splitlines():
+        host, sep, values = line.partition(" : ")
+        host = host.strip()
+        if not sep or host not in results:
+            continue
+        first = values.split()[0] if values.split() else "-"
+        with contextlib.suppress(ValueError):
+            results[host] = float(first)
+    return results
+
+
+@dataclass(slots=True)
+class ProbeTarget:
+    frame_id: int
+    host: str
+    url: str
+    verify: Any
+
+
+@dataclass(slots=True)
+class _Schedule:
+    next_check: float = 0.0
+    up_streak: int = 0
+    last_up: Optional[bool] = None
+
+
+def next_probe_delay(schedule: _Schedule, up: bool) -> float:
+    """Seconds until the next probe, updating the streak on *schedule*."""
+    changed = schedule.last_up is not None and schedule.last_up != up
+    schedule.last_up = up
+    if not up:
+        schedule.up_streak = 0
+        return RECHECK_SECONDS if changed else DOWN_INTERVAL_SECONDS
+    schedule.up_streak = 0 if changed else schedule.up_streak + 1
+    if changed:
+        return RECHECK_SECONDS
+    return min(UP_MIN_INTERVAL_SECONDS * (2 ** max(schedule.up_streak - 1, 0)), UP_MAX_INTERVAL_SECONDS)
+
+
+def probe_target_for_frame(frame) -> Optional[ProbeTarget]:
+    """How to reach *frame* directly, or ``None`` when it isn't ours to probe.
+
+    Embedded frames deep-sleep between refreshes and frames driven through
+    the agent are reached over its websocket, so neither is probed.
+    """
+    from app.utils.frame_http import _frame_scheme_port, _httpx_verify, _is_embedded_frame
+    from app.utils.network import is_safe_host
+
+    if frame.id is None or _is_embedded_frame(frame):
+        return None
+    agent = frame.agent or {}
+    if agent.get("agentEnabled") and agent.get("agentRunCommands"):
+        return None
+    host = (frame.frame_host or "").strip()
+    if not host or not is_safe_host(host):
+        return None
+    scheme, port = _frame_scheme_port(frame)
+    url_host = f"[{host}]" if ":" in host else host
+    return ProbeTarget(int(frame.id), host, f"{scheme}://{url_host}:{port}/", _httpx_verify(frame))
+
+
+class FrameReachabilityMonitor:
+    def __init__(self):
+        self._targets: dict[int, ProbeTarget] = {}
+        self._schedules: dict[int, _Schedule] = {}
+        self._targets_loaded_at = 0.0
+
+    # ---- lifecycle ----------------------------------------------------------
+
+    async def run(self):
+        from app.redis import close_redis_connection, create_redis_connection
+
+        backoff = 5.0
+        while True:
+            redis = create_redis_connection()
+            try:
+                while True:
+                    await self.tick(redis)
+                    backoff = 5.0
+                    await asyncio.sleep(TICK_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                print(f"🔴 Frame reachability monitor error, retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 300.0)
+            finally:
+                with contextlib.suppress(Exception):
+                    await close_redis_connection(redis)
+
+    async def tick(self, redis, *, now: float | None = None) -> list[int]:
+        """Probe every frame that is due; returns the probed frame ids."""
+        now = now or time.monotonic()
+        if now - self._targets_loaded_at >= FRAME_RELOAD_SECONDS or not self._targets_loaded_at:
+            self.set_targets(await asyncio.to_thread(self._load_targets))
+            self._targets_loaded_at = now
+        due = [
+            target
+            for frame_id, target in self._targets.items()
+            if self._schedules.setdefault(frame_id, _Schedule()).next_check <= now
+        ]
+        if not due:
+            return []
+        await self.probe(redis, due, now=now)
+        return [target.frame_id for target in due]
+
+    def set_targets(self, targets: list[ProbeTarget]) -> None:
+        self._targets = {target.frame_id: target for target in targets}
+        for frame_id in list(self._schedules):
+            if frame_id not in self._targets:
+                del self._schedules[frame_id]
+
+    @staticmethod
+    def _load_targets() -> list[ProbeTarget]:
+        from app.database import SessionLocal
+        from app.models.frame import Frame
+
+        db = SessionLocal()
+        try:
+            targets = [probe_target_for_frame(frame) for frame in db.query(Frame).all()]
+        finally:
+            db.close()
+        return [target for target in targets if target is not None]
+
+    # ---- probing -------------------------------------------------------------
+
+    async def probe(self, redis, targets: list[ProbeTarget], *, now: float | None = None) -> None:
+        now = now or time.monotonic()
+        semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+
+        async def head(target: ProbeTarget) -> int | None:
+            async with semaphore:
+                return await self._http_head(target)
+
+        pings, statuses = await asyncio.gather(
+            ping_hosts([target.host for target in targets]),
+            asyncio.gather(*(head(target) for target in targets)),
+        )
+        for target, http_status in zip(targets, statuses):
+            rtt_ms = pings.get(target.host)
+            up = http_status is not None
+            previous = await get_frame_reachability(redis, target.frame_id)
+            await record_frame_reachability(
+                redis, target.frame_id, up, rtt_ms=rtt_ms, http_status=http_status, previous=previous
+            )
+            schedule = self._schedules.setdefault(target.frame_id, _Schedule())
+            schedule.next_check = now + next_probe_delay(schedule, up)
+
+    async def _http_head(self, target: ProbeTarget) -> int | None:
+        try:
+            async with httpx.AsyncClient(verify=target.verify, timeout=PROBE_TIMEOUT_SECONDS) as client:
+                response = await client.head(target.url)
+        except Exception:
+            return None
+        return response.status_code
+
+
+frame_reachability_monitor = FrameReachabilityMonitor()
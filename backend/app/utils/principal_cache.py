@@ -0,0 +1,253 @@
+"""Short-lived cache of authenticated principals.
+
+Devices authenticate with their frame's ``server_api_key``; dashboards with a
+session (bearer JWT or cookie). Resolving either cost one to three queries
+per request before any real work, and device log posts and render polls are
+the most frequent requests the backend serves. This module keeps what auth
+needs in memory for ``FRAMEOS_PRINCIPAL_CACHE_TTL`` seconds:
+
+- frames by the sha256 of their API key: id, project and mode;
+- sessions by their id hash: the user row and the session's expiry;
+- project ids per user, which scope websocket broadcasts.
+
+Entries are dropped as soon as what they mirror changes. Mapper listeners on
+the models and the session revocation helpers call ``invalidate_principals``,
+which clears this process's entries and publishes a ``principal_invalidate``
+message on the Redis ``broadcast_channel``. Every API process (the HA
+add-on runs a second uvicorn) clears its own entries from ``redis_listener``.
+The arq worker never authenticates anything, so it only publishes: its
+writes to frames and sessions reach the API's caches this way. The TTL
+bounds whatever slips past both (raw SQL, a dropped pub/sub message).
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.config import config
+from app.database import calling_loop
+from app.utils.env import get_env_float
+
+if TYPE_CHECKING:
+    from app.models.user import User
+
+PRINCIPAL_CACHE_TTL_SECONDS = get_env_float("FRAMEOS_PRINCIPAL_CACHE_TTL", 30.0)
+# Per map; reaching it clears the map rather than tracking recency.
+PRINCIPAL_CACHE_MAX_ENTRIES = 10_000
+PRINCIPAL_INVALIDATE_EVENT = "principal_invalidate"
+
+
+@dataclass(frozen=True)
+class FramePrincipal:
+    frame_id: int
+    project_id: int
+    mode: str
+
+
+@dataclass(frozen=True)
+class _SessionPrincipal:
+    user_id: int
+    email: str
+    password: str | None
+    expires_at: datetime.datetime
+
+
+_frames: dict[str, tuple[float, FramePrincipal]] = {}
+_sessions: dict[str, tuple[float, _SessionPrincipal]] = {}
+_user_projects: dict[int, tuple[float, frozenset[int]]] = {}
+_pending_publishes: set[asyncio.Task] = set()
+
+
+def _get(cache: dict, key: Any) -> Any:
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        cache.pop(key, None)
+        return None
+    return entry[1]
+
+
+def _put(cache: dict, key: Any, value: Any) -> None:
+    if PRINCIPAL_CACHE_TTL_SECONDS <= 0:
+        return
+    if len(cache) >= PRINCIPAL_CACHE_MAX_ENTRIES:
+        cache.clear()
+    cache[key] = (time.monotonic() + PRINCIPAL_CACHE_TTL_SECONDS, value)
+
+
+def api_key_hash(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def frame_principal(db: Session, api_key: str | None) -> FramePrincipal | None:
+    """The frame whose ``server_api_key`` is *api_key*, if any."""
+    if not api_key:
+        return None
+    from app.models.frame import Frame
+
+    key = api_key_hash(api_key)
+    principal = _get(_frames, key)
+    if principal is None:
+        row = (
+            db.query(Frame.id, Frame.project_id, Frame.mode)
+            .filter(Frame.server_api_key == api_key)
+            .first()
+        )
+        if row is None:
+            return None
+        principal = FramePrincipal(frame_id=int(row.id), project_id=int(row.project_id), mode=row.mode or "rpios")
+        _put(_frames, key, principal)
+    return principal
+
+
+def session_user(db: Session, email: str, session_id: str | None) -> User | None:
+    """The user named by a credential's *email*, if its session is active.
+
+    A cached user is attached to *db* with ``merge(load=False)``: it behaves
+    like a freshly loaded row without a query.
+    """
+    if not session_id:
+        return None
+    from app.models.user import User
+    from app.models.user_session import UserSession, hash_session_id
+
+    key = hash_session_id(session_id)
+    now = datetime.datetime.utcnow()
+    principal = _get(_sessions, key)
+    if principal is None or principal.email != email:
+        session = (
+            db.query(UserSession.revoked_at, UserSession.expires_at)
+            .filter(UserSession.session_id_hash == key)
+            .first()
+        )
+        if session is None or session.revoked_at is not None or session.expires_at <= now:
+            return None
+        user = db.query(User).filter(User.email == email).first()
+        if user is None:
+            return None
+        _put(_sessions, key, _SessionPrincipal(
+            user_id=int(user.id),
+            email=user.email,
+            password=user.password,
+            expires_at=session.expires_at,
+        ))
+        return user
+    if principal.expires_at <= now:
+        _sessions.pop(key, None)
+        return None
+    user = User(id=principal.user_id, email=principal.email, password=principal.password)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def user_project_ids(db: Session, user_id: int) -> frozenset[int]:
+    """Ids of the projects in every organization *user_id* belongs to."""
+    project_ids = _get(_user_projects, user_id)
+    if project_ids is None:
+        from app.models.organization import OrganizationMember, Project
+
+        project_ids = frozenset(
+            int(project_id)
+            for (project_id,) in (
+                db.query(Project.id)
+                .join(OrganizationMember, OrganizationMember.organization_id == Project.organization_id)
+                .filter(OrganizationMember.user_id == user_id)
+                .all()
+            )
+        )
+        _put(_user_projects, user_id, project_ids)
+    return project_ids
+
+
+def apply_principal_invalidation(data: dict[str, Any]) -> None:
+    """Drop this process's entries matching *data* (see ``invalidate_principals``)."""
+    frame_id = data.get("frameId")
+    if frame_id is not None:
+        for key, (_expiry, principal) in list(_frames.items()):
+            if principal.frame_id == frame_id:
+                _frames.pop(key, None)
+    user_id = data.get("userId")
+    if user_id is not None:
+        for key, (_expiry, principal) in list(_sessions.items()):
+            if principal.user_id == user_id:
+                _sessions.pop(key, None)
+        _user_projects.pop(user_id, None)
+    if data.get("sessionHash"):
+        _sessions.pop(data["sessionHash"], None)
+    if data.get("allSessions"):
+        _sessions.clear()
+    if data.get("allProjects"):
+        _user_projects.clear()
+
+
+def invalidate_principals(
+    *,
+    frame_id: int | None = None,
+    user_id: int | None = None,
+    session_hash: str | None = None,
+    all_sessions: bool = False,
+    all_projects: bool = False,
+) -> None:
+    """Drop cached principals here and in every other backend process."""
+    data: dict[str, Any] = {}
+    if frame_id is not None:
+        data["frameId"] = int(frame_id)
+    if user_id is not None:
+        data["userId"] = int(user_id)
+    if session_hash:
+        data["sessionHash"] = session_hash
+    if all_sessions:
+        data["allSessions"] = True
+    if all_projects:
+        data["allProjects"] = True
+    if not data:
+        return
+    apply_principal_invalidation(data)
+    _publish_invalidation(data)
+
+
+def _publish_invalidation(data: dict[str, Any]) -> None:
+    # Called from sync code (mapper events, revocation helpers), possibly on
+    # a DB thread (``run_db``). Without a loop to reach (CLI scripts) other
+    # processes fall back to the TTL.
+    loop = calling_loop()
+    if loop is None:
+        return
+    message = json.dumps({"event": PRINCIPAL_INVALIDATE_EVENT, "data": data, "instance_id": config.INSTANCE_ID})
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        _schedule_publish(message)
+    elif not loop.is_closed():
+        loop.call_soon_threadsafe(_schedule_publish, message)
+
+
+def _schedule_publish(message: str) -> None:
+    from app.redis import get_shared_redis
+
+    task = asyncio.get_running_loop().create_task(_publish(get_shared_redis(), message))
+    _pending_publishes.add(task)
+    task.add_done_callback(_pending_publishes.discard)
+
+
+async def _publish(redis, message: str) -> None:
+    try:
+        await redis.publish("broadcast_channel", message)
+    except Exception as e:
+        print(f"principal_cache: invalidation publish failed: {e}")
+
+
+def clear_principal_cache() -> None:
+    _frames.clear()
+    _sessions.clear()
+    _user_projects.clear()
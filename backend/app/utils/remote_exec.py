@@ -25,6 +25,7 @@ from app.utils.ssh_utils import (
     get_ssh_connection,
     exec_command,
     remove_ssh_connection,
+    retire_ssh_connection,
 )
 
 __all__ = [
@@ -483,8 +484,10 @@ async def upload_file(
             finally:
                 if broken:
                     # A stalled or failed transfer usually means a dead TCP
-                    # connection; close it so the pool can't hand it out again.
-                    ssh.abort()
+                    # connection. Other leases may still be using it, so only
+                    # retire it: the pool stops handing it out and closes it
+                    # once the last holder lets go.
+                    await retire_ssh_connection(ssh, frame)
                 await remove_ssh_connection(db, redis, ssh, frame)
         raise RuntimeError(
             f"scp upload of {remote_path} failed after {SCP_MAX_ATTEMPTS} attempts"
@@ -0,0 +1,170 @@
+"""Copy-on-write and sparse file helpers for composing disk images.
+
+Per-frame SD images differ from their base in a few partitions only, so
+composing one should cost roughly the bytes that actually change:
+
+- ``clone_image`` reflinks the base (``FICLONE``) where the filesystem
+  supports it (btrfs, XFS, bcachefs, ...), sharing every extent until it is
+  written. Elsewhere it falls back to a sparse copy that only copies data
+  extents and leaves zero runs as holes.
+- ``sparse_decompress`` unpacks a gzipped image the same way.
+- ``write_region`` copies a partition image into place block by block,
+  skipping blocks that already match (so reflinked extents stay shared) and
+  punching holes instead of writing zero blocks.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import gzip
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+FICLONE = 0x40049409
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+SPARSE_BLOCK_SIZE = 1024 * 1024
+_ZERO_BLOCK = bytes(SPARSE_BLOCK_SIZE)
+
+_fallocate = None
+
+
+@dataclass(slots=True)
+class RegionWriteStats:
+    written: int = 0
+    unchanged: int = 0
+    punched: int = 0
+
+
+def _is_zero(block: bytes) -> bool:
+    if len(block) == SPARSE_BLOCK_SIZE:
+        return block == _ZERO_BLOCK
+    return not block.strip(b"\0")
+
+
+def reflink_file(source: Path, destination: Path) -> bool:
+    """Clone *source* into *destination* sharing extents; False when unsupported."""
+    if fcntl is None:
+        return False
+    try:
+        with source.open("rb") as src, destination.open("wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        destination.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def _data_ranges(fd: int, size: int) -> Iterator[tuple[int, int]]:
+    """(start, end) of the allocated extents of *fd*; the whole file without SEEK_DATA."""
+    seek_data = getattr(os, "SEEK_DATA", None)
+    seek_hole = getattr(os, "SEEK_HOLE", None)
+    if seek_data is None or seek_hole is None:
+        yield 0, size
+        return
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, seek_data)
+        except OSError:
+            # ENXIO: only a hole is left.
+            return
+        end = min(os.lseek(fd, start, seek_hole), size)
+        yield start, end
+        offset = end
+
+
+def sparse_copy_file(source: Path, destination: Path) -> None:
+    size = source.stat().st_size
+    with source.open("rb") as src, destination.open("wb") as dst:
+        for start, end in _data_ranges(src.fileno(), size):
+            src.seek(start)
+            offset = start
+            while offset < end:
+                block = src.read(min(SPARSE_BLOCK_SIZE, end - offset))
+                if not block:
+                    break
+                if not _is_zero(block):
+                    dst.seek(offset)
+                    dst.write(block)
+                offset += len(block)
+        dst.truncate(size)
+
+
+def clone_image(source: Path, destination: Path) -> str:
+    """Copy *source* to *destination* as cheaply as the filesystem allows.
+
+    Returns ``"reflink"`` or ``"sparse"``. Metadata is copied like
+    ``shutil.copy2``.
+    """
+    destination.unlink(missing_ok=True)
+    method = "reflink" if reflink_file(source, destination) else "sparse"
+    if method == "sparse":
+        sparse_copy_file(source, destination)
+    shutil.copystat(source, destination)
+    return method
+
+
+def sparse_decompress(source: Path, destination: Path) -> None:
+    """gunzip *source* into *destination*, leaving zero blocks as holes."""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    size = 0
+    with gzip.open(source, "rb") as src, destination.open("wb") as dst:
+        while True:
+            block = src.read(SPARSE_BLOCK_SIZE)
+            if not block:
+                break
+            if not _is_zero(block):
+                dst.seek(size)
+                dst.write(block)
+            size += len(block)
+        dst.truncate(size)
+
+
+def punch_hole(fd: int, offset: int, length: int) -> bool:
+    """Deallocate a byte range (it then reads as zeros); False when unsupported."""
+    global _fallocate
+    if _fallocate is None:
+        libc_name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(libc_name, use_errno=True) if libc_name else None
+        func = getattr(libc, "fallocate", None) if libc is not None else None
+        if func is None:
+            _fallocate = False
+            return False
+        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+        func.restype = ctypes.c_int
+        _fallocate = func
+    if _fallocate is False:
+        return False
+    return _fallocate(fd, FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE, offset, length) == 0
+
+
+def write_region(image_path: Path, offset: int, source_path: Path) -> RegionWriteStats:
+    """Copy *source_path* into *image_path* at *offset*, touching only changed blocks."""
+    stats = RegionWriteStats()
+    with image_path.open("r+b") as image, source_path.open("rb") as source:
+        position = offset
+        while True:
+            block = source.read(SPARSE_BLOCK_SIZE)
+            if not block:
+                break
+            image.seek(position)
+            current = image.read(len(block))
+            if current == block:
+                stats.unchanged += len(block)
+            elif _is_zero(block) and punch_hole(image.fileno(), position, len(block)):
+                stats.punched += len(block)
+            else:
+                image.seek(position)
+                image.write(block)
+                stats.written += len(block)
+            position += len(block)
+    return stats
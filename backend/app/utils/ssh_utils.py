@@ -1,10 +1,12 @@
 from arq import ArqRedis
 import asyncssh
 import asyncio
+import os
 import time
 from typing import Optional, Any
 from sqlalchemy.orm import Session
 
+from app.database import SessionLocal
 from app.models.log import new_log as log
 from app.models.frame import Frame
 from app.models.settings import Settings
@@ -13,14 +15,78 @@ from app.utils.ssh_key_utils import select_ssh_keys_for_frame
 # ---------------------------------------
 # GLOBAL POOL STORAGE
 # ---------------------------------------
+#
+# One authenticated connection per frame (per credentials) serves many callers
+# at once: every get_ssh_connection() takes a *lease*, and each lease opens its
+# own exec/SFTP channels over the shared connection. A second connection is
+# only dialed when MAX_CHANNELS_PER_CONNECTION leases are already out, and
+# concurrent callers that find no connection wait on the handshake already in
+# flight instead of starting their own. Handshakes to a Pi Zero take seconds,
+# so this is what keeps a deploy from paying for one per command.
 _pool_lock = asyncio.Lock()
 
+PoolKey = tuple[Any, Any | int, Any, str]
+
 # Keys in this dict: (host, port, username, 'password' or 'key'), e.g. ("192.168.1.1", 22, "ubuntu", "password")
 # Values: List of PooledConnection objects
-_ssh_pool: dict[tuple[Any, Any | int, Any, str], list["PooledConnection"]] = {}
+_ssh_pool: dict[PoolKey, list["PooledConnection"]] = {}
+
+# Handshakes in progress, so concurrent callers share one new connection.
+_connecting: dict[PoolKey, asyncio.Future] = {}
 
-# If a connection is idle more than this many seconds, it will be closed.
+# Smoothed seconds between a release and the next acquire, per key. Drives the
+# adaptive idle timeout: frames that come back every minute (deploys waiting on
+# a build, polling endpoints) keep their connection instead of redialing.
+_idle_gaps: dict[PoolKey, float] = {}
+_last_released: dict[PoolKey, float] = {}
+
+# Idle connections are closed after this many seconds at minimum ...
 IDLE_TIMEOUT_SECONDS = 30
+# ... and never kept for longer than this, whatever the observed gaps.
+MAX_IDLE_TIMEOUT_SECONDS = 300
+IDLE_GAP_SMOOTHING = 0.5
+
+# OpenSSH's MaxSessions defaults to 10 channels per connection; stay under it.
+MAX_CHANNELS_PER_CONNECTION = 8
+
+# Detect a dead frame within ~45s instead of waiting for the TCP stack.
+KEEPALIVE_INTERVAL_SECONDS = 15
+KEEPALIVE_COUNT_MAX = 3
+
+# How long a pre-warmed connection stays open without any lease.
+PREWARM_HOLD_SECONDS = 120
+SSH_PREWARM_ENABLED = os.environ.get("FRAMEOS_SSH_PREWARM", "1").lower() not in ("0", "false", "no")
+
+_metrics = {
+    "handshakes": 0,
+    "handshake_failures": 0,
+    "handshake_seconds": 0.0,
+    "leases": 0,
+    "reused": 0,
+    "shared_handshakes": 0,
+    "idle_closes": 0,
+    "prewarms": 0,
+}
+
+
+def idle_timeout_for(pool_key: PoolKey) -> float:
+    gap = _idle_gaps.get(pool_key)
+    if gap is None:
+        return IDLE_TIMEOUT_SECONDS
+    return max(IDLE_TIMEOUT_SECONDS, min(MAX_IDLE_TIMEOUT_SECONDS, gap * 2))
+
+
+def _record_acquire(pool_key: PoolKey) -> None:
+    released = _last_released.get(pool_key)
+    if released is None:
+        return
+    gap = time.time() - released
+    if gap > MAX_IDLE_TIMEOUT_SECONDS:
+        # A long pause says nothing about the working rhythm; forget it.
+        _idle_gaps.pop(pool_key, None)
+        return
+    previous = _idle_gaps.get(pool_key)
+    _idle_gaps[pool_key] = gap if previous is None else previous + IDLE_GAP_SMOOTHING * (gap - previous)
 
 
 class PooledConnection:
@@ -29,40 +95,69 @@ class PooledConnection:
     """
     def __init__(self, ssh: asyncssh.SSHClientConnection):
         self.ssh = ssh
-        self.in_use = False
+        self.leases = 0
         self.last_used = time.time()
+        self.pinned_until = 0.0
         self.closing_task: Optional[asyncio.Task] = None
+        # Set once a caller saw the connection fail. Other leases keep their
+        # channels, but no new lease is handed out and the last release closes it.
+        self.retired = False
+
+    @property
+    def in_use(self) -> bool:
+        return self.leases > 0
+
+    def closed(self) -> bool:
+        return self.ssh.is_closed()
+
+    def has_capacity(self) -> bool:
+        return self.leases < MAX_CHANNELS_PER_CONNECTION and not self.retired and not self.closed()
 
-    def expired(self):
-        return (time.time() - self.last_used) >= IDLE_TIMEOUT_SECONDS
+    def keep_open_for(self, pool_key: PoolKey) -> float:
+        """Seconds this idle connection should still stay open."""
+        idle_deadline = self.last_used + idle_timeout_for(pool_key)
+        return max(idle_deadline, self.pinned_until) - time.time()
+
+    def expired(self, pool_key: PoolKey) -> bool:
+        return self.keep_open_for(pool_key) <= 0
 
     def mark_in_use(self):
-        self.in_use = True
+        self.leases += 1
         self.last_used = time.time()
+        _metrics["leases"] += 1
         # If there was a close scheduled, cancel it.
         if self.closing_task and not self.closing_task.done():
             self.closing_task.cancel()
         self.closing_task = None
 
     def mark_idle(self):
-        self.in_use = False
+        self.leases = max(0, self.leases - 1)
         self.last_used = time.time()
 
+    def pin(self, seconds: float):
+        self.pinned_until = max(self.pinned_until, time.time() + seconds)
+
     async def schedule_close(self, pool_key, db, redis, frame_id):
         """
-        Waits for IDLE_TIMEOUT_SECONDS. If still idle afterward, close the SSH connection.
+        Waits until the adaptive idle timeout (or a pre-warm pin) runs out. If
+        still idle afterward, close the SSH connection.
         """
         try:
-            await asyncio.sleep(IDLE_TIMEOUT_SECONDS)
+            while not self.in_use and not self.closed():
+                remaining = self.keep_open_for(pool_key)
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(remaining)
         except asyncio.CancelledError:
             # If the close was canceled, that means the connection was reused.
             return
 
         # Double-check: if still not in use, close it for real
-        if not self.in_use and self.expired():
-            # Actually close the underlying SSH connection
+        if not self.in_use:
+            idle_for = int(time.time() - self.last_used)
             self.ssh.close()
-            await log(db, redis, frame_id, "stdinfo", f"SSH connection idle for {IDLE_TIMEOUT_SECONDS}s, closing until further commands")
+            _metrics["idle_closes"] += 1
+            await log(db, redis, frame_id, "stdinfo", f"SSH connection idle for {idle_for}s, closing until further commands")
             try:
                 await self.ssh.wait_closed()
             except asyncio.CancelledError:
@@ -75,75 +170,98 @@ class PooledConnection:
                         _ssh_pool[pool_key].remove(self)
 
 
+def _pool_key(frame: Frame) -> PoolKey:
+    auth_label = "password" if frame.ssh_pass else "key"
+    return (frame.frame_host, frame.ssh_port or 22, frame.ssh_user, auth_label)
+
+
+def _lease_existing(pool_key: PoolKey) -> Optional[PooledConnection]:
+    """Drop dead or expired idle connections, then lease the least busy live one. Hold _pool_lock."""
+    connections = _ssh_pool.get(pool_key)
+    if not connections:
+        return None
+    for pc in list(connections):
+        if pc.closed() or (not pc.in_use and (pc.retired or pc.expired(pool_key))):
+            connections.remove(pc)
+    candidates = [pc for pc in connections if pc.has_capacity()]
+    if not candidates:
+        return None
+    pc = min(candidates, key=lambda candidate: candidate.leases)
+    pc.mark_in_use()
+    _metrics["reused"] += 1
+    return pc
+
+
 # ---------------------------------------
 # PUBLIC SSH UTILS
 # ---------------------------------------
 
 async def get_ssh_connection(db: Session, redis: ArqRedis, frame: Frame) -> asyncssh.SSHClientConnection:
     """
-    Retrieve an SSH connection from the pool if available. Otherwise, open a new one.
-    If all existing connections for this frame's credentials are in use, create another one.
+    Lease an SSH connection for this frame. The connection may be shared with
+    other callers; open channels on it (create_process, scp, sftp) but never
+    close it — hand it back with remove_ssh_connection().
     """
-    host = frame.frame_host
-    port = frame.ssh_port or 22
-    username = frame.ssh_user
-    password = frame.ssh_pass
+    pool_key = _pool_key(frame)
+    _record_acquire(pool_key)
 
-    # Build a pool key
-    if password:
-        auth_label = "password"
-    else:
-        auth_label = "key"
-
-    pool_key = (host, port, username, auth_label)
-
-    async with _pool_lock:
-        # 1) Clean up any connections that have been closed or that had errors:
-        to_remove = []
-        if pool_key in _ssh_pool:
-            for pc in _ssh_pool[pool_key]:
-                if not pc.in_use and pc.expired():
-                    to_remove.append(pc)
-            for pc in to_remove:
-                _ssh_pool[pool_key].remove(pc)
-
-        # 2) Look for an idle connection
-        if pool_key in _ssh_pool:
-            for pc in _ssh_pool[pool_key]:
-                if not pc.in_use:  # found an idle connection
-                    pc.mark_in_use()
-                    # await log(db, redis, frame.id, "stdinfo", "Reusing existing SSH connection")
-                    return pc.ssh
-
-    # No idle connection available. Establish the new connection WITHOUT holding
-    # the global pool lock: _create_new_connection can block for the full connect
-    # timeout on an unreachable frame, and holding the lock there would stall all
-    # SSH activity to every other frame. A concurrent caller may create a second
-    # connection for the same key in the meantime, which the pool tolerates.
-    new_ssh = await _create_new_connection(db, redis, frame)
-    pc = PooledConnection(new_ssh)
-    pc.mark_in_use()
-
-    async with _pool_lock:
-        _ssh_pool.setdefault(pool_key, []).append(pc)
-
-    return new_ssh
+    while True:
+        async with _pool_lock:
+            pc = _lease_existing(pool_key)
+            if pc is not None:
+                return pc.ssh
+
+            pending = _connecting.get(pool_key)
+            if pending is None:
+                pending = asyncio.get_running_loop().create_future()
+                _connecting[pool_key] = pending
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            # Someone else is already dialing this frame. Wait for that
+            # handshake and lease its connection (or dial another if it is
+            # already full). A failed handshake fails every waiter at once
+            # rather than making each of them time out in turn.
+            _metrics["shared_handshakes"] += 1
+            await asyncio.shield(pending)
+            continue
+
+        # Establish the new connection WITHOUT holding the global pool lock:
+        # _create_new_connection can block for the full connect timeout on an
+        # unreachable frame, and holding the lock there would stall all SSH
+        # activity to every other frame.
+        try:
+            new_ssh = await _create_new_connection(db, redis, frame)
+        except BaseException as exc:
+            async with _pool_lock:
+                _connecting.pop(pool_key, None)
+            if not pending.done():
+                pending.set_exception(exc if isinstance(exc, Exception) else RuntimeError(str(exc)))
+                # Mark retrieved so a handshake nobody waited on doesn't warn.
+                pending.exception()
+            raise
+
+        pc = PooledConnection(new_ssh)
+        pc.mark_in_use()
+        async with _pool_lock:
+            _ssh_pool.setdefault(pool_key, []).append(pc)
+            _connecting.pop(pool_key, None)
+        if not pending.done():
+            pending.set_result(None)
+        return new_ssh
 
 
 async def remove_ssh_connection(db, redis, ssh: asyncssh.SSHClientConnection, frame: Frame):
     """
-    Release the SSH connection back to the pool so it can be reused or closed after IDLE_TIMEOUT_SECONDS.
+    Release a lease taken with get_ssh_connection(). The connection is closed
+    once no lease is left and it has been idle for its adaptive timeout.
     """
     if not ssh:
         return
 
-    # Find which pool entry this belongs to
-    host = frame.frame_host
-    port = frame.ssh_port or 22
-    username = frame.ssh_user
-    password = frame.ssh_pass
-    auth_label = "password" if password else "key"
-    pool_key = (host, port, username, auth_label)
+    pool_key = _pool_key(frame)
 
     async with _pool_lock:
         # If we don't have this key at all, there's nothing to do
@@ -153,12 +271,38 @@ async def remove_ssh_connection(db, redis, ssh: asyncssh.SSHClientConnection, fr
         # Look for the matching PooledConnection
         for pc in _ssh_pool[pool_key]:
             if pc.ssh is ssh:
-                # await log(db, redis, frame.id, "stdinfo", "SSH connection scheduled for closure")
                 pc.mark_idle()
-                await schedule_close(pc, pool_key, db, redis, frame.id)
+                _last_released[pool_key] = time.time()
+                if pc.closed():
+                    # Aborted by its user; never hand it out again.
+                    _ssh_pool[pool_key].remove(pc)
+                elif pc.retired:
+                    if not pc.in_use:
+                        pc.ssh.abort()
+                        _ssh_pool[pool_key].remove(pc)
+                elif not pc.in_use:
+                    await schedule_close(pc, pool_key, db, redis, frame.id)
                 return
 
 
+async def retire_ssh_connection(ssh: asyncssh.SSHClientConnection, frame: Frame):
+    """
+    Take a connection that failed for this caller (e.g. a stalled scp) out of
+    rotation. Other callers may still hold leases on it, so it is not aborted
+    here: it is aborted when the last lease is released with remove_ssh_connection().
+    """
+    if not ssh:
+        return
+
+    async with _pool_lock:
+        for pc in _ssh_pool.get(_pool_key(frame), []):
+            if pc.ssh is ssh:
+                pc.retired = True
+                return
+    # Not pooled, so nobody else can be using it.
+    ssh.abort()
+
+
 async def schedule_close(pc: PooledConnection, pool_key, db, redis, frame_id):
     """
     Schedules a close task for the given PooledConnection.
@@ -170,6 +314,60 @@ async def schedule_close(pc: PooledConnection, pool_key, db, redis, frame_id):
     pc.closing_task = asyncio.create_task(pc.schedule_close(pool_key, db, redis, frame_id))
 
 
+async def prewarm_ssh_connection(db: Session, redis: ArqRedis, frame: Frame, hold_seconds: float = PREWARM_HOLD_SECONDS) -> bool:
+    """
+    Open (or keep) a connection to *frame* ahead of use and hold it open for
+    *hold_seconds* even without leases — e.g. while a deploy builds locally
+    before its first remote command. Returns False if the frame can't be reached.
+    """
+    try:
+        ssh = await get_ssh_connection(db, redis, frame)
+    except Exception:
+        return False
+    _metrics["prewarms"] += 1
+    pool_key = _pool_key(frame)
+    async with _pool_lock:
+        for pc in _ssh_pool.get(pool_key, []):
+            if pc.ssh is ssh:
+                pc.pin(hold_seconds)
+                break
+    await remove_ssh_connection(db, redis, ssh, frame)
+    return True
+
+
+def start_ssh_prewarm(redis: ArqRedis, frame: Frame) -> Optional[asyncio.Task]:
+    """
+    Pre-warm in the background with a private DB session, so the handshake
+    overlaps whatever the caller does next. No-op when FRAMEOS_SSH_PREWARM=0.
+    """
+    if not SSH_PREWARM_ENABLED:
+        return None
+
+    async def _prewarm() -> None:
+        db = SessionLocal()
+        try:
+            await prewarm_ssh_connection(db, redis, frame)
+        finally:
+            db.close()
+
+    return asyncio.create_task(_prewarm())
+
+
+def ssh_pool_metrics() -> dict[str, Any]:
+    """Counters and current state of this process's SSH pool."""
+    connections = [pc for pcs in _ssh_pool.values() for pc in pcs]
+    handshakes = _metrics["handshakes"]
+    return {
+        **_metrics,
+        "avg_handshake_seconds": (_metrics["handshake_seconds"] / handshakes) if handshakes else None,
+        "frames": sum(1 for pcs in _ssh_pool.values() if pcs),
+        "connections": len(connections),
+        "active_leases": sum(pc.leases for pc in connections),
+        "idle_connections": sum(1 for pc in connections if not pc.in_use),
+        "connecting": len(_connecting),
+    }
+
+
 # ---------------------------------------
 # LOW-LEVEL / INTERNAL
 # ---------------------------------------
@@ -208,6 +406,7 @@ async def _create_new_connection(db, redis, frame) -> asyncssh.SSHClientConnecti
         f"({'password' if password else f'keypair: {keypair_label}'})"
     )
 
+    started = time.monotonic()
     try:
         ssh = await asyncssh.connect(
             host=host,
@@ -220,10 +419,17 @@ async def _create_new_connection(db, redis, frame) -> asyncssh.SSHClientConnecti
             # timeout (minutes) — arq worker slots and API requests wait on this.
             connect_timeout=30,
             login_timeout=30,
+            # Pooled connections outlive single commands; notice a frame that
+            # dropped off the network before handing its connection out again.
+            keepalive_interval=KEEPALIVE_INTERVAL_SECONDS,
+            keepalive_count_max=KEEPALIVE_COUNT_MAX,
         )
+        _metrics["handshakes"] += 1
+        _metrics["handshake_seconds"] += time.monotonic() - started
         await log(db, redis, frame.id, "stdinfo", f"SSH connection established to {username}@{host}")
         return ssh
     except (OSError, asyncssh.Error) as exc:
+        _metrics["handshake_failures"] += 1
         raise Exception(f"Unable to connect to {host}:{port} via SSH: {exc}")
 
 
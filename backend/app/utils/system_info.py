@@ -4,14 +4,16 @@ import os
 import platform
 import shutil
 import subprocess
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
 from typing import Iterable
 
 from sqlalchemy.engine import make_url
 
 from app.config import config
+from app.utils.artifact_cache import artifact_cache_stats
 from app.utils.cross_compile import CACHE_ENV as CROSS_CACHE_ENV, DEFAULT_CACHE as DEFAULT_CROSS_CACHE
+from app.utils.dir_size import directory_size as tracked_directory_size
 
 BACKEND_ROOT = Path(__file__).resolve().parents[1]
 REPO_ROOT = Path(__file__).resolve().parents[2]
@@ -43,6 +45,12 @@ class CacheUsage:
     path: Path
     size_bytes: int
     exists: bool
+    # Set for areas under the artifact cache budget.
+    entries: int | None = None
+    pinned_entries: int | None = None
+    hits: int | None = None
+    misses: int | None = None
+    hit_rate: float | None = None
 
 
 @dataclass(frozen=True)
@@ -67,14 +75,11 @@ def _safe_stat(path: Path) -> int:
 
 
 def directory_size(path: Path) -> int:
+    # A running total, walked once and reconciled in the background: these
+    # trees (the Docker data root above all) are far too big to walk per request.
     if not path.exists():
         return 0
-
-    total = 0
-    for entry in path.rglob("*"):
-        if entry.is_file():
-            total += _safe_stat(entry)
-    return total
+    return tracked_directory_size(path)
 
 
 def get_disk_usage(path: str | Path = "/") -> DiskUsage:
@@ -178,6 +183,30 @@ def get_cache_usage() -> list[CacheUsage]:
 
         size_bytes = directory_size(path)
         caches.append(CacheUsage(name=name, path=path, size_bytes=size_bytes, exists=exists))
+
+    for stats in artifact_cache_stats():
+        if not stats.path.exists():
+            continue
+        counters = {
+            "entries": stats.entries,
+            "pinned_entries": stats.pinned_entries,
+            "hits": stats.hits,
+            "misses": stats.misses,
+            "hit_rate": stats.hit_rate,
+        }
+        if stats.path in seen:
+            # FRAMEOS_CROSS_CACHE is already listed above by its directory
+            # size; add the toolchain cache statistics to that row.
+            caches = [replace(cache, **counters) if cache.path == stats.path else cache for cache in caches]
+            continue
+        seen.add(stats.path)
+        caches.append(CacheUsage(
+            name=stats.name,
+            path=stats.path,
+            size_bytes=stats.size_bytes,
+            exists=True,
+            **counters,
+        ))
     return caches
 
 
@@ -0,0 +1,108 @@
+import json
+import os
+import time
+
+import pytest
+
+from app.utils import artifact_cache
+from app.utils.artifact_cache import (
+    CacheArea,
+    artifact_cache_stats,
+    enforce_artifact_cache_budget,
+    pinned_artifact_cache_entry,
+    record_artifact_cache_access,
+)
+
+
+@pytest.fixture
+def areas(tmp_path, monkeypatch):
+    releases = tmp_path / "releases"
+    cross = tmp_path / "cross"
+    for path in (releases, cross / "prebuilt"):
+        path.mkdir(parents=True)
+    configured = [
+        CacheArea("releases", "Releases", releases),
+        CacheArea("cross-toolchains", "Toolchains", cross, frozenset({"prebuilt"})),
+        CacheArea("cross-prebuilt", "Prebuilt", cross / "prebuilt"),
+    ]
+    monkeypatch.setattr(artifact_cache, "artifact_cache_areas", lambda: configured)
+    monkeypatch.setattr(artifact_cache, "_ready_image_sources", lambda: set())
+    monkeypatch.setattr(artifact_cache, "ARTIFACT_CACHE_LEASE_SECONDS", 0)
+    return releases, cross
+
+
+def entry(path, size: int, age: float):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(os.urandom(size))
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_evicts_least_recently_used_entries_over_budget(areas):
+    releases, cross = areas
+    oldest = entry(releases / "a.tar.gz", 40_000, age=300)
+    middle = entry(releases / "b.tar.gz", 40_000, age=200)
+    newest = entry(cross / "prebuilt" / "quickjs-1" / "lib.a", 40_000, age=100)
+    # Reading the oldest makes it the most recently used.
+    record_artifact_cache_access(oldest, hit=True)
+
+    evicted = enforce_artifact_cache_budget(budget_bytes=100_000, min_free_bytes=0)
+
+    assert evicted == [middle]
+    assert oldest.exists() and newest.exists()
+    stats = {stats.key: stats for stats in artifact_cache_stats()}
+    assert stats["releases"].evictions == 1
+    assert stats["releases"].entries == 1
+    assert stats["cross-prebuilt"].entries == 1
+    assert stats["cross-toolchains"].entries == 0
+
+
+@pytest.mark.asyncio
+async def test_pinned_leased_and_ready_image_entries_survive(areas, monkeypatch):
+    releases, cross = areas
+    pinned = entry(cross / "debian-bookworm-arm64" / "sysroot" / "libc.so", 10_000, age=400)
+    sourced = entry(releases / "release.img", 10_000, age=300)
+    leased = entry(releases / "leased.tar.gz", 10_000, age=200)
+    monkeypatch.setattr(artifact_cache, "_ready_image_sources", lambda: {str(sourced)})
+
+    monkeypatch.setattr(artifact_cache, "ARTIFACT_CACHE_LEASE_SECONDS", 3600)
+    record_artifact_cache_access(leased, hit=False, enforce=False)
+    async with pinned_artifact_cache_entry(cross / "debian-bookworm-arm64"):
+        assert enforce_artifact_cache_budget(budget_bytes=0, min_free_bytes=0) == []
+        assert [stats.pinned_entries for stats in artifact_cache_stats()] == [2, 1, 0]
+
+    monkeypatch.setattr(artifact_cache, "ARTIFACT_CACHE_LEASE_SECONDS", 0)
+    record_artifact_cache_access(leased, hit=True)
+    assert enforce_artifact_cache_budget(budget_bytes=0, min_free_bytes=0) == [pinned.parent.parent, leased]
+    assert sourced.exists()
+    # Victims are renamed aside under the index lock and deleted after it.
+    assert sorted(path.name for path in cross.iterdir()) == ["prebuilt"]
+    assert sorted(path.name for path in releases.iterdir()) == ["release.img"]
+
+
+def test_hit_rate_and_index_survive_processes(areas):
+    releases, _cross = areas
+    archive = entry(releases / "frameos.tar.gz", 1_000, age=10)
+
+    record_artifact_cache_access(archive, hit=False, enforce=False)
+    record_artifact_cache_access(archive, hit=True)
+    record_artifact_cache_access(archive, hit=True)
+    # Paths outside every area are ignored.
+    record_artifact_cache_access(releases.parent / "elsewhere.bin", hit=True)
+
+    stats = artifact_cache_stats()[0]
+    assert (stats.hits, stats.misses) == (2, 1)
+    assert stats.hit_rate == pytest.approx(2 / 3)
+    index = json.loads(artifact_cache.artifact_cache_index_path().read_text())
+    assert index["areas"]["releases"]["hits"] == 2
+    assert str(archive) in index["entries"]
+
+
+def test_in_progress_downloads_are_not_entries(areas):
+    releases, _cross = areas
+    entry(releases / "frameos.tar.gz.part", 50_000, age=1_000)
+    entry(releases / ".resume.tar.gz", 50_000, age=1_000)
+
+    assert enforce_artifact_cache_budget(budget_bytes=0, min_free_bytes=0) == []
+    assert artifact_cache_stats()[0].entries == 0
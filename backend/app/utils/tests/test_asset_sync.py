@@ -0,0 +1,158 @@
+import io
+import json
+import subprocess
+import tarfile
+
+import pytest
+
+from app.utils.asset_sync import (
+    MANIFEST_FILENAME,
+    PROBE_SEPARATOR,
+    apply_command,
+    build_sync_archive,
+    bytes_sync_file,
+    local_sync_file,
+    parse_manifest,
+    parse_probe_output,
+    plan_asset_sync,
+    render_manifest,
+    write_local_manifest,
+)
+
+
+def _entry(file):
+    return {"sha256": file.sha256, "size": file.size}
+
+
+def test_plan_uploads_missing_and_changed_files_only():
+    same = bytes_sync_file("fonts/Same.ttf", b"same")
+    changed = bytes_sync_file("fonts/Changed.ttf", b"new!")
+    missing = bytes_sync_file("fonts/Missing.ttf", b"missing")
+    manifest = {
+        same.path: _entry(same),
+        changed.path: {"sha256": "0" * 64, "size": 4},
+    }
+    sizes = {same.path: 4, changed.path: 4}
+
+    plan = plan_asset_sync([same, changed, missing], manifest, sizes, scope="fonts/")
+
+    assert [file.path for file in plan.upload] == ["fonts/Changed.ttf", "fonts/Missing.ttf"]
+    assert plan.delete == []
+    assert plan.manifest[changed.path] == _entry(changed)
+
+
+def test_plan_reuploads_when_remote_size_disagrees_with_manifest():
+    font = bytes_sync_file("fonts/A.ttf", b"abcd")
+    plan = plan_asset_sync([font], {font.path: _entry(font)}, {font.path: 2}, scope="fonts/")
+    assert plan.upload == [font]
+
+
+def test_plan_deletes_only_previously_synced_files_in_scope():
+    kept = bytes_sync_file("fonts/Kept.ttf", b"kept")
+    manifest = {
+        kept.path: _entry(kept),
+        "fonts/Removed.ttf": {"sha256": "a" * 64, "size": 3},
+        "fonts/AlreadyGone.ttf": {"sha256": "b" * 64, "size": 3},
+        "images/Other.png": {"sha256": "c" * 64, "size": 3},
+    }
+    sizes = {kept.path: 4, "fonts/Removed.ttf": 3, "fonts/UserUpload.ttf": 9}
+
+    plan = plan_asset_sync([kept], manifest, sizes, scope="fonts/")
+
+    assert plan.upload == []
+    assert plan.delete == ["fonts/Removed.ttf"]
+    assert set(plan.manifest) == {kept.path, "images/Other.png"}
+
+
+def test_plan_is_empty_when_everything_matches():
+    font = bytes_sync_file("fonts/A.ttf", b"abcd")
+    plan = plan_asset_sync([font], {font.path: _entry(font)}, {font.path: 4}, scope="fonts/")
+    assert plan.empty
+
+
+def test_bytes_sync_file_rejects_escaping_paths():
+    with pytest.raises(ValueError):
+        bytes_sync_file("fonts/../../etc/passwd", b"")
+
+
+def test_parse_manifest_ignores_garbage():
+    assert parse_manifest("") == {}
+    assert parse_manifest("not json") == {}
+    assert parse_manifest(json.dumps({"version": 99, "files": {}})) == {}
+    assert parse_manifest(render_manifest({"fonts/A.ttf": {"sha256": "x", "size": 1}})) == {
+        "fonts/A.ttf": {"sha256": "x", "size": 1}
+    }
+
+
+def test_parse_probe_output_splits_manifest_and_listing():
+    manifest = render_manifest({"fonts/A.ttf": {"sha256": "x", "size": 1}}).decode()
+    stdout = (
+        f"{manifest}\n{PROBE_SEPARATOR}\n"
+        "1 /srv/assets/fonts/A.ttf\n"
+        "12 /srv/assets/fonts/sub dir/B C.ttf\n"
+        "garbage\n"
+    )
+    parsed_manifest, sizes = parse_probe_output(stdout, "/srv/assets")
+    assert parsed_manifest == {"fonts/A.ttf": {"sha256": "x", "size": 1}}
+    assert sizes == {"fonts/A.ttf": 1, "fonts/sub dir/B C.ttf": 12}
+
+
+def test_parse_probe_output_without_manifest():
+    manifest, sizes = parse_probe_output(f"\n{PROBE_SEPARATOR}\n5 /srv/assets/fonts/A.ttf\n", "/srv/assets")
+    assert manifest == {}
+    assert sizes == {"fonts/A.ttf": 5}
+
+
+def test_build_sync_archive_contains_files_and_manifest(tmp_path):
+    local = tmp_path / "Local.ttf"
+    local.write_bytes(b"local-font")
+    files = [local_sync_file(str(local), "fonts/Local.ttf"), bytes_sync_file("fonts/Custom.ttf", b"custom")]
+    manifest = {file.path: _entry(file) for file in files}
+
+    archive = build_sync_archive(files, manifest)
+
+    with tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz") as tar:
+        names = tar.getnames()
+        assert names == ["fonts/Local.ttf", "fonts/Custom.ttf", MANIFEST_FILENAME]
+        assert tar.extractfile("fonts/Custom.ttf").read() == b"custom"
+        assert parse_manifest(tar.extractfile(MANIFEST_FILENAME).read()) == manifest
+
+
+def test_apply_command_batches_deletes_and_extract():
+    cmd = apply_command("/srv/my assets", "/tmp/sync.tar.gz", ["fonts/Old.ttf", "fonts/Other Old.ttf"])
+    assert "rm -f -- '/srv/my assets/fonts/Old.ttf' '/srv/my assets/fonts/Other Old.ttf'" in cmd
+    assert "tar -xzf /tmp/sync.tar.gz -C '/srv/my assets'" in cmd
+    assert cmd.count("rm -f") == 2
+
+
+def test_apply_command_removes_archive_when_extraction_fails(tmp_path):
+    archive = tmp_path / "sync.tar.gz"
+    archive.write_bytes(b"not a tarball")
+
+    result = subprocess.run(["sh", "-c", apply_command(str(tmp_path / "assets"), str(archive), [])])
+
+    assert result.returncode != 0
+    assert not archive.exists()
+
+
+def test_apply_command_extracts_and_removes_archive(tmp_path):
+    files = [bytes_sync_file("fonts/A.ttf", b"aaaa")]
+    archive = tmp_path / "sync.tar.gz"
+    archive.write_bytes(build_sync_archive(files, {}))
+
+    result = subprocess.run(["sh", "-c", apply_command(str(tmp_path / "assets"), str(archive), [])])
+
+    assert result.returncode == 0
+    assert (tmp_path / "assets" / "fonts" / "A.ttf").read_bytes() == b"aaaa"
+    assert not archive.exists()
+
+
+def test_write_local_manifest_lists_staged_files(tmp_path):
+    fonts = tmp_path / "fonts"
+    fonts.mkdir()
+    (fonts / "A.ttf").write_bytes(b"aaaa")
+
+    write_local_manifest(tmp_path, "fonts")
+
+    manifest = parse_manifest((tmp_path / MANIFEST_FILENAME).read_bytes())
+    assert manifest == {"fonts/A.ttf": _entry(bytes_sync_file("fonts/A.ttf", b"aaaa"))}
@@ -0,0 +1,111 @@
+import asyncio
+import gzip
+import lzma
+import os
+
+import pytest
+
+from app.utils import compression
+from app.utils.compression import (
+    available_compression_formats,
+    block_compressor,
+    compress_file,
+    compressed_path_for,
+    decompress_block,
+    iter_compressed_blocks,
+    normalize_compression_format,
+    stream_compressed_to_cache,
+)
+
+
+def _payload(size: int) -> bytes:
+    return (os.urandom(256) + bytes(768)) * (size // 1024)
+
+
+def test_parallel_gzip_is_multi_member_and_round_trips(tmp_path):
+    source = tmp_path / "disk.img"
+    data = _payload(64 * 1024)
+    source.write_bytes(data)
+
+    blocks = list(iter_compressed_blocks(source, "gzip", block_size=16 * 1024, threads=3))
+
+    assert len(blocks) == 4
+    assert all(block.startswith(b"\x1f\x8b") for block in blocks)
+    assert gzip.decompress(b"".join(blocks)) == data
+
+
+def test_xz_blocks_round_trip_from_gzipped_source(tmp_path):
+    data = _payload(40 * 1024)
+    source = tmp_path / "disk.img.gz"
+    source.write_bytes(gzip.compress(data, mtime=0))
+    destination = compressed_path_for(source, "xz")
+
+    compress_file(source, destination, "xz", block_size=16 * 1024)
+
+    assert destination.name == "disk.img.xz"
+    assert lzma.decompress(destination.read_bytes()) == data
+    assert not (tmp_path / "disk.img.xz.partial").exists()
+
+
+def test_empty_source_still_produces_a_valid_archive(tmp_path):
+    source = tmp_path / "empty.bin"
+    source.write_bytes(b"")
+    assert gzip.decompress(b"".join(iter_compressed_blocks(source, "gzip"))) == b""
+
+
+def test_blocks_decompress_in_every_available_format():
+    data = _payload(8 * 1024)
+    for fmt in available_compression_formats():
+        assert decompress_block(block_compressor(fmt)(data), fmt) == data
+
+
+def test_normalize_compression_format(monkeypatch):
+    assert normalize_compression_format(None) == "gzip"
+    assert normalize_compression_format("GZ") == "gzip"
+    with pytest.raises(ValueError):
+        normalize_compression_format("rar")
+    monkeypatch.setattr(compression, "_zstandard", lambda: None)
+    with pytest.raises(ValueError, match="zstandard"):
+        normalize_compression_format("zstd")
+
+
+@pytest.mark.asyncio
+async def test_stream_writes_cache_only_when_complete(tmp_path, monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION_BLOCK_SIZE", 8 * 1024)
+    data = _payload(32 * 1024)
+    source = tmp_path / "disk.img"
+    source.write_bytes(data)
+    cache = compressed_path_for(source, "gzip")
+
+    stream = stream_compressed_to_cache(source, cache)
+    first = await stream.__anext__()
+    assert first.startswith(b"\x1f\x8b")
+    await stream.aclose()
+    assert not cache.exists()
+    assert list(tmp_path.glob("*.partial")) == []
+
+    chunks = [chunk async for chunk in stream_compressed_to_cache(source, cache)]
+    assert gzip.decompress(b"".join(chunks)) == data
+    assert cache.read_bytes() == b"".join(chunks)
+
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive_while_compressing(tmp_path, monkeypatch):
+    monkeypatch.setattr(compression, "COMPRESSION_BLOCK_SIZE", 256 * 1024)
+    source = tmp_path / "disk.img"
+    source.write_bytes(os.urandom(4 * 1024 * 1024))
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    task = asyncio.create_task(ticker())
+    try:
+        async for _chunk in stream_compressed_to_cache(source, tmp_path / "disk.img.gz"):
+            pass
+    finally:
+        task.cancel()
+    assert ticks > 1
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.utils import dir_size
+from app.utils.dir_size import (
+    adjust_directory_size,
+    directory_size,
+    directory_size_reconciler,
+    invalidate_directory_size,
+)
+
+
+def test_directory_size_walks_once_then_tracks_adjustments(tmp_path, monkeypatch):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "one.bin").write_bytes(b"x" * 100)
+    (tmp_path / "two.bin").write_bytes(b"y" * 50)
+    assert directory_size(tmp_path) == 150
+
+    walks = []
+    original = dir_size.walk_directory_size
+    monkeypatch.setattr(dir_size, "walk_directory_size", lambda root: walks.append(root) or original(root))
+
+    (tmp_path / "a" / "three.bin").write_bytes(b"z" * 30)
+    adjust_directory_size(tmp_path / "a" / "three.bin", 30)
+    (tmp_path / "two.bin").unlink()
+    adjust_directory_size(tmp_path / "two.bin", -50)
+    # Paths outside the root leave it alone.
+    adjust_directory_size(tmp_path.parent / "elsewhere.bin", 1000)
+
+    assert directory_size(tmp_path) == 130
+    assert walks == []
+
+
+def test_invalidate_rewalks_on_next_query(tmp_path):
+    assert directory_size(tmp_path) == 0
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "saved.jpg").write_bytes(b"j" * 10)
+    assert directory_size(tmp_path) == 0
+
+    invalidate_directory_size(tmp_path / "sub")
+
+    assert directory_size(tmp_path) == 10
+
+
+@pytest.mark.asyncio
+async def test_reconciler_corrects_drift(tmp_path, monkeypatch):
+    monkeypatch.setattr(dir_size, "DIR_SIZE_RECONCILE_SECONDS", 0.01)
+    assert directory_size(tmp_path) == 0
+    # Written by another process: no adjustment reaches this one.
+    (tmp_path / "external.bin").write_bytes(b"e" * 64)
+
+    task = asyncio.create_task(directory_size_reconciler())
+    try:
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if dir_size._tallies[dir_size._key(tmp_path)].size_bytes == 64:
+                break
+    finally:
+        task.cancel()
+
+    assert directory_size(tmp_path) == 64
@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import httpx
+import pytest
+
+from app.utils import downloads
+from app.utils.downloads import DownloadDigestMismatch, download_file
+
+URL = "https://releases.example.com/frameos.tar.gz"
+
+
+class FakeServer:
+    """A local stand-in for a release host: ranges, If-Range and dropped connections."""
+
+    def __init__(self, body: bytes, *, etag: str = '"v1"', ranges: bool = True) -> None:
+        self.body = body
+        self.etag = etag
+        self.ranges = ranges
+        self.requests: list[httpx.Request] = []
+        # Drop the connection after this many bytes, once per entry.
+        self.drop_after: list[int] = []
+        # Answer the next requests with these statuses, once per entry.
+        self.fail_with: list[int] = []
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.fail_with:
+            return httpx.Response(self.fail_with.pop(0), text="upstream unavailable")
+        headers = {"ETag": self.etag}
+        start, end, status = 0, len(self.body), 200
+        http_range = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if self.ranges:
+            headers["Accept-Ranges"] = "bytes"
+            if http_range and (if_range is None or if_range == self.etag):
+                first, _, last = http_range.removeprefix("bytes=").partition("-")
+                start = int(first)
+                end = int(last) + 1 if last else len(self.body)
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(self.body)}"
+        data = self.body[start:end]
+        headers["Content-Length"] = str(len(data))
+        drop_after = self.drop_after.pop(0) if self.drop_after and len(data) > 1 else None
+        return httpx.Response(status, headers=headers, stream=_Stream(data, drop_after))
+
+
+class _Stream(httpx.AsyncByteStream):
+    def __init__(self, data: bytes, drop_after: int | None) -> None:
+        self.data = data
+        self.drop_after = drop_after
+
+    async def __aiter__(self):
+        limit = len(self.data) if self.drop_after is None else self.drop_after
+        for offset in range(0, limit, 1024):
+            yield self.data[offset : min(offset + 1024, limit)]
+        if self.drop_after is not None:
+            raise httpx.RemoteProtocolError("peer closed connection")
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(downloads, "DOWNLOAD_RETRY_BACKOFF_SECONDS", 0)
+
+
+def _ranges(server: FakeServer) -> list[str | None]:
+    return [request.headers.get("range") for request in server.requests]
+
+
+@pytest.mark.asyncio
+async def test_resumes_a_dropped_download_with_range(tmp_path):
+    body = os.urandom(200_000)
+    server = FakeServer(body)
+    server.drop_after = [70_000]
+    destination = tmp_path / "release.tar.gz"
+
+    await download_file(
+        URL,
+        destination,
+        digests={"sha256": hashlib.sha256(body).hexdigest()},
+        single_flight=False,
+        transport=server.transport(),
+    )
+
+    assert destination.read_bytes() == body
+    # Probe, the dropped stream, then the rest from where it stopped.
+    assert _ranges(server) == ["bytes=0-0", None, "bytes=70000-199999"]
+    assert server.requests[-1].headers["if-range"] == '"v1"'
+    assert not (tmp_path / "release.tar.gz.part").exists()
+    assert not (tmp_path / "release.tar.gz.part.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_retries_proxy_errors_and_resumes_the_part_file(tmp_path):
+    body = os.urandom(200_000)
+    server = FakeServer(body)
+    server.fail_with = [502]
+    server.drop_after = [70_000]
+    destination = tmp_path / "release.tar.gz"
+
+    original_handle = server.handle
+
+    def handle(request):
+        response = original_handle(request)
+        if request.headers.get("range") is None:
+            # The stream after the probe drops; the proxy then fails twice.
+            server.fail_with = [503, 429]
+        return response
+
+    await download_file(URL, destination, single_flight=False, transport=httpx.MockTransport(handle))
+
+    assert destination.read_bytes() == body
+    assert _ranges(server) == [
+        "bytes=0-0", "bytes=0-0", None, "bytes=70000-199999", "bytes=70000-199999", "bytes=70000-199999"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_resumes_a_part_file_left_by_an_earlier_run(tmp_path, monkeypatch):
+    body = os.urandom(120_000)
+    server = FakeServer(body)
+    server.drop_after = [50_000] * 10
+    destination = tmp_path / "release.tar.gz"
+    monkeypatch.setattr(downloads, "DOWNLOAD_ATTEMPTS", 1)
+
+    with pytest.raises(downloads.DownloadError):
+        await download_file(URL, destination, single_flight=False, transport=server.transport())
+    assert (tmp_path / "release.tar.gz.part").stat().st_size == 50_000
+
+    server.drop_after = []
+    server.requests.clear()
+    await download_file(URL, destination, single_flight=False, transport=server.transport())
+
+    assert destination.read_bytes() == body
+    assert _ranges(server) == ["bytes=50000-119999"]
+
+
+@pytest.mark.asyncio
+async def test_segmented_download_reassembles_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloads, "DOWNLOAD_SEGMENT_MIN_BYTES", 50_000)
+    body = os.urandom(200_000)
+    server = FakeServer(body)
+    server.drop_after = [0, 10_000]  # the probe is one byte and never dropped
+    destination = tmp_path / "image.img.gz"
+
+    await download_file(
+        URL,
+        destination,
+        digests={"md5": hashlib.md5(body).hexdigest()},
+        segments=4,
+        single_flight=False,
+        transport=server.transport(),
+    )
+
+    assert destination.read_bytes() == body
+    segment_ranges = {value for value in _ranges(server)[1:]}
+    assert {"bytes=0-49999", "bytes=50000-99999", "bytes=100000-149999", "bytes=150000-199999"} <= segment_ranges
+    assert "bytes=60000-99999" in segment_ranges
+
+
+@pytest.mark.asyncio
+async def test_digest_mismatch_discards_the_partial_download(tmp_path):
+    server = FakeServer(os.urandom(10_000))
+    destination = tmp_path / "deps.tar.gz"
+
+    with pytest.raises(DownloadDigestMismatch):
+        await download_file(
+            URL,
+            destination,
+            digests={"sha256": "0" * 64},
+            single_flight=False,
+            transport=server.transport(),
+        )
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_changed_file_restarts_from_zero(tmp_path):
+    old = os.urandom(100_000)
+    new = os.urandom(90_000)
+    server = FakeServer(old)
+    server.drop_after = [40_000]
+    destination = tmp_path / "release.tar.gz"
+    original_handle = server.handle
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        if len(server.requests) == 2:
+            # Re-published between the drop and the resume.
+            server.body, server.etag = new, '"v2"'
+        return original_handle(request)
+
+    server.handle = handle  # type: ignore[method-assign]
+    await download_file(URL, destination, single_flight=False, transport=server.transport())
+
+    assert destination.read_bytes() == new
+    assert _ranges(server) == ["bytes=0-0", None, "bytes=40000-99999", None]
+
+
+@pytest.mark.asyncio
+async def test_server_without_range_support_still_downloads(tmp_path):
+    body = os.urandom(30_000)
+    server = FakeServer(body, ranges=False)
+
+    await download_file(URL, tmp_path / "a.bin", segments=4, single_flight=False, transport=server.transport())
+
+    assert (tmp_path / "a.bin").read_bytes() == body
+    assert len(server.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_missing_file_raises_http_status_error(tmp_path):
+    transport = httpx.MockTransport(lambda request: httpx.Response(404))
+
+    with pytest.raises(httpx.HTTPStatusError) as excinfo:
+        await download_file(URL, tmp_path / "missing.tar.gz", single_flight=False, transport=transport)
+
+    assert excinfo.value.response.status_code == 404
+    assert not (tmp_path / "missing.tar.gz").exists()
+
+
+@pytest.mark.asyncio
+async def test_bandwidth_limit_paces_the_download(tmp_path):
+    body = os.urandom(64 * 1024)
+    server = FakeServer(body)
+
+    started = time.monotonic()
+    await download_file(
+        URL,
+        tmp_path / "slow.bin",
+        bandwidth_limit=256 * 1024,
+        single_flight=False,
+        transport=server.transport(),
+    )
+
+    assert time.monotonic() - started >= 0.2
+    assert (tmp_path / "slow.bin").read_bytes() == body
+
+
+@pytest.mark.asyncio
+async def test_concurrent_downloads_of_one_file_fetch_it_once(tmp_path, redis, monkeypatch):
+    monkeypatch.setattr(downloads, "DOWNLOAD_LOCK_POLL_SECONDS", 0.01)
+    body = os.urandom(50_000)
+    server = FakeServer(body)
+    destination = tmp_path / "shared.tar.gz"
+
+    await asyncio.gather(
+        *(download_file(URL, destination, transport=server.transport()) for _ in range(3))
+    )
+
+    assert destination.read_bytes() == body
+    assert len(server.requests) == 2  # one probe, one body
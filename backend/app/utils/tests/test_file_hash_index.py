@@ -0,0 +1,85 @@
+import hashlib
+import os
+import time
+
+from app.utils import file_hash_index
+from app.utils.file_hash_index import FileHashIndex
+
+
+def write_old(path, content: bytes, age: float = 60.0) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def test_index_rehashes_only_changed_files_across_instances(tmp_path, monkeypatch):
+    index_path = tmp_path / "index.json"
+    unchanged = tmp_path / "src" / "a.nim"
+    changed = tmp_path / "src" / "b.nim"
+    write_old(unchanged, b"a = 1\n")
+    write_old(changed, b"b = 1\n")
+
+    first = FileHashIndex(index_path)
+    assert first.sha256(unchanged) == hashlib.sha256(b"a = 1\n").hexdigest()
+    first.sha256(changed)
+    assert first.hashed == 2
+    first.save()
+
+    write_old(changed, b"b = 22\n", age=30.0)
+    reads: list[str] = []
+    original = file_hash_index.sha256_file
+    monkeypatch.setattr(file_hash_index, "sha256_file", lambda path: reads.append(path.name) or original(path))
+
+    second = FileHashIndex(index_path)
+    assert second.sha256(unchanged) == hashlib.sha256(b"a = 1\n").hexdigest()
+    assert second.sha256(changed) == hashlib.sha256(b"b = 22\n").hexdigest()
+    assert reads == ["b.nim"]
+
+
+def test_index_does_not_remember_racily_fresh_files(tmp_path):
+    index_path = tmp_path / "index.json"
+    fresh = tmp_path / "fresh.c"
+    fresh.write_bytes(b"int x;\n")
+
+    index = FileHashIndex(index_path)
+    index.sha256(fresh)
+    index.save()
+
+    # Same size and mtime tick, different content: must still be noticed.
+    stat = fresh.stat()
+    fresh.write_bytes(b"int y;\n")
+    os.utime(fresh, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert FileHashIndex(index_path).sha256(fresh) == hashlib.sha256(b"int y;\n").hexdigest()
+
+
+def test_save_prunes_files_that_were_not_looked_up(tmp_path):
+    index_path = tmp_path / "index.json"
+    kept = tmp_path / "kept.txt"
+    removed = tmp_path / "removed.txt"
+    write_old(kept, b"kept")
+    write_old(removed, b"removed")
+    index = FileHashIndex(index_path)
+    index.sha256(kept)
+    index.sha256(removed)
+    index.save()
+    removed.unlink()
+
+    index = FileHashIndex(index_path)
+    index.sha256(kept)
+    index.save()
+
+    assert str(removed.absolute()) not in index_path.read_text(encoding="utf-8")
+    assert str(kept.absolute()) in index_path.read_text(encoding="utf-8")
+
+
+def test_corrupt_index_is_ignored(tmp_path):
+    index_path = tmp_path / "index.json"
+    index_path.write_text("{not json", encoding="utf-8")
+    source = tmp_path / "a.txt"
+    write_old(source, b"a")
+
+    index = FileHashIndex(index_path)
+    assert index.sha256(source) == hashlib.sha256(b"a").hexdigest()
+    index.save()
+    assert FileHashIndex(index_path).sha256(source) == hashlib.sha256(b"a").hexdigest()
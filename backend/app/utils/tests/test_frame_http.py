@@ -1,5 +1,8 @@
+import asyncio
+
 import httpx
 import pytest
+from fastapi import HTTPException
 
 from app.models.frame import Frame
 import app.utils.frame_http as frame_http
@@ -130,7 +133,7 @@ async def test_fetch_frame_http_bytes_falls_back_after_tls_candidate_error(monke
         async def __aexit__(self, exc_type, exc, tb):
             return False
 
-        async def request(self, method, url, headers=None, content=None, timeout=None):
+        async def request(self, method, url, headers=None, content=None, timeout=None, extensions=None):
             calls.append((method, url, self.verify, headers, content, timeout))
             if url.startswith("https://"):
                 raise httpx.ConnectError(
@@ -181,3 +184,151 @@ async def test_fetch_frame_http_bytes_encodes_remote_text_as_utf8(monkeypatch):
     assert body == b'{"name":"non\xe2\x80\x91breaking hyphen"}'
     assert body.decode("utf-8") == '{"name":"non\u2011breaking hyphen"}'
     assert headers["content-type"] == "application/json"
+
+
+def _racing_frame() -> Frame:
+    frame = _frame("stale-name.local")
+    frame.id = 7
+    frame.mode = "embedded"
+    frame.frame_port = 80
+    frame.https_proxy = {"enable": False}
+    frame.embedded = {"lastBoot": {"ip": "10.8.0.50"}}
+    return frame
+
+
+def _hanging_client(calls, cancelled):
+    class HangingAsyncClient:
+        def __init__(self, verify=True):
+            self.verify = verify
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        async def request(self, method, url, headers=None, content=None, timeout=None, extensions=None):
+            calls.append((method, url))
+            if "stale-name.local" in url:
+                try:
+                    await asyncio.sleep(30)
+                except asyncio.CancelledError:
+                    cancelled.append(url)
+                    raise
+            return httpx.Response(200, content=b"image")
+
+    return HangingAsyncClient
+
+
+@pytest.mark.asyncio
+async def test_fetch_frame_http_bytes_races_candidates_and_remembers_winner(monkeypatch, redis):
+    frame = _racing_frame()
+    calls, cancelled = [], []
+
+    async def fake_use_remote(_frame, _redis):
+        return False
+
+    monkeypatch.setattr(frame_http, "_use_remote", fake_use_remote)
+    monkeypatch.setattr(frame_http, "FRAME_HTTP_RACE_STAGGER_SECONDS", 0.01)
+    monkeypatch.setattr(frame_http.httpx, "AsyncClient", _hanging_client(calls, cancelled))
+
+    status, body, _ = await frame_http._fetch_frame_http_bytes(frame, redis, path="/image")
+
+    assert (status, body) == (200, b"image")
+    assert [url for _, url in calls] == ["http://stale-name.local:80/image", "http://10.8.0.50:80/image"]
+    assert cancelled == ["http://stale-name.local:80/image"]
+    assert await redis.get(frame_http.frame_http_route_key(7)) == b"http://10.8.0.50:80"
+
+    calls.clear()
+    await frame_http._fetch_frame_http_bytes(frame, redis, path="/image")
+    assert [url for _, url in calls] == ["http://10.8.0.50:80/image"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_frame_http_bytes_does_not_race_non_idempotent_requests(monkeypatch):
+    frame = _racing_frame()
+    calls = []
+
+    async def fake_use_remote(_frame, _redis):
+        return False
+
+    async def attempt(url, _verify, _on_connect):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return 200, b"ok", {}
+
+    monkeypatch.setattr(frame_http, "_use_remote", fake_use_remote)
+    candidates = frame_http._frame_http_direct_candidates(frame, "/event/render", "POST")
+
+    index, _ = await frame_http._race_candidates(candidates, attempt, stagger=None)
+
+    assert index == 0
+    assert calls == ["http://stale-name.local:80/event/render"]
+
+
+@pytest.mark.asyncio
+async def test_race_candidates_raises_last_error_when_all_fail():
+    async def attempt(url, _verify, _on_connect):
+        raise frame_http._CandidateFailed(HTTPException(status_code=502, detail=f"down {url}"))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await frame_http._race_candidates([("a", True), ("b", True)], attempt, stagger=0.01)
+
+    assert exc_info.value.detail == "down b"
+
+
+@pytest.mark.asyncio
+async def test_fetch_frame_http_bytes_only_races_the_connect_phase(monkeypatch, redis):
+    frame = _racing_frame()
+    calls = []
+
+    class SlowRenderClient:
+        def __init__(self, verify=True):
+            self.verify = verify
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+        async def request(self, method, url, headers=None, content=None, timeout=None, extensions=None):
+            # Connected at once, then a render far slower than the stagger.
+            await extensions["trace"]("http11.send_request_headers.started", {})
+            calls.append(url)
+            await asyncio.sleep(0.1)
+            return httpx.Response(200, content=b"image")
+
+    async def fake_use_remote(_frame, _redis):
+        return False
+
+    monkeypatch.setattr(frame_http, "_use_remote", fake_use_remote)
+    monkeypatch.setattr(frame_http, "FRAME_HTTP_RACE_STAGGER_SECONDS", 0.01)
+    monkeypatch.setattr(frame_http.httpx, "AsyncClient", SlowRenderClient)
+
+    status, body, _ = await frame_http._fetch_frame_http_bytes(frame, redis, path="/image")
+
+    assert (status, body) == (200, b"image")
+    assert calls == ["http://stale-name.local:80/image"]
+
+
+@pytest.mark.asyncio
+async def test_race_candidates_never_lets_a_fallback_error_status_win():
+    async def attempt(url, _verify, on_connect):
+        if url == "primary":
+            raise frame_http._CandidateFailed(HTTPException(status_code=502, detail="primary down"))
+        await on_connect()
+        return 404, b"someone else's server", {}
+
+    with pytest.raises(HTTPException) as exc_info:
+        await frame_http._race_candidates([("primary", True), ("http://10.8.0.50", True)], attempt, stagger=0.01)
+    assert exc_info.value.detail == "primary down"
+
+    async def primary_answers(url, _verify, on_connect):
+        await on_connect()
+        return (404 if url == "primary" else 200), b"", {}
+
+    index, (status, _, _) = await frame_http._race_candidates(
+        [("primary", True), ("http://10.8.0.50", True)], primary_answers, stagger=0.01
+    )
+    assert (index, status) == (0, 404)
@@ -0,0 +1,128 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import app.utils.frame_http as frame_http
+import app.utils.frame_reachability as reachability
+from app.models.frame import Frame
+
+
+def _frame(**overrides) -> Frame:
+    frame = Frame(name="f", frame_host="10.0.0.5", frame_port=8787, status="ok")
+    frame.id = 3
+    for key, value in overrides.items():
+        setattr(frame, key, value)
+    return frame
+
+
+def test_parse_fping_output():
+    output = "10.0.0.5 : 1.52\n10.0.0.6 : -\nnoise\n"
+    assert reachability.parse_fping_output(output, ["10.0.0.5", "10.0.0.6", "10.0.0.7"]) == {
+        "10.0.0.5": 1.52,
+        "10.0.0.6": None,
+        "10.0.0.7": None,
+    }
+
+
+def test_known_down_needs_repeated_recent_failures():
+    now = time.time()
+    assert not reachability.is_known_down(None)
+    assert not reachability.is_known_down({"up": True, "failures": 0, "checkedAt": now})
+    assert not reachability.is_known_down({"up": False, "failures": 1, "checkedAt": now})
+    assert reachability.is_known_down({"up": False, "failures": 2, "checkedAt": now})
+    stale = now - reachability.DOWN_TRUST_SECONDS - 1
+    assert not reachability.is_known_down({"up": False, "failures": 5, "checkedAt": stale})
+
+
+def test_probe_schedule_backs_off_while_up_and_rechecks_on_change():
+    schedule = reachability._Schedule()
+    delays = [reachability.next_probe_delay(schedule, True) for _ in range(4)]
+    assert delays == [30.0, 60.0, 120.0, 120.0]
+    assert reachability.next_probe_delay(schedule, False) == reachability.RECHECK_SECONDS
+    assert reachability.next_probe_delay(schedule, False) == reachability.DOWN_INTERVAL_SECONDS
+    assert reachability.next_probe_delay(schedule, True) == reachability.RECHECK_SECONDS
+
+
+def test_probe_targets_skip_embedded_and_agent_frames():
+    target = reachability.probe_target_for_frame(_frame())
+    assert target is not None
+    assert target.url == "http://10.0.0.5:8787/"
+    assert reachability.probe_target_for_frame(_frame(mode="embedded")) is None
+    assert reachability.probe_target_for_frame(_frame(agent={"agentEnabled": True, "agentRunCommands": True})) is None
+
+
+@pytest.mark.asyncio
+async def test_monitor_records_state_and_failure_streak(monkeypatch, redis):
+    monitor = reachability.FrameReachabilityMonitor()
+    target = reachability.probe_target_for_frame(_frame())
+    statuses = iter([200, None, None])
+
+    async def fake_ping(hosts, **_kwargs):
+        return {host: 2.5 for host in hosts}
+
+    async def fake_head(_target):
+        return next(statuses)
+
+    monkeypatch.setattr(reachability, "ping_hosts", fake_ping)
+    monkeypatch.setattr(monitor, "_http_head", fake_head)
+
+    await monitor.probe(redis, [target])
+    up = await reachability.get_frame_reachability(redis, 3)
+    assert up["up"] is True and up["rttMs"] == 2.5 and up["lastSeen"]
+
+    await monitor.probe(redis, [target])
+    await monitor.probe(redis, [target])
+    down = await reachability.get_frame_reachability(redis, 3)
+    assert down["up"] is False
+    assert down["failures"] == 2
+    assert down["lastSeen"] == up["lastSeen"]
+    assert reachability.is_known_down(down)
+
+
+@pytest.mark.asyncio
+async def test_monitor_tick_only_probes_due_frames(monkeypatch, redis):
+    monitor = reachability.FrameReachabilityMonitor()
+    probed = []
+
+    async def fake_probe(_redis, targets, *, now=None):
+        probed.append([target.frame_id for target in targets])
+        for target in targets:
+            monitor._schedules[target.frame_id].next_check = now + 30
+
+    monkeypatch.setattr(monitor, "_load_targets", lambda: [reachability.probe_target_for_frame(_frame())])
+    monkeypatch.setattr(monitor, "probe", fake_probe)
+
+    assert await monitor.tick(redis, now=1000.0) == [3]
+    assert await monitor.tick(redis, now=1010.0) == []
+    assert await monitor.tick(redis, now=1031.0) == [3]
+
+
+@pytest.mark.asyncio
+async def test_fetch_short_circuits_polling_reads_for_down_frames(monkeypatch, redis):
+    frame = _frame()
+    calls = []
+
+    async def fake_use_remote(_frame, _redis):
+        return False
+
+    async def fake_request(_frame, url, *_args):
+        calls.append(url)
+        return 200, b"pong", {}
+
+    monkeypatch.setattr(frame_http, "_use_remote", fake_use_remote)
+    monkeypatch.setattr(frame_http, "_request_candidate", fake_request)
+    await reachability.record_frame_reachability(redis, 3, False)
+    await reachability.record_frame_reachability(
+        redis, 3, False, previous=await reachability.get_frame_reachability(redis, 3)
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        await frame_http._fetch_frame_http_bytes(frame, redis, path="/image")
+    assert exc.value.status_code == 503
+    assert calls == []
+
+    # Actions and explicit pings still try, and a success clears the verdict.
+    await frame_http._fetch_frame_http_bytes(frame, redis, path="/ping", live=True)
+    assert calls == ["http://10.0.0.5:8787/ping"]
+    assert (await reachability.get_frame_reachability(redis, 3))["up"] is True
@@ -0,0 +1,104 @@
+import asyncio
+import datetime
+import json
+
+import pytest
+from sqlalchemy import event, text
+
+from app.database import SessionLocal, engine
+from app.models.frame import new_frame
+from app.models.user import User
+from app.models.user_session import create_user_session, revoke_user_session
+from app.utils import principal_cache
+from app.utils.principal_cache import (
+    PRINCIPAL_INVALIDATE_EVENT,
+    apply_principal_invalidation,
+    frame_principal,
+    invalidate_principals,
+    session_user,
+)
+
+
+@pytest.mark.asyncio
+async def test_frame_principal_is_cached_until_the_frame_changes(db, redis):
+    frame = await new_frame(db, redis, "Device", "localhost", "server_host")
+    api_key = frame.server_api_key
+    principal = frame_principal(db, api_key)
+    assert principal is not None
+    assert (principal.frame_id, principal.mode) == (frame.id, "rpios")
+
+    # A write the ORM does not see is only picked up after the TTL...
+    db.execute(text("UPDATE frame SET mode = 'embedded' WHERE id = :id"), {"id": frame.id})
+    db.commit()
+    assert frame_principal(db, api_key).mode == "rpios"
+
+    # ...while rotating the key through the ORM drops the entry at once.
+    frame.server_api_key = "rotated"
+    db.commit()
+    assert frame_principal(db, api_key) is None
+    assert frame_principal(db, "rotated").mode == "embedded"
+
+
+@pytest.mark.asyncio
+async def test_session_user_is_served_from_cache_and_revocable(db, redis):
+    user = User(email="cached@example.com")
+    user.set_password("secret")
+    db.add(user)
+    db.commit()
+    session_id = create_user_session(
+        db, user_id=user.id, expires_at=datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    )
+    assert session_user(db, "cached@example.com", session_id).id == user.id
+
+    queries = []
+
+    def count(*_args):
+        queries.append(1)
+
+    other = SessionLocal()
+    try:
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            cached = session_user(other, "cached@example.com", session_id)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        assert queries == []
+        assert cached in other
+        assert cached.check_password("secret")
+        # A credential naming another email is never answered from the cache.
+        assert session_user(other, "someone@example.com", session_id) is None
+    finally:
+        other.close()
+
+    revoke_user_session(db, session_id)
+    assert session_user(db, "cached@example.com", session_id) is None
+
+
+@pytest.mark.asyncio
+async def test_invalidation_is_broadcast_to_other_processes(db, redis):
+    frame = await new_frame(db, redis, "Device", "localhost", "server_host")
+    api_key = frame.server_api_key
+    assert frame_principal(db, api_key) is not None
+
+    pubsub = redis.pubsub()
+    await pubsub.subscribe("broadcast_channel")
+    try:
+        invalidate_principals(frame_id=frame.id)
+        parsed = None
+        for _ in range(50):
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+            if message is not None and json.loads(message["data"]).get("data") == {"frameId": frame.id}:
+                parsed = json.loads(message["data"])
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await pubsub.unsubscribe("broadcast_channel")
+        await pubsub.close()
+
+    assert parsed is not None
+    assert parsed["event"] == PRINCIPAL_INVALIDATE_EVENT
+
+    # The receiving side: what redis_listener applies.
+    frame_principal(db, api_key)
+    apply_principal_invalidation(parsed["data"])
+    assert principal_cache._frames == {}
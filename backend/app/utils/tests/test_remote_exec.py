@@ -63,10 +63,7 @@ async def test_remote_run_command_preserves_output_without_requesting_log(monkey
 
 class FakeSSH:
     def __init__(self) -> None:
-        self.aborted = False
-
-    def abort(self) -> None:
-        self.aborted = True
+        self.retired = False
 
 
 def _patch_scp_env(monkeypatch, scp_impl, logged):
@@ -83,12 +80,16 @@ def _patch_scp_env(monkeypatch, scp_impl, logged):
     async def fake_remove_ssh_connection(_db, _redis, _ssh, _frame):
         pass
 
+    async def fake_retire_ssh_connection(ssh, _frame):
+        ssh.retired = True
+
     async def fake_log(_db, _redis, _frame_id, log_type, line, timestamp=None):
         logged.append((log_type, line))
 
     monkeypatch.setattr(remote_exec, "_use_remote", fake_use_remote)
     monkeypatch.setattr(remote_exec, "get_ssh_connection", fake_get_ssh_connection)
     monkeypatch.setattr(remote_exec, "remove_ssh_connection", fake_remove_ssh_connection)
+    monkeypatch.setattr(remote_exec, "retire_ssh_connection", fake_retire_ssh_connection)
     monkeypatch.setattr(remote_exec, "log", fake_log)
     monkeypatch.setattr(remote_exec.asyncssh, "scp", scp_impl)
     # Keep stall detection fast: the watchdog polls every second, so a hanging
@@ -125,7 +126,7 @@ async def test_upload_file_scp_success(monkeypatch):
     await remote_exec.upload_file(None, None, frame, "/tmp/target", b"data")
 
     assert len(calls) == 1
-    assert not connections[0].aborted
+    assert not connections[0].retired
     assert any("scp →" in line for _t, line in logged)
 
 
@@ -145,8 +146,8 @@ async def test_upload_file_scp_retries_after_stall(monkeypatch):
     await remote_exec.upload_file(None, None, frame, "/tmp/target", b"data")
 
     assert len(calls) == 2
-    assert connections[0].aborted
-    assert not connections[1].aborted
+    assert connections[0].retired
+    assert not connections[1].retired
     assert any("stalled" in line for _t, line in logged)
     assert any("attempt 2/2" in line for _t, line in logged)
 
@@ -165,7 +166,7 @@ async def test_upload_file_scp_fails_after_max_attempts(monkeypatch):
         await remote_exec.upload_file(None, None, frame, "/tmp/target", b"data")
 
     assert len(connections) == 2
-    assert all(ssh.aborted for ssh in connections)
+    assert all(ssh.retired for ssh in connections)
 
 
 @pytest.mark.asyncio
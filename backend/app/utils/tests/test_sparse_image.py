@@ -0,0 +1,75 @@
+import gzip
+import os
+
+from app.utils import sparse_image
+from app.utils.sparse_image import (
+    SPARSE_BLOCK_SIZE,
+    clone_image,
+    sparse_copy_file,
+    sparse_decompress,
+    write_region,
+)
+
+BLOCK = SPARSE_BLOCK_SIZE
+
+
+def _image_with_hole() -> bytes:
+    return os.urandom(BLOCK) + bytes(4 * BLOCK) + os.urandom(BLOCK)
+
+
+def _allocated(path) -> int:
+    return path.stat().st_blocks * 512
+
+
+def test_sparse_copy_keeps_zero_runs_as_holes(tmp_path):
+    source = tmp_path / "base.img"
+    source.write_bytes(_image_with_hole())
+    destination = tmp_path / "copy.img"
+
+    sparse_copy_file(source, destination)
+
+    assert destination.read_bytes() == source.read_bytes()
+    assert _allocated(destination) < 3 * BLOCK
+
+
+def test_sparse_decompress_round_trips(tmp_path):
+    data = _image_with_hole() + bytes(BLOCK)
+    archive = tmp_path / "release.img.gz"
+    archive.write_bytes(gzip.compress(data, mtime=0))
+    destination = tmp_path / "release.img"
+
+    sparse_decompress(archive, destination)
+
+    assert destination.read_bytes() == data
+    assert _allocated(destination) < 3 * BLOCK
+
+
+def test_clone_image_falls_back_to_sparse_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(sparse_image, "reflink_file", lambda source, destination: False)
+    source = tmp_path / "base.img"
+    source.write_bytes(_image_with_hole())
+    destination = tmp_path / "frame.img"
+    destination.write_bytes(b"stale")
+
+    assert clone_image(source, destination) == "sparse"
+    assert destination.read_bytes() == source.read_bytes()
+    assert destination.stat().st_mtime == source.stat().st_mtime
+
+
+def test_write_region_only_touches_changed_blocks(tmp_path):
+    first, second = os.urandom(BLOCK), os.urandom(BLOCK)
+    image = tmp_path / "frame.img"
+    image.write_bytes(os.urandom(BLOCK) + first + second + os.urandom(BLOCK))
+    replacement = os.urandom(BLOCK // 2)
+    partition = tmp_path / "assets.img"
+    partition.write_bytes(first + bytes(BLOCK) + replacement)
+
+    stats = write_region(image, BLOCK, partition)
+
+    assert stats.unchanged == BLOCK
+    assert stats.written + stats.punched == BLOCK + len(replacement)
+    content = image.read_bytes()
+    assert content[BLOCK:2 * BLOCK] == first
+    assert content[2 * BLOCK:3 * BLOCK] == bytes(BLOCK)
+    assert content[3 * BLOCK:3 * BLOCK + len(replacement)] == replacement
+    assert len(content) == 4 * BLOCK
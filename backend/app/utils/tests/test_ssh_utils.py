@@ -0,0 +1,199 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import ssh_utils
+
+
+class FakeSSH:
+    def __init__(self):
+        self._closed = False
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+    def abort(self):
+        self._closed = True
+
+    async def wait_closed(self):
+        return None
+
+
+def make_frame(**overrides):
+    defaults = {"id": 1, "frame_host": "10.0.0.5", "ssh_port": 22, "ssh_user": "pi", "ssh_pass": "secret"}
+    defaults.update(overrides)
+    return SimpleNamespace(**defaults)
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(ssh_utils, "_ssh_pool", {})
+    monkeypatch.setattr(ssh_utils, "_connecting", {})
+    monkeypatch.setattr(ssh_utils, "_idle_gaps", {})
+    monkeypatch.setattr(ssh_utils, "_last_released", {})
+    monkeypatch.setattr(ssh_utils, "_metrics", dict.fromkeys(ssh_utils._metrics, 0))
+
+    async def fake_log(*_args, **_kwargs):
+        return None
+
+    monkeypatch.setattr(ssh_utils, "log", fake_log)
+
+
+def install_fake_connect(monkeypatch, delay=0.0, error=None):
+    created: list[FakeSSH] = []
+
+    async def fake_create(_db, _redis, _frame):
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        ssh = FakeSSH()
+        created.append(ssh)
+        return ssh
+
+    monkeypatch.setattr(ssh_utils, "_create_new_connection", fake_create)
+    return created
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_handshake(monkeypatch):
+    created = install_fake_connect(monkeypatch, delay=0.05)
+    frame = make_frame()
+
+    connections = await asyncio.gather(*(ssh_utils.get_ssh_connection(None, None, frame) for _ in range(5)))
+
+    assert len(created) == 1
+    assert all(ssh is created[0] for ssh in connections)
+    metrics = ssh_utils.ssh_pool_metrics()
+    assert metrics["connections"] == 1
+    assert metrics["active_leases"] == 5
+    assert metrics["shared_handshakes"] == 4
+
+
+@pytest.mark.asyncio
+async def test_second_connection_only_when_channels_run_out(monkeypatch):
+    created = install_fake_connect(monkeypatch)
+    monkeypatch.setattr(ssh_utils, "MAX_CHANNELS_PER_CONNECTION", 2)
+    frame = make_frame()
+
+    first = await ssh_utils.get_ssh_connection(None, None, frame)
+    second = await ssh_utils.get_ssh_connection(None, None, frame)
+    third = await ssh_utils.get_ssh_connection(None, None, frame)
+
+    assert first is second
+    assert third is not first
+    assert len(created) == 2
+
+    await ssh_utils.remove_ssh_connection(None, None, first, frame)
+    assert await ssh_utils.get_ssh_connection(None, None, frame) is first
+
+
+@pytest.mark.asyncio
+async def test_failed_handshake_fails_all_waiters_once(monkeypatch):
+    calls = []
+
+    async def failing_create(_db, _redis, _frame):
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        raise Exception("Unable to connect")
+
+    monkeypatch.setattr(ssh_utils, "_create_new_connection", failing_create)
+    frame = make_frame()
+
+    results = await asyncio.gather(
+        *(ssh_utils.get_ssh_connection(None, None, frame) for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    assert len(calls) == 1
+    assert all(isinstance(result, Exception) for result in results)
+    assert ssh_utils._connecting == {}
+
+
+@pytest.mark.asyncio
+async def test_aborted_connection_is_dropped_on_release(monkeypatch):
+    created = install_fake_connect(monkeypatch)
+    frame = make_frame()
+
+    ssh = await ssh_utils.get_ssh_connection(None, None, frame)
+    ssh.abort()
+    await ssh_utils.remove_ssh_connection(None, None, ssh, frame)
+
+    fresh = await ssh_utils.get_ssh_connection(None, None, frame)
+    assert fresh is not ssh
+    assert len(created) == 2
+
+
+@pytest.mark.asyncio
+async def test_retired_connection_closes_after_its_last_lease(monkeypatch):
+    created = install_fake_connect(monkeypatch)
+    frame = make_frame()
+
+    failed = await ssh_utils.get_ssh_connection(None, None, frame)
+    shared = await ssh_utils.get_ssh_connection(None, None, frame)
+    assert shared is failed
+
+    await ssh_utils.retire_ssh_connection(failed, frame)
+    await ssh_utils.remove_ssh_connection(None, None, failed, frame)
+    # The other lease (e.g. an open terminal) keeps its channels.
+    assert not shared.is_closed()
+
+    fresh = await ssh_utils.get_ssh_connection(None, None, frame)
+    assert fresh is not shared
+    assert len(created) == 2
+
+    await ssh_utils.remove_ssh_connection(None, None, shared, frame)
+    assert shared.is_closed()
+    assert ssh_utils.ssh_pool_metrics()["connections"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_connection_closes_after_timeout(monkeypatch):
+    install_fake_connect(monkeypatch)
+    monkeypatch.setattr(ssh_utils, "IDLE_TIMEOUT_SECONDS", 0.05)
+    frame = make_frame()
+
+    ssh = await ssh_utils.get_ssh_connection(None, None, frame)
+    await ssh_utils.remove_ssh_connection(None, None, ssh, frame)
+    await asyncio.sleep(0.15)
+
+    assert ssh.is_closed()
+    assert ssh_utils.ssh_pool_metrics()["connections"] == 0
+    assert ssh_utils.ssh_pool_metrics()["idle_closes"] == 1
+
+
+def test_idle_timeout_adapts_to_observed_gaps(monkeypatch):
+    key = ssh_utils._pool_key(make_frame())
+    assert ssh_utils.idle_timeout_for(key) == ssh_utils.IDLE_TIMEOUT_SECONDS
+
+    ssh_utils._last_released[key] = time.time() - 90
+    ssh_utils._record_acquire(key)
+    assert ssh_utils.idle_timeout_for(key) == pytest.approx(180, abs=1)
+
+    ssh_utils._last_released[key] = time.time() - 10_000
+    ssh_utils._record_acquire(key)
+    assert ssh_utils.idle_timeout_for(key) == ssh_utils.IDLE_TIMEOUT_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_prewarm_holds_connection_open(monkeypatch):
+    created = install_fake_connect(monkeypatch)
+    monkeypatch.setattr(ssh_utils, "IDLE_TIMEOUT_SECONDS", 0.01)
+    frame = make_frame()
+
+    assert await ssh_utils.prewarm_ssh_connection(None, None, frame, hold_seconds=5) is True
+    await asyncio.sleep(0.05)
+
+    assert not created[0].is_closed()
+    assert await ssh_utils.get_ssh_connection(None, None, frame) is created[0]
+    assert ssh_utils.ssh_pool_metrics()["prewarms"] == 1
+
+
+@pytest.mark.asyncio
+async def test_prewarm_reports_unreachable_frame(monkeypatch):
+    install_fake_connect(monkeypatch, error=Exception("no route"))
+    assert await ssh_utils.prewarm_ssh_connection(None, None, make_frame()) is False
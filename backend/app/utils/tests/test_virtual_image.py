@@ -0,0 +1,39 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.virtual_image import Extent, VirtualImage, VirtualImageResponse
+
+
+class _SlowImage(VirtualImage):
+    def iter_bytes(self, start=0, end=None, chunk_size=1024):
+        try:
+            while True:
+                yield b"x" * 16
+                self.reading.set()
+                self.release.wait(5)
+        finally:
+            self.closed.append(threading.current_thread().name)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_mid_read_closes_the_chunk_generator():
+    image = _SlowImage([Extent(length=1 << 20, fill=0)])
+    image.reading, image.release, image.closed = threading.Event(), threading.Event(), []
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    response = VirtualImageResponse(image)
+    task = asyncio.create_task(response._send_chunks(send, 0, image.size))
+    await asyncio.to_thread(image.reading.wait, 5)
+    # The worker thread is inside next() when the client goes away.
+    task.cancel()
+    asyncio.get_running_loop().call_later(0.1, image.release.set)
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert len(image.closed) == 1
+    assert sent and all(message["more_body"] for message in sent)
@@ -15,6 +15,10 @@ Uploads are quota-limited per frame: ``device_config.assetsQuotaMb`` (edited
 in the frame's settings panel), defaulting to 100 MB. Exceeding it returns
 507 Insufficient Storage, the same status a full SD card produces on embedded
 frames.
+
+Usage is a running total from ``app.utils.dir_size``: walked once, then
+adjusted by every upload and delete here, so a render does not stat the
+whole photo library just to compute its write budget.
 """
 
 from __future__ import annotations
@@ -30,6 +34,12 @@ from typing import Any
 from fastapi import HTTPException
 
 from app.models.frame import Frame
+from app.utils.dir_size import (
+    adjust_directory_size,
+    directory_size,
+    invalidate_directory_size,
+    walk_directory_size,
+)
 from app.utils.embedded_assets import embedded_assets_path, to_relative_asset_path
 
 DEFAULT_QUOTA_MB = 100
@@ -59,17 +69,15 @@ def quota_bytes(frame: Frame) -> int:
 
 
 def usage_bytes(frame: Frame) -> int:
-    total = 0
     root = frame_assets_dir(frame)
     if not root.is_dir():
         return 0
-    for dirpath, _dirnames, filenames in os.walk(root):
-        for name in filenames:
-            try:
-                total += os.path.getsize(os.path.join(dirpath, name))
-            except OSError:
-                continue
-    return total
+    return directory_size(root)
+
+
+def invalidate_usage(frame: Frame) -> None:
+    """Recount usage on the next query: files were written outside this module."""
+    invalidate_directory_size(frame_assets_dir(frame))
 
 
 def _physical_path(frame: Frame, full_path: str, *, allow_root: bool = False) -> Path:
@@ -162,6 +170,7 @@ async def upload_asset(frame: Frame, redis, full_path: str, data: bytes) -> dict
     except OSError:
         _unlink_quietly(tmp_name)
         raise
+    adjust_directory_size(target, len(data) - replaced)
     return {
         "path": full_path,
         "size": len(data),
@@ -187,9 +196,13 @@ async def make_dir(frame: Frame, redis, full_path: str) -> None:
 async def delete_path(frame: Frame, redis, full_path: str) -> None:
     target = _physical_path(frame, full_path)
     if target.is_dir():
+        freed = walk_directory_size(target)
         shutil.rmtree(target)
+        adjust_directory_size(target, -freed)
     elif target.is_file():
+        freed = target.stat().st_size
         target.unlink()
+        adjust_directory_size(target, -freed)
     else:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Asset not found")
 
@@ -210,3 +223,4 @@ def delete_frame_assets(frame: Frame) -> None:
     root = frame_assets_dir(frame)
     if root.is_dir():
         shutil.rmtree(root, ignore_errors=True)
+    invalidate_directory_size(root)
@@ -0,0 +1,322 @@
+"""Disk images assembled on the fly from shared base files and small overlays.
+
+A ``VirtualImage`` is an extent map: an ordered list of byte runs, each
+either a range of some file on disk or a run of one repeated byte. A
+personalized SD image that differs from the cached release image in a single
+region is then a few hundred bytes of JSON plus the region's non-padding
+bytes, instead of a multi-GB copy per frame.
+
+``VirtualImageResponse`` serves such an image with ``Range``/``If-Range``
+support. File extents go out through the ASGI ``zerocopysend`` extension
+(``os.sendfile`` in the server) when the server offers it and through
+``os.pread`` on a worker thread otherwise.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import io
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from email.utils import formatdate
+from pathlib import Path
+from typing import Iterator, Mapping
+
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+VIRTUAL_IMAGE_MANIFEST_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class Extent:
+    length: int
+    path: str | None = None
+    offset: int = 0
+    # Byte repeated over the extent when there is no path.
+    fill: int = 0
+
+
+@dataclass(slots=True)
+class VirtualImage:
+    extents: list[Extent]
+    # path -> [size, mtime_ns] of every file the extents point into when the
+    # image was composed; a changed or missing source invalidates the image.
+    sources: dict[str, list[int]] = field(default_factory=dict)
+    _starts: list[int] = field(default_factory=list, repr=False)
+
+    def __post_init__(self) -> None:
+        position = 0
+        self._starts = []
+        for extent in self.extents:
+            self._starts.append(position)
+            position += extent.length
+
+    @property
+    def size(self) -> int:
+        return self._starts[-1] + self.extents[-1].length if self.extents else 0
+
+    @classmethod
+    def from_extents(cls, extents: list[Extent]) -> "VirtualImage":
+        extents = [extent for extent in extents if extent.length > 0]
+        sources: dict[str, list[int]] = {}
+        for extent in extents:
+            if extent.path is not None and extent.path not in sources:
+                stat = os.stat(extent.path)
+                sources[extent.path] = [stat.st_size, stat.st_mtime_ns]
+        return cls(extents=extents, sources=sources)
+
+    def to_json(self) -> dict:
+        return {
+            "extents": [asdict(extent) for extent in self.extents],
+            "sources": self.sources,
+        }
+
+    @classmethod
+    def from_json(cls, data: Mapping) -> "VirtualImage":
+        return cls(
+            extents=[Extent(**extent) for extent in data["extents"]],
+            sources={path: list(value) for path, value in data.get("sources", {}).items()},
+        )
+
+    def is_intact(self) -> bool:
+        for path, (size, mtime_ns) in self.sources.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                return False
+        return True
+
+    def etag(self) -> str:
+        encoded = json.dumps(self.to_json(), sort_keys=True).encode("utf-8")
+        return f'"{hashlib.sha256(encoded).hexdigest()[:32]}"'
+
+    def pieces(self, start: int, end: int) -> Iterator[tuple[Extent, int, int]]:
+        """``(extent, offset into it, length)`` covering ``[start, end)``."""
+        index = bisect.bisect_right(self._starts, start) - 1
+        position = start
+        while position < end and 0 <= index < len(self.extents):
+            extent = self.extents[index]
+            within = position - self._starts[index]
+            length = min(extent.length - within, end - position)
+            if length > 0:
+                yield extent, within, length
+                position += length
+            index += 1
+
+    def iter_bytes(self, start: int = 0, end: int | None = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        end = self.size if end is None else min(end, self.size)
+        handles: dict[str, int] = {}
+        try:
+            for extent, within, length in self.pieces(start, end):
+                if extent.path is None:
+                    fill = bytes([extent.fill]) * min(length, chunk_size)
+                    while length > 0:
+                        yield fill[: min(length, chunk_size)]
+                        length -= chunk_size
+                    continue
+                fd = handles.get(extent.path)
+                if fd is None:
+                    fd = handles[extent.path] = os.open(extent.path, os.O_RDONLY)
+                offset = extent.offset + within
+                while length > 0:
+                    chunk = os.pread(fd, min(length, chunk_size), offset)
+                    if not chunk:
+                        raise OSError(f"{extent.path} is shorter than its virtual image extent")
+                    yield chunk
+                    offset += len(chunk)
+                    length -= len(chunk)
+        finally:
+            for fd in handles.values():
+                os.close(fd)
+
+    def open(self) -> io.BufferedReader:
+        return io.BufferedReader(_VirtualImageReader(self), buffer_size=CHUNK_SIZE)
+
+    def sha256(self) -> str:
+        digest = hashlib.sha256()
+        for chunk in self.iter_bytes():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+class _VirtualImageReader(io.RawIOBase):
+    def __init__(self, image: VirtualImage) -> None:
+        self._image = image
+        self._chunks: Iterator[bytes] | None = None
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._chunks is None:
+            self._chunks = self._image.iter_bytes()
+        if not self._pending:
+            self._pending = next(self._chunks, b"")
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+    def close(self) -> None:
+        if self._chunks is not None:
+            self._chunks.close()  # type: ignore[attr-defined]
+        super().close()
+
+
+def write_virtual_image_manifest(path: Path, images: Mapping[str, VirtualImage]) -> None:
+    """Store named variants (e.g. ``raw`` and ``gzip``) of one image in *path*."""
+    payload = {
+        "version": VIRTUAL_IMAGE_MANIFEST_VERSION,
+        "images": {name: image.to_json() for name, image in images.items()},
+    }
+    partial = path.with_name(f"{path.name}.partial")
+    partial.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(partial, path)
+
+
+def load_virtual_image(path: Path, variant: str) -> VirtualImage | None:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if payload.get("version") != VIRTUAL_IMAGE_MANIFEST_VERSION:
+        return None
+    data = payload.get("images", {}).get(variant)
+    return VirtualImage.from_json(data) if isinstance(data, dict) else None
+
+
+def virtual_image_is_intact(path: Path) -> bool:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    if payload.get("version") != VIRTUAL_IMAGE_MANIFEST_VERSION:
+        return False
+    return all(VirtualImage.from_json(data).is_intact() for data in payload.get("images", {}).values())
+
+
+def _parse_single_range(value: str, size: int) -> tuple[int, int] | None:
+    """``(start, end)`` for one ``bytes=`` range, None for anything we serve whole.
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    units, _, spec = value.partition("=")
+    if units.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last) + 1, size) if last else size
+        elif last:
+            start = max(size - int(last), 0)
+            end = size
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size or start >= end:
+        raise ValueError(value)
+    return start, end
+
+
+class VirtualImageResponse(Response):
+    def __init__(
+        self,
+        image: VirtualImage,
+        *,
+        media_type: str = "application/octet-stream",
+        headers: Mapping[str, str] | None = None,
+        last_modified: float | None = None,
+    ) -> None:
+        super().__init__(content=None, media_type=media_type, headers=headers)
+        self.image = image
+        self.headers.setdefault("accept-ranges", "bytes")
+        self.headers.setdefault("etag", image.etag())
+        if last_modified is not None:
+            self.headers.setdefault("last-modified", formatdate(last_modified, usegmt=True))
+
+    def _range(self, scope: Scope) -> tuple[int, int] | None:
+        request_headers = Headers(scope=scope)
+        http_range = request_headers.get("range")
+        if http_range is None:
+            return None
+        if_range = request_headers.get("if-range")
+        if if_range is not None and if_range not in (self.headers.get("etag"), self.headers.get("last-modified")):
+            return None
+        return _parse_single_range(http_range, self.image.size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        size = self.image.size
+        try:
+            byte_range = self._range(scope)
+        except ValueError:
+            response = PlainTextResponse(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+            return await response(scope, receive, send)
+        start, end = byte_range or (0, size)
+        if byte_range is not None:
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or start == end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            await self._send_zero_copy(send, start, end)
+        else:
+            await self._send_chunks(send, start, end)
+        if self.background is not None:
+            await self.background()
+
+    async def _send_chunks(self, send: Send, start: int, end: int) -> None:
+        chunks = self.image.iter_bytes(start, end)
+        pulling: asyncio.Future[bytes | None] | None = None
+        try:
+            while True:
+                pulling = asyncio.ensure_future(asyncio.to_thread(next, chunks, None))
+                chunk = await asyncio.shield(pulling)
+                if chunk is None:
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            # A disconnect can cancel us mid-read; the generator may only be
+            # closed once that thread has handed it back.
+            if pulling is not None and not pulling.done():
+                with contextlib.suppress(BaseException):
+                    await asyncio.wait([pulling])
+            await asyncio.to_thread(chunks.close)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_zero_copy(self, send: Send, start: int, end: int) -> None:
+        handles: dict[str, object] = {}
+        try:
+            for extent, within, length in self.image.pieces(start, end):
+                if extent.path is None:
+                    for chunk in VirtualImage([extent]).iter_bytes(within, within + length):
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                    continue
+                handle = handles.get(extent.path)
+                if handle is None:
+                    handle = handles[extent.path] = open(extent.path, "rb")
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": handle,
+                    "offset": extent.offset + within,
+                    "count": length,
+                    "more_body": True,
+                })
+        finally:
+            for handle in handles.values():
+                handle.close()  # type: ignore[attr-defined]
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -5,10 +5,14 @@ from redis.asyncio import from_url as create_redis, Redis
 from fastapi import WebSocket, WebSocketDisconnect
 
 from app.database import SessionLocal
-from app.models.organization import OrganizationMember, Project
 
 from app.config import config
 from app.utils.env import get_env_float
+from app.utils.principal_cache import (
+    PRINCIPAL_INVALIDATE_EVENT,
+    apply_principal_invalidation,
+    user_project_ids,
+)
 
 
 WEBSOCKET_BROADCAST_TIMEOUT = get_env_float("WEBSOCKET_BROADCAST_TIMEOUT", 2.0)
@@ -18,6 +22,7 @@ PROJECT_SCOPED_EVENTS = {
     "frame_rendered",
     "new_frame",
     "new_log",
+    "new_logs",
     "new_metrics",
     "new_scene_image",
     "update_frame",
@@ -28,6 +33,8 @@ class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.connection_project_ids: dict[WebSocket, set[int] | None] = {}
+        # Frame images each dashboard currently shows, for the image prefetcher.
+        self.connection_watched_frames: dict[WebSocket, set[int]] = {}
         self.lock = asyncio.Lock()
 
     async def connect(self, websocket: WebSocket, project_ids: set[int] | None = None):
@@ -42,8 +49,17 @@ class ConnectionManager:
             if websocket in self.active_connections:
                 self.active_connections.remove(websocket)
             self.connection_project_ids.pop(websocket, None)
+            self.connection_watched_frames.pop(websocket, None)
         print(f"Websocket client disconnected: {websocket.client}")
 
+    async def watch_frames(self, websocket: WebSocket, frame_ids: set[int]):
+        async with self.lock:
+            if websocket in self.active_connections:
+                self.connection_watched_frames[websocket] = frame_ids
+
+    def watched_frame_ids(self) -> set[int]:
+        return set().union(*self.connection_watched_frames.values())
+
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
@@ -104,6 +120,7 @@ class ConnectionManager:
                     if connection in self.active_connections:
                         self.active_connections.remove(connection)
                     self.connection_project_ids.pop(connection, None)
+                    self.connection_watched_frames.pop(connection, None)
 
 manager = ConnectionManager() # Local clients
 
@@ -123,8 +140,14 @@ async def redis_listener():
                     try:
                         parsed = json.loads(message["data"])
                         # Only broadcast if not from this instance
-                        if parsed.get("instance_id") != config.INSTANCE_ID:
-                            await manager.broadcast(message["data"])
+                        if parsed.get("instance_id") == config.INSTANCE_ID:
+                            continue
+                        if parsed.get("event") == PRINCIPAL_INVALIDATE_EVENT:
+                            # Auth bookkeeping between backend processes;
+                            # never forwarded to dashboards.
+                            apply_principal_invalidation(parsed.get("data") or {})
+                            continue
+                        await manager.broadcast(message["data"])
                     except json.JSONDecodeError:
                         pass
         except asyncio.CancelledError:
@@ -141,6 +164,67 @@ async def redis_listener():
         await asyncio.sleep(backoff)
         backoff = min(backoff * 2, 30.0)
 
+async def frame_viewers_refresher():
+    """Keep this instance's watched frames alive in the shared viewer set."""
+    from app.api.frame_image_prefetch import VIEWER_REFRESH_SECONDS, mark_frames_watched
+    from app.redis import get_shared_redis
+
+    while True:
+        await asyncio.sleep(VIEWER_REFRESH_SECONDS)
+        try:
+            await mark_frames_watched(get_shared_redis(), manager.watched_frame_ids())
+        except Exception as e:
+            print(f"frame_viewers_refresher error: {e}")
+
+
+def _visible_frame_ids(frame_ids: list, project_ids: set[int] | None) -> set[int]:
+    from app.api.frame_image_prefetch import MAX_WATCHED_FRAMES
+    from app.models.frame import Frame
+
+    requested: set[int] = set()
+    for frame_id in frame_ids[:MAX_WATCHED_FRAMES]:
+        try:
+            requested.add(int(frame_id))
+        except (TypeError, ValueError):
+            continue
+    if not requested or project_ids is None:
+        return requested
+    if not project_ids:
+        return set()
+    db = SessionLocal()
+    try:
+        return {
+            int(frame_id)
+            for (frame_id,) in db.query(Frame.id)
+            .filter(Frame.id.in_(requested), Frame.project_id.in_(project_ids))
+            .all()
+        }
+    finally:
+        db.close()
+
+
+async def _handle_client_message(websocket: WebSocket, data: str, project_ids: set[int] | None) -> bool:
+    """Handle a JSON command from a dashboard; False for anything else."""
+    if not data.startswith("{"):
+        return False
+    try:
+        parsed = json.loads(data)
+    except json.JSONDecodeError:
+        return False
+    if not isinstance(parsed, dict) or parsed.get("event") != "watch_frames":
+        return False
+    payload = parsed.get("data") if isinstance(parsed.get("data"), dict) else {}
+    frame_ids = payload.get("frameIds")
+    watched = _visible_frame_ids(frame_ids if isinstance(frame_ids, list) else [], project_ids)
+    await manager.watch_frames(websocket, watched)
+    if watched:
+        from app.api.frame_image_prefetch import mark_frames_watched
+        from app.redis import get_shared_redis
+
+        await mark_frames_watched(get_shared_redis(), watched)
+    return True
+
+
 async def publish_message(redis: Redis, event: str, data: dict):
     msg = {"event": event, "data": data, "instance_id": config.INSTANCE_ID}
 
@@ -162,15 +246,7 @@ def register_ws_routes(app):
             try:
                 user, error_reason = get_current_user_from_websocket(websocket, db)
                 if user is not None:
-                    project_ids = {
-                        int(project_id)
-                        for (project_id,) in (
-                            db.query(Project.id)
-                            .join(OrganizationMember, OrganizationMember.organization_id == Project.organization_id)
-                            .filter(OrganizationMember.user_id == user.id)
-                            .all()
-                        )
-                    }
+                    project_ids = set(user_project_ids(db, int(user.id)))
             finally:
                 db.close()
 
@@ -182,6 +258,8 @@ def register_ws_routes(app):
         try:
             while True:
                 data = await websocket.receive_text()
+                if await _handle_client_message(websocket, data, project_ids):
+                    continue
                 await manager.send_personal_message(json.dumps({'event': "pong", 'payload': data}), websocket)
         except WebSocketDisconnect:
             await manager.disconnect(websocket)
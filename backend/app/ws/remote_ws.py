@@ -11,18 +11,22 @@ import secrets
 import re
 import time
 from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
 from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
 from starlette.websockets import WebSocketState
 from arq import ArqRedis as Redis
+from sqlalchemy.orm import load_only
 
 # ── project locals ──────────────────────────────────────────────────────────
 from app.database import SessionLocal
 from app.redis import close_redis_connection, get_redis, create_redis_connection
 from app.websockets import publish_message
 from app.models.frame import Frame
-from app.models.log import new_log as log
+from app.models.log import new_log as log, new_logs
+from app.utils.env import get_env_float, get_env_int
 from app.utils.request_ip import extract_client_ip
 from app.ws.remote_bridge import CMD_KEY, RESP_KEY, STREAM_KEY, send_cmd
 
@@ -31,6 +35,10 @@ router = APIRouter()
 MAX_REMOTES = 1000        # simple DoS safeguard
 CONN_TTL   = 60           # seconds – Redis key self-expiry
 REMOTE_DISCONNECTED_ERROR = "remote websocket disconnected before command completed"
+# Command output is coalesced for this long (or this many lines) before it is
+# logged and pushed to the command's stream key.
+STREAM_FLUSH_INTERVAL = get_env_float("FRAMEOS_REMOTE_STREAM_FLUSH_INTERVAL", 0.25)
+STREAM_FLUSH_LINES = get_env_int("FRAMEOS_REMOTE_STREAM_FLUSH_LINES", 500)
 
 # frame_id → list[websocket] (only for UI statistics)
 active_sockets_by_frame: dict[int, list[WebSocket]] = {}
@@ -45,6 +53,14 @@ async def write_log(redis: Redis, frame_id: int, type: str, line: str, ip: str |
         db.close()
 
 
+async def write_logs(redis: Redis, frame_id: int, entries: list[tuple[datetime, str, str]], ip: str | None = None):
+    db = SessionLocal()
+    try:
+        await new_logs(db, redis, frame_id, entries, ip=ip)
+    finally:
+        db.close()
+
+
 async def mark_sd_image_booted_if_needed(redis: Redis, frame_id: int) -> None:
     from app.tasks.buildroot_deploy_state import mark_buildroot_sd_image_booted
 
@@ -380,6 +396,84 @@ async def fail_pending_commands(
         await redis.expire(RESP_KEY.format(id=cmd_id), 60)
 
 
+@dataclass
+class _PendingStream:
+    logs: list[tuple[datetime, str, str]] = field(default_factory=list)
+    chunks: list[bytes] = field(default_factory=list)
+
+
+class RemoteStreamBuffer:
+    """
+    Per-connection buffer for ``cmd/stream`` output. A noisy command (apt-get,
+    a compile) sends thousands of lines a minute; one log commit, publish and
+    rpush per line kept the database busy for the whole deploy. Lines are
+    held per command and written together: one bulk insert, one publish, one
+    pipelined rpush. Flushes run in arrival order.
+    """
+
+    def __init__(self, redis: Redis, frame_id: int, client_ip: str | None) -> None:
+        self.redis = redis
+        self.frame_id = frame_id
+        self.client_ip = client_ip
+        self._pending: dict[str, _PendingStream] = {}
+        self._timers: dict[str, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    async def add(
+        self,
+        command_id: str,
+        logs: list[tuple[datetime, str, str]],
+        chunks: list[bytes],
+    ) -> None:
+        pending = self._pending.setdefault(command_id, _PendingStream())
+        pending.logs.extend(logs)
+        pending.chunks.extend(chunks)
+        if len(pending.logs) + len(pending.chunks) >= STREAM_FLUSH_LINES:
+            await self.flush(command_id)
+        elif command_id not in self._timers:
+            self._timers[command_id] = asyncio.create_task(self._flush_later(command_id))
+
+    async def _flush_later(self, command_id: str) -> None:
+        await asyncio.sleep(STREAM_FLUSH_INTERVAL)
+        # Once running, a flush is never cancelled by ``flush`` or ``close``.
+        self._timers.pop(command_id, None)
+        try:
+            await self.flush(command_id)
+        except Exception as e:
+            print(f"🔴 Failed to write stream output of remote command {command_id}: {e}")
+
+    async def flush(self, command_id: str) -> None:
+        """Write out everything buffered for *command_id*, e.g. before its reply."""
+        timer = self._timers.pop(command_id, None)
+        if timer is not None:
+            timer.cancel()
+        async with self._lock:
+            pending = self._pending.pop(command_id, None)
+            if pending is None:
+                return
+            if pending.chunks:
+                stream_key = STREAM_KEY.format(id=command_id)
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.rpush(stream_key, *pending.chunks)
+                    pipe.expire(stream_key, 300)
+                    await pipe.execute()
+            if pending.logs:
+                await write_logs(self.redis, self.frame_id, pending.logs, ip=self.client_ip)
+
+    async def close(self) -> None:
+        for command_id in list(self._pending):
+            with contextlib.suppress(Exception):
+                await self.flush(command_id)
+
+
+def stream_buffer_for(ws: WebSocket, redis: Redis, frame: Frame, client_ip: str | None) -> RemoteStreamBuffer:
+    buffer = ws.scope.get("cmd_stream_buffer")
+    if buffer is None:
+        buffer = RemoteStreamBuffer(redis, frame.id, client_ip)
+        ws.scope["cmd_stream_buffer"] = buffer
+    return buffer
+
+
 async def handle_remote_stream_chunk(
     ws: WebSocket,
     redis: Redis,
@@ -391,27 +485,29 @@ async def handle_remote_stream_chunk(
     data = payload.get("data", "")
     command_id = payload["id"]
     log_output = ws.scope.get("cmd_log_output", {}).get(command_id, True)
+    buffer = stream_buffer_for(ws, redis, frame, client_ip)
+    now = datetime.utcnow()
 
     if payload.get("raw"):
-        for line in str(data).splitlines():
-            if line and log_output:
-                await write_log(redis, frame.id, stream, line, ip=client_ip)
+        logs = [(now, stream, line) for line in str(data).splitlines() if line] if log_output else []
+        # Raw chunks feed interactive terminals: they reach Redis right away
+        # and only their log lines wait for the next flush.
         await redis.rpush(
             STREAM_KEY.format(id=command_id),
             json.dumps({"stream": stream, "data": data, "raw": True}).encode(),
         )
         await redis.expire(STREAM_KEY.format(id=command_id), 300)
+        if logs:
+            await buffer.add(command_id, logs, [])
         return
 
-    for line in data.splitlines():
-        if line:
-            if log_output:
-                await write_log(redis, frame.id, stream, line, ip=client_ip)
-            await redis.rpush(
-                STREAM_KEY.format(id=command_id),
-                json.dumps({"stream": stream, "data": line}).encode(),
-            )
-    await redis.expire(STREAM_KEY.format(id=command_id), 300)
+    lines = [line for line in data.splitlines() if line]
+    if lines:
+        await buffer.add(
+            command_id,
+            [(now, stream, line) for line in lines] if log_output else [],
+            [json.dumps({"stream": stream, "data": line}).encode() for line in lines],
+        )
 
 # ────────────────────────────────────────────────────────────────────────────
 # Main WebSocket endpoint
@@ -444,7 +540,13 @@ async def ws_remote_endpoint(
     server_api_key = str(hello_msg.get("serverApiKey", "")) or ""
     db = SessionLocal()
     try:
-        frame = db.query(Frame).filter_by(server_api_key=server_api_key).first()
+        # Only what the handshake and the session below use.
+        frame = (
+            db.query(Frame)
+            .options(load_only(Frame.id, Frame.name, Frame.project_id, Frame.agent, raiseload=True))
+            .filter_by(server_api_key=server_api_key)
+            .first()
+        )
     finally:
         db.close()
 
@@ -592,6 +694,8 @@ async def ws_remote_endpoint(
                 else:
                     payload["result"] = result
 
+                # The caller stops reading the stream at the reply.
+                await stream_buffer_for(ws, redis, frame, client_ip).flush(cmd_id)
                 await redis.rpush(RESP_KEY.format(id=cmd_id),
                                   json.dumps(payload).encode())
                 await redis.expire(RESP_KEY.format(id=cmd_id), 60)
@@ -606,6 +710,7 @@ async def ws_remote_endpoint(
         pass
     finally:
         # ----- final clean-up ---------------------------------------------
+        await stream_buffer_for(ws, redis, frame, client_ip).close()
         if ws in active_sockets:
             active_sockets.remove(ws)
         if ws in active_sockets_by_frame.get(frame.id, []):
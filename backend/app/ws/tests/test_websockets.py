@@ -511,28 +511,16 @@ async def test_pump_commands_fails_pending_command_when_websocket_send_drops() -
 
 
 @pytest.mark.asyncio
-async def test_remote_stream_chunk_can_skip_frame_logs(monkeypatch) -> None:
+async def test_remote_stream_chunk_can_skip_frame_logs(monkeypatch, redis) -> None:
     from app.ws import remote_ws
 
-    class FakeRedis:
-        def __init__(self) -> None:
-            self.pushed: list[tuple[str, bytes]] = []
-            self.expired: list[tuple[str, int]] = []
-
-        async def rpush(self, key: str, value: bytes) -> None:
-            self.pushed.append((key, value))
-
-        async def expire(self, key: str, seconds: int) -> None:
-            self.expired.append((key, seconds))
-
     logged: list[tuple[int, str, str]] = []
 
-    async def fake_write_log(_redis, frame_id: int, type: str, line: str, ip: str | None = None):
-        logged.append((frame_id, type, line))
+    async def fake_write_logs(_redis, frame_id: int, entries, ip: str | None = None):
+        logged.extend((frame_id, type, line) for _timestamp, type, line in entries)
 
-    monkeypatch.setattr(remote_ws, "write_log", fake_write_log)
+    monkeypatch.setattr(remote_ws, "write_logs", fake_write_logs)
 
-    redis = FakeRedis()
     frame = SimpleNamespace(id=77)
     ws = SimpleNamespace(scope={"cmd_log_output": {"quiet-cmd": False}})
 
@@ -543,42 +531,84 @@ async def test_remote_stream_chunk_can_skip_frame_logs(monkeypatch) -> None:
         {"id": "quiet-cmd", "type": "cmd/stream", "stream": "stdout", "data": "raspios\nbookworm"},
         client_ip="127.0.0.1",
     )
+    await ws.scope["cmd_stream_buffer"].flush("quiet-cmd")
 
     assert logged == []
-    assert [json.loads(raw) for _key, raw in redis.pushed] == [
+    assert [json.loads(raw) for raw in await redis.lrange("remote:cmd:stream:quiet-cmd", 0, -1)] == [
         {"stream": "stdout", "data": "raspios"},
         {"stream": "stdout", "data": "bookworm"},
     ]
-    assert redis.expired == [("remote:cmd:stream:quiet-cmd", 300)]
+    assert 0 < await redis.ttl("remote:cmd:stream:quiet-cmd") <= 300
 
 
 @pytest.mark.asyncio
-async def test_remote_stream_chunk_logs_by_default(monkeypatch) -> None:
+async def test_remote_stream_chunk_logs_by_default(monkeypatch, redis) -> None:
     from app.ws import remote_ws
 
-    class FakeRedis:
-        async def rpush(self, _key: str, _value: bytes) -> None:
-            pass
-
-        async def expire(self, _key: str, _seconds: int) -> None:
-            pass
-
     logged: list[tuple[int, str, str]] = []
 
-    async def fake_write_log(_redis, frame_id: int, type: str, line: str, ip: str | None = None):
-        logged.append((frame_id, type, line))
+    async def fake_write_logs(_redis, frame_id: int, entries, ip: str | None = None):
+        logged.extend((frame_id, type, line) for _timestamp, type, line in entries)
 
-    monkeypatch.setattr(remote_ws, "write_log", fake_write_log)
+    monkeypatch.setattr(remote_ws, "write_logs", fake_write_logs)
 
     frame = SimpleNamespace(id=88)
     ws = SimpleNamespace(scope={})
 
     await remote_ws.handle_remote_stream_chunk(
         ws,
-        FakeRedis(),
+        redis,
         frame,
         {"id": "normal-cmd", "type": "cmd/stream", "stream": "stdout", "data": "visible"},
         client_ip=None,
     )
+    await ws.scope["cmd_stream_buffer"].close()
 
     assert logged == [(88, "stdout", "visible")]
+
+
+@pytest.mark.asyncio
+async def test_remote_stream_chunks_are_written_in_batches(monkeypatch, redis) -> None:
+    from app.ws import remote_ws
+
+    batches: list[list[tuple[str, str]]] = []
+
+    async def fake_write_logs(_redis, _frame_id: int, entries, ip: str | None = None):
+        batches.append([(type, line) for _timestamp, type, line in entries])
+
+    monkeypatch.setattr(remote_ws, "write_logs", fake_write_logs)
+    monkeypatch.setattr(remote_ws, "STREAM_FLUSH_INTERVAL", 0.05)
+
+    frame = SimpleNamespace(id=99)
+    ws = SimpleNamespace(scope={})
+
+    for index in range(3):
+        await remote_ws.handle_remote_stream_chunk(
+            ws,
+            redis,
+            frame,
+            {"id": "busy-cmd", "type": "cmd/stream", "stream": "stdout", "data": f"a{index}\nb{index}"},
+            client_ip=None,
+        )
+    await remote_ws.handle_remote_stream_chunk(
+        ws,
+        redis,
+        frame,
+        {"id": "busy-cmd", "type": "cmd/stream", "stream": "stderr", "data": "warning"},
+        client_ip=None,
+    )
+    # Nothing is written until the window closes.
+    assert batches == []
+    assert await redis.llen("remote:cmd:stream:busy-cmd") == 0
+
+    await asyncio.sleep(0.2)
+
+    assert batches == [[
+        ("stdout", "a0"), ("stdout", "b0"),
+        ("stdout", "a1"), ("stdout", "b1"),
+        ("stdout", "a2"), ("stdout", "b2"),
+        ("stderr", "warning"),
+    ]]
+    assert [json.loads(raw)["data"] for raw in await redis.lrange("remote:cmd:stream:busy-cmd", 0, -1)] == [
+        "a0", "b0", "a1", "b1", "a2", "b2", "warning",
+    ]
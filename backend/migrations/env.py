@@ -21,6 +21,13 @@ config.set_main_option("sqlalchemy.url", app_config.DATABASE_URL)
 
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The log search index (log_fts and its shadow tables) is created by DDL
+    # events, not models: keep autogenerate from dropping it.
+    return not (type_ == "table" and reflected and name.startswith("log_fts"))
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode."""
     url = config.get_main_option("sqlalchemy.url")
@@ -45,7 +52,8 @@ def run_migrations_online():
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
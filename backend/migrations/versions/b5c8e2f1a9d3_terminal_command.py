@@ -0,0 +1,76 @@
+"""Move terminal history out of the frame row
+
+Each command typed in the terminal rewrote `frame.terminal_history` (a JSON
+list) and with it the whole frame row. Commands now go to an append-only
+`terminal_command` table, capped per frame by the backend. Existing
+histories are copied over, oldest first, before the column is dropped.
+
+Revision ID: b5c8e2f1a9d3
+Revises: e7a3b9c4d2f6
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import sqlite
+
+revision = "b5c8e2f1a9d3"
+down_revision = "e7a3b9c4d2f6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "terminal_command",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("frame_id", sa.Integer(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("command", sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(["frame_id"], ["frame.id"]),
+        sa.ForeignKeyConstraint(["project_id"], ["project.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_terminal_command_project_id"), "terminal_command", ["project_id"], unique=False)
+    op.create_index("ix_terminal_command_frame_id_id", "terminal_command", ["frame_id", "id"], unique=False)
+
+    connection = op.get_bind()
+    meta = sa.MetaData()
+    frame_table = sa.Table(
+        "frame",
+        meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("project_id", sa.Integer),
+        sa.Column("terminal_history", sqlite.JSON()),
+    )
+    command_table = sa.Table(
+        "terminal_command",
+        meta,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("project_id", sa.Integer),
+        sa.Column("frame_id", sa.Integer),
+        sa.Column("timestamp", sa.DateTime),
+        sa.Column("command", sa.Text),
+    )
+    now = sa.func.current_timestamp()
+    rows = connection.execute(
+        sa.select(frame_table.c.id, frame_table.c.project_id, frame_table.c.terminal_history)
+    ).all()
+    for frame_id, project_id, history in rows:
+        if project_id is None or not isinstance(history, list):
+            continue
+        commands = [str(command).strip() for command in history[-200:] if str(command or "").strip()]
+        for command in commands:
+            connection.execute(
+                command_table.insert().values(project_id=project_id, frame_id=frame_id, timestamp=now, command=command)
+            )
+
+    with op.batch_alter_table("frame") as batch_op:
+        batch_op.drop_column("terminal_history")
+
+
+def downgrade():
+    with op.batch_alter_table("frame") as batch_op:
+        batch_op.add_column(sa.Column("terminal_history", sqlite.JSON(), nullable=True))
+    op.drop_index("ix_terminal_command_frame_id_id", table_name="terminal_command")
+    op.drop_index(op.f("ix_terminal_command_project_id"), table_name="terminal_command")
+    op.drop_table("terminal_command")
@@ -0,0 +1,69 @@
+"""Log event column and keyset indexes
+
+The log API pages a frame's rows by id and filters them by type or by the
+"event" of webhook lines. `log.event` copies that event out of the JSON line
+so it can be indexed; existing webhook rows are backfilled.
+
+Revision ID: c3d9a4e7b215
+Revises: b5c8e2f1a9d3
+"""
+import json
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "c3d9a4e7b215"
+down_revision = "b5c8e2f1a9d3"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 5000
+
+
+def upgrade():
+    op.add_column("log", sa.Column("event", sa.String(length=64), nullable=True))
+
+    connection = op.get_bind()
+    log_table = sa.table(
+        "log",
+        sa.column("id", sa.Integer),
+        sa.column("type", sa.String),
+        sa.column("line", sa.Text),
+        sa.column("event", sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(log_table.c.id, log_table.c.line)
+            .where(log_table.c.type == "webhook", log_table.c.id > last_id)
+            .order_by(log_table.c.id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for log_id, line in rows:
+            try:
+                event = json.loads(line).get("event")
+            except (ValueError, TypeError, AttributeError):
+                continue
+            if isinstance(event, str) and event:
+                updates.append({"log_id": log_id, "event": event[:64]})
+        if updates:
+            connection.execute(
+                log_table.update().where(log_table.c.id == sa.bindparam("log_id")).values(event=sa.bindparam("event")),
+                updates,
+            )
+
+    op.create_index("ix_log_frame_id_id", "log", ["frame_id", "id"], unique=False)
+    op.create_index("ix_log_frame_id_type_id", "log", ["frame_id", "type", "id"], unique=False)
+    op.create_index("ix_log_frame_id_event_id", "log", ["frame_id", "event", "id"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_log_frame_id_event_id", table_name="log")
+    op.drop_index("ix_log_frame_id_type_id", table_name="log")
+    op.drop_index("ix_log_frame_id_id", table_name="log")
+    with op.batch_alter_table("log") as batch_op:
+        batch_op.drop_column("event")
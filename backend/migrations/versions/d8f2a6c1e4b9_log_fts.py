@@ -0,0 +1,50 @@
+"""Full-text index over log lines
+
+An FTS5 table (`log_fts`) indexing `log.line`, with external content so the
+text isn't stored twice, and triggers that keep it in step with every insert
+and delete on `log`. Existing rows are indexed with a rebuild. SQLite only.
+
+A later batch_alter_table("log") recreates the table on SQLite and loses the
+triggers: recreate them (and rebuild) in that migration.
+
+Revision ID: d8f2a6c1e4b9
+Revises: c3d9a4e7b215
+"""
+from alembic import op
+
+revision = "d8f2a6c1e4b9"
+down_revision = "c3d9a4e7b215"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS log_fts USING fts5(line, content='log', content_rowid='id')")
+    op.execute(
+        """CREATE TRIGGER IF NOT EXISTS log_fts_insert AFTER INSERT ON log BEGIN
+            INSERT INTO log_fts(rowid, line) VALUES (new.id, new.line);
+        END"""
+    )
+    op.execute(
+        """CREATE TRIGGER IF NOT EXISTS log_fts_delete AFTER DELETE ON log BEGIN
+            INSERT INTO log_fts(log_fts, rowid, line) VALUES ('delete', old.id, old.line);
+        END"""
+    )
+    op.execute(
+        """CREATE TRIGGER IF NOT EXISTS log_fts_update AFTER UPDATE OF line ON log BEGIN
+            INSERT INTO log_fts(log_fts, rowid, line) VALUES ('delete', old.id, old.line);
+            INSERT INTO log_fts(rowid, line) VALUES (new.id, new.line);
+        END"""
+    )
+    op.execute("INSERT INTO log_fts(log_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute("DROP TRIGGER IF EXISTS log_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS log_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS log_fts_insert")
+    op.execute("DROP TABLE IF EXISTS log_fts")
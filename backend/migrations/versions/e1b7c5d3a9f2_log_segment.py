@@ -0,0 +1,44 @@
+"""Compressed log segments
+
+Rows trimmed from `log` beyond the per-frame row limit used to be deleted.
+They now roll into `log_segment`: compressed blocks of JSON lines with their
+id and time bounds, kept under a byte budget per frame.
+
+Revision ID: e1b7c5d3a9f2
+Revises: d8f2a6c1e4b9
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "e1b7c5d3a9f2"
+down_revision = "d8f2a6c1e4b9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "log_segment",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("frame_id", sa.Integer(), nullable=False),
+        sa.Column("first_log_id", sa.Integer(), nullable=False),
+        sa.Column("last_log_id", sa.Integer(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("ended_at", sa.DateTime(), nullable=False),
+        sa.Column("line_count", sa.Integer(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("codec", sa.String(length=8), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["frame_id"], ["frame.id"]),
+        sa.ForeignKeyConstraint(["project_id"], ["project.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_log_segment_project_id"), "log_segment", ["project_id"], unique=False)
+    op.create_index("ix_log_segment_frame_id_first_log_id", "log_segment", ["frame_id", "first_log_id"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_log_segment_frame_id_first_log_id", table_name="log_segment")
+    op.drop_index(op.f("ix_log_segment_project_id"), table_name="log_segment")
+    op.drop_table("log_segment")
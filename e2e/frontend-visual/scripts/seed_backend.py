@@ -28,6 +28,7 @@ from app.models.log import Log
 from app.models.metrics import Metrics
 from app.models.scene_image import SceneImage
 from app.models.settings import Settings
+from app.models.terminal_history import TerminalCommand
 from app.models.user import User
 from app.redis import close_redis_connection, create_redis_connection
 from app.tenancy import ensure_default_project_for_user
@@ -143,7 +144,6 @@ def base_frame_kwargs() -> dict[str, Any]:
         "palette": {},
         "buildroot": {"enabled": False},
         "rpios": {"enabled": True},
-        "terminal_history": ["uptime", "journalctl -u frameos -n 50", "df -h"],
     }
 
 
@@ -292,6 +292,16 @@ def create_data() -> tuple[Frame, list[dict[str, Any]]]:
                 )
             )
 
+        for index, command in enumerate(["uptime", "journalctl -u frameos -n 50", "df -h"]):
+            db.add(
+                TerminalCommand(
+                    project_id=project.id,
+                    frame_id=1,
+                    command=command,
+                    timestamp=FIXED_NOW - timedelta(minutes=30 - index),
+                )
+            )
+
         preview_colors = [
             ("#172554", "#8b5cf6"),
             ("#064e3b", "#14b8a6"),
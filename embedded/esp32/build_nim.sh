@@ -1,6 +1,7 @@
 #!/usr/bin/env bash
 # Compile the FrameOS embedded Nim runtime (frameos/src/embedded) to C and
-# drop it into components/frameos_nim/nimcache for the IDF build.
+# drop it into components/frameos_nim/nimcache (or $FRAMEOS_NIMCACHE_DIR) for
+# the IDF build.
 #
 #   ./build_nim.sh          # build nimcache
 #   ./build_nim.sh clean    # remove nimcache (firmware falls back to stub)
@@ -9,7 +10,7 @@ set -euo pipefail
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 REPO_ROOT="$(cd "$SCRIPT_DIR/../.." && pwd)"
 FRAMEOS_DIR="$REPO_ROOT/frameos"
-NIMCACHE="$SCRIPT_DIR/components/frameos_nim/nimcache"
+NIMCACHE="${FRAMEOS_NIMCACHE_DIR:-$SCRIPT_DIR/components/frameos_nim/nimcache}"
 
 if [[ "${1:-}" == "clean" ]]; then
     rm -rf "$NIMCACHE"
@@ -22,6 +23,14 @@ command -v nim >/dev/null || { echo "nim not found on PATH" >&2; exit 1; }
 rm -rf "$NIMCACHE"
 mkdir -p "$NIMCACHE"
 
+# Concurrent backend builds (one per build directory) share frameos/ —
+# nimble.paths and the generated app loaders — so they take turns from here.
+if command -v flock >/dev/null; then
+    mkdir -p "$SCRIPT_DIR/.cache"
+    exec 9>"$SCRIPT_DIR/.cache/build_nim.lock"
+    flock 9
+fi
+
 # Compiled-scene parameters from the backend (e.g. "-d:frameosSceneName=clock");
 # empty for a generic image.
 EXTRA_NIM_FLAGS="${FRAMEOS_EXTRA_NIM_FLAGS:-}"
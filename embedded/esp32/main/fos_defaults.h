@@ -11,7 +11,12 @@
  */
 #pragma once
 
-#if defined(__has_include)
+/* Backend builds pass the header's path instead (one per build directory,
+ * so concurrent builds never share it); see main/CMakeLists.txt. */
+#if defined(FRAMEOS_GENERATED_CONFIG_HEADER)
+#include FRAMEOS_GENERATED_CONFIG_HEADER
+#define FRAMEOS_HAVE_GENERATED_CONFIG 1
+#elif defined(__has_include)
 #if __has_include("generated_config.h")
 #include "generated_config.h"
 #define FRAMEOS_HAVE_GENERATED_CONFIG 1
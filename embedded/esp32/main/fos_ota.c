@@ -351,9 +351,10 @@ static esp_err_t ota_check_and_apply_locked(void)
         return ESP_OK;
     }
 
-    char url[FOS_URL_LEN + 96];
-    snprintf(url, sizeof(url), "%s/api/frames/%lu/embedded/ota/download",
-             config->backend_url, (unsigned long)config->frame_id);
+    /* Pinned to the manifest's image: a resumed download never mixes builds. */
+    char url[FOS_URL_LEN + 176];
+    snprintf(url, sizeof(url), "%s/api/frames/%lu/embedded/ota/download?sha256=%s",
+             config->backend_url, (unsigned long)config->frame_id, manifest.sha);
     if (has_applied_sha) {
         ESP_LOGI(TAG, "updating %.*s… -> %.*s… from %s",
                  12, applied_sha, 12, manifest.sha, url);
@@ -95,14 +95,18 @@ static void log_bootup_event(bool online)
     int width = fos_display_present() ? fos_display_width() : 800;
     int height = fos_display_present() ? fos_display_height() : 480;
     int pixel_format = fos_display_present() ? (int)fos_display_format() : 1;
-    char log_line[360];
+    /* Identifies the running build so the backend can offer a delta OTA. */
+    char elf_sha[80];
+    elf_sha[0] = '\0';
+    esp_app_get_elf_sha256(elf_sha, sizeof(elf_sha));
+    char log_line[448];
     snprintf(log_line, sizeof(log_line),
              "{\"event\":\"bootup\",\"source\":\"esp32\",\"width\":%d,\"height\":%d,"
              "\"pixelFormat\":%d,\"mode\":\"embedded\",\"renderMode\":\"%s\","
-             "\"version\":\"%s\",\"panel\":\"%s\",\"ip\":\"%s\",\"wifi\":\"%s\"}",
+             "\"version\":\"%s\",\"elfSha256\":\"%s\",\"panel\":\"%s\",\"ip\":\"%s\",\"wifi\":\"%s\"}",
              width, height, pixel_format,
              config->render_mode == FOS_RENDER_LOCAL ? "local" : "remote",
-             app->version, config->panel, fos_wifi_ip(), online ? "connected" : "offline");
+             app->version, elf_sha, config->panel, fos_wifi_ip(), online ? "connected" : "offline");
     frameos_nim_log_hook(log_line);
     frameos_nim_flush_logs();
 }
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import hashlib
+import importlib.util
 import json
 import os
 import shutil
@@ -13,6 +14,9 @@ from pathlib import Path
 
 MANIFEST_VERSION = 1
 MANIFEST_PATH = Path("assets/compiled/.manifest.json")
+# Per-file (size, mtime_ns, sha256) entries, so unchanged inputs are not reread.
+HASH_INDEX_PATH = Path("assets/compiled/.hash-index.json")
+FILE_HASH_INDEX_MODULE = Path(__file__).resolve().parents[2] / "backend" / "app" / "utils" / "file_hash_index.py"
 
 FRONTEND_OUTPUTS = (
     Path("assets/compiled/frame_web/index.html"),
@@ -133,7 +137,30 @@ def iter_files(path: Path) -> list[Path]:
     return sorted(candidate for candidate in path.rglob("*") if candidate.is_file())
 
 
+def load_hash_index(project_root: Path):
+    """The backend's FileHashIndex for this project, or None when the backend
+    tree is not next to this checkout (inputs are then hashed directly)."""
+    try:
+        spec = importlib.util.spec_from_file_location("frameos_file_hash_index", FILE_HASH_INDEX_MODULE)
+        if spec is None or spec.loader is None:
+            return None
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except (OSError, ImportError):
+        return None
+    return module.FileHashIndex(project_root / HASH_INDEX_PATH)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def hash_inputs(root: Path, entries: list[Path]) -> str:
+    index = load_hash_index(root)
     digest = hashlib.sha256()
     seen: set[Path] = set()
 
@@ -165,9 +192,11 @@ def hash_inputs(root: Path, entries: list[Path]) -> str:
                 continue
             seen.add(file_path)
             digest.update(f"path:{rel_path}\n".encode("utf-8"))
-            digest.update(file_path.read_bytes())
+            digest.update((index.sha256(file_path) if index is not None else file_sha256(file_path)).encode("ascii"))
             digest.update(b"\n")
 
+    if index is not None:
+        index.save()
     return digest.hexdigest()
 
 
@@ -9,6 +9,7 @@ import {
   copyPublicFolder,
   createHashlessEntrypoints,
   isDev,
+  precompressDirectory,
   startDevServer,
 } from './utils.mjs'
 
@@ -260,6 +261,11 @@ await buildInParallel(
       createHashlessEntrypoints(__dirname, files)
       copyMonacoWorkerChunks(buildResponse)
     },
+    async onAllBuildsComplete() {
+      // Served by the backend's PrecompressedStaticFiles instead of being
+      // compressed on every request.
+      await precompressDirectory(path.resolve(__dirname, 'dist'))
+    },
   }
 )
 
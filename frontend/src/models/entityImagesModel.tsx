@@ -25,6 +25,15 @@ export function useEntityImage(
 
   const imageUrl = entity ? getEntityImage(entity, subentity) : null
 
+  useEffect(() => {
+    const frameId = subentity === 'image' ? frameIdFromEntity(entity) : null
+    if (frameId === null) {
+      return
+    }
+    entityImagesModel.actions.watchFrameImage(frameId)
+    return () => entityImagesModel.actions.unwatchFrameImage(frameId)
+  }, [entity, subentity])
+
   useEffect(() => {
     if (entity) {
       updateEntityImage(entity, subentity, false)
@@ -42,6 +51,11 @@ export function useEntityImage(
   return { imageUrl, isLoading, setIsLoading }
 }
 
+function frameIdFromEntity(entity: string | null): number | null {
+  const match = entity?.match(/^frames\/(\d+)$/)
+  return match ? Number(match[1]) : null
+}
+
 export const entityImagesModel = kea<entityImagesModelType>([
   connect(() => ({ logic: [socketLogic] })),
   path(['src', 'models', 'entityImages']),
@@ -53,8 +67,21 @@ export const entityImagesModel = kea<entityImagesModelType>([
       imageUrl,
     }),
     updateEntityImageTimestamp: (entity: string, subentity: string) => ({ entity, subentity }),
+    watchFrameImage: (frameId: number) => ({ frameId }),
+    unwatchFrameImage: (frameId: number) => ({ frameId }),
   }),
   reducers(({ values }) => ({
+    // frame id -> number of mounted components showing its image
+    watchedFrameImages: [
+      {} as Record<number, number>,
+      {
+        watchFrameImage: (state, { frameId }) => ({ ...state, [frameId]: (state[frameId] ?? 0) + 1 }),
+        unwatchFrameImage: (state, { frameId }) => {
+          const { [frameId]: count = 0, ...rest } = state
+          return count > 1 ? { ...rest, [frameId]: count - 1 } : rest
+        },
+      },
+    ],
     entityImageTimestamps: [
       {} as Record<string, number>,
       {
@@ -84,6 +111,15 @@ export const entityImagesModel = kea<entityImagesModelType>([
     ],
   }),
   listeners(({ actions, values }) => ({
+    watchFrameImage: async (_, breakpoint) => {
+      // Page changes unmount and mount many images at once; send one update.
+      await breakpoint(250)
+      socketLogic.actions.watchFrames(Object.keys(values.watchedFrameImages).map(Number))
+    },
+    unwatchFrameImage: async (_, breakpoint) => {
+      await breakpoint(250)
+      socketLogic.actions.watchFrames(Object.keys(values.watchedFrameImages).map(Number))
+    },
     updateEntityImage: async ({ entity, subentity, force }) => {
       if (!entity) {
         return
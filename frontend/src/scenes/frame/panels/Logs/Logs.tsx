@@ -321,8 +321,10 @@ function logTypeClassName(type: string, theme: WorkspaceTheme): string {
 export function Logs({ fullScreen = false, compact = false, className }: LogsProps = {}) {
   const { frame, frameId } = useValues(frameLogic)
   const { theme: workspaceTheme } = useValues(workspaceLogic)
-  const { logs, filteredLogs, logSearch, logsLoading, fullLogDownloading } = useValues(logsLogic({ frameId }))
-  const { downloadLog, downloadFullLog, setLogSearch } = useActions(logsLogic({ frameId }))
+  const { logs, filteredLogs, logSearch, logsLoading, fullLogDownloading, hasOlderLogs } = useValues(
+    logsLogic({ frameId })
+  )
+  const { downloadLog, downloadFullLog, setLogSearch, loadOlderLogs } = useActions(logsLogic({ frameId }))
   const { usbLogStreamStatesByFrameId } = useValues(embeddedUsbLogsModel)
   const { stopUsbLogStream } = useActions(embeddedUsbLogsModel)
   const [atBottom, setAtBottom] = useState(true)
@@ -620,7 +622,22 @@ export function Logs({ fullScreen = false, compact = false, className }: LogsPro
         initialTopMostItemIndex={searchActive ? 0 : Math.max(visibleLogs.length - 1, 0)}
         data={visibleLogs}
         components={{
-          Header: () => (fullScreen ? <div aria-hidden="true" className="logs-list-top-spacer" /> : null),
+          Header: () => (
+            <>
+              {fullScreen ? <div aria-hidden="true" className="logs-list-top-spacer" /> : null}
+              {!compact && !searchActive && hasOlderLogs ? (
+                <div className="flex justify-center py-2">
+                  <button
+                    type="button"
+                    onClick={() => loadOlderLogs()}
+                    className="frameos-secondary-button rounded-lg px-3 py-1 font-sans text-xs font-semibold transition focus:outline-none focus-visible:ring-2 focus-visible:ring-blue-400"
+                  >
+                    Load older logs
+                  </button>
+                </div>
+              ) : null}
+            </>
+          ),
           Footer: () => (visibleLogs.length > 0 ? <div aria-hidden="true" className="h-5" /> : null),
           EmptyPlaceholder: () => (
             <div
@@ -12,6 +12,7 @@ export interface LogsLogicProps {
   frameId: FrameId
 }
 const MAX_LOG_LINES = 50000
+const OLDER_LOGS_PAGE_SIZE = 1000
 
 // Duplicate lines appear when a REST load (initial mount — e.g. the deploy
 // drawer mounting this logic mid-deploy — or the reconnect catch-up) races
@@ -101,8 +102,9 @@ export const logsLogic = kea<logsLogicType>([
     setFullLogDownloading: (downloading: boolean) => ({ downloading }),
     setLogSearch: (search: string) => ({ search }),
     appendLog: (log: LogType) => ({ log }),
+    setHasOlderLogs: (hasOlderLogs: boolean) => ({ hasOlderLogs }),
   }),
-  loaders(({ props, values }) => ({
+  loaders(({ actions, props, values }) => ({
     logs: [
       [] as LogType[],
       {
@@ -114,6 +116,7 @@ export const logsLogic = kea<logsLogicType>([
             }
             const data = await response.json()
             const fetched = data.logs as LogType[]
+            actions.setHasOlderLogs(Boolean(data.has_more))
             // Live lines may have streamed in over the websocket while the
             // fetch was in flight; keep them instead of clobbering, dedup by id.
             const fetchedIds = new Set(fetched.map((log) => log.id))
@@ -154,6 +157,32 @@ export const logsLogic = kea<logsLogicType>([
             return values.logs
           }
         },
+        // Page back through the retained history, a keyset page at a time
+        // (before_id = our oldest line), instead of loading it all on open.
+        loadOlderLogs: async () => {
+          const minId = values.logs.reduce((min, log) => (log.id < min ? log.id : min), Number.MAX_SAFE_INTEGER)
+          if (minId === Number.MAX_SAFE_INTEGER || values.logs.length >= MAX_LOG_LINES) {
+            actions.setHasOlderLogs(false)
+            return values.logs
+          }
+          try {
+            const response = await apiFetch(
+              `/api/frames/${props.frameId}/logs?before_id=${minId}&limit=${OLDER_LOGS_PAGE_SIZE}`
+            )
+            if (!response.ok) {
+              throw new Error('Failed to fetch logs')
+            }
+            const data = await response.json()
+            actions.setHasOlderLogs(Boolean(data.has_more))
+            const current = values.logs
+            const knownIds = new Set(current.map((log) => log.id))
+            const olderLogs = (data.logs as LogType[]).filter((log) => !knownIds.has(log.id))
+            return [...olderLogs, ...current].slice(0, MAX_LOG_LINES)
+          } catch (error) {
+            console.error(error)
+            return values.logs
+          }
+        },
       },
     ],
   })),
@@ -165,6 +194,12 @@ export const logsLogic = kea<logsLogicType>([
       // kea-typegen and break this reducer's typing.
       appendLog: (state, { log }) => (hasLogId(state, log.id) ? state : [...state, log].slice(-MAX_LOG_LINES)),
     },
+    hasOlderLogs: [
+      false,
+      {
+        setHasOlderLogs: (_, { hasOlderLogs }) => hasOlderLogs,
+      },
+    ],
     fullLogDownloading: [
       false,
       {
@@ -15,6 +15,12 @@ export type TerminalConnectionState = 'connecting' | 'connected' | 'closed'
 
 const MAX_HISTORY_SIZE = 200
 
+interface TerminalCommandType {
+  id: number
+  timestamp: string
+  command: string
+}
+
 function nextCommandHistory(history: string[], command: string): string[] {
   const trimmed = command.trim()
   if (!trimmed) {
@@ -74,7 +80,9 @@ export const terminalLogic = kea<terminalLogicType>([
     sendKeys: (keys: string) => ({ keys }),
     historyPrev: true,
     historyNext: true,
+    loadHistory: true,
     initializeHistory: (history: string[]) => ({ history }),
+    appendHistory: (history: string[]) => ({ history }),
     setHistoryIndex: (historyIndex: number | null) => ({ historyIndex }),
     setNavigationDraft: (navigationDraft: string) => ({ navigationDraft }),
     setConnectionState: (connectionState: TerminalConnectionState) => ({ connectionState }),
@@ -105,6 +113,7 @@ export const terminalLogic = kea<terminalLogicType>([
       [] as string[],
       {
         initializeHistory: (_, { history }) => history,
+        appendHistory: (state, { history }) => history.reduce(nextCommandHistory, state),
         executeCommand: (state, { command }) => nextCommandHistory(state, command),
       },
     ],
@@ -145,7 +154,7 @@ export const terminalLogic = kea<terminalLogicType>([
       cache.manualDisconnect = false
       cache.receivedTerminalOutput = false
       actions.setConnectionState('connecting')
-      actions.initializeHistory(frame.terminal_history || [])
+      actions.loadHistory()
       actions.appendText(
         useRemoteTerminal
           ? `***connecting to ${terminalRemoteTarget(frame)} via FrameOS Remote***\n`
@@ -165,6 +174,30 @@ export const terminalLogic = kea<terminalLogicType>([
       }
       cache.ws = ws
     },
+    loadHistory: async () => {
+      // After the first load only fetch commands typed since (in another tab,
+      // or by another user), so a reconnect doesn't re-download the history.
+      const afterId: number | undefined = cache.lastHistoryId
+      const query = afterId === undefined ? '' : `?after_id=${afterId}`
+      try {
+        const response = await apiFetch(`/api/frames/${props.frameId}/terminal_history${query}`)
+        if (!response.ok) {
+          throw new Error('Failed to fetch terminal history')
+        }
+        const commands = (await response.json()).commands as TerminalCommandType[]
+        if (commands.length > 0) {
+          cache.lastHistoryId = Math.max(cache.lastHistoryId ?? 0, commands[commands.length - 1].id)
+        }
+        const history = commands.map(({ command }) => command)
+        if (afterId === undefined) {
+          actions.initializeHistory(history)
+        } else {
+          actions.appendHistory(history)
+        }
+      } catch (error) {
+        console.error(error)
+      }
+    },
     disconnect: () => {
       if (cache.ws) {
         cache.manualDisconnect = true
@@ -178,14 +211,19 @@ export const terminalLogic = kea<terminalLogicType>([
       if (!command) {
         return
       }
-      const updatedHistory = nextCommandHistory(values.commandHistory, command)
       actions.executeCommand(command)
       cache.ws?.send(command + '\n')
-      await apiFetch(`/api/frames/${props.frameId}`, {
+      const response = await apiFetch(`/api/frames/${props.frameId}/terminal_history`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ terminal_history: updatedHistory }),
+        body: JSON.stringify({ command }),
       })
+      if (response.ok) {
+        const [saved] = (await response.json()).commands as TerminalCommandType[]
+        if (saved && cache.lastHistoryId !== undefined) {
+          cache.lastHistoryId = Math.max(cache.lastHistoryId, saved.id)
+        }
+      }
     },
     historyPrev: () => {
       const history = values.commandHistory
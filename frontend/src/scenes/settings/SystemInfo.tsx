@@ -92,6 +92,11 @@ export function SystemInfo() {
                         <td className="frameos-muted py-2 pr-2 align-top font-mono text-xs">{cache.path}</td>
                         <td className="frameos-strong py-2 pr-3 text-right font-semibold align-top">
                           {formatBytes(cache.sizeBytes)}
+                          {typeof cache.hitRate === 'number' ? (
+                            <div className="frameos-muted text-xs font-normal">
+                              {Math.round(cache.hitRate * 100)}% hits · {cache.entries ?? 0} entries
+                            </div>
+                          ) : null}
                         </td>
                       </tr>
                     ))}
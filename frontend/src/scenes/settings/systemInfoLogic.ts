@@ -27,6 +27,11 @@ export interface CacheInfo {
   path: string
   sizeBytes: number
   exists: boolean
+  entries?: number | null
+  pinnedEntries?: number | null
+  hits?: number | null
+  misses?: number | null
+  hitRate?: number | null
 }
 
 export interface DatabaseInfo {
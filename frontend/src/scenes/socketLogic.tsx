@@ -1,4 +1,4 @@
-import { actions, afterMount, beforeUnmount, kea, path } from 'kea'
+import { actions, afterMount, beforeUnmount, kea, listeners, path } from 'kea'
 import { AiSceneLogType, FrameType, LogType, FrameId } from '../types'
 
 import type { socketLogicType } from './socketLogicType'
@@ -21,6 +21,13 @@ function cloudWebSocketUrl(): string {
   return (typeof origin === 'string' ? origin : '') + CLOUD_UPDATES_PATH
 }
 
+function sendWatchedFrames(cache: Record<string, any>): void {
+  if (isCloudMode() || !cache.watchedFrameIds || cache.ws?.readyState !== WebSocket.OPEN) {
+    return
+  }
+  cache.ws.send(JSON.stringify({ event: 'watch_frames', data: { frameIds: cache.watchedFrameIds } }))
+}
+
 export const socketLogic = kea<socketLogicType>([
   path(['src', 'scenes', 'socketLogic']),
   actions({
@@ -38,11 +45,20 @@ export const socketLogic = kea<socketLogicType>([
     updateSettings: (settings: Record<string, any>) => ({ settings }),
     newMetrics: (metrics: Record<string, any>) => ({ metrics }),
     frameRendered: (frameId: FrameId) => ({ frameId }),
+    // Tell the backend which frame images are on screen, so it can prefetch
+    // them as soon as the frame finishes rendering.
+    watchFrames: (frameIds: number[]) => ({ frameIds }),
     // Fired when the socket reopens after a drop. All frame state is
     // event-sourced over this socket, so listeners must refetch anything
     // they may have missed while disconnected.
     socketReconnected: true,
   }),
+  listeners(({ cache }) => ({
+    watchFrames: ({ frameIds }) => {
+      cache.watchedFrameIds = frameIds
+      sendWatchedFrames(cache)
+    },
+  })),
   afterMount(({ actions, cache }) => {
     if (typeof window !== 'undefined' && (window as any).FRAMEOS_EMBEDDED_NO_BACKEND) {
       return
@@ -60,6 +76,7 @@ export const socketLogic = kea<socketLogicType>([
       cache.ws.onopen = function (event: any) {
         console.log('🔵 Connected to the WebSocket server.')
         cache.openedAt = Date.now()
+        sendWatchedFrames(cache)
         if (cache.everDisconnected) {
           actions.socketReconnected()
         }
@@ -77,6 +94,11 @@ export const socketLogic = kea<socketLogicType>([
             case 'new_log':
               actions.newLog(data.data)
               break
+            case 'new_logs':
+              for (const log of data.data.logs) {
+                actions.newLog(log)
+              }
+              break
             case 'ai_scene_log':
               actions.aiSceneLog(data.data)
               break
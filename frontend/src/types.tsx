@@ -206,7 +206,6 @@ export interface FrameType {
   buildroot?: FrameBuildrootConfig
   embedded?: FrameEmbeddedConfig
   rpios?: FrameRpiOSConfig
-  terminal_history?: string[]
   active_connections?: number
   // Cloud frames only: whether the device's management WebSocket is live on
   // the hub right now. Commands sent while false queue until it redials.
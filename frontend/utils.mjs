@@ -1,4 +1,5 @@
 import fs from 'node:fs/promises'
+import zlib from 'node:zlib'
 
 import autoprefixer from 'autoprefixer'
 import chokidar from 'chokidar'
@@ -110,6 +111,53 @@ export function createHashlessEntrypoints(absWorkingDir, entrypoints) {
   }
 }
 
+const precompressedExtensions = /\.(css|html|js|json|mjs|svg|txt|wasm)$/
+const precompressMinimumSize = 1024
+
+async function* walkFiles(dir) {
+  for (const entry of await fs.readdir(dir, { withFileTypes: true })) {
+    const entryPath = path.resolve(dir, entry.name)
+    if (entry.isDirectory()) {
+      yield* walkFiles(entryPath)
+    } else if (entry.isFile()) {
+      yield entryPath
+    }
+  }
+}
+
+/** Writes "file.js.br" and "file.js.gz" next to every text asset in dir, for the backend to serve as is. */
+export async function precompressDirectory(dir) {
+  let count = 0
+  for await (const file of walkFiles(dir)) {
+    if (!precompressedExtensions.test(file)) {
+      continue
+    }
+    const contents = await fs.readFile(file)
+    if (contents.length < precompressMinimumSize) {
+      continue
+    }
+    const variants = [
+      [
+        '.br',
+        zlib.brotliCompressSync(contents, {
+          params: {
+            [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY,
+            [zlib.constants.BROTLI_PARAM_SIZE_HINT]: contents.length,
+          },
+        }),
+      ],
+      ['.gz', zlib.gzipSync(contents, { level: zlib.constants.Z_BEST_COMPRESSION })],
+    ]
+    for (const [suffix, compressed] of variants) {
+      if (compressed.length < contents.length) {
+        await fs.writeFile(`${file}${suffix}`, compressed)
+      }
+    }
+    count += 1
+  }
+  console.log(`🗜️ Precompressed ${count} files in ${dir}`)
+}
+
 /** @type {import('esbuild').BuildOptions} */
 export const commonConfig = {
   sourcemap: true,
@@ -178,7 +226,7 @@ function getChunks(result) {
   return chunks
 }
 
-export async function buildInParallel(configs, { onBuildStart, onBuildComplete } = {}) {
+export async function buildInParallel(configs, { onBuildStart, onBuildComplete, onAllBuildsComplete } = {}) {
   try {
     await Promise.all(
       configs.map((config) =>
@@ -189,6 +237,9 @@ export async function buildInParallel(configs, { onBuildStart, onBuildComplete }
         })
       )
     )
+    if (!isDev) {
+      await onAllBuildsComplete?.()
+    }
   } catch (e) {
     if (!isDev) {
       process.exit(1)